@@ -10,6 +10,8 @@ _   _ _____ _____    _____ _____ __  __ _    _ _            _______ ____  _____
 """
 import abc
 import argparse
+import asyncio
+import collections
 import contextlib
 import fcntl
 import grpc
@@ -31,9 +33,12 @@ import nic_simulator_grpc_service_pb2
 import nic_simulator_grpc_service_pb2_grpc
 import nic_simulator_grpc_mgmt_service_pb2
 import nic_simulator_grpc_mgmt_service_pb2_grpc
+from simulator_metrics import Metrics
 
 
 THREAD_CONCURRENCY_PER_SERVER = 2
+# NOTE: the NiC servers of the consolidated mode share one thread pool
+THREAD_CONCURRENCY_CONSOLIDATED = 16
 USE_HASH_SELECTION_METHOD_EXPLICITLY = False
 
 # name templates
@@ -52,6 +57,9 @@ GRPC_SERVER_OPTIONS = [
     ('grpc.http2.min_ping_interval_without_data_ms', 1000),
     ('grpc.http2.max_ping_strikes',  0)
 ]
+# NOTE: the metrics service is served with JSON messages, it has no protobuf definitions
+METRICS_SERVICE = "nic_simulator.Metrics"
+METRICS_QUERY_METHOD = "QueryMetrics"
 GRPC_CLIENT_OPTIONS = [
     ('grpc.keepalive_timeout_ms', 8000),
     ('grpc.keepalive_time_ms', 4000),
@@ -75,11 +83,15 @@ def get_ip_address(ifname):
     return addr
 
 
-def run_command(cmd, check=True):
-    """Run a command."""
+def run_command(cmd, check=True, input=None):
+    """Run a command, with input sent to its stdin if given."""
     logging.debug("COMMAND: %s", cmd)
+    if input is not None:
+        logging.debug("COMMAND STDIN:\n%s\n", input)
+    METRICS.count("commands")
     result = subprocess.run(
         cmd,
+        input=input.encode() if input is not None else None,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         shell=True,
@@ -104,6 +116,9 @@ class OVSCommand(object):
     OVS_OFCTL_DEL_GROUPS_CMD = "ovs-ofctl -O OpenFlow13 del-groups {bridge_name}"
     OVS_OFCTL_ADD_GROUP_CMD = "ovs-ofctl -O OpenFlow13 add-group {bridge_name} {group}"
     OVS_OFCTL_MOD_GROUP_CMD = "ovs-ofctl -O OpenFlow13 mod-group {bridge_name} {group}"
+    OVS_OFCTL_BUNDLE_CMD = "ovs-ofctl -O OpenFlow15 bundle {bridge_name} -"
+    # NOTE: bundles of flow and group mods need OpenFlow 1.4 and above, use them with OpenFlow15
+    USE_BUNDLE = False
 
     @staticmethod
     def setup_openflow_version():
@@ -122,6 +137,7 @@ class OVSCommand(object):
                 OVSCommand.OVS_OFCTL_DEL_GROUPS_CMD = "ovs-ofctl -O OpenFlow15 del-groups {bridge_name}"
                 OVSCommand.OVS_OFCTL_ADD_GROUP_CMD = "ovs-ofctl -O OpenFlow15 add-group {bridge_name} {group}"
                 OVSCommand.OVS_OFCTL_MOD_GROUP_CMD = "ovs-ofctl -O OpenFlow15 mod-group {bridge_name} {group}"
+                OVSCommand.USE_BUNDLE = True
         except Exception:
             raise ValueError("Failed to find/setup openflow version: %s" % out.stdout)
 
@@ -157,6 +173,78 @@ class OVSCommand(object):
     def ovs_ofctl_mod_groups(bridge_name, group):
         return run_command(OVSCommand.OVS_OFCTL_MOD_GROUP_CMD.format(bridge_name=bridge_name, group=group))
 
+    @staticmethod
+    def ovs_ofctl_bundle(bridge_name, mods):
+        return run_command(OVSCommand.OVS_OFCTL_BUNDLE_CMD.format(bridge_name=bridge_name),
+                           input="".join("%s\n" % mod for mod in mods))
+
+
+METRICS = Metrics(lambda: {"use_bundle": OVSCommand.USE_BUNDLE, "threads": threading.active_count()})
+
+
+class OVSBatch(object):
+    """
+    Flow and group changes of a request to an OVS bridge.
+
+    The changes are applied in one ovs-ofctl bundle transaction, so they take effect atomically and with a single
+    ovs-ofctl process. Without bundle support, or if the bundle fails, they are applied with one ovs-ofctl command
+    each. A flow or group changed several times is only changed once, to its latest state.
+    """
+
+    BUNDLE_MODS = {
+        "add_flow": "flow add %s",
+        "mod_flow": "flow modify_strict %s",
+        "add_group": "group add %s",
+        "mod_group": "group modify %s"
+    }
+    COMMANDS = {
+        "add_flow": "ovs_ofctl_add_flow",
+        "mod_flow": "ovs_ofctl_mod_flow",
+        "add_group": "ovs_ofctl_add_group",
+        "mod_group": "ovs_ofctl_mod_groups"
+    }
+
+    def __init__(self, bridge_name):
+        self.bridge_name = bridge_name
+        self.changes = collections.OrderedDict()
+
+    def add_flow(self, flow):
+        self.changes.setdefault(id(flow), ("add_flow", flow))
+
+    def mod_flow(self, flow):
+        self.changes.setdefault(id(flow), ("mod_flow", flow))
+
+    def add_group(self, group):
+        self.changes.setdefault(id(group), ("add_group", group))
+
+    def mod_group(self, group):
+        self.changes.setdefault(id(group), ("mod_group", group))
+
+    def apply(self):
+        """Apply the changes."""
+        if not self.changes:
+            return
+        changes = list(self.changes.values())
+        self.changes.clear()
+        if OVSCommand.USE_BUNDLE:
+            mods = [self.BUNDLE_MODS[operation] % obj for operation, obj in changes]
+            try:
+                OVSCommand.ovs_ofctl_bundle(self.bridge_name, mods)
+                METRICS.count("bundles")
+                return
+            except subprocess.CalledProcessError as e:
+                # NOTE: a failed bundle is discarded as a whole, so the changes could be applied one by one
+                stderr = e.stderr.decode() if e.stderr else str(e)
+                if "bundle" in stderr.lower() or "version negotiation failed" in stderr:
+                    logging.warning("Bundles are not supported by bridge %s, stop using bundles: %s",
+                                    self.bridge_name, stderr)
+                    OVSCommand.USE_BUNDLE = False
+                else:
+                    logging.warning("Failed to apply bundle to bridge %s, apply the changes one by one: %s",
+                                    self.bridge_name, stderr)
+        for operation, obj in changes:
+            getattr(OVSCommand, self.COMMANDS[operation])(self.bridge_name, obj)
+
 
 class StrObj(abc.ABC):
     """Abstract class defines objects that could be represented as a string."""
@@ -502,10 +590,11 @@ class OVSBridge(object):
         logging.info("Init flows for bridge %s", self.bridge_name)
         self._del_flows()
         self._del_groups()
+        batch = OVSBatch(self.bridge_name)
         # downstream flows
-        self.downstream_upper_tor_flow = self._add_flow(self.upper_tor_port,
+        self.downstream_upper_tor_flow = self._add_flow(batch, self.upper_tor_port,
                                                         output_ports=[self.ptf_port, self.server_nic], priority=11)
-        self.downstream_lower_tor_flow = self._add_flow(self.lower_tor_port,
+        self.downstream_lower_tor_flow = self._add_flow(batch, self.lower_tor_port,
                                                         output_ports=[self.ptf_port, self.server_nic], priority=11)
 
         # upstream flows
@@ -513,6 +602,7 @@ class OVSBridge(object):
             # NOTE: add two flows to direct gRPC traffic to its correct destination
             # upstream packet to the upper ToR loopback3 from server NiC should be forwarded to the upper ToR
             self.upstream_upper_tor_nic_flow = self._add_flow(
+                batch,
                 self.server_nic,
                 packet_filter="tcp,ip_dst=%s" % self.upper_tor_loopback3_ip,
                 output_ports=[self.lower_tor_port, self.upper_tor_port],
@@ -522,6 +612,7 @@ class OVSBridge(object):
             )
             # upstream packet to the lower ToR loopback3 from server NiC should be forwarded to the lower ToR
             self.upstream_lower_tor_nic_flow = self._add_flow(
+                batch,
                 self.server_nic,
                 packet_filter="tcp,ip_dst=%s" % self.lower_tor_loopback3_ip,
                 output_ports=[self.lower_tor_port, self.upper_tor_port],
@@ -531,6 +622,7 @@ class OVSBridge(object):
             )
         # upstream packet from server NiC should be directed to both ToRs
         self.upstream_nic_flow = self._add_flow(
+            batch,
             self.server_nic,
             output_ports=[self.lower_tor_port, self.upper_tor_port],
             priority=9,
@@ -538,6 +630,7 @@ class OVSBridge(object):
         )
         # upstream packet to loopback2 from ptf port should be duplicated to both ToRs
         self.upstream_loopback2_flow = self._add_flow(
+            batch,
             self.ptf_port,
             packet_filter="ip,ip_dst=%s" % self.loopback2_ip,
             output_ports=[self.lower_tor_port, self.upper_tor_port],
@@ -546,6 +639,7 @@ class OVSBridge(object):
         )
         # upstream packet to the upper ToR loopback3 from ptf should be duplicated to both ToRs
         self.upstream_upper_tor_loopback3_flow = self._add_flow(
+            batch,
             self.ptf_port,
             packet_filter="ip,ip_dst=%s" % self.upper_tor_loopback3_ip,
             output_ports=[self.lower_tor_port, self.upper_tor_port],
@@ -554,6 +648,7 @@ class OVSBridge(object):
         )
         # upstream packet to the lower ToR loopback3 from ptf should be duplicated to both ToRs
         self.upstream_lower_tor_loopback3_flow = self._add_flow(
+            batch,
             self.ptf_port,
             packet_filter="ip,ip_dst=%s" % self.lower_tor_loopback3_ip,
             output_ports=[self.lower_tor_port, self.upper_tor_port],
@@ -562,6 +657,7 @@ class OVSBridge(object):
         )
         # upstream arp packet from ptf port should be duplicated to both ToRs
         self.upstream_arp_flow = self._add_flow(
+            batch,
             self.ptf_port, packet_filter="arp",
             output_ports=[self.lower_tor_port, self.upper_tor_port],
             priority=6,
@@ -569,6 +665,7 @@ class OVSBridge(object):
         )
         # upstream ipv6 icmp packet from ptf port should be duplicated to both ToRs
         self.upstream_icmpv6_flow = self._add_flow(
+            batch,
             self.ptf_port, packet_filter="ipv6,nw_proto=58",
             output_ports=[self.lower_tor_port, self.upper_tor_port],
             priority=5,
@@ -576,15 +673,18 @@ class OVSBridge(object):
         )
         # upstream packet from ptf port should be ECMP directed to active ToRs
         self.upstream_ecmp_group = self._add_upstream_ecmp_group(
+            batch,
             1,
             self.upper_tor_port,
             self.lower_tor_port
         )
         self.upstream_ecmp_flow = self._add_upstream_ecmp_flow(
+            batch,
             self.ptf_port,
             self.upstream_ecmp_group,
             priority=4
         )
+        batch.apply()
 
     def _get_ports(self):
         result = OVSCommand.ovs_vsctl_list_ports(self.bridge_name)
@@ -600,7 +700,7 @@ class OVSBridge(object):
         self.upstream_ecmp_group = None
         self.groups.clear()
 
-    def _add_flow(self, in_port, packet_filter=None, output_ports=[], group=None, priority=None,
+    def _add_flow(self, batch, in_port, packet_filter=None, output_ports=[], group=None, priority=None,
                   upstream=False, enable_output_ports=None):
         if upstream:
             flow = OVSUpstreamFlow(in_port, packet_filter=packet_filter, output_ports=output_ports,
@@ -609,23 +709,23 @@ class OVSBridge(object):
             flow = OVSFlow(in_port, packet_filter=packet_filter, output_ports=output_ports,
                            group=group, priority=priority)
         logging.info("Add flow to bridge %s: %s", self.bridge_name, flow)
-        OVSCommand.ovs_ofctl_add_flow(self.bridge_name, flow)
+        batch.add_flow(flow)
         self.flows.append(flow)
         return flow
 
-    def _add_upstream_ecmp_group(self, group_id, upper_tor_port, lower_tor_port):
+    def _add_upstream_ecmp_group(self, batch, group_id, upper_tor_port, lower_tor_port):
         group = UpstreamECMPGroup(group_id, upper_tor_port, lower_tor_port)
         logging.info("Add upstream ecmp group to bridge %s: %s",
                      self.bridge_name, group)
-        OVSCommand.ovs_ofctl_add_group(self.bridge_name, group)
+        batch.add_group(group)
         self.groups.append(group)
         return group
 
-    def _add_upstream_ecmp_flow(self, in_port, group, priority=None):
+    def _add_upstream_ecmp_flow(self, batch, in_port, group, priority=None):
         flow = UpstreamECMPFlow(in_port, group, priority=priority)
         logging.info("Add upstream ecmp flow to bridge %s: %s",
                      self.bridge_name, flow)
-        OVSCommand.ovs_ofctl_add_flow(self.bridge_name, flow)
+        batch.add_flow(flow)
         self.flows.append(flow)
         return flow
 
@@ -636,8 +736,9 @@ class OVSBridge(object):
                 logging.info("Set bridge %s port %s forwarding state: %s",
                              self.bridge_name, portid, ForwardingState.STATE_LABELS[state])
                 self.flap_counter[portid] += self.states_setter[portid](state)
-            OVSCommand.ovs_ofctl_mod_groups(
-                self.bridge_name, self.upstream_ecmp_group)
+            batch = OVSBatch(self.bridge_name)
+            batch.mod_group(self.upstream_ecmp_group)
+            batch.apply()
             return self.query_forwarding_state(portids)
 
     def query_forwarding_state(self, portids):
@@ -652,8 +753,15 @@ class OVSBridge(object):
         """Set drop on a link."""
         logging.info("Set drop on bridge %s: portids=%s, directions=%s, recover=%s"
                      % (self.bridge_name, portids, directions, recover))
+        if not recover:
+            for _, direction in zip(portids, directions):
+                if direction not in (0, 1):
+                    raise ValueError("Invalid direction %s, please use 0 for downstream and 1 for upstream"
+                                     % (direction))
         with self.lock:
             result = []
+            # NOTE: the flow changes of all the ports are applied together at the end
+            batch = OVSBatch(self.bridge_name)
             for portid, direction in zip(portids, directions):
                 downstream_flow = self.downstream_flows[portid]
                 forwarding_state_getter = self.states_getter[portid]
@@ -663,8 +771,7 @@ class OVSBridge(object):
                     # recover downstream
                     if downstream_flow.drop:
                         downstream_flow.set_drop(recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, downstream_flow)
+                        batch.mod_flow(downstream_flow)
 
                     # recover upstream
                     # recover upstream traffic from server NiC
@@ -672,115 +779,97 @@ class OVSBridge(object):
                         if self.upstream_upper_tor_nic_flow.get_drop(portid):
                             self.upstream_upper_tor_nic_flow.set_drop(
                                 portid=portid, recover=recover)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_upper_tor_nic_flow)
+                            batch.mod_flow(self.upstream_upper_tor_nic_flow)
                     if self.upstream_lower_tor_nic_flow.get_port_enable(portid):
                         if self.upstream_lower_tor_nic_flow.get_drop(portid):
                             self.upstream_lower_tor_nic_flow.set_drop(
                                 portid=portid, recover=recover)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_lower_tor_nic_flow)
+                            batch.mod_flow(self.upstream_lower_tor_nic_flow)
                     if self.upstream_nic_flow.get_drop(portid):
                         self.upstream_nic_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_nic_flow)
+                        batch.mod_flow(self.upstream_nic_flow)
                     # recover upstream loopback2 traffic from ptf
                     if self.upstream_loopback2_flow.get_drop(portid):
                         self.upstream_loopback2_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_loopback2_flow)
+                        batch.mod_flow(self.upstream_loopback2_flow)
                     # recover upstream upper ToR loopback3 traffic from ptf
                     if self.upstream_upper_tor_loopback3_flow.get_drop(portid):
                         self.upstream_upper_tor_loopback3_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_upper_tor_loopback3_flow)
+                        batch.mod_flow(self.upstream_upper_tor_loopback3_flow)
                     # recover upstream lower ToR loopback3 traffic from ptf
                     if self.upstream_lower_tor_loopback3_flow.get_drop(portid):
                         self.upstream_lower_tor_loopback3_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_lower_tor_loopback3_flow)
+                        batch.mod_flow(self.upstream_lower_tor_loopback3_flow)
                     # recover upstream arp traffic from ptf
                     if self.upstream_arp_flow.get_drop(portid):
                         self.upstream_arp_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_arp_flow)
+                        batch.mod_flow(self.upstream_arp_flow)
                     # recover upstream icmpv6 traffic from ptf
                     if self.upstream_icmpv6_flow.get_drop(portid):
                         self.upstream_icmpv6_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_icmpv6_flow)
+                        batch.mod_flow(self.upstream_icmpv6_flow)
 
                     forwarding_state = forwarding_state_getter()
                     if forwarding_state == ForwardingState.STANDBY:
                         forwarding_state_setter(ForwardingState.ACTIVE)
-                        OVSCommand.ovs_ofctl_mod_groups(
-                            self.bridge_name, self.upstream_ecmp_group)
+                        batch.mod_group(self.upstream_ecmp_group)
                 else:
                     if direction == 0:
                         # downstream
                         if not downstream_flow.drop:
                             downstream_flow.set_drop()
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, downstream_flow)
+                            batch.mod_flow(downstream_flow)
                     elif direction == 1:
                         # upstream
                         # drop upstream traffic from server NiC
                         if self.upstream_upper_tor_nic_flow.get_port_enable(portid):
                             if not self.upstream_upper_tor_nic_flow.get_drop(portid):
                                 self.upstream_upper_tor_nic_flow.set_drop(portid)
-                                OVSCommand.ovs_ofctl_mod_flow(
-                                    self.bridge_name, self.upstream_upper_tor_nic_flow)
+                                batch.mod_flow(self.upstream_upper_tor_nic_flow)
                         if self.upstream_lower_tor_nic_flow.get_port_enable(portid):
                             if not self.upstream_lower_tor_nic_flow.get_drop(portid):
                                 self.upstream_lower_tor_nic_flow.set_drop(portid)
-                                OVSCommand.ovs_ofctl_mod_flow(
-                                    self.bridge_name, self.upstream_lower_tor_nic_flow)
+                                batch.mod_flow(self.upstream_lower_tor_nic_flow)
                         if not self.upstream_nic_flow.get_drop(portid):
                             self.upstream_nic_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_nic_flow)
+                            batch.mod_flow(self.upstream_nic_flow)
                         # drop upstream loopback2 traffic from ptf
                         if not self.upstream_loopback2_flow.get_drop(portid):
                             self.upstream_loopback2_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_loopback2_flow)
+                            batch.mod_flow(self.upstream_loopback2_flow)
                         # drop upstream upper ToR loopback3 traffic from ptf
                         if not self.upstream_upper_tor_loopback3_flow.get_drop(portid):
                             self.upstream_upper_tor_loopback3_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_upper_tor_loopback3_flow)
+                            batch.mod_flow(self.upstream_upper_tor_loopback3_flow)
                         # drop upstream lower ToR loopback3 traffic from ptf
                         if not self.upstream_lower_tor_loopback3_flow.get_drop(portid):
                             self.upstream_lower_tor_loopback3_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_lower_tor_loopback3_flow)
+                            batch.mod_flow(self.upstream_lower_tor_loopback3_flow)
                         # drop upstream arp traffic from ptf
                         if not self.upstream_arp_flow.get_drop(portid):
                             self.upstream_arp_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_arp_flow)
+                            batch.mod_flow(self.upstream_arp_flow)
                         # drop upstream icmpv6 traffic from ptf
                         if not self.upstream_icmpv6_flow.get_drop(portid):
                             self.upstream_icmpv6_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_icmpv6_flow)
+                            batch.mod_flow(self.upstream_icmpv6_flow)
 
                         forwarding_state = forwarding_state_getter()
                         # use set forwarding state to standby to simulator link drop
                         if forwarding_state == ForwardingState.ACTIVE:
                             forwarding_state_setter(ForwardingState.STANDBY)
-                            OVSCommand.ovs_ofctl_mod_groups(
-                                self.bridge_name, self.upstream_ecmp_group)
+                            batch.mod_group(self.upstream_ecmp_group)
                     else:
                         raise ValueError("Invalid direction %s, please use 0 for downstream and 1 for upstream"
                                          % (direction))
                 result.append(True)
+            batch.apply()
             return result
 
     def query_flap_counter(self, portids):
@@ -869,10 +958,11 @@ class NiCServer(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
         logging.debug("SetAdminForwardingPortState: request to server %s from client %s\n",
                       self.nic_addr, context.peer())
         portids, states = request.portid, request.state
-        response = nic_simulator_grpc_service_pb2.AdminReply(
-            portid=portids,
-            state=self.ovs_bridge.set_forwarding_state(portids, states)
-        )
+        with METRICS.timed("SetAdminForwardingPortState"):
+            response = nic_simulator_grpc_service_pb2.AdminReply(
+                portid=portids,
+                state=self.ovs_bridge.set_forwarding_state(portids, states)
+            )
         logging.debug("SetAdminForwardingPortState: response to client %s from server %s:\n%s",
                       context.peer(), self.nic_addr, response)
         return response
@@ -893,10 +983,11 @@ class NiCServer(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
         logging.debug("SetDrop: request to server %s from client %s\n",
                       self.nic_addr, context.peer())
         portids, directions, recover = request.portid, request.direction, request.recover
-        response = nic_simulator_grpc_service_pb2.DropReply(
-            portid=portids,
-            success=self.ovs_bridge.set_drop(portids, directions, recover)
-        )
+        with METRICS.timed("SetDrop"):
+            response = nic_simulator_grpc_service_pb2.DropReply(
+                portid=portids,
+                success=self.ovs_bridge.set_drop(portids, directions, recover)
+            )
         logging.debug("SetDrop: response to client %s from server %s\n%s",
                       context.peer(), self.nic_addr, response)
         return response
@@ -958,19 +1049,110 @@ class NiCServer(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
             timeout=timeout, suppress_exception=suppress_exception)
 
 
+class NiCServerLoop(object):
+    """
+    Event loop to run the gRPC servers of all the NiCs in the consolidated mode.
+
+    The NiC servers are asyncio gRPC servers sharing this event loop thread, and their handlers run in one shared
+    thread pool, instead of a thread and a thread pool for each NiC server.
+    """
+
+    def __init__(self, max_workers):
+        self.loop = asyncio.new_event_loop()
+        self.executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.thread = InterruptableThread(target=self._run_loop, daemon=True)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self):
+        """Start the event loop thread."""
+        self.thread.start()
+
+    def run(self, coroutine):
+        """Run the coroutine in the event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+
+class AsyncNiCServer(NiCServer):
+    """gRPC for a NiC, served on the event loop of the consolidated mode."""
+
+    def __init__(self, nic_addr, ovs_bridge, binding_port, server_loop):
+        super(AsyncNiCServer, self).__init__(nic_addr, ovs_bridge, binding_port)
+        self.server_loop = server_loop
+
+    async def _start_server(self, binding_port):
+        """Start the asyncio gRPC server, the servicer methods run in the thread pool of the event loop."""
+        self.server = grpc.aio.server(
+            migration_thread_pool=self.server_loop.executor,
+            options=GRPC_SERVER_OPTIONS
+        )
+        nic_simulator_grpc_service_pb2_grpc.add_DualToRActiveServicer_to_server(
+            self,
+            self.server
+        )
+        self.server.add_insecure_port("%s:%s" % (self.nic_addr, binding_port))
+        await self.server.start()
+
+    def start(self):
+        """Start the gRPC server."""
+        self.server_loop.run(self._start_server(self.binding_port))
+        self.started = True
+
+    def stop(self):
+        """Stop the gRPC server."""
+        self.server_loop.run(self.server.stop(grace=None))
+        self.started = False
+
+    def join(self, timeout=None, suppress_exception=False):
+        """The gRPC server is already stopped when stop returns."""
+        return None
+
+
+class LocalNiCStub(object):
+    """Client stub to call the NiC servers in process, skipping the gRPC round trip to the NiC servers."""
+
+    class Context(object):
+        """Context of the calls in process."""
+
+        @staticmethod
+        def peer():
+            return "local"
+
+    def __init__(self, nic_servers, nic_address):
+        self.nic_servers = nic_servers
+        self.nic_address = nic_address
+
+    def __getattr__(self, name):
+
+        def _call(request, timeout=None):
+            # NOTE: fail the calls to a stopped NiC server like the calls over gRPC
+            nic_server = self.nic_servers.get(self.nic_address)
+            if nic_server is None or not nic_server.started:
+                raise RuntimeError("NiC server %s is not running" % self.nic_address)
+            return getattr(nic_server, name)(request, LocalNiCStub.Context)
+
+        return _call
+
+
 class MgmtServer(nic_simulator_grpc_mgmt_service_pb2_grpc.DualTorMgmtServiceServicer):
     """Management gRPC server to interact with sonic-mgmt."""
 
-    def __init__(self, binding_address, binding_port, nic_servers):
+    def __init__(self, binding_address, binding_port, nic_servers, local_fanout=False):
         self.binding_address = binding_address
         self.binding_port = binding_port
         self.nic_servers = nic_servers
+        self.local_fanout = local_fanout
         self.client_stubs = {}
         self.server = None
 
     def _get_client_stub(self, nic_address):
         if nic_address in self.client_stubs:
             client_stub = self.client_stubs[nic_address]
+        elif self.local_fanout:
+            client_stub = LocalNiCStub(self.nic_servers, nic_address)
+            self.client_stubs[nic_address] = client_stub
         else:
             client_stub = nic_simulator_grpc_service_pb2_grpc.DualToRActiveStub(
                 grpc.insecure_channel(
@@ -1009,6 +1191,11 @@ class MgmtServer(nic_simulator_grpc_mgmt_service_pb2_grpc.DualTorMgmtServiceServ
         return response
 
     def SetAdminForwardingPortState(self, request, context):
+        # NOTE: toggling all the ports is one call with all the NiC addresses
+        with METRICS.timed("SetAdminForwardingPortState[mgmt]"):
+            return self._set_admin_forwarding_port_state(request, context)
+
+    def _set_admin_forwarding_port_state(self, request, context):
         nic_addresses = request.nic_addresses
         admin_requests = request.admin_requests
         logging.debug(
@@ -1039,6 +1226,10 @@ class MgmtServer(nic_simulator_grpc_mgmt_service_pb2_grpc.DualTorMgmtServiceServ
         return nic_simulator_grpc_mgmt_service_pb2.ListOfOperationReply()
 
     def SetDrop(self, request, context):
+        with METRICS.timed("SetDrop[mgmt]"):
+            return self._set_drop(request, context)
+
+    def _set_drop(self, request, context):
         nic_addresses = request.nic_addresses
         drop_requests = request.drop_requests
         logging.debug("SetDrop[mgmt]: request set drop: %s\n", request)
@@ -1162,6 +1353,14 @@ class MgmtServer(nic_simulator_grpc_mgmt_service_pb2_grpc.DualTorMgmtServiceServ
             "ResetFlapCounter[mgmt]: response of reset: %s", response)
         return response
 
+    def QueryMetrics(self, request, context):
+        """Return the metrics of the NiC simulator, and clear them if requested with {"clear": true}."""
+        metrics = METRICS.to_dict()
+        if request.get("clear"):
+            METRICS.clear()
+        logging.debug("QueryMetrics[mgmt]: response of query: %s", metrics)
+        return metrics
+
     def start(self):
         self.server = grpc.server(
             futures.ThreadPoolExecutor(
@@ -1170,6 +1369,15 @@ class MgmtServer(nic_simulator_grpc_mgmt_service_pb2_grpc.DualTorMgmtServiceServ
         )
         nic_simulator_grpc_mgmt_service_pb2_grpc.add_DualTorMgmtServiceServicer_to_server(
             self, self.server)
+        self.server.add_generic_rpc_handlers((
+            grpc.method_handlers_generic_handler(METRICS_SERVICE, {
+                METRICS_QUERY_METHOD: grpc.unary_unary_rpc_method_handler(
+                    self.QueryMetrics,
+                    request_deserializer=lambda data: json.loads(data.decode() or "{}"),
+                    response_serializer=lambda metrics: json.dumps(metrics).encode()
+                )
+            }),
+        ))
         self.server.add_insecure_port("%s:%s" % (
             self.binding_address, self.binding_port))
         self.server.start()
@@ -1179,7 +1387,8 @@ class MgmtServer(nic_simulator_grpc_mgmt_service_pb2_grpc.DualTorMgmtServiceServ
 class NiCSimulator(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
     """NiC simulator class, define all the gRPC calls."""
 
-    def __init__(self, vm_set, mgmt_port, binding_port, loopback_ips, duplicate_nic_upstream=False):
+    def __init__(self, vm_set, mgmt_port, binding_port, loopback_ips, duplicate_nic_upstream=False,
+                 consolidated=False):
         self.vm_set = vm_set
         self.server_nics = self._find_all_server_nics()
         self.server_nic_addresses = {
@@ -1201,10 +1410,16 @@ class NiCSimulator(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
                      json.dumps(list(self.ovs_bridges.keys()), indent=4))
 
         self.servers = {}
-        self.servers = {nic_addr: NiCServer(nic_addr, ovs_bridge, binding_port)
-                        for nic_addr, ovs_bridge in self.ovs_bridges.items()}
+        self.server_loop = None
+        if consolidated:
+            self.server_loop = NiCServerLoop(THREAD_CONCURRENCY_CONSOLIDATED)
+            self.servers = {nic_addr: AsyncNiCServer(nic_addr, ovs_bridge, binding_port, self.server_loop)
+                            for nic_addr, ovs_bridge in self.ovs_bridges.items()}
+        else:
+            self.servers = {nic_addr: NiCServer(nic_addr, ovs_bridge, binding_port)
+                            for nic_addr, ovs_bridge in self.ovs_bridges.items()}
         self.mgmt_server = MgmtServer(
-            self.mgmt_port_address, binding_port, self.servers)
+            self.mgmt_port_address, binding_port, self.servers, local_fanout=consolidated)
 
     def _find_all_server_nics(self):
         return [_ for _ in os.listdir('/sys/class/net') if re.search(NETNS_IFACE_PATTERN, _)]
@@ -1216,6 +1431,8 @@ class NiCSimulator(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
         return bridges
 
     def start_nic_servers(self):
+        if self.server_loop is not None:
+            self.server_loop.start()
         for nic_addr, server in self.servers.items():
             logging.debug("Starting gRPC server on NiC %s", nic_addr)
             server.start()
@@ -1277,6 +1494,13 @@ def parse_args():
         action="store_true",
         help="Duplicate NIC upstream traffic to both ToRs (default: False)",
     )
+    parser.add_argument(
+        "-c",
+        "--consolidated",
+        default=False,
+        action="store_true",
+        help="Serve all the NiCs from one asyncio event loop and call them in process from the mgmt server"
+    )
     args = parser.parse_args()
     return args
 
@@ -1329,7 +1553,8 @@ def main():
     loopback_ips = args.loopback_ips.split(",")
     if len(loopback_ips) != 3:
         raise ValueError("Invalid loopback ips: {loopback_ips}".format(loopback_ips=loopback_ips))
-    nic_simulator = NiCSimulator(args.vm_set, "mgmt", args.port, loopback_ips, args.duplicate_nic_upstream)
+    nic_simulator = NiCSimulator(args.vm_set, "mgmt", args.port, loopback_ips, args.duplicate_nic_upstream,
+                                 args.consolidated)
     nic_simulator.start_nic_servers()
     try:
         nic_simulator.start_mgmt_server()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Benchmark of the NiC simulator gRPC servers.
+
+Compare the thread count and the request latency of the NiC servers with a gRPC server, a thread pool and a thread
+for each NiC (legacy) with the consolidated mode, where the NiC servers are asyncio gRPC servers on one event loop
+sharing one thread pool, and the mgmt server calls them in process. The NiC servers are bound to addresses of
+127.0.0.0/8 and manipulate fake OVS bridges, so the OVS commands are not part of the measurement unless a delay is
+given for them. Every mode runs in its own process, where the per-NiC requests are sent like the ToRs do and the
+mgmt fan-out is called like the mgmt server does, and the replies of both modes are checked to be the same.
+
+Usage:
+    python3 ansible/dualtor/nic_simulator/nic_simulator_benchmark.py --nics 64 --requests 20
+"""
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+
+import grpc
+
+import nic_simulator
+import nic_simulator_grpc_service_pb2
+import nic_simulator_grpc_service_pb2_grpc
+import nic_simulator_grpc_mgmt_service_pb2
+
+
+class FakeOVSBridge(object):
+    """OVS bridge keeping the forwarding states, each change taking ovs_delay seconds."""
+
+    def __init__(self, ovs_delay):
+        self.ovs_delay = ovs_delay
+        self.lock = threading.Lock()
+        self.states = {0: True, 1: True}
+
+    def set_forwarding_state(self, portids, states):
+        with self.lock:
+            time.sleep(self.ovs_delay)
+            for portid, state in zip(portids, states):
+                self.states[portid] = state
+            return self.query_forwarding_state(portids)
+
+    def query_forwarding_state(self, portids):
+        return [self.states[portid] for portid in portids]
+
+
+class FakeContext(object):
+    """Context of the calls to the mgmt server."""
+
+    code = None
+    details = None
+
+    @staticmethod
+    def peer():
+        return "benchmark"
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+
+def nic_addresses(count):
+    return ["127.0.%d.%d" % (1 + index // 250, 1 + index % 250) for index in range(count)]
+
+
+def os_thread_count():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+
+
+def percentile(latencies, percent):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100.0))] * 1000.0
+
+
+def measure(mode, args, queue):
+    addresses = nic_addresses(args.nics)
+    consolidated = mode == "consolidated"
+    if consolidated:
+        server_loop = nic_simulator.NiCServerLoop(nic_simulator.THREAD_CONCURRENCY_CONSOLIDATED)
+        server_loop.start()
+        servers = {address: nic_simulator.AsyncNiCServer(address, FakeOVSBridge(args.ovs_delay), args.port,
+                                                         server_loop) for address in addresses}
+    else:
+        servers = {address: nic_simulator.NiCServer(address, FakeOVSBridge(args.ovs_delay), args.port)
+                   for address in addresses}
+    start = time.time()
+    for server in servers.values():
+        server.start()
+    channels = [grpc.insecure_channel("%s:%s" % (address, args.port)) for address in addresses]
+    for channel in channels:
+        grpc.channel_ready_future(channel).result(timeout=30)
+    startup = time.time() - start
+    stubs = [nic_simulator_grpc_service_pb2_grpc.DualToRActiveStub(channel) for channel in channels]
+
+    # Requests of the ToRs to every NiC
+    nic_latencies = []
+    for round_index in range(args.requests):
+        request = nic_simulator_grpc_service_pb2.AdminRequest(portid=[0, 1], state=[True, round_index % 2 == 0])
+        for stub in stubs:
+            start = time.time()
+            stub.SetAdminForwardingPortState(request, timeout=5)
+            nic_latencies.append(time.time() - start)
+
+    # Toggles of all the NiCs from the mgmt server
+    mgmt_server = nic_simulator.MgmtServer(None, args.port, servers, local_fanout=consolidated)
+    mgmt_latencies = []
+    replies = []
+    for round_index in range(args.requests):
+        request = nic_simulator_grpc_mgmt_service_pb2.ListOfAdminRequest(
+            nic_addresses=addresses,
+            admin_requests=[nic_simulator_grpc_service_pb2.AdminRequest(
+                portid=[0, 1], state=[round_index % 2 == 0, True]) for _ in addresses]
+        )
+        context = FakeContext()
+        start = time.time()
+        response = mgmt_server.SetAdminForwardingPortState(request, context)
+        mgmt_latencies.append(time.time() - start)
+        assert context.code is None, context.details
+        replies.append([list(reply.state) for reply in response.admin_replies])
+
+    threads = threading.active_count()
+    os_threads = os_thread_count()
+    for channel in channels:
+        channel.close()
+    for server in servers.values():
+        server.stop()
+        server.join()
+    queue.put({
+        "startup": startup,
+        "threads": threads,
+        "os_threads": os_threads,
+        "nic_p50": percentile(nic_latencies, 50),
+        "nic_p99": percentile(nic_latencies, 99),
+        "mgmt_p50": percentile(mgmt_latencies, 50),
+        "mgmt_max": max(mgmt_latencies) * 1000.0,
+        "replies": replies
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NiC simulator gRPC servers")
+    parser.add_argument("--nics", type=int, default=64, help="Number of NiCs")
+    parser.add_argument("--requests", type=int, default=20, help="Rounds of requests to every NiC and to mgmt")
+    parser.add_argument("--port", type=int, default=50075, help="Binding port of the NiC servers")
+    parser.add_argument("--ovs_delay", type=float, default=0.0, help="Seconds taken by a forwarding state change")
+    args = parser.parse_args()
+
+    # NOTE: gRPC doesn't support fork, run every mode in a spawned process
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    print("{:>12} {:>10} {:>8} {:>11} {:>13} {:>13} {:>14} {:>14}".format(
+        "mode", "startup(s)", "threads", "OS threads", "NiC p50(ms)", "NiC p99(ms)", "mgmt p50(ms)", "mgmt max(ms)"))
+    for mode in ("legacy", "consolidated"):
+        queue = context.Queue()
+        process = context.Process(target=measure, args=(mode, args, queue))
+        process.start()
+        results[mode] = queue.get()
+        process.join()
+        print("{:>12} {:>10.2f} {:>8} {:>11} {:>13.2f} {:>13.2f} {:>14.2f} {:>14.2f}".format(
+            mode, results[mode]["startup"], results[mode]["threads"], results[mode]["os_threads"],
+            results[mode]["nic_p50"], results[mode]["nic_p99"], results[mode]["mgmt_p50"],
+            results[mode]["mgmt_max"]))
+
+    assert json.dumps(results["legacy"]["replies"]) == json.dumps(results["consolidated"]["replies"]), \
+        "Replies differ"
+
+
+if __name__ == "__main__":
+    main()
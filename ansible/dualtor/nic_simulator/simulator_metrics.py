@@ -0,0 +1,64 @@
+"""Counters and latencies of the operations of the mux simulator and of the NiC simulator.
+
+The module is copied next to both simulators on the test server, it must stay compatible with Python 2.
+"""
+import contextlib
+import threading
+import time
+
+from collections import defaultdict
+
+
+class Metrics(object):
+    """Counters and latencies of the simulator operations, for the metrics endpoints."""
+
+    def __init__(self, status=None):
+        """Initialize empty metrics.
+
+        Args:
+            status (callable): Function returning a dict of values about the state of the simulator, added to the
+                metrics, e.g. whether bundles are used.
+        """
+        self.status = status
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.counters = defaultdict(int)
+            self.latencies = {}
+            self.since = time.time()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def record(self, name, elapsed):
+        with self.lock:
+            latency = self.latencies.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+            latency['count'] += 1
+            latency['total'] += elapsed
+            latency['max'] = max(latency['max'], elapsed)
+            latency['last'] = elapsed
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """Record how long the block took under name."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, time.time() - start)
+
+    def to_dict(self):
+        with self.lock:
+            metrics = {
+                'since': self.since,
+                'uptime': time.time() - self.since,
+                'counters': dict(self.counters),
+                'latencies': dict((name, dict(latency, average=latency['total'] / latency['count']))
+                                  for name, latency in self.latencies.items())
+            }
+        if self.status is not None:
+            metrics.update(self.status())
+        return metrics
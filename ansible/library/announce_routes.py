@@ -5,18 +5,16 @@ import math
 import os
 import yaml
 import re
-import requests
 import ipaddress
-import json
 import sys
 import socket
 import random
 import logging
-import time
-from multiprocessing.pool import ThreadPool
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.debug_utils import config_module_logging
 from ansible.module_utils.multi_servers_utils import MultiServersUtils
+from ansible.module_utils.prefix_index_utils import PrefixIndex, prefix_version
+from ansible.module_utils.route_injection_utils import RouteInjector
 
 if sys.version_info.major == 3:
     UNICODE_TYPE = str
@@ -83,7 +81,6 @@ BGP_SCALE_T1S = [
     't1-isolated-d254u2', 't1-isolated-d254u2s1', 't1-isolated-d254u2s2',
     't1-isolated-d510u2', 't1-isolated-d510u2s2'
 ]
-ROUTES_BATCH_SIZE = 200
 
 # Describe default number of COLOs
 COLO_NUMBER = 30
@@ -161,84 +158,30 @@ def read_topo(topo_name, path):
         return {}
 
 
-def change_routes(action, ptf_ip, port, routes, routes_batch_size=ROUTES_BATCH_SIZE):
-    logging.debug("action = {}, ptf_ip = {}, port = {}, routes_batch_size = {}, routes = {}"
-                  .format(action, ptf_ip, port, routes_batch_size, routes))
-    messages = []
-    for prefix, nexthop, aspath in routes:
-        if aspath:
-            messages.append(
-                "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath))
-        else:
-            messages.append(
-                "{} route {} next-hop {}".format(action, prefix, nexthop))
+# Injector shared by all the route changes of the module run, it keeps a keep-alive session per exabgp port
+route_injector = RouteInjector()
+
+
+def change_routes(action, ptf_ip, port, routes):
+    logging.debug("action = %s, ptf_ip = %s, port = %s", action, ptf_ip, port)
     wait_for_http(ptf_ip, port, timeout=60)
-    url = "http://%s:%d" % (ptf_ip, port)
-    for i in range(0, len(messages), routes_batch_size):
-        batch_messages = messages[i:i+routes_batch_size]
-        data = {"commands": ";".join(batch_messages)}
-        logging.debug("Posting to url={} data={}".format(url, json.dumps(data)))
-        post_data_to_url(url, data)
-
-
-def post_data_to_url(url, data):
-    # nosemgrep-next-line
-    # Flaky error `ConnectionResetError(104, 'Connection reset by peer')` may happen while using `requests.post`
-    # To avoid this error, we add sleep time before sending request.
-    # We use a "backoff" algorithm here, the maximum retry times is five.
-    # If one retry fails, we increase the waiting time.
-    for i in range(0, 5):
-        try:
-            r = requests.post(url, data=data, timeout=360, proxies={"http": None, "https": None})
-            break
-        except Exception as e:
-            logging.debug("Got exception {}, will try to connect again".format(e))
-            time.sleep(0.01 * (i+1))
-            if i == 4:
-                raise e
-
-    if r.status_code != 200:
-        raise Exception(
-            "Change routes failed: url={}, data={}, r.status_code={}, r.reason={}, r.headers={}, r.text={}".format(
-                url,
-                json.dumps(data),
-                r.status_code,
-                r.reason,
-                r.headers,
-                r.text
-            )
-        )
-
-
-def send_routes_for_each_set(args):
-    routes, port, action, ptf_ip = args
-    change_routes(action, ptf_ip, port, routes)
+    route_injector.change_routes(action, "http://%s:%d" % (ptf_ip, port), routes)
 
 
 def send_routes_in_parallel(route_set):
     """
-    Sends the given set of routes in parallel using a thread pool.
+    Sends the given set of routes in parallel, a thread per route set.
 
     Args:
-        route_set (list): A list of route sets to send.
+        route_set (list): A list of (routes, port, action, ptf_ip) route sets to send.
 
     Returns:
         None
     """
-    # Create a pool of worker processes
-    pool = ThreadPool(processes=len(route_set))
-
-    # Use the ThreadPool.map function to apply the function to each set of routes
-    results = pool.map(send_routes_for_each_set, route_set)
-
-    # Optionally, process the results
-    for result in results:
-        # Process individual results here
-        pass
-
-    # Close the pool and wait for all processes to complete
-    pool.close()
-    pool.join()
+    for routes, port, action, ptf_ip in route_set:
+        wait_for_http(ptf_ip, port, timeout=60)
+    route_injector.change_routes_in_parallel(
+        [(routes, "http://%s:%d" % (ptf_ip, port), action) for routes, port, action, ptf_ip in route_set])
 
 
 # AS path from Leaf router for T0 topology
@@ -1653,11 +1596,11 @@ def adhoc_routes(topo, ptf_ip, peers_routes_to_change, action):
 
 
 def get_ipv4_routes(routes):
-    return [r for r in routes if ipaddress.ip_network(UNICODE_TYPE(r[0])).version == 4]
+    return [r for r in routes if prefix_version(r[0]) == 4]
 
 
 def get_ipv6_routes(routes):
-    return [r for r in routes if ipaddress.ip_network(UNICODE_TYPE(r[0])).version == 6]
+    return [r for r in routes if prefix_version(r[0]) == 6]
 
 
 def filterout_subnet_ipv4(aggregate_routes, candidate_routes):
@@ -1671,13 +1614,8 @@ def filterout_subnet_ipv6(aggregate_routes, candidate_routes):
 
 
 def filterout_subnet(aggregate_routes, candidate_routes):
-    subnets = []
-    for ar in aggregate_routes:
-        ar_net = ipaddress.ip_network(UNICODE_TYPE(ar[0]))
-        for cr in candidate_routes:
-            if ipaddress.ip_network(UNICODE_TYPE(cr[0])).subnet_of(ar_net):
-                subnets.append(cr)
-    return list(set(candidate_routes) - set(subnets))
+    """Return the candidate routes which are not a subnet of any of the aggregate routes."""
+    return PrefixIndex(UNICODE_TYPE(ar[0]) for ar in aggregate_routes).filter_out(candidate_routes)
 
 
 def convert_routes_to_str(topo_routes):
@@ -1689,6 +1627,15 @@ def convert_routes_to_str(topo_routes):
     return topo_routes
 
 
+def log_injection_stats(result):
+    """Log the throughput of the route injection, and add it to the result of the module if routes were changed."""
+    stats = route_injector.report()
+    if stats["routes"]:
+        logging.info("Changed %d routes by %d requests in %.3fs, %.1f routes/s", stats["routes"],
+                     stats["requests"], stats["seconds"], stats["routes_per_second"])
+        result["injection_stats"] = stats
+
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
@@ -1736,50 +1683,54 @@ def main():
     try:
         if adhoc:
             adhoc_routes(topo, ptf_ip, peers_routes_to_change, action)
-            module.exit_json(change=True)
+            result = dict(change=True)
         elif topo_type == "t0":
             fib_t0(topo, ptf_ip, no_default_route=is_storage_backend, action=action,
                    upstream_neighbor_groups=upstream_neighbor_groups, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "t1" or topo_type == "smartswitch-t1":
             fib_t1_lag(
                 topo, ptf_ip, topo_name, no_default_route=is_storage_backend, action=action,
                 tor_default_route=tor_default_route, downstream_neighbor_groups=downstream_neighbor_groups,
                 topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "t2":
             fib_t2_lag(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "t0-mclag":
             fib_t0_mclag(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "m1":
             fib_m1(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "m0":
             fib_m0(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "mx":
             fib_mx(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "c0":
             fib_c0(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "dpu":
             fib_dpu(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(change=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(change=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "lt2":
             fib_lt2_routes(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(change=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(change=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "ft2":
             fib_ft2_routes(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(change=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(change=True, topo_routes=convert_routes_to_str(topo_routes))
         else:
-            module.exit_json(
-                msg='Unsupported topology "{}" - skipping announcing routes'.format(topo_name))
+            result = dict(msg='Unsupported topology "{}" - skipping announcing routes'.format(topo_name))
     except Exception as e:
         module.fail_json(msg='Announcing routes failed, topo_name={}, topo_type={}, exception={}'
                          .format(topo_name, topo_type, repr(e)))
+    finally:
+        route_injector.close()
+
+    log_injection_stats(result)
+    module.exit_json(**result)
 
 
 if __name__ == '__main__':
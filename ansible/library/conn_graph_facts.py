@@ -8,13 +8,13 @@ import traceback
 
 try:
     from ansible.module_utils.debug_utils import config_module_logging
-    from ansible.module_utils.graph_utils import LabGraph
+    from ansible.module_utils.graph_utils import LabGraph, load_hostname_index
 except ImportError:
     # Add parent dir for using outside Ansible
     import sys
     sys.path.append('..')
     from module_utils.debug_utils import config_module_logging
-    from module_utils.graph_utils import LabGraph
+    from module_utils.graph_utils import LabGraph, load_hostname_index
 
 config_module_logging('conn_graph_facts')
 
@@ -125,27 +125,31 @@ def find_graph(hostnames, part=False):
     with open(graph_group_file) as fd:
         graph_groups = yaml.safe_load(fd)
 
+    # Pick the group from the hostname index, only the graph facts of the selected group are loaded
+    hostname_groups = load_hostname_index(LAB_GRAPHFILE_PATH, graph_groups)
+    hostnames_in_group = {}
+    for hostname in set(hostnames):
+        for group in hostname_groups.get(hostname, []):
+            hostnames_in_group[group] = hostnames_in_group.get(group, 0) + 1
+
     target_graph = None
     target_group = None
     for group in graph_groups:
-        logging.debug("Looking at graph files of group {} for hosts {}".format(group, hostnames))
-        lab_graph = LabGraph(LAB_GRAPHFILE_PATH, group)
-        graph_hostnames = set(lab_graph.graph_facts["devices"].keys())
-        logging.debug("For graph group {}, got hostnames {}".format(group, graph_hostnames))
+        logging.debug("Group {} has {} of hosts {}".format(group, hostnames_in_group.get(group, 0), hostnames))
 
         if not part:
-            if set(hostnames) <= graph_hostnames:
-                target_graph = lab_graph
+            if hostnames_in_group.get(group, 0) == len(set(hostnames)):
                 target_group = group
                 break
         else:
             THRESHOLD = 0.8
-            in_graph_hostnames = set(hostnames).intersection(graph_hostnames)
-            if len(in_graph_hostnames) * 1.0 / len(hostnames) >= THRESHOLD:
-                target_graph = lab_graph
+            if hostnames_in_group.get(group, 0) * 1.0 / len(hostnames) >= THRESHOLD:
                 target_group = group
                 break
 
+    if target_group is not None:
+        target_graph = LabGraph.load(LAB_GRAPHFILE_PATH, target_group)
+
     if target_graph is not None:
         logging.debug("Returning lab graph of group {} for hosts {}".format(target_group, hostnames))
 
@@ -184,7 +188,7 @@ def main():
             LAB_GRAPHFILE_PATH = m_args['filepath']
 
         if m_args["group"]:
-            lab_graph = LabGraph(LAB_GRAPHFILE_PATH, m_args["group"])
+            lab_graph = LabGraph.load(LAB_GRAPHFILE_PATH, m_args["group"])
         else:
             # When calling passed in anchor instead of hostnames,
             # the caller is asking to return the whole graph. This
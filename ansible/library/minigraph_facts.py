@@ -2,11 +2,14 @@
 from __future__ import print_function
 from ansible.module_utils.basic import AnsibleModule
 import calendar
+import hashlib
 import os
 import sys
 import traceback
 import json
+import tempfile
 import time
+import types
 import ipaddr as ipaddress
 from collections import defaultdict
 from natsort import natsorted
@@ -29,6 +32,20 @@ options:
         description:
             - Set to target snmp server (normally {{inventory_hostname}})
         required: true
+    filename:
+        description:
+            - Minigraph file to parse, /etc/sonic/minigraph.xml if not set
+        required: false
+    namespace:
+        description:
+            - ASIC namespace to retrieve the facts of, for a multi-ASIC device
+        required: false
+    use_cache:
+        description:
+            - Reuse the facts parsed by a previous run from the same minigraph, hostname and namespace, if the port
+              table didn't change since
+        required: false
+        default: true
 '''
 
 EXAMPLES = '''
@@ -42,9 +59,39 @@ ns1 = "http://schemas.datacontract.org/2004/07/Microsoft.Search.Autopilot.Evolut
 ns2 = "Microsoft.Search.Autopilot.NetMux"
 ns3 = "http://www.w3.org/2001/XMLSchema-instance"
 
+# top level nodes of a mini-graph read by parse_xml
+MINI_GRAPH_SECTION_TAGS = frozenset(str(QName(ns, tag)) for tag in (
+    "DpgDec", "CpgDec", "PngDec", "UngDec", "MetadataDeclaration", "LinkMetadataDeclaration"))
+HOSTNAME_TAG = str(QName(ns, "Hostname"))
+HWSKU_TAG = str(QName(ns, "HwSku"))
+DEVICE_INFO_TAG = str(QName(ns, "DeviceInfo"))
+DEVICE_INFOS_TAG = str(QName(ns, "DeviceInfos"))
+MINI_GRAPH_ITERPARSE_TAGS = sorted(MINI_GRAPH_SECTION_TAGS) + [HOSTNAME_TAG, HWSKU_TAG, DEVICE_INFO_TAG]
+
+# nodes read for every link, device and BGP session of a mini-graph
+DEVICE_LINK_BASE_TAG = str(QName(ns, "DeviceLinkBase"))
+ELEMENT_TYPE_TAG = str(QName(ns, "ElementType"))
+END_DEVICE_TAG = str(QName(ns, "EndDevice"))
+END_PORT_TAG = str(QName(ns, "EndPort"))
+START_DEVICE_TAG = str(QName(ns, "StartDevice"))
+START_PORT_TAG = str(QName(ns, "StartPort"))
+BANDWIDTH_TAG = str(QName(ns, "Bandwidth"))
+CHASSIS_INTERNAL_TAG = str(QName(ns, "ChassisInternal"))
+DEVICE_TAG = str(QName(ns, "Device"))
+ADDRESS_TAG = str(QName(ns, "Address"))
+MANAGEMENT_ADDRESS_TAG = str(QName(ns, "ManagementAddress"))
+IP_PREFIX_TAG = str(QName(ns2, "IPPrefix"))
+XSI_TYPE_ATTRIB = str(QName(ns3, "type"))
+BGP_SESSION_TAG = str(QName(ns, "BGPSession"))
+START_ROUTER_TAG = str(QName(ns, "StartRouter"))
+START_PEER_TAG = str(QName(ns, "StartPeer"))
+END_ROUTER_TAG = str(QName(ns, "EndRouter"))
+END_PEER_TAG = str(QName(ns, "EndPeer"))
+
 ANSIBLE_USER_MINIGRAPH_PATH = os.path.expanduser('~/.ansible/minigraph')
 ANSIBLE_LOCAL_MINIGRAPH_PATH = '{}.xml'
 ANSIBLE_USER_MINIGRAPH_MAX_AGE = 86400  # 24-hours (in seconds)
+ANSIBLE_USER_MINIGRAPH_FACTS_CACHE = os.path.join(ANSIBLE_USER_MINIGRAPH_PATH, '{}_facts.json')
 backend_device_types = ['BackEndToRRouter', 'BackEndLeafRouter']
 VLAN_SUB_INTERFACE_VLAN_ID = '10'
 VLAN_SUB_INTERFACE_SEPARATOR = '.'
@@ -58,15 +105,26 @@ class minigraph_encoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+def child_texts(node):
+    """
+    :return: the text of the first child of node with every tag, read in one pass instead of a find() for each tag
+    """
+    texts = {}
+    for child in node:
+        if child.tag not in texts:
+            texts[child.tag] = child.text
+    return texts
+
+
 def parse_asic_internal_link(link, asic_name, hostname):
     neighbors = {}
     port_speeds = {}
-    enddevice = link.find(str(QName(ns, "EndDevice"))).text
-    endport = link.find(str(QName(ns, "EndPort"))).text
-    startdevice = link.find(str(QName(ns, "StartDevice"))).text
-    startport = link.find(str(QName(ns, "StartPort"))).text
-    bandwidth_node = link.find(str(QName(ns, "Bandwidth")))
-    bandwidth = bandwidth_node.text if bandwidth_node is not None else None
+    link_texts = child_texts(link)
+    enddevice = link_texts[END_DEVICE_TAG]
+    endport = link_texts[END_PORT_TAG]
+    startdevice = link_texts[START_DEVICE_TAG]
+    startport = link_texts[START_PORT_TAG]
+    bandwidth = link_texts.get(BANDWIDTH_TAG)
     if ((enddevice.lower() == asic_name.lower()) and
             (startdevice.lower() != hostname.lower())):
         if endport in port_alias_asic_map:
@@ -88,12 +146,12 @@ def parse_asic_internal_link(link, asic_name, hostname):
 def parse_asic_external_link(link, asic_name, hostname):
     neighbors = {}
     port_speeds = {}
-    enddevice = link.find(str(QName(ns, "EndDevice"))).text
-    endport = link.find(str(QName(ns, "EndPort"))).text
-    startdevice = link.find(str(QName(ns, "StartDevice"))).text
-    startport = link.find(str(QName(ns, "StartPort"))).text
-    bandwidth_node = link.find(str(QName(ns, "Bandwidth")))
-    bandwidth = bandwidth_node.text if bandwidth_node is not None else None
+    link_texts = child_texts(link)
+    enddevice = link_texts[END_DEVICE_TAG]
+    endport = link_texts[END_PORT_TAG]
+    startdevice = link_texts[START_DEVICE_TAG]
+    startport = link_texts[START_PORT_TAG]
+    bandwidth = link_texts.get(BANDWIDTH_TAG)
     # if chassis internal is false, the interface name will be
     # interface alias which should be converted to asic port name
     if (enddevice.lower() == hostname.lower()):
@@ -120,13 +178,13 @@ def parse_asic_png(png, asic_name, hostname):
     port_speeds = {}
     for child in png:
         if child.tag == str(QName(ns, "DeviceInterfaceLinks")):
-            for link in child.findall(str(QName(ns, "DeviceLinkBase"))):
+            for link in child.findall(DEVICE_LINK_BASE_TAG):
                 # Chassis internal node is used in multi-asic device or chassis minigraph
                 # where the minigraph will contain the internal asic connectivity and
                 # external neighbor information. The ChassisInternal node will be used to
                 # determine if the link is internal to the device or chassis.
                 chassis_internal_node = link.find(
-                    str(QName(ns, "ChassisInternal")))
+                    CHASSIS_INTERNAL_TAG)
                 chassis_internal = chassis_internal_node.text if chassis_internal_node is not None else "false"
 
                 # If the link is an external link include the external neighbor
@@ -143,25 +201,25 @@ def parse_asic_png(png, asic_name, hostname):
                     port_speeds.update(int_port_speeds)
 
         if child.tag == str(QName(ns, "Devices")):
-            for device in child.findall(str(QName(ns, "Device"))):
+            for device in child.findall(DEVICE_TAG):
                 lo_addr = None
                 # don't shadow type()
                 d_type = None
                 mgmt_addr = None
                 hwsku = None
-                if str(QName(ns3, "type")) in device.attrib:
-                    d_type = device.attrib[str(QName(ns3, "type"))]
+                if XSI_TYPE_ATTRIB in device.attrib:
+                    d_type = device.attrib[XSI_TYPE_ATTRIB]
 
                 for node in device:
-                    if node.tag == str(QName(ns, "Address")):
+                    if node.tag == ADDRESS_TAG:
                         lo_addr = node.find(
-                            str(QName(ns2, "IPPrefix"))).text.split('/')[0]
-                    elif node.tag == str(QName(ns, "ManagementAddress")):
+                            IP_PREFIX_TAG).text.split('/')[0]
+                    elif node.tag == MANAGEMENT_ADDRESS_TAG:
                         mgmt_addr = node.find(
-                            str(QName(ns2, "IPPrefix"))).text.split('/')[0]
-                    elif node.tag == str(QName(ns, "Hostname")):
+                            IP_PREFIX_TAG).text.split('/')[0]
+                    elif node.tag == HOSTNAME_TAG:
                         name = node.text
-                    elif node.tag == str(QName(ns, "HwSku")):
+                    elif node.tag == HWSKU_TAG:
                         hwsku = node.text
 
                 devices[name] = {'lo_addr': lo_addr, 'type': d_type,
@@ -189,15 +247,16 @@ def parse_png(png, hname):
 
     for child in png:
         if child.tag == str(QName(ns, "DeviceInterfaceLinks")):
-            for link in child.findall(str(QName(ns, "DeviceLinkBase"))):
-                linktype = link.find(str(QName(ns, "ElementType"))).text
+            for link in child.findall(DEVICE_LINK_BASE_TAG):
+                link_texts = child_texts(link)
+                linktype = link_texts[ELEMENT_TYPE_TAG]
                 if linktype != "DeviceInterfaceLink" and linktype != "UnderlayInterfaceLink":
                     continue
 
-                enddevice = link.find(str(QName(ns, "EndDevice"))).text
-                endport = link.find(str(QName(ns, "EndPort"))).text
-                startdevice = link.find(str(QName(ns, "StartDevice"))).text
-                startport = link.find(str(QName(ns, "StartPort"))).text
+                enddevice = link_texts[END_DEVICE_TAG]
+                endport = link_texts[END_PORT_TAG]
+                startdevice = link_texts[START_DEVICE_TAG]
+                startport = link_texts[START_PORT_TAG]
 
                 if enddevice == hname:
                     if endport in port_alias_to_name_map:
@@ -217,7 +276,7 @@ def parse_png(png, hname):
                             'name': enddevice, 'port': endport, 'namespace': ''}
 
         if child.tag == str(QName(ns, "Devices")):
-            for device in child.findall(str(QName(ns, "Device"))):
+            for device in child.findall(DEVICE_TAG):
                 lo_addr = None
                 # don't shadow type()
                 d_type = None
@@ -225,43 +284,43 @@ def parse_png(png, hname):
                 hwsku = None
 
                 for node in device:
-                    if node.tag == str(QName(ns, "Address")):
+                    if node.tag == ADDRESS_TAG:
                         lo_addr = node.find(
-                            str(QName(ns2, "IPPrefix"))).text.split('/')[0]
-                    elif node.tag == str(QName(ns, "ManagementAddress")):
+                            IP_PREFIX_TAG).text.split('/')[0]
+                    elif node.tag == MANAGEMENT_ADDRESS_TAG:
                         mgmt_addr = node.find(
-                            str(QName(ns2, "IPPrefix"))).text.split('/')[0]
-                    elif node.tag == str(QName(ns, "Hostname")):
+                            IP_PREFIX_TAG).text.split('/')[0]
+                    elif node.tag == HOSTNAME_TAG:
                         name = node.text
-                    elif node.tag == str(QName(ns, "HwSku")):
+                    elif node.tag == HWSKU_TAG:
                         hwsku = node.text
-                    elif node.tag == str(QName(ns, "ElementType")):
+                    elif node.tag == ELEMENT_TYPE_TAG:
                         d_type = node.text
 
                 if name.lower() in namespace_list:
                     continue
 
-                if d_type is None and str(QName(ns3, "type")) in device.attrib:
-                    d_type = device.attrib[str(QName(ns3, "type"))]
+                if d_type is None and XSI_TYPE_ATTRIB in device.attrib:
+                    d_type = device.attrib[XSI_TYPE_ATTRIB]
 
                 devices[name] = {'lo_addr': lo_addr, 'type': d_type,
                                  'mgmt_addr': mgmt_addr, 'hwsku': hwsku}
 
         if child.tag == str(QName(ns, "DeviceInterfaceLinks")):
             for if_link in child.findall(str(QName(ns, 'DeviceLinkBase'))):
-                if str(QName(ns3, "type")) in if_link.attrib:
-                    link_type = if_link.attrib[str(QName(ns3, "type"))]
+                if XSI_TYPE_ATTRIB in if_link.attrib:
+                    link_type = if_link.attrib[XSI_TYPE_ATTRIB]
                     if link_type == 'DeviceSerialLink':
                         for node in if_link:
-                            if node.tag == str(QName(ns, "EndPort")):
+                            if node.tag == END_PORT_TAG:
                                 console_port = node.text.split()[-1]
-                            elif node.tag == str(QName(ns, "EndDevice")):
+                            elif node.tag == END_DEVICE_TAG:
                                 console_dev = node.text
                     elif link_type == 'DeviceMgmtLink':
                         for node in if_link:
-                            if node.tag == str(QName(ns, "EndPort")):
+                            if node.tag == END_PORT_TAG:
                                 mgmt_port = node.text.split()[-1]
-                            elif node.tag == str(QName(ns, "EndDevice")):
+                            elif node.tag == END_DEVICE_TAG:
                                 mgmt_dev = node.text
 
     for k, v in neighbors.items():
@@ -492,11 +551,11 @@ def parse_cpg(cpg, hname):
     for child in cpg:
         tag = child.tag
         if tag == str(QName(ns, "PeeringSessions")):
-            for session in child.findall(str(QName(ns, "BGPSession"))):
-                start_router = session.find(str(QName(ns, "StartRouter"))).text
-                start_peer = session.find(str(QName(ns, "StartPeer"))).text
-                end_router = session.find(str(QName(ns, "EndRouter"))).text
-                end_peer = session.find(str(QName(ns, "EndPeer"))).text
+            for session in child.findall(BGP_SESSION_TAG):
+                start_router = session.find(START_ROUTER_TAG).text
+                start_peer = session.find(START_PEER_TAG).text
+                end_router = session.find(END_ROUTER_TAG).text
+                end_peer = session.find(END_PEER_TAG).text
                 if end_router == hname:
                     bgp_sessions.append({
                         'name': start_router,
@@ -510,6 +569,10 @@ def parse_cpg(cpg, hname):
                         'peer_addr': start_peer
                     })
         elif child.tag == str(QName(ns, "Routers")):
+            # the sessions of every neighbor, instead of looking for them in all sessions for every router
+            sessions_by_name = defaultdict(list)
+            for bgp_session in bgp_sessions:
+                sessions_by_name[bgp_session['name']].append(bgp_session)
             for router in child.findall(str(QName(ns1, "BGPRouterDeclaration"))):
                 asn = router.find(str(QName(ns1, "ASN"))).text
                 hostname = router.find(str(QName(ns1, "Hostname"))).text
@@ -529,9 +592,8 @@ def parse_cpg(cpg, hname):
                             })
 
                 else:
-                    for bgp_session in bgp_sessions:
-                        if hostname == bgp_session['name']:
-                            bgp_session['asn'] = int(asn)
+                    for bgp_session in sessions_by_name.get(hostname, []):
+                        bgp_session['asn'] = int(asn)
 
     return bgp_sessions, myasn, bgp_peers_with_range
 
@@ -603,6 +665,112 @@ def file_age(filename):
     return calendar.timegm(time.gmtime()) - os.path.getctime(filename)
 
 
+def code_digest(sha, code):
+    """Update sha with the bytecode, names and constants of a code object and of its nested functions."""
+    sha.update(code.co_code)
+    sha.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            code_digest(sha, const)
+        elif isinstance(const, frozenset):
+            # the order of a frozenset depends on the hash seed
+            sha.update(repr(sorted(const, key=repr)).encode())
+        else:
+            sha.update(repr(const).encode())
+
+
+def minigraph_facts_cache_key(mini_graph_path, hostname, asic_name):
+    """
+    :return: the digest of the mini-graph, of the parameters and of the parser code the facts are cached with
+    """
+    sha = hashlib.sha256()
+    with open(mini_graph_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    sha.update(json.dumps([mini_graph_path, hostname, asic_name, PARSER_DIGEST]).encode())
+    return sha.hexdigest()
+
+
+def parser_digest():
+    """
+    :return: the digest of the functions of this module, the facts are parsed again after an update of the parser
+    """
+    sha = hashlib.sha256()
+    for name, value in sorted(globals().items()):
+        if isinstance(value, types.FunctionType) and value.__module__ == __name__:
+            sha.update(name.encode())
+            code_digest(sha, value.__code__)
+    return sha.hexdigest()
+
+
+def port_table_digest(hwsku, asic_name):
+    """
+    :return: the digest of the port tables parse_xml reads from the device, which may change without the mini-graph
+    """
+    try:
+        from sonic_py_common import multi_asic
+        namespace_list = multi_asic.get_namespace_list()
+    except ImportError:
+        namespace_list = ['']
+    port_maps = get_port_alias_to_name_map(hwsku, asic_name)
+    return hashlib.sha256(json.dumps([port_maps, namespace_list], sort_keys=True).encode()).hexdigest()
+
+
+def load_cached_minigraph_facts(cache_path, key, asic_name):
+    """
+    :return: the facts cached in cache_path if they were parsed with key and the same port tables, None otherwise
+    """
+    try:
+        if file_age(cache_path) > ANSIBLE_USER_MINIGRAPH_MAX_AGE:
+            return None
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached['key'] != key:
+            return None
+        if cached['port_table'] != port_table_digest(cached['facts']['minigraph_hwsku'], asic_name):
+            return None
+        return cached['facts']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def store_cached_minigraph_facts(cache_path, key, asic_name, facts):
+    """Cache the facts in cache_path, replaced atomically as parallel runs may read it."""
+    cached = {
+        'key': key,
+        'port_table': port_table_digest(facts['minigraph_hwsku'], asic_name),
+        'facts': facts
+    }
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cached, f)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        # the facts are still returned, they are parsed again by the next run
+        pass
+
+
+def get_minigraph_facts(filename, hostname, asic_name=None, use_cache=True):
+    """
+    Parse the mini-graph facts, or reuse the ones cached by a previous run from the same mini-graph.
+
+    :return: the facts of parse_xml, as their JSON representation
+    """
+    if not use_cache:
+        return json.loads(json.dumps(parse_xml(filename, hostname, asic_name), cls=minigraph_encoder))
+
+    mini_graph_path = get_mini_graph_path(filename)
+    key = minigraph_facts_cache_key(mini_graph_path, hostname, asic_name)
+    cache_name = hostname if asic_name is None else '{}_{}'.format(hostname, asic_name)
+    cache_path = ANSIBLE_USER_MINIGRAPH_FACTS_CACHE.format(cache_name)
+    facts = load_cached_minigraph_facts(cache_path, key, asic_name)
+    if facts is None:
+        facts = json.loads(json.dumps(parse_xml(filename, hostname, asic_name), cls=minigraph_encoder))
+        store_cached_minigraph_facts(cache_path, key, asic_name, facts)
+    return facts
+
+
 def reconcile_mini_graph_locations(filename, hostname):
     """
     Location precedence:
@@ -616,17 +784,55 @@ def reconcile_mini_graph_locations(filename, hostname):
 
     :param filename: the filename to load (may be None)
     :param hostname: the hostname to load (required)
-    :return: tuple(the absolute filepath of the {cached,loaded} mini-graph, the root node of the loaded graph)
+    :return: tuple(the absolute filepath of the {cached,loaded} mini-graph, the iterparse_mini_graph result of it)
     """
+    mini_graph_path = get_mini_graph_path(filename)
+    return mini_graph_path, iterparse_mini_graph(mini_graph_path)
+
+
+def get_mini_graph_path(filename):
     if filename is not None:
         # literal filename specified. read directly from the file.
-        mini_graph_path = filename
-    else:
-        # only the hostname was specified, determine the output path
-        mini_graph_path = '/etc/sonic/minigraph.xml'
+        return filename
+    # only the hostname was specified, determine the output path
+    return '/etc/sonic/minigraph.xml'
+
 
-    root = ET.parse(mini_graph_path).getroot()
-    return mini_graph_path, root
+def iterparse_mini_graph(mini_graph_path):
+    """
+    Parse the mini-graph in a single pass, keeping only the sections parse_xml reads.
+
+    The Hostname and HwSku come last in a mini-graph, so the sections are kept until the end of the file, but the
+    other top level nodes (DeviceInfos...) are cleared as soon as they are parsed instead of being kept in a DOM.
+
+    :param mini_graph_path: the filepath of the mini-graph
+    :return: tuple(Hostname, HwSku, the section nodes in document order)
+    """
+    hostname = None
+    hwsku = None
+    sections = []
+    # only the nodes that may be top level nodes are reported, the others are built by lxml without any callback
+    context = ET.iterparse(mini_graph_path, events=('end',), tag=MINI_GRAPH_ITERPARSE_TAGS)
+    for _, node in context:
+        parent = node.getparent()
+        if parent is None or parent.getparent() is not None:
+            if node.tag == DEVICE_INFO_TAG and parent is not None and parent.tag == DEVICE_INFOS_TAG:
+                # a DeviceInfos child, not used by parse_xml
+                node.clear()
+            continue
+        if node.tag in MINI_GRAPH_SECTION_TAGS:
+            sections.append(node)
+        elif node.tag == HWSKU_TAG:
+            hwsku = node.text
+        elif node.tag == HOSTNAME_TAG:
+            hostname = node.text
+        # clear the top level nodes parsed so far which are not sections, including the unknown ones
+        for sibling in node.itersiblings(preceding=True):
+            if sibling.tag not in MINI_GRAPH_SECTION_TAGS:
+                sibling.clear()
+        if node.tag not in MINI_GRAPH_SECTION_TAGS:
+            node.clear()
+    return hostname, hwsku, sections
 
 
 def port_alias_to_name_map_50G(all_ports, s100G_ports):
@@ -676,7 +882,7 @@ def parse_linkmeta(meta, hname):
 
 
 def parse_xml(filename, hostname, asic_name=None):
-    mini_graph_path, root = reconcile_mini_graph_locations(filename, hostname)
+    mini_graph_path, (mg_hostname, mg_hwsku, sections) = reconcile_mini_graph_locations(filename, hostname)
 
     u_neighbors = None
     u_devices = None
@@ -711,13 +917,8 @@ def parse_xml(filename, hostname, asic_name=None):
     else:
         asic_id = None
 
-    hwsku_qn = QName(ns, "HwSku")
-    hostname_qn = QName(ns, "Hostname")
-    for child in root:
-        if child.tag == str(hwsku_qn):
-            hwsku = child.text
-        if child.tag == str(hostname_qn):
-            hostname = child.text
+    hwsku = mg_hwsku
+    hostname = mg_hostname
 
     global port_alias_to_name_map
     global port_name_to_alias_map
@@ -736,7 +937,7 @@ def parse_xml(filename, hostname, asic_name=None):
             if v == j:
                 port_alias_to_port_asic_alias_map[k] = i
 
-    for child in root:
+    for child in sections:
         if asic_name is None:
             if child.tag == str(QName(ns, "DpgDec")):
                 (intfs, lo_intfs, mgmt_intf, vlans, pcs, acls,
@@ -765,6 +966,8 @@ def parse_xml(filename, hostname, asic_name=None):
                 (neighbors, devices, _) = parse_asic_png(child, asic_name, hostname)
             elif child.tag == str(QName(ns, "LinkMetadataDeclaration")):
                 macsec_enabled_ports, macsec_neighbors = parse_linkmeta(child, hostname)
+        # the section is parsed, free its nodes
+        child.clear()
 
     current_device = [devices[key]
                       for key in devices if key.lower() == hostname.lower()][0]
@@ -911,6 +1114,7 @@ port_name_to_alias_map = {}
 port_alias_asic_map = {}
 port_name_to_index_map = {}
 port_alias_to_port_asic_alias_map = {}
+PARSER_DIGEST = parser_digest()
 
 
 def main():
@@ -919,6 +1123,7 @@ def main():
             host=dict(required=True),
             filename=dict(),
             namespace=dict(required=False, default=None),
+            use_cache=dict(required=False, type='bool', default=True),
         ),
         supports_check_mode=True
     )
@@ -947,8 +1152,7 @@ def main():
     namespace = m_args['namespace']
 
     try:
-        results = parse_xml(filename, m_args['host'], namespace)
-        results_clean = json.loads(json.dumps(results, cls=minigraph_encoder))
+        results_clean = get_minigraph_facts(filename, m_args['host'], namespace, m_args['use_cache'])
         module.exit_json(ansible_facts=results_clean)
     except Exception as e:
         tb = traceback.format_exc()
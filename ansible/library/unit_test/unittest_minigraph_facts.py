@@ -0,0 +1,141 @@
+"""Unit tests of the minigraph_facts module.
+
+Run from the root of the repository:
+    python3 -m unittest discover -s ansible/library/unit_test -p "unittest_*.py"
+"""
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import ansible.module_utils
+
+from lxml import etree as ET
+
+LIBRARY_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MINIGRAPH_PATH = os.path.join(os.path.dirname(LIBRARY_PATH), 'minigraph')
+
+# the module utils of the repository are found by ansible when a module runs
+ansible.module_utils.__path__.append(os.path.join(os.path.dirname(LIBRARY_PATH), 'module_utils'))
+sys.path.insert(0, LIBRARY_PATH)
+
+import minigraph_facts  # noqa: E402
+
+# facts of the mini-graphs of MINIGRAPH_PATH, as parsed by the DOM parser the streaming parser replaced
+EXPECTED_FACTS_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'minigraph_facts')
+
+
+def mini_graph_hostname(mini_graph_path):
+    for child in ET.parse(mini_graph_path).getroot():
+        if child.tag == minigraph_facts.HOSTNAME_TAG:
+            return child.text
+
+
+def parse_facts(mini_graph_path, hostname):
+    return json.loads(json.dumps(minigraph_facts.parse_xml(mini_graph_path, hostname),
+                                 cls=minigraph_facts.minigraph_encoder))
+
+
+def expected_facts(mini_graph_path):
+    name = os.path.splitext(os.path.basename(mini_graph_path))[0]
+    with open(os.path.join(EXPECTED_FACTS_PATH, name + '.json')) as f:
+        return json.load(f)
+
+
+def write_variants(mini_graph_path, directory):
+    """Write the mini-graph with its top level nodes in other orders and with unknown top level nodes."""
+    variants = []
+    for name, reorder in [
+            ('reversed', lambda children: list(reversed(children))),
+            ('hostname_first', lambda children: sorted(children, key=lambda child: child.tag not in (
+                minigraph_facts.HOSTNAME_TAG, minigraph_facts.HWSKU_TAG))),
+            ('unknown_nodes', lambda children: [ET.Element(str(ET.QName(minigraph_facts.ns, 'Unknown')))] +
+             children + [ET.Element(str(ET.QName(minigraph_facts.ns, 'DeviceInfo')))])]:
+        tree = ET.parse(mini_graph_path)
+        root = tree.getroot()
+        children = list(root)
+        for child in children:
+            root.remove(child)
+        root.extend(reorder(children))
+        path = os.path.join(directory, '{}_{}'.format(name, os.path.basename(mini_graph_path)))
+        tree.write(path)
+        variants.append(path)
+    return variants
+
+
+class TestMiniGraphFacts(unittest.TestCase):
+
+    def setUp(self):
+        self.mini_graphs = sorted(glob.glob(os.path.join(MINIGRAPH_PATH, '*.xml')))
+        self.assertTrue(self.mini_graphs, "No minigraph in %s" % MINIGRAPH_PATH)
+        self.cache_dir = tempfile.mkdtemp()
+        cache_patch = mock.patch.object(minigraph_facts, 'ANSIBLE_USER_MINIGRAPH_FACTS_CACHE',
+                                        os.path.join(self.cache_dir, '{}_facts.json'))
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_parser_matches_expected_facts(self):
+        for mini_graph in self.mini_graphs:
+            expected = expected_facts(mini_graph)
+            for variant in [mini_graph] + write_variants(mini_graph, self.cache_dir):
+                with self.subTest(mini_graph=variant):
+                    # the expected facts don't have the path of the mini-graph
+                    self.assertEqual(parse_facts(variant, mini_graph_hostname(variant)),
+                                     dict(expected, minigraph_as_xml=variant))
+
+    def test_device_info_of_section_kept(self):
+        # only the DeviceInfo nodes of DeviceInfos are cleared by the streaming parser
+        mini_graph = os.path.join(self.cache_dir, 'minigraph.xml')
+        tree = ET.parse(self.mini_graphs[0])
+        section = tree.getroot().find(str(ET.QName(minigraph_facts.ns, 'PngDec')))
+        device_info = ET.SubElement(section, minigraph_facts.DEVICE_INFO_TAG)
+        ET.SubElement(device_info, str(ET.QName(minigraph_facts.ns, 'AutoNegotiation'))).text = 'true'
+        tree.write(mini_graph)
+
+        _, _, sections = minigraph_facts.iterparse_mini_graph(mini_graph)
+        png = [node for node in sections if node.tag == section.tag][0]
+        self.assertEqual([child.text for child in png.find(minigraph_facts.DEVICE_INFO_TAG)], ['true'])
+
+    def test_cached_facts(self):
+        for mini_graph in self.mini_graphs:
+            hostname = mini_graph_hostname(mini_graph)
+            with self.subTest(mini_graph=mini_graph):
+                expected = parse_facts(mini_graph, hostname)
+                self.assertEqual(minigraph_facts.get_minigraph_facts(mini_graph, hostname), expected)
+
+                # the facts are not parsed again from the same mini-graph
+                with mock.patch.object(minigraph_facts, 'parse_xml', side_effect=AssertionError("parsed again")):
+                    self.assertEqual(minigraph_facts.get_minigraph_facts(mini_graph, hostname), expected)
+
+                # nor when the cache is not used
+                self.assertEqual(minigraph_facts.get_minigraph_facts(mini_graph, hostname, use_cache=False), expected)
+
+                # but they are after a change of the port table
+                with mock.patch.object(minigraph_facts, 'port_table_digest', return_value='changed'):
+                    with mock.patch.object(minigraph_facts, 'parse_xml', wraps=minigraph_facts.parse_xml) as parse:
+                        self.assertEqual(minigraph_facts.get_minigraph_facts(mini_graph, hostname), expected)
+                        self.assertEqual(parse.call_count, 1)
+
+    def test_cached_facts_of_changed_mini_graph(self):
+        mini_graph = os.path.join(self.cache_dir, 'minigraph.xml')
+        shutil.copy(self.mini_graphs[0], mini_graph)
+        hostname = mini_graph_hostname(mini_graph)
+        facts = minigraph_facts.get_minigraph_facts(mini_graph, hostname)
+
+        tree = ET.parse(mini_graph)
+        for child in tree.getroot():
+            if child.tag == str(ET.QName(minigraph_facts.ns, "HwSku")):
+                child.text = 'Changed-' + child.text
+        tree.write(mini_graph)
+        changed_facts = minigraph_facts.get_minigraph_facts(mini_graph, hostname)
+        self.assertEqual(changed_facts['minigraph_hwsku'], 'Changed-' + facts['minigraph_hwsku'])
+        self.assertEqual(changed_facts, parse_facts(mini_graph, hostname))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Unit tests of the prefix index of the announce_routes module.
+
+Run from the root of the repository:
+    python3 -m unittest discover -s ansible/library/unit_test -p "unittest_*.py"
+"""
+import ipaddress
+import os
+import random
+import unittest
+
+import ansible.module_utils
+
+# the module utils of the repository are found by ansible when a module runs
+ansible.module_utils.__path__.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))), 'module_utils'))
+
+from ansible.module_utils.prefix_index_utils import PrefixIndex, parse_prefix, prefix_version  # noqa: E402
+
+IPV4_PREFIXES = ['10.0.0.0/8', '10.1.0.0/16', '10.1.0.0/24', '10.1.1.0/24', '10.1.2.0/23', '10.1.0.1/32',
+                 '10.2.0.0/16', '11.0.0.0/8', '9.255.255.255/32', '0.0.0.0/0', '255.255.255.255/32',
+                 '192.168.0.0/16', '192.168.0.0/17', '192.168.128.0/17', '192.169.0.0/16']
+IPV6_PREFIXES = ['fc00::/7', 'fc00::/64', 'fc00::1/128', 'fc00:0:0:1::/64', 'fe00::/7', 'fbff::/16', '::/0',
+                 '2001:db8::/32', '2001:db8:1::/48', '2001:db9::/32', '2001:db7:ffff::/48',
+                 'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff/128', '::/128', '::1/128']
+
+
+def is_subnet(prefix, indexed_prefixes):
+    """Whether prefix is a subnet of any of the indexed prefixes, with ipaddress."""
+    network = ipaddress.ip_network(prefix)
+    return any(network.version == indexed.version and network.subnet_of(indexed)
+               for indexed in map(ipaddress.ip_network, indexed_prefixes))
+
+
+def random_prefixes(rnd, count, version):
+    bits = 32 if version == 4 else 128
+    network = ipaddress.IPv4Network if version == 4 else ipaddress.IPv6Network
+    prefixes = []
+    for _ in range(count):
+        prefixlen = rnd.randint(0, bits)
+        # few distinct high bits so that the prefixes nest and are adjacent
+        address = (rnd.getrandbits(3) << (bits - 3)) | rnd.getrandbits(bits - 8)
+        prefixes.append(str(network((address >> (bits - prefixlen) << (bits - prefixlen), prefixlen))))
+    return prefixes
+
+
+class TestPrefixIndex(unittest.TestCase):
+
+    def assert_contains(self, indexed_prefixes, prefixes):
+        index = PrefixIndex(indexed_prefixes)
+        for prefix in prefixes:
+            with self.subTest(indexed_prefixes=indexed_prefixes, prefix=prefix):
+                self.assertEqual(index.contains(prefix), is_subnet(prefix, indexed_prefixes))
+
+    def assert_filter_out(self, indexed_prefixes, routes):
+        expected = [route for route in dict.fromkeys(routes) if not is_subnet(route[0], indexed_prefixes)]
+        self.assertEqual(PrefixIndex(indexed_prefixes).filter_out(routes), expected)
+
+    def test_nested_prefixes(self):
+        self.assert_contains(['10.1.0.0/16'], IPV4_PREFIXES)
+        self.assert_contains(['10.0.0.0/8', '10.1.0.0/16', '10.1.0.0/24'], IPV4_PREFIXES)
+        self.assert_contains(['10.1.0.0/24', '10.1.0.0/16'], IPV4_PREFIXES)
+        self.assert_contains(['2001:db8::/32', '2001:db8:1::/48'], IPV6_PREFIXES)
+
+    def test_equal_prefixes(self):
+        for prefix in IPV4_PREFIXES + IPV6_PREFIXES:
+            self.assertTrue(PrefixIndex([prefix]).contains(prefix))
+        self.assert_contains(['10.1.0.0/24', '10.1.0.0/24'], IPV4_PREFIXES)
+
+    def test_adjacent_prefixes(self):
+        self.assert_contains(['10.1.0.0/24', '10.1.2.0/23'], IPV4_PREFIXES)
+        self.assert_contains(['192.168.0.0/17', '192.168.128.0/17'], IPV4_PREFIXES)
+        self.assert_contains(['fc00::/64', 'fc00:0:0:1::/64'], IPV6_PREFIXES)
+        self.assert_contains(['2001:db8::/32'], ['2001:db7:ffff::/48', '2001:db9::/32', '2001:db8:ffff::/48'])
+
+    def test_default_routes(self):
+        self.assert_contains(['0.0.0.0/0'], IPV4_PREFIXES + IPV6_PREFIXES)
+        self.assert_contains(['::/0'], IPV4_PREFIXES + IPV6_PREFIXES)
+        self.assert_contains(['10.0.0.0/8', 'fc00::/7'], ['0.0.0.0/0', '::/0'])
+
+    def test_host_prefixes(self):
+        self.assert_contains(['10.1.0.1/32', '255.255.255.255/32', '0.0.0.0/32'], IPV4_PREFIXES + ['0.0.0.0/32'])
+        self.assert_contains(['fc00::1/128', 'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff/128', '::/128'],
+                             IPV6_PREFIXES)
+        self.assert_contains(['255.255.255.0/24', 'ffff::/16'],
+                             ['255.255.255.255/32', 'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff/128'])
+        # the address without prefix length is a host prefix
+        self.assertTrue(PrefixIndex(['10.1.0.0/24']).contains('10.1.0.1'))
+        self.assertTrue(PrefixIndex(['fc00::1']).contains('fc00::1/128'))
+
+    def test_versions_kept_apart(self):
+        # ::/96 and 0.0.0.0/0 have the same integer ranges
+        self.assert_contains(['::/96', '::ffff:0:0/96'], ['0.0.0.0/0', '10.0.0.0/8', '::/96', '::ffff:a00:0/104'])
+        self.assert_contains(['0.0.0.0/0'], ['::/96', '::/128'])
+
+    def test_empty_index(self):
+        self.assertFalse(PrefixIndex().contains('10.0.0.0/8'))
+        self.assertFalse(PrefixIndex().contains('::/0'))
+
+    def test_added_prefixes(self):
+        index = PrefixIndex(['10.0.0.0/16'])
+        self.assertFalse(index.contains('10.1.0.0/24'))
+        index.add('10.1.0.0/16')
+        self.assertTrue(index.contains('10.1.0.0/24'))
+        self.assertEqual(len(index), 2)
+
+    def test_random_prefixes(self):
+        rnd = random.Random(0)
+        for version in (4, 6):
+            for count in (1, 10, 100):
+                self.assert_contains(random_prefixes(rnd, count, version), random_prefixes(rnd, 200, version))
+
+    def test_filter_out(self):
+        routes = [(prefix, '10.0.0.1', '6666 6667') for prefix in IPV4_PREFIXES] + \
+            [(prefix, 'fc00::1', None) for prefix in IPV6_PREFIXES]
+        routes += routes[:5]
+        for indexed_prefixes in ([], ['10.1.0.0/16', 'fc00::/7'], ['0.0.0.0/0'], ['::/0'], ['192.168.0.0/17'],
+                                 ['10.1.0.1/32', '2001:db8:1::/48', 'fc00::1/128']):
+            with self.subTest(indexed_prefixes=indexed_prefixes):
+                self.assert_filter_out(indexed_prefixes, routes)
+
+    def test_filter_out_random_routes(self):
+        rnd = random.Random(1)
+        for version in (4, 6):
+            routes = [(prefix, 'nexthop', None) for prefix in random_prefixes(rnd, 300, version)]
+            self.assert_filter_out(random_prefixes(rnd, 20, version), routes)
+
+
+class TestParsePrefix(unittest.TestCase):
+
+    def test_ranges(self):
+        for prefix in IPV4_PREFIXES + IPV6_PREFIXES:
+            network = ipaddress.ip_network(prefix)
+            self.assertEqual(parse_prefix(prefix),
+                             (network.version, int(network.network_address), int(network.broadcast_address)))
+            self.assertEqual(prefix_version(prefix), network.version)
+
+    def test_invalid_prefixes(self):
+        for prefix in ('10.0.0.1/8', '10.0.0.0/33', 'fc00::1/64', 'fc00::/129', '10.0.0.0/-1', '10.0.0/8',
+                       'not a prefix', '10.0.0.0/a', ''):
+            with self.subTest(prefix=prefix):
+                with self.assertRaises(ValueError):
+                    ipaddress.ip_network(prefix)
+                with self.assertRaises(ValueError):
+                    parse_prefix(prefix)
+
+
+if __name__ == '__main__':
+    unittest.main()
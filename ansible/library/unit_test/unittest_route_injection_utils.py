@@ -0,0 +1,222 @@
+"""Unit tests of the route injection of the announce_routes module.
+
+Run from the root of the repository:
+    python3 -m unittest discover -s ansible/library/unit_test -p "unittest_*.py"
+"""
+import os
+import threading
+import unittest
+from unittest import mock
+
+import ansible.module_utils
+
+# the module utils of the repository are found by ansible when a module runs
+ansible.module_utils.__path__.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))), 'module_utils'))
+
+from ansible.module_utils import route_injection_utils  # noqa: E402
+from ansible.module_utils.route_injection_utils import AdaptiveBatchSize, RouteInjector  # noqa: E402
+
+URL = 'http://10.255.0.2:5000'
+
+
+def make_routes(count, aspath='6666 6667'):
+    return [('192.168.{}.{}/32'.format(i >> 8, i & 0xff), '10.0.0.1', aspath) for i in range(count)]
+
+
+class FakeClock(object):
+    """Clock of the route injection, advanced by the fake posts instead of sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+class FakeSession(object):
+    """requests.Session posting to a fake exabgp, the latency of a post is given by the route count of its batch."""
+
+    def __init__(self, exabgp):
+        self.exabgp = exabgp
+        self.closed = False
+        self.trust_env = True
+        self.mount = mock.MagicMock()
+
+    def post(self, url, data, timeout):
+        return self.exabgp.post(self, url, data)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeExabgp(object):
+
+    def __init__(self, clock, latency=lambda routes: 0.01, failures=0, status_code=200):
+        self.clock = clock
+        self.latency = latency
+        self.failures = failures
+        self.status_code = status_code
+        self.sessions = []
+        self.posts = []
+        self._lock = threading.Lock()
+
+    def session(self):
+        session = FakeSession(self)
+        self.sessions.append(session)
+        return session
+
+    def post(self, session, url, data):
+        assert not session.closed, 'post on a closed session'
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionResetError(104, 'Connection reset by peer')
+            commands = data['commands'].split(';')
+            self.posts.append((url, commands))
+            self.clock.now += self.latency(len(commands))
+        return mock.Mock(status_code=self.status_code, reason='Internal Server Error', headers={}, text='error')
+
+
+class TestAdaptiveBatchSize(unittest.TestCase):
+
+    def test_fast_full_batches_double_the_size(self):
+        batch_size = AdaptiveBatchSize(initial=200, minimum=50, maximum=1000, target_latency=2.0)
+        self.assertEqual([batch_size.update(batch_size.size, 0.5) for _ in range(4)], [400, 800, 1000, 1000])
+
+    def test_fast_partial_batch_keeps_the_size(self):
+        batch_size = AdaptiveBatchSize(initial=200, minimum=50, maximum=1000, target_latency=2.0)
+        self.assertEqual(batch_size.update(120, 0.5), 200)
+
+    def test_latency_between_half_and_target_keeps_the_size(self):
+        batch_size = AdaptiveBatchSize(initial=200, minimum=50, maximum=1000, target_latency=2.0)
+        self.assertEqual(batch_size.update(200, 1.5), 200)
+        self.assertEqual(batch_size.update(200, 2.0), 200)
+
+    def test_slow_batches_halve_the_size(self):
+        batch_size = AdaptiveBatchSize(initial=400, minimum=50, maximum=1000, target_latency=2.0)
+        self.assertEqual([batch_size.update(batch_size.size, 3.0) for _ in range(5)], [200, 100, 50, 50, 50])
+
+    def test_slow_partial_batch_halves_the_batch(self):
+        batch_size = AdaptiveBatchSize(initial=400, minimum=50, maximum=1000, target_latency=2.0)
+        self.assertEqual(batch_size.update(300, 3.0), 150)
+
+    def test_bounds_include_the_initial_size(self):
+        batch_size = AdaptiveBatchSize(initial=20, minimum=50, maximum=10, target_latency=2.0)
+        self.assertEqual((batch_size.minimum, batch_size.maximum), (20, 20))
+
+
+class TestRouteInjector(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.exabgp = FakeExabgp(self.clock)
+        for name, patcher in [('time', mock.patch.object(route_injection_utils, 'time', self.clock)),
+                              ('session', mock.patch.object(route_injection_utils.requests, 'Session',
+                                                            side_effect=lambda: self.exabgp.session()))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def batch_sizes(self):
+        return [len(commands) for _, commands in self.exabgp.posts]
+
+    def test_commands(self):
+        injector = RouteInjector(batch_size=2, adaptive=False)
+        routes = [('10.1.0.0/24', '10.0.0.1', '6666 6667'), ('10.2.0.0/24', '10.0.0.3', None),
+                  ('fc00::/64', 'fc00::1', '')]
+        self.assertEqual(injector.change_routes('withdraw', URL, routes), 3)
+        self.assertEqual(self.exabgp.posts, [
+            (URL, ['withdraw route 10.1.0.0/24 next-hop 10.0.0.1 as-path [ 6666 6667 ]',
+                   'withdraw route 10.2.0.0/24 next-hop 10.0.0.3']),
+            (URL, ['withdraw route fc00::/64 next-hop fc00::1'])])
+
+    def test_fixed_batches(self):
+        injector = RouteInjector(batch_size=200, adaptive=False)
+        self.assertEqual(injector.change_routes('announce', URL, iter(make_routes(450))), 450)
+        self.assertEqual(self.batch_sizes(), [200, 200, 50])
+
+    def test_no_routes(self):
+        injector = RouteInjector()
+        self.assertEqual(injector.change_routes('announce', URL, []), 0)
+        self.assertEqual(self.exabgp.posts, [])
+        self.assertEqual(injector.report()['routes'], 0)
+
+    def test_batches_grow_while_exabgp_is_fast(self):
+        injector = RouteInjector(batch_size=100, min_batch_size=50, max_batch_size=400, target_latency=2.0)
+        self.assertEqual(injector.change_routes('announce', URL, make_routes(1500)), 1500)
+        self.assertEqual(self.batch_sizes(), [100, 200, 400, 400, 400])
+
+    def test_batches_shrink_when_exabgp_is_slow(self):
+        # exabgp takes 10ms per route, batches of more than 200 routes are slower than the target
+        self.exabgp.latency = lambda routes: routes * 0.01
+        injector = RouteInjector(batch_size=800, min_batch_size=50, max_batch_size=1600, target_latency=2.0)
+        injector.change_routes('announce', URL, make_routes(2000))
+        self.assertEqual(self.batch_sizes(), [800, 400, 200, 200, 200, 200])
+
+    def test_batch_size_kept_per_url(self):
+        injector = RouteInjector(batch_size=100, min_batch_size=50, max_batch_size=400, target_latency=2.0)
+        injector.change_routes('announce', URL, make_routes(300))
+        injector.change_routes('announce', 'http://10.255.0.2:5001', make_routes(100))
+        injector.change_routes('announce', URL, make_routes(400))
+        self.assertEqual(self.batch_sizes(), [100, 200, 100, 400])
+
+    def test_one_session_per_url(self):
+        injector = RouteInjector(batch_size=100, adaptive=False)
+        injector.change_routes('announce', URL, make_routes(300))
+        injector.change_routes('withdraw', URL, make_routes(300))
+        self.assertEqual(len(self.exabgp.sessions), 1)
+        session = self.exabgp.sessions[0]
+        self.assertFalse(session.trust_env)
+        injector.close()
+        self.assertTrue(session.closed)
+
+    def test_retry_on_a_new_session(self):
+        self.exabgp.failures = 2
+        injector = RouteInjector(batch_size=100, adaptive=False)
+        self.assertEqual(injector.change_routes('announce', URL, make_routes(100)), 100)
+        self.assertEqual(self.batch_sizes(), [100])
+        self.assertEqual([session.closed for session in self.exabgp.sessions], [True, True, False])
+        self.assertEqual(self.clock.sleeps, [0.01, 0.02])
+
+    def test_too_many_failures(self):
+        self.exabgp.failures = route_injection_utils.POST_RETRIES
+        injector = RouteInjector(batch_size=100, adaptive=False)
+        with self.assertRaises(ConnectionResetError):
+            injector.change_routes('announce', URL, make_routes(100))
+        self.assertEqual(len(self.exabgp.sessions), route_injection_utils.POST_RETRIES)
+        self.assertTrue(all(session.closed for session in self.exabgp.sessions))
+
+    def test_error_status(self):
+        self.exabgp.status_code = 500
+        injector = RouteInjector(batch_size=100, adaptive=False)
+        with self.assertRaisesRegex(Exception, 'Change routes failed: url={}.*r.status_code=500'.format(URL)):
+            injector.change_routes('announce', URL, make_routes(100))
+
+    def test_parallel_route_sets(self):
+        injector = RouteInjector(batch_size=100, adaptive=False)
+        route_sets = [(make_routes(50 * (port + 1)), 'http://10.255.0.2:{}'.format(5000 + port), 'announce')
+                      for port in range(40)]
+        with mock.patch.object(route_injection_utils, 'ThreadPool', wraps=route_injection_utils.ThreadPool) as pool:
+            posted = injector.change_routes_in_parallel(route_sets)
+        # a thread per route set
+        pool.assert_called_once_with(processes=40)
+        self.assertEqual(posted, [50 * (port + 1) for port in range(40)])
+        for routes, url, _ in route_sets:
+            self.assertEqual(sum(len(commands) for post_url, commands in self.exabgp.posts if post_url == url),
+                             len(routes))
+        self.assertEqual(len(self.exabgp.sessions), 40)
+        self.assertEqual(injector.change_routes_in_parallel([]), [])
+
+    def test_report(self):
+        injector = RouteInjector(batch_size=100, adaptive=False)
+        injector.change_routes('announce', URL, make_routes(250))
+        self.assertEqual(injector.report(), {'routes': 250, 'requests': 3, 'seconds': 0.03,
+                                             'routes_per_second': 8333.3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
 import csv
+import hashlib
+import inspect
 import os
 import logging
 import ipaddress
+import pickle
+import sys
 import six
 from operator import itemgetter
 from itertools import groupby
@@ -12,6 +16,111 @@ try:
 except ImportError:
     from module_utils.port_utils import get_port_alias_to_name_map
 
+# Parsed graph facts are cached per graph folder and group, the cache is validated by the mtime and size of the csv
+# files and by the source of the parsing code. Set LAB_GRAPH_CACHE_DIR to an empty string to disable the cache.
+LAB_GRAPH_CACHE_DIR = os.environ.get(
+    "LAB_GRAPH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sonic-mgmt", "lab_graph"))
+LAB_GRAPH_CACHE_VERSION = 1
+
+_code_digest = None
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+def _get_code_digest():
+    """Digest of the source of the modules parsing the csv files.
+
+    The source is read through the module loader, so it also works when the module is zipped by Ansible.
+    """
+    global _code_digest
+    if _code_digest is None:
+        digest = hashlib.md5()
+        for module_name in [__name__, get_port_alias_to_name_map.__module__]:
+            try:
+                digest.update(inspect.getsource(sys.modules[module_name]).encode("utf-8"))
+            except (KeyError, IOError, OSError, TypeError):
+                digest.update(module_name.encode("utf-8"))
+        _code_digest = digest.hexdigest()
+    return _code_digest
+
+
+def _cache_file(cache_dir, kind, path, group=""):
+    key = hashlib.md5("{}|{}".format(os.path.abspath(path), group).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, "{}_{}.pickle".format(kind, key))
+
+
+def _read_cache(cache_file, signature):
+    try:
+        with open(cache_file, "rb") as f:
+            cached_signature, data = pickle.load(f)
+    except (IOError, OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        return None
+    if cached_signature != signature:
+        logging.debug("Cache {} is stale".format(cache_file))
+        return None
+    return data
+
+
+def _write_cache(cache_file, signature, data):
+    tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+    try:
+        cache_dir = os.path.dirname(cache_file)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+        with open(tmp_file, "wb") as f:
+            pickle.dump((signature, data), f, 2)
+        # Readers never see a partially written cache
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError, pickle.PicklingError) as e:
+        logging.debug("Failed to write cache {}: {}".format(cache_file, repr(e)))
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def load_hostname_index(path, groups, cache_dir=None):
+    """Build the index of the graph groups of every hostname.
+
+    Only the devices csv file of every group is read, and the index is cached until one of them changes.
+
+    Args:
+        path (str): Folder of the csv graph files.
+        groups (list): Graph groups, in the order of the graph groups file.
+        cache_dir (str, optional): Cache folder, defaults to LAB_GRAPH_CACHE_DIR.
+
+    Returns:
+        dict: Hostname to the list of groups having the hostname, in the order of groups.
+    """
+    cache_dir = LAB_GRAPH_CACHE_DIR if cache_dir is None else cache_dir
+    devices_files = [os.path.join(path, LabGraph.SUPPORTED_CSV_FILES["devices"].format(group)) for group in groups]
+    signature = (LAB_GRAPH_CACHE_VERSION, list(groups), [_file_signature(f) for f in devices_files])
+    cache_file = _cache_file(cache_dir, "hostname_index", path) if cache_dir else None
+    if cache_file:
+        hostname_groups = _read_cache(cache_file, signature)
+        if hostname_groups is not None:
+            return hostname_groups
+
+    hostname_groups = {}
+    for group, devices_file in zip(groups, devices_files):
+        if not os.path.exists(devices_file):
+            continue
+        with open(devices_file) as csvfile:
+            for row in csv.DictReader(csvfile):
+                group_list = hostname_groups.setdefault(row["Hostname"], [])
+                if group not in group_list:
+                    group_list.append(group)
+
+    if cache_file:
+        _write_cache(cache_file, signature, hostname_groups)
+    return hostname_groups
+
 
 class LabGraph(object):
 
@@ -25,13 +134,18 @@ class LabGraph(object):
         "serial_links": "sonic_{}_serial_links.csv",
     }
 
-    def __init__(self, path, group):
+    def __init__(self, path, group, facts=None):
         self.path = path
         self.group = group
         self.csv_files = {k: os.path.join(self.path, v.format(group)) for k, v in self.SUPPORTED_CSV_FILES.items()}
 
         self._cache_port_alias_to_name = {}
         self._cache_port_name_to_alias = {}
+        self._cache_port_name_to_index = {}
+
+        if facts is not None:
+            self.csv_facts, self.graph_facts = facts
+            return
 
         self.csv_facts = {}
         self.read_csv_files()
@@ -39,6 +153,34 @@ class LabGraph(object):
         self.graph_facts = {}
         self.csv_to_graph_facts()
 
+    @classmethod
+    def load(cls, path, group, cache_dir=None):
+        """Create the LabGraph of a group, from the cached graph facts when the csv files are unchanged.
+
+        Args:
+            path (str): Folder of the csv graph files.
+            group (str): Graph group.
+            cache_dir (str, optional): Cache folder, defaults to LAB_GRAPH_CACHE_DIR. Empty string disables the cache.
+
+        Returns:
+            obj: Instance of LabGraph.
+        """
+        cache_dir = LAB_GRAPH_CACHE_DIR if cache_dir is None else cache_dir
+        if not cache_dir:
+            return cls(path, group)
+
+        csv_files = [os.path.join(path, v.format(group)) for _, v in sorted(cls.SUPPORTED_CSV_FILES.items())]
+        signature = (LAB_GRAPH_CACHE_VERSION, _get_code_digest(), [_file_signature(f) for f in csv_files])
+        cache_file = _cache_file(cache_dir, "graph", path, group)
+        facts = _read_cache(cache_file, signature)
+        if facts is not None:
+            logging.debug("Loaded graph facts of group {} from cache {}".format(group, cache_file))
+            return cls(path, group, facts=facts)
+
+        lab_graph = cls(path, group)
+        _write_cache(cache_file, signature, (lab_graph.csv_facts, lab_graph.graph_facts))
+        return lab_graph
+
     def read_csv_files(self):
         for k, v in self.csv_files.items():
             if os.path.exists(v):
@@ -107,6 +249,18 @@ class LabGraph(object):
     def _get_sorted_port_name_list(self, hwsku):
         return natsorted(self._get_port_alias_to_name_map(hwsku).values())
 
+    def _get_port_name_to_index_map(self, hwsku):
+        """
+        Retrive map of port name to its index in the sorted port name list of specific hwsku.
+        """
+        if hwsku in self._cache_port_name_to_index:
+            return self._cache_port_name_to_index[hwsku]
+        port_name_to_index = {}
+        for index, port_name in enumerate(self._get_sorted_port_name_list(hwsku)):
+            port_name_to_index.setdefault(port_name, index)
+        self._cache_port_name_to_index[hwsku] = port_name_to_index
+        return port_name_to_index
+
     def _get_port_name_to_alias_map(self, hwsku):
         """
         Retrive port name to alias map for specific hwsku.
@@ -442,22 +596,27 @@ class LabGraph(object):
             else:
                 device_vlan_map_list[hostname] = {}
 
-                sorted_port_name_list = self._get_sorted_port_name_list(device["HwSku"])
+                port_name_to_index = self._get_port_name_to_index_map(device["HwSku"])
+
+                # Ports of every vlan, in the order of port_vlans, instead of scanning all ports for every vlan
+                vlan_ports = {}
+                for port_name, port_info in device_port_vlans[hostname].items():
+                    for vlan in set(port_info["vlanlist"]):
+                        vlan_ports.setdefault(vlan, []).append(port_name)
 
                 for host_vlan in vlan_list:
                     found_port_for_vlan = False
-                    for port_name, port_info in device_port_vlans[hostname].items():
-                        if host_vlan in port_info["vlanlist"]:
-                            if port_name in sorted_port_name_list:
-                                port_index = sorted_port_name_list.index(port_name)
-                                device_vlan_map_list[hostname][port_index] = host_vlan
-                                found_port_for_vlan = True
-                            elif not ignore_error:
-                                msg = (f"Did not find port for '{port_name}' in the ports based on "
-                                       f"hwsku '{device['HwSku']}' for host '{hostname}'")
-                                logging.error("Sorted port name list: {}".format(sorted_port_name_list))
-                                logging.error("port_vlans of host {}: {}".format(hostname, device_port_vlans[hostname]))
-                                return (False, msg)
+                    for port_name in vlan_ports.get(host_vlan, []):
+                        if port_name in port_name_to_index:
+                            device_vlan_map_list[hostname][port_name_to_index[port_name]] = host_vlan
+                            found_port_for_vlan = True
+                        elif not ignore_error:
+                            msg = (f"Did not find port for '{port_name}' in the ports based on "
+                                   f"hwsku '{device['HwSku']}' for host '{hostname}'")
+                            logging.error("Sorted port name list: {}".format(
+                                self._get_sorted_port_name_list(device["HwSku"])))
+                            logging.error("port_vlans of host {}: {}".format(hostname, device_port_vlans[hostname]))
+                            return (False, msg)
                     if not found_port_for_vlan and not ignore_error:
                         msg = (f"Did not find corresponding link for vlan {host_vlan} in "
                                f"{device_port_vlans[hostname]} for host {hostname}")
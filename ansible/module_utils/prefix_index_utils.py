@@ -0,0 +1,103 @@
+"""Prefix containment index for route generators.
+
+Prefixes are converted to integer ranges [first address, last address]. Two prefixes are either nested or disjoint,
+so keeping only the outermost indexed prefixes gives disjoint sorted ranges, and whether a prefix is a subnet of any
+indexed prefix is answered by a binary search.
+
+    from ansible.module_utils.prefix_index_utils import PrefixIndex
+
+    index = PrefixIndex(["192.168.0.0/16", "fc00::/7"])
+    index.contains("192.168.1.0/24")        # True
+    routes = index.filter_out(routes)       # routes are (prefix, nexthop, aspath) tuples
+"""
+import bisect
+import socket
+import struct
+
+IPV4_MAX_PREFIXLEN = 32
+IPV6_MAX_PREFIXLEN = 128
+
+
+def prefix_version(prefix):
+    """IP version of a prefix string, without parsing it."""
+    return 6 if ':' in str(prefix) else 4
+
+
+def parse_prefix(prefix):
+    """Convert a prefix string to (version, first address, last address) integers.
+
+    Raises:
+        ValueError: If the prefix is invalid or has host bits set, like ipaddress.ip_network does.
+    """
+    prefix = str(prefix)
+    address, _, prefixlen = prefix.partition('/')
+    try:
+        if ':' in address:
+            version, max_prefixlen = 6, IPV6_MAX_PREFIXLEN
+            high, low = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6, address))
+            first = (high << 64) | low
+        else:
+            version, max_prefixlen = 4, IPV4_MAX_PREFIXLEN
+            first = struct.unpack('!I', socket.inet_pton(socket.AF_INET, address))[0]
+        prefixlen = int(prefixlen) if prefixlen else max_prefixlen
+    except (socket.error, ValueError):
+        raise ValueError('{} does not appear to be an IPv4 or IPv6 network'.format(prefix))
+    if not 0 <= prefixlen <= max_prefixlen:
+        raise ValueError('{} has an invalid prefix length'.format(prefix))
+    host_mask = (1 << (max_prefixlen - prefixlen)) - 1
+    if first & host_mask:
+        raise ValueError('{} has host bits set'.format(prefix))
+    return version, first, first | host_mask
+
+
+class PrefixIndex(object):
+    """Index of prefixes answering whether a prefix is a subnet of any of them in O(log n)."""
+
+    def __init__(self, prefixes=()):
+        self._ranges = {4: [], 6: []}
+        self._starts = None
+        self._ends = None
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def add(self, prefix):
+        version, first, last = parse_prefix(prefix)
+        self._ranges[version].append((first, last))
+        self._starts = None
+
+    def __len__(self):
+        return len(self._ranges[4]) + len(self._ranges[6])
+
+    def _build(self):
+        self._starts, self._ends = {}, {}
+        for version, ranges in self._ranges.items():
+            starts, ends = [], []
+            # Sorted by first address and widest first, nested prefixes are skipped
+            for first, last in sorted(ranges, key=lambda r: (r[0], -r[1])):
+                if ends and last <= ends[-1]:
+                    continue
+                starts.append(first)
+                ends.append(last)
+            self._starts[version], self._ends[version] = starts, ends
+
+    def contains(self, prefix):
+        """Whether the prefix is a subnet of (or equal to) any indexed prefix."""
+        if self._starts is None:
+            self._build()
+        version, first, last = parse_prefix(prefix)
+        starts = self._starts[version]
+        i = bisect.bisect_right(starts, first) - 1
+        return i >= 0 and last <= self._ends[version][i]
+
+    def filter_out(self, routes):
+        """Drop the routes whose prefix is a subnet of any indexed prefix, and the duplicated routes.
+
+        Args:
+            routes (iterable): Routes as (prefix, nexthop, aspath) tuples.
+
+        Returns:
+            list: Remaining routes in their original order.
+        """
+        if not len(self):
+            return list(dict.fromkeys(routes))
+        return [route for route in dict.fromkeys(routes) if not self.contains(route[0])]
@@ -0,0 +1,218 @@
+"""Pipeline for injecting routes into exabgp through its HTTP API.
+
+Routes are formatted into exabgp commands one batch at a time and posted over a keep-alive session per exabgp port,
+so only the commands of the batch being posted are held, the routes themselves are still built by the caller.
+The batch size of every port adapts to the observed response latency: it grows while exabgp answers quickly and
+shrinks when a batch takes longer than the target latency. Throughput is accounted for the whole run.
+
+    from ansible.module_utils.route_injection_utils import RouteInjector
+
+    injector = RouteInjector()
+    injector.change_routes("announce", "http://10.255.0.2:5000", routes)
+    injector.change_routes_in_parallel([(routes, "http://10.255.0.2:5001", "announce")])
+    logging.info(injector.report())
+"""
+import itertools
+import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ROUTES_BATCH_SIZE = 200
+MIN_ROUTES_BATCH_SIZE = 50
+MAX_ROUTES_BATCH_SIZE = 5000
+# Batches answered faster than half of the target latency grow, batches slower than the target latency shrink
+TARGET_BATCH_LATENCY = 2.0
+POST_TIMEOUT = 360
+POST_RETRIES = 5
+
+
+def format_route_commands(action, routes):
+    """Generate exabgp commands of the routes, routes are (prefix, nexthop, aspath) tuples."""
+    for prefix, nexthop, aspath in routes:
+        if aspath:
+            yield "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath)
+        else:
+            yield "{} route {} next-hop {}".format(action, prefix, nexthop)
+
+
+class AdaptiveBatchSize(object):
+    """Batch size driven by the response latency of the previous batches, additive decrease is too slow for the
+    sizes used here, so the size is doubled or halved.
+    """
+
+    def __init__(self, initial=ROUTES_BATCH_SIZE, minimum=MIN_ROUTES_BATCH_SIZE, maximum=MAX_ROUTES_BATCH_SIZE,
+                 target_latency=TARGET_BATCH_LATENCY):
+        self.minimum = min(minimum, initial)
+        self.maximum = max(maximum, initial)
+        self.target_latency = target_latency
+        self.size = initial
+
+    def update(self, batch_size, latency):
+        if latency > self.target_latency:
+            self.size = max(self.minimum, min(self.size, batch_size) // 2)
+        elif latency < self.target_latency / 2 and batch_size >= self.size:
+            # Only a full batch tells that exabgp keeps up with the current size
+            self.size = min(self.maximum, self.size * 2)
+        return self.size
+
+
+class InjectionStats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = 0
+        self.requests = 0
+        self.post_time = 0.0
+        self.start = None
+        self.end = None
+
+    def record(self, routes, latency):
+        with self._lock:
+            now = time.time()
+            if self.start is None:
+                self.start = now - latency
+            self.end = now
+            self.routes += routes
+            self.requests += 1
+            self.post_time += latency
+
+    def report(self):
+        with self._lock:
+            elapsed = (self.end - self.start) if self.start is not None else 0.0
+            return {
+                "routes": self.routes,
+                "requests": self.requests,
+                "seconds": round(elapsed, 3),
+                "routes_per_second": round(self.routes / elapsed, 1) if elapsed else 0.0,
+            }
+
+
+class RouteInjector(object):
+    """Post exabgp commands of routes to the HTTP API of exabgp, see http_api.py in the exabgp module."""
+
+    def __init__(self, batch_size=ROUTES_BATCH_SIZE, min_batch_size=MIN_ROUTES_BATCH_SIZE,
+                 max_batch_size=MAX_ROUTES_BATCH_SIZE, target_latency=TARGET_BATCH_LATENCY,
+                 adaptive=True):
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency
+        self.adaptive = adaptive
+        self.stats = InjectionStats()
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._batch_sizes = {}
+
+    def _session(self, url):
+        with self._lock:
+            session = self._sessions.get(url)
+            if session is None:
+                session = requests.Session()
+                # Same as proxies={"http": None, "https": None}, exabgp runs in the PTF container
+                session.trust_env = False
+                session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+                self._sessions[url] = session
+            return session
+
+    def _reset_session(self, url):
+        with self._lock:
+            session = self._sessions.pop(url, None)
+        if session is not None:
+            session.close()
+
+    def _batch_size(self, url):
+        with self._lock:
+            batch_size = self._batch_sizes.get(url)
+            if batch_size is None:
+                batch_size = AdaptiveBatchSize(self.batch_size, self.min_batch_size, self.max_batch_size,
+                                               self.target_latency)
+                self._batch_sizes[url] = batch_size
+            return batch_size
+
+    def post(self, url, data):
+        # Flaky error `ConnectionResetError(104, 'Connection reset by peer')` may happen while posting,
+        # retry with a "backoff" algorithm on a new connection, the maximum retry times is five.
+        for i in range(POST_RETRIES):
+            try:
+                r = self._session(url).post(url, data=data, timeout=POST_TIMEOUT)
+                break
+            except Exception as e:
+                logging.debug("Got exception {}, will try to connect again".format(e))
+                self._reset_session(url)
+                time.sleep(0.01 * (i + 1))
+                if i == POST_RETRIES - 1:
+                    raise e
+
+        if r.status_code != 200:
+            raise Exception(
+                "Change routes failed: url={}, data={}, r.status_code={}, r.reason={}, r.headers={}, r.text={}".format(
+                    url, data, r.status_code, r.reason, r.headers, r.text))
+        return r
+
+    def change_routes(self, action, url, routes):
+        """Announce or withdraw routes through the exabgp HTTP API at url.
+
+        Args:
+            action (str): 'announce' or 'withdraw'.
+            url (str): URL of the exabgp HTTP API.
+            routes (iterable): (prefix, nexthop, aspath) tuples, formatted into commands one batch at a time.
+
+        Returns:
+            int: Number of routes posted.
+        """
+        commands = format_route_commands(action, routes)
+        batch_size = self._batch_size(url)
+        posted = 0
+        while True:
+            size = batch_size.size if self.adaptive else self.batch_size
+            batch = list(itertools.islice(commands, size))
+            if not batch:
+                break
+            data = {"commands": ";".join(batch)}
+            logging.debug("Posting %d routes to url=%s data=%s", len(batch), url, data)
+            start = time.time()
+            self.post(url, data)
+            latency = time.time() - start
+            self.stats.record(len(batch), latency)
+            posted += len(batch)
+            if self.adaptive:
+                new_size = batch_size.update(len(batch), latency)
+                if new_size != size:
+                    logging.debug("Batch size of url=%s changed from %d to %d, latency %.3fs",
+                                  url, size, new_size, latency)
+        return posted
+
+    def _change_routes(self, args):
+        routes, url, action = args
+        return self.change_routes(action, url, routes)
+
+    def change_routes_in_parallel(self, route_sets):
+        """Change routes of several exabgp ports concurrently, a thread per route set.
+
+        Args:
+            route_sets (list): (routes, url, action) tuples.
+
+        Returns:
+            list: Number of routes posted for every route set.
+        """
+        if not route_sets:
+            return []
+        pool = ThreadPool(processes=len(route_sets))
+        try:
+            return pool.map(self._change_routes, route_sets)
+        finally:
+            pool.close()
+            pool.join()
+
+    def report(self):
+        return self.stats.report()
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
@@ -1,7 +1,7 @@
 import re
 import six
 
-from ipaddress import ip_address, ip_network
+from ipaddress import ip_address
 from lpm import LpmDict
 
 # These subnets are excluded from FIB test
@@ -44,7 +44,7 @@ class Fib():
             port_list = [p for intf in self._next_hop for p in intf]
             return port_list
 
-    # Initialize FIB with FIB file
+    # Initialize FIB with FIB file, the routes with the same next hops share one NextHop
     def __init__(self, file_path):
         self._ipv4_lpm_dict = LpmDict()
         for ip in EXCLUDE_IPV4_PREFIXES:
@@ -57,17 +57,18 @@ class Fib():
         # filter out empty lines and lines starting with '#'
         pattern = re.compile("^#.*$|^[ \t]*$")
 
+        next_hops = {}
         with open(file_path, 'r') as f:
-            for line in f.readlines():
+            for line in f:
                 if pattern.match(line):
                     continue
-                entry = line.split(' ', 1)
-                prefix = ip_network(six.text_type(entry[0]))
-                next_hop = self.NextHop(entry[1])
-                if prefix.version == 4:
-                    self._ipv4_lpm_dict[str(prefix)] = next_hop
-                elif prefix.version == 6:
-                    self._ipv6_lpm_dict[str(prefix)] = next_hop
+                prefix, next_hop = line.split(' ', 1)
+                if next_hop not in next_hops:
+                    next_hops[next_hop] = self.NextHop(next_hop)
+                if ':' in prefix:
+                    self._ipv6_lpm_dict[prefix] = next_hops[next_hop]
+                else:
+                    self._ipv4_lpm_dict[prefix] = next_hops[next_hop]
 
     def __getitem__(self, ip):
         ip = ip_address(six.text_type(ip))
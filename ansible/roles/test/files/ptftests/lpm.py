@@ -1,9 +1,17 @@
 import random
 import six
+import socket
 
-from ipaddress import ip_address, ip_network
+from array import array
+from collections.abc import Sequence
+from ipaddress import IPv4Address, IPv6Address
 from SubnetTree import SubnetTree
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 '''
 LpmDict is a class used in FIB test for LPM and IP segmentation.
 
@@ -14,17 +22,25 @@ segments from start to end according to the prefixes (networks) it reads.
 
 Initially, the whole IP space contains only one range. After inserting
 prefixes, the IP space is segmented into multiple ranges. The ranges()
-function returns all ranges in the LpmDict with a list of IpIntervals. The
+function returns all ranges in the LpmDict with a sequence of IpIntervals. The
 sub-class IpInterval then could be used to get the first/last/random IP within
 this range. It could also check the length of the range and if an IP is within
 this range.
 
+The prefixes are kept as arrays of integers (the IPv6 ones split in high and
+low 64 bits), and ranges() computes the range boundaries from them, with NumPy
+if it is installed. The IpIntervals are only created when they are accessed,
+so a full routing table doesn't need an object per range. Deleted prefixes are
+only recorded, they are removed from the arrays at once by the next ranges().
+
 To achieve the LPM functionality, use the LpmDict as a dictionary and use
 [] operator to get the corresponding value using the key (IP).
 
 Please check the test_lpm.py file to see the details of how this class works.
 '''
 
+MAX_UINT64 = (1 << 64) - 1
+
 
 class LpmDict():
     class IpInterval:
@@ -53,62 +69,136 @@ class LpmDict():
         def __str__(self):
             return str(self._start) + ' - ' + str(self._end)
 
+    class IpRanges(Sequence):
+        """Sorted ranges of an LpmDict, the IpIntervals are created when accessed."""
+
+        def __init__(self, high, low, address_class, max_address):
+            # The boundaries are low if high is None, (high << 64) | low otherwise
+            self._high = high
+            self._low = low
+            self._address_class = address_class
+            self._max_address = max_address
+
+        def _boundary(self, index):
+            if self._high is None:
+                return int(self._low[index])
+            return (int(self._high[index]) << 64) | int(self._low[index])
+
+        def __len__(self):
+            return len(self._low)
+
+        def __getitem__(self, index):
+            if isinstance(index, slice):
+                return [self[i] for i in range(*index.indices(len(self)))]
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError('range index out of range')
+            end = self._boundary(index + 1) - 1 if index + 1 < len(self) else self._max_address
+            return LpmDict.IpInterval(self._address_class(self._boundary(index)), self._address_class(end))
+
     def __init__(self, ipv4=True):
         self._ipv4 = ipv4
-        self._prefix_set = set()
+        self._family = socket.AF_INET if ipv4 else socket.AF_INET6
+        self._bits = 32 if ipv4 else 128
+        self._address_class = IPv4Address if ipv4 else IPv6Address
         self._subnet_tree = SubnetTree()
-        # 0.0.0.0 is a non-routable meta-address that needs to be skipped
-        self._boundaries = {ip_address(u'0.0.0.0'): 1} if ipv4 else {
-            ip_address(u'::'): 1}
+        # First addresses and lengths of the prefixes, except the default route
+        self._starts_high = array('Q')
+        self._starts_low = array('Q')
+        self._prefixlens = array('B')
+        # (first address, length) of the prefixes deleted since the last ranges()
+        self._deleted = set()
+
+    def _parse(self, key):
+        """Return the first address as an integer and the length of prefix key, which must be a network."""
+        address, _, prefixlen = six.text_type(key).partition('/')
+        try:
+            start = int.from_bytes(socket.inet_pton(self._family, address), 'big')
+            prefixlen = int(prefixlen) if prefixlen else self._bits
+        except (OSError, ValueError):
+            raise ValueError('%r does not appear to be an IPv%d network' % (key, 4 if self._ipv4 else 6))
+        if not 0 <= prefixlen <= self._bits or start & ((1 << (self._bits - prefixlen)) - 1):
+            raise ValueError('%r is not a valid IPv%d network' % (key, 4 if self._ipv4 else 6))
+        return start, prefixlen
 
     def __setitem__(self, key, value):
-        prefix = ip_network(six.text_type(key))
-        # add the current key to self._prefix_set only when it is not the default route and it is not a duplicate key
-        if prefix.prefixlen and key not in self._prefix_set:
-            boundary = prefix[0]
-            self._boundaries[boundary] = self._boundaries.get(boundary, 0) + 1
-            if prefix[-1] != ip_address(u'255.255.255.255') \
-                    and prefix[-1] != ip_address(u'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'):
-                next_boundary = prefix[-1] + 1
-                self._boundaries[next_boundary] = self._boundaries.get(
-                    next_boundary, 0) + 1
-            self._prefix_set.add(key)
+        start, prefixlen = self._parse(key)
+        # the default route doesn't segment the IP space
+        if prefixlen:
+            self._deleted.discard((start, prefixlen))
+            self._starts_high.append(start >> 64)
+            self._starts_low.append(start & MAX_UINT64)
+            self._prefixlens.append(prefixlen)
         self._subnet_tree.__setitem__(key, value)
 
     def __getitem__(self, key):
         return self._subnet_tree[key]
 
     def __delitem__(self, key):
-        if '/0' not in key:
-            prefix = ip_network(six.text_type(key))
-            boundary = prefix[0]
-            next_boundary = prefix[-1] + 1
-            self._boundaries[boundary] = self._boundaries.get(boundary) - 1
-            if not self._boundaries[boundary]:
-                del self._boundaries[boundary]
-            self._boundaries[next_boundary] = self._boundaries.get(
-                next_boundary) - 1
-            if not self._boundaries[next_boundary]:
-                del self._boundaries[next_boundary]
-            self._prefix_set.remove(key)
-        self._subnet_tree.__delitem__(key)
+        start, prefixlen = self._parse(key)
+        try:
+            self._subnet_tree.__delitem__(key)
+        except RuntimeError:
+            # SubnetTree fails to find the prefix
+            raise KeyError(key)
+        if prefixlen:
+            self._deleted.add((start, prefixlen))
+
+    def _remove_deleted(self):
+        """Remove the deleted prefixes from the arrays, in one pass for all of them."""
+        if not self._deleted:
+            return
+        kept = [index for index, (high, low, prefixlen)
+                in enumerate(zip(self._starts_high, self._starts_low, self._prefixlens))
+                if ((high << 64) | low, prefixlen) not in self._deleted]
+        self._starts_high = array('Q', (self._starts_high[index] for index in kept))
+        self._starts_low = array('Q', (self._starts_low[index] for index in kept))
+        self._prefixlens = array('B', (self._prefixlens[index] for index in kept))
+        self._deleted = set()
+
+    def _boundaries(self):
+        """
+        Return the sorted boundaries of the ranges, as high and low halves for IPv6: the first address of every
+        prefix, the address after it, and 0.0.0.0 or :: which is a non-routable meta-address that needs to be skipped.
+        """
+        if np is None:
+            boundaries = {0}
+            for high, low, prefixlen in zip(self._starts_high, self._starts_low, self._prefixlens):
+                start = (high << 64) | low
+                boundaries.add(start)
+                boundaries.add(start + (1 << (self._bits - prefixlen)))
+            # the address after a prefix ending with the last address is out of the IP space
+            boundaries.discard(1 << self._bits)
+            return None, sorted(boundaries)
+
+        prefixlens = np.frombuffer(self._prefixlens, dtype=np.uint8).astype(np.uint64)
+        starts_low = np.frombuffer(self._starts_low, dtype=np.uint64)
+        zero = np.zeros(1, dtype=np.uint64)
+        if self._ipv4:
+            nexts = starts_low + (np.uint64(1) << (np.uint64(32) - prefixlens))
+            return None, np.unique(np.concatenate((zero, starts_low, nexts[nexts < 1 << 32])))
+
+        # add the prefix sizes to the addresses split in halves, the size of a prefix is in one of the halves
+        starts_high = np.frombuffer(self._starts_high, dtype=np.uint64)
+        one = np.uint64(1)
+        high_sizes = np.where(prefixlens <= 64, one << (np.uint64(64) - np.minimum(prefixlens, 64)), 0)
+        low_sizes = np.where(prefixlens <= 64, 0, one << (np.uint64(128) - np.maximum(prefixlens, 65)))
+        nexts_low = starts_low + low_sizes
+        nexts_high = starts_high + high_sizes + (nexts_low < starts_low)
+        # the address after a prefix ending with the last address wraps around to ::, already a boundary
+        highs = np.concatenate((zero, starts_high, nexts_high))
+        lows = np.concatenate((zero, starts_low, nexts_low))
+        order = np.lexsort((lows, highs))
+        highs, lows = highs[order], lows[order]
+        unique = np.ones(len(highs), dtype=bool)
+        unique[1:] = (highs[1:] != highs[:-1]) | (lows[1:] != lows[:-1])
+        return highs[unique], lows[unique]
 
     def ranges(self):
-        sorted_boundaries = sorted(self._boundaries.keys())
-        ranges = []
-        for index, boundary in enumerate(sorted_boundaries):
-            if index != len(sorted_boundaries) - 1:
-                interval = self.IpInterval(
-                    sorted_boundaries[index], sorted_boundaries[index + 1] - 1)
-            else:
-                if self._ipv4:
-                    interval = self.IpInterval(
-                        sorted_boundaries[index], ip_address(u'255.255.255.255'))
-                else:
-                    interval = self.IpInterval(sorted_boundaries[index], ip_address(
-                        u'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'))
-            ranges.append(interval)
-        return ranges
+        self._remove_deleted()
+        high, low = self._boundaries()
+        return self.IpRanges(high, low, self._address_class, (1 << self._bits) - 1)
 
     def contains(self, key):
         return key in self._subnet_tree
@@ -72,6 +72,7 @@ import ptf.packet as scapy
 import scapy.all as scapyall
 from scapy.arch.linux import attach_filter as attach_filter
 
+import dataplane_loss
 import sad_path as sp
 
 from ptf import config
@@ -223,6 +224,10 @@ class ReloadTest(BaseTest):
         self.log_fp = open(self.log_file_name, 'w')
 
         self.packets_list = []
+        # Scapy packets examined by examine_flow() instead of the sniffer capture, if set
+        self.packets = None
+        # Capture of the last sniffer run examined by examine_flow(), None until a sniffer run succeeded
+        self.sniffed_pcap = None
         self.vnet = self.test_params['vnet']
         if (self.vnet):
             self.packets_list = json.load(open(self.test_params['vnet_pkts']))
@@ -1911,8 +1916,7 @@ class ReloadTest(BaseTest):
     def sniff_in_background(self, wait=None):
         """
         This function listens on all ports, in both directions, for the TCP src=1234 dst=5000 packets, until timeout.
-        Once found, all packets are dumped to local pcap file,
-        and all packets are saved to self.packets as scapy type(pcap format).
+        Once found, all packets are dumped to local pcap file, which examine_flow() examines.
         """
         if not wait:
             wait = self.time_to_listen + self.test_params['sniff_time_incr']
@@ -1936,6 +1940,7 @@ class ReloadTest(BaseTest):
             wait (int): Duration in seconds to sniff the traffic
             sniff_filter (str): Filter that tcpdump will use to collect only relevant packets
         """
+        self.sniffed_pcap = None
         try:
             subprocess.call(["rm", "-rf", self.capture_pcap])
             self.kill_sniffer = False
@@ -1945,9 +1950,10 @@ class ReloadTest(BaseTest):
                 self.vmhost_connection.fetch(self.remote_capture_pcap, self.capture_pcap)
             else:
                 self.start_sniffer_on_ptf(self.capture_pcap, sniff_filter, wait)
-
-            self.packets = scapyall.rdpcap(self.capture_pcap)
-            self.log("Number of all packets captured: {}".format(len(self.packets)))
+            if os.path.exists(self.capture_pcap):
+                self.sniffed_pcap = self.capture_pcap
+            else:
+                self.log("Error in tcpdump_sniff: the sniffer did not create {}".format(self.capture_pcap))
         except Exception:
             traceback_msg = traceback.format_exc()
             self.log("Error in tcpdump_sniff: {}".format(traceback_msg))
@@ -2067,7 +2073,7 @@ class ReloadTest(BaseTest):
             # This is a unique (no flooded) received packet.
             # for dualtor, t1->server rcvd pkt will have src MAC as vlan_mac,
             # and server->t1 rcvd pkt will have src MAC as dut_mac
-            self.unique_id.append(int(bytes(packet[scapyall.TCP].payload)))
+            self.unique_id.add(int(bytes(packet[scapyall.TCP].payload)))
             return True
         elif packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac:
             # This is a sent packet.
@@ -2077,25 +2083,15 @@ class ReloadTest(BaseTest):
         else:
             return False
 
-    def examine_flow(self, filename=None):
+    def examine_packets(self, all_packets):
         """
-        This method examines pcap file (if given), or self.packets scapy file.
-        The method compares TCP payloads of the packets one by one (assuming all payloads are consecutive integers),
-        and the losses if found - are treated as disruptions in Dataplane forwarding.
-        All disruptions are saved to self.lost_packets dictionary, in format:
-        disrupt_start_id = (missing_packets_count, disrupt_time, disrupt_start_timestamp, disrupt_stop_timestamp)
+        This method is used by examine_flow() method when the capture can't be analyzed without scapy.
+        It filters and sorts the scapy packets, and returns the counters and disruptions of the flow
+        as dataplane_loss.FlowResult.
         """
-        if filename:
-            all_packets = scapyall.rdpcap(filename)
-        elif self.packets:
-            all_packets = self.packets
-        else:
-            self.log("Filename and self.packets are not defined.")
-            self.fails['dut'].add("Filename and self.packets are not defined")
-            return None
         # Filter out packets and remove floods:
-        # This list will contain all unique Payload ID, to filter out received floods.
-        self.unique_id = list()
+        # This set will contain all unique Payload ID, to filter out received floods.
+        self.unique_id = set()
         filtered_packets = [pkt for pkt in all_packets if
                             scapyall.TCP in pkt and
                             scapyall.ICMP not in pkt and
@@ -2124,14 +2120,11 @@ class ReloadTest(BaseTest):
         packets = sorted(filtered_packets, key=lambda packet: (
             int(bytes(packet[scapyall.TCP].payload)), float(packet.time)))
         self.lost_packets = dict()
-        self.max_disrupt, self.total_disruption = 0, 0
         sent_packets = dict()
         # Track packet id's that were neither sent or received
         missing_sent_and_received_packet_id_sequences = []
-        self.fails['dut'].add("Sniffer failed to capture any traffic")
-        self.assertTrue(packets, "Sniffer failed to capture any traffic")
-        self.fails['dut'].clear()
         prev_payload = None
+        self.disruption_start, self.disruption_stop = None, None
         if packets:
             prev_payload, prev_time = -1, 0
             sent_payload = 0
@@ -2143,7 +2136,6 @@ class ReloadTest(BaseTest):
             missed_vlan_to_t1 = 0
             missed_t1_to_vlan = 0
             flooded_pkts = []
-            self.disruption_start, self.disruption_stop = None, None
             for packet in packets:
                 if packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac:
                     # This is a sent packet - keep track of it as payload_id:timestamp.
@@ -2230,15 +2222,73 @@ class ReloadTest(BaseTest):
                             float(received_time))
                 prev_payload = received_payload
                 prev_time = received_time
-            self.log(
-                "**************** Packet received summary: ********************")
-            self.log("*********** Sent packets captured - {}".format(sent_counter))
-            self.log("*********** received packets captured - t1-to-vlan - {}".format(received_t1_to_vlan))
-            self.log("*********** received packets captured - vlan-to-t1 - {}".format(received_vlan_to_t1))
-            self.log("*********** Missed received packets - t1-to-vlan - {}".format(missed_t1_to_vlan))
-            self.log("*********** Missed received packets - vlan-to-t1 - {}".format(missed_vlan_to_t1))
-            self.log("*********** Flooded pkts - {}".format(flooded_pkts))
-            self.log("**************************************************************")
+
+        flow = dataplane_loss.FlowResult()
+        flow.packets = packets
+        flow.filtered_count = len(packets)
+        flow.lost_packets = self.lost_packets
+        flow.disruption_start, flow.disruption_stop = self.disruption_start, self.disruption_stop
+        flow.last_payload = prev_payload
+        if packets:
+            flow.sent_counter = sent_counter
+            flow.received_counter = received_counter
+            flow.received_t1_to_vlan, flow.received_vlan_to_t1 = received_t1_to_vlan, received_vlan_to_t1
+            flow.missed_t1_to_vlan, flow.missed_vlan_to_t1 = missed_t1_to_vlan, missed_vlan_to_t1
+            flow.flooded_pkts = flooded_pkts
+        flow.missing_sent_and_received_packet_id_sequences = missing_sent_and_received_packet_id_sequences
+        return flow
+
+    def examine_flow(self, filename=None):
+        """
+        This method examines pcap file (if given), or self.packets scapy file, or the capture of the last sniffer run.
+        It fails if none is given and the last sniffer run failed.
+        The method compares TCP payloads of the packets one by one (assuming all payloads are consecutive integers),
+        and the losses if found - are treated as disruptions in Dataplane forwarding.
+        All disruptions are saved to self.lost_packets dictionary, in format:
+        disrupt_start_id = (missing_packets_count, disrupt_time, disrupt_start_timestamp, disrupt_stop_timestamp)
+        """
+        if not filename and not self.packets:
+            # Never fall back to a capture left by a previous run
+            self.fails['dut'].add("Sniffer failed, there is no capture to examine")
+            self.assertTrue(self.sniffed_pcap, "Sniffer failed, there is no capture to examine")
+            self.fails['dut'].clear()
+            filename = self.sniffed_pcap
+        flow = None
+        if filename and not self.vnet:
+            # Analyze the capture without dissecting every packet with scapy
+            try:
+                flow = dataplane_loss.analyze_capture(filename, self.dut_mac, self.vlan_mac, self.log)
+            except dataplane_loss.UnsupportedCapture as e:
+                self.log("Falling back to scapy to examine {}: {}".format(filename, e))
+        if flow is None:
+            if filename:
+                all_packets = scapyall.rdpcap(filename)
+                self.log("Number of all packets captured: {}".format(len(all_packets)))
+            else:
+                all_packets = self.packets
+            flow = self.examine_packets(all_packets)
+
+        self.lost_packets = flow.lost_packets
+        self.max_disrupt, self.total_disruption = 0, 0
+        self.fails['dut'].add("Sniffer failed to capture any traffic")
+        self.assertTrue(flow.filtered_count, "Sniffer failed to capture any traffic")
+        self.fails['dut'].clear()
+        self.disruption_start, self.disruption_stop = flow.disruption_start, flow.disruption_stop
+        prev_payload = flow.last_payload
+        sent_counter = flow.sent_counter
+        received_counter = flow.received_counter
+        received_t1_to_vlan, received_vlan_to_t1 = flow.received_t1_to_vlan, flow.received_vlan_to_t1
+        missed_t1_to_vlan, missed_vlan_to_t1 = flow.missed_t1_to_vlan, flow.missed_vlan_to_t1
+        missing_sent_and_received_packet_id_sequences = flow.missing_sent_and_received_packet_id_sequences
+        self.log(
+            "**************** Packet received summary: ********************")
+        self.log("*********** Sent packets captured - {}".format(sent_counter))
+        self.log("*********** received packets captured - t1-to-vlan - {}".format(received_t1_to_vlan))
+        self.log("*********** received packets captured - vlan-to-t1 - {}".format(received_vlan_to_t1))
+        self.log("*********** Missed received packets - t1-to-vlan - {}".format(missed_t1_to_vlan))
+        self.log("*********** Missed received packets - vlan-to-t1 - {}".format(missed_vlan_to_t1))
+        self.log("*********** Flooded pkts - {}".format(flow.flooded_pkts))
+        self.log("**************************************************************")
         self.fails['dut'].add("Sniffer failed to filter any traffic from DUT")
         self.assertTrue(received_counter,
                         "Sniffer failed to filter any traffic from DUT")
@@ -2299,11 +2349,11 @@ class ReloadTest(BaseTest):
             self.fails["dut"].add(message)
 
         self.log("Total incoming packets captured %d" % received_counter)
-        if packets:
-            filename = ('/tmp/capture_filtered.pcap' if self.logfile_suffix is None
-                        else "/tmp/capture_filtered_%s.pcap" % self.logfile_suffix)
-            scapyall.wrpcap(filename, packets)
-            self.log("Filtered pcap dumped to %s" % filename)
+        filename = ('/tmp/capture_filtered.pcap' if self.logfile_suffix is None
+                    else "/tmp/capture_filtered_%s.pcap" % self.logfile_suffix)
+        flow.write_filtered(filename)
+        flow.close()
+        self.log("Filtered pcap dumped to %s" % filename)
 
     def check_forwarding_stop(self, signal):
         self.asic_start_recording_vlan_reachability()
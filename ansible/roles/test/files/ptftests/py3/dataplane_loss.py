@@ -0,0 +1,243 @@
+"""
+Dataplane loss analysis of the advanced-reboot sniffer capture.
+
+The capture is memory-mapped and indexed by packet_capture.PacketCapture, then the Ether/IPv4/TCP fields at their
+fixed offsets and the decimal payload IDs are extracted for all packets at once with NumPy.
+Packets of any other shape (VLAN tags, IP options, padding, non-decimal payloads, ...) are dissected with scapy one
+by one, so that the packets kept are exactly the ones ReloadTest.examine_flow keeps with scapy.
+
+The disruptions are then computed over the (payload ID, timestamp) arrays sorted the way examine_flow sorts the
+packets: only the received packets which don't follow the previous one are visited in Python, everything else is
+done with vectorized passes.
+"""
+import bisect
+import datetime
+
+import scapy.all as scapyall
+
+from packet_capture import PacketCapture, UnsupportedCapture, mac_to_int, np
+from packet_capture import ETHER_DST_OFFSET, ETHER_SRC_OFFSET, TCP_SPORT_OFFSET, TCP_DPORT_OFFSET
+
+TCP_SPORT = 1234
+TCP_DPORT = 5000
+
+MAX_DIGITS = 18
+
+
+class FlowResult(object):
+    """Counters and disruptions of the examined flow, as ReloadTest.examine_flow reports them."""
+
+    def __init__(self):
+        self.filtered_count = 0
+        self.lost_packets = dict()
+        self.disruption_start, self.disruption_stop = None, None
+        self.sent_counter = 0
+        self.received_counter = 0
+        self.received_t1_to_vlan = 0
+        self.received_vlan_to_t1 = 0
+        self.missed_t1_to_vlan = 0
+        self.missed_vlan_to_t1 = 0
+        self.flooded_pkts = []
+        self.missing_sent_and_received_packet_id_sequences = []
+        self.last_payload = None
+        # Filtered packets sorted by payload and time: scapy packets or indexes of a PacketCapture
+        self.packets = None
+        self.capture = None
+
+    def write_filtered(self, filename):
+        if self.capture is not None:
+            self.capture.write_pcap(filename, self.packets)
+        else:
+            scapyall.wrpcap(filename, self.packets)
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.close()
+
+
+def _decode_payloads(capture, indexes, payloads, decoded):
+    """
+    Decode the decimal TCP payloads of the packets at indexes into payloads, and set in decoded the packets whose
+    payload could be decoded: all its bytes are digits and it's below 10**18, anything else is left to int().
+    """
+    # The payloads of the same length are decoded together, the digits of the payload IDs are the last ones
+    for chunk, rows in capture.payloads(indexes):
+        length = rows.shape[1]
+        leading = max(0, length - MAX_DIGITS)
+        powers = 10 ** np.arange(length - leading - 1, -1, -1, dtype=np.int64)
+        digits = rows - np.uint8(ord("0"))
+        ok = np.all(digits[:, :leading] == 0, axis=1) & np.all(digits[:, leading:] <= 9, axis=1)
+        payloads[chunk] = np.where(ok, digits[:, leading:].astype(np.int64) @ powers, 0)
+        decoded[chunk] = ok
+
+
+def _parse_flow(capture):
+    """
+    Return the payload IDs of the packets of capture which examine_flow keeps before removing floods,
+    and the mask of those packets.
+    """
+    count = len(capture)
+    payloads = np.zeros(count, dtype=np.int64)
+    kept = np.zeros(count, dtype=bool)
+    shaped = capture.ipv4_tcp()
+    candidates = shaped[(capture.field(TCP_SPORT_OFFSET, 2, shaped) == TCP_SPORT) &
+                        (capture.field(TCP_DPORT_OFFSET, 2, shaped) == TCP_DPORT)]
+    _decode_payloads(capture, candidates, payloads, kept)
+
+    # Whatever isn't known to be kept or dropped is dissected like examine_flow does
+    dissect = np.ones(count, dtype=bool)
+    dissect[shaped] = False
+    dissect[candidates[~kept[candidates]]] = True
+    for index in np.flatnonzero(dissect):
+        packet = capture.packet(index)
+        if scapyall.TCP not in packet or scapyall.ICMP in packet or \
+                packet[scapyall.TCP].sport != TCP_SPORT or packet[scapyall.TCP].dport != TCP_DPORT:
+            continue
+        try:
+            payload = int(bytes(packet[scapyall.TCP].payload))
+        except Exception:
+            continue
+        if not -2 ** 63 <= payload < 2 ** 63:
+            raise UnsupportedCapture("Payload ID %d is out of range" % payload)
+        payloads[index] = payload
+        kept[index] = True
+    return payloads, kept
+
+
+def analyze_capture(filename, dut_mac, vlan_mac, log):
+    """
+    Examine the sniffer capture filename the way examine_flow examines the scapy packets, and return a FlowResult.
+
+    The packets sent to the DUT have dut_mac or vlan_mac as destination, the packets received from the DUT have one of
+    them as source. Raise UnsupportedCapture if the capture has to be loaded with scapy instead.
+    """
+    capture = PacketCapture(filename)
+    log("Number of all packets captured: {}".format(len(capture)))
+    macs = [mac for mac in set([mac_to_int(dut_mac), mac_to_int(vlan_mac)]) if mac is not None]
+    payloads, kept = _parse_flow(capture)
+    kept_indexes = np.flatnonzero(kept)
+    to_dut = np.zeros(len(capture), dtype=bool)
+    from_dut = np.zeros(len(capture), dtype=bool)
+    to_dut[kept_indexes] = np.isin(capture.field(ETHER_DST_OFFSET, 6, kept_indexes), macs)
+    from_dut[kept_indexes] = np.isin(capture.field(ETHER_SRC_OFFSET, 6, kept_indexes), macs)
+
+    # Remove floods: only the first packet from the DUT of every payload ID is kept, besides the packets to the DUT
+    from_dut_indexes = np.flatnonzero(from_dut)
+    _, first = np.unique(payloads[from_dut_indexes], return_index=True)
+    unique_from_dut = np.zeros(len(capture), dtype=bool)
+    unique_from_dut[from_dut_indexes[first]] = True
+    filtered = np.flatnonzero(to_dut | unique_from_dut)
+
+    # Re-arrange packets, if delayed, by Payload ID and Timestamp (lexsort is stable as sorted() is)
+    order = filtered[np.lexsort((capture.times[filtered], payloads[filtered]))]
+    result = FlowResult()
+    result.capture = capture
+    result.packets = order
+    result.filtered_count = len(order)
+    if len(order):
+        _examine_sorted(result, payloads[order], capture.times[order], to_dut[order], log)
+    return result
+
+
+def _examine_sorted(result, payloads, times, sent, log):
+    """Compute the counters and disruptions of the filtered packets sorted by payload ID and time."""
+    sent_positions = np.flatnonzero(sent)
+    sent_payloads = payloads[sent_positions]
+    first_sent = np.ones(len(sent_payloads), dtype=bool)
+    first_sent[1:] = sent_payloads[1:] != sent_payloads[:-1]
+    last_sent = np.ones(len(sent_payloads), dtype=bool)
+    last_sent[:-1] = first_sent[1:]
+    result.sent_counter = len(sent_positions)
+    result.flooded_pkts = sent_payloads[~first_sent].tolist()
+    # Every sent payload ID with the time of its last sent packet
+    unique_sent = sent_payloads[first_sent]
+    unique_sent_times = times[sent_positions[last_sent]]
+    unique_sent_vlan_to_t1 = np.concatenate(([0], np.cumsum(unique_sent % 5 == 0)))
+
+    received_positions = np.flatnonzero(~sent)
+    received = payloads[received_positions]
+    received_times = times[received_positions]
+    result.received_counter = len(received)
+    result.received_vlan_to_t1 = int(np.count_nonzero(received % 5 == 0))
+    result.received_t1_to_vlan = result.received_counter - result.received_vlan_to_t1
+
+    # A received packet following the previous one is only remembered as the previous one,
+    # the others are examined one by one
+    follows = np.zeros(len(received), dtype=bool)
+    follows[1:] = (received[1:] - received[:-1] <= 1) & (received[1:] != 0) & (received_times[1:] != 0)
+    examined = np.flatnonzero(~follows)
+
+    received_but_not_sent_packets = []
+    prev_payload, prev_time = -1, 0
+    last_examined = -1
+    index = int(examined[0]) if len(examined) else len(received)
+    while index < len(received):
+        if index - 1 > last_examined:
+            prev_payload, prev_time = int(received[index - 1]), float(received_times[index - 1])
+        last_examined = index
+        received_payload, received_time = int(received[index]), float(received_times[index])
+        ignored = False
+        if received_payload and received_time and received_payload - prev_payload > 1:
+            position = int(received_positions[index])
+            # The sent packets with the same payload ID which are sorted before this one
+            last = int(np.searchsorted(sent_positions, position)) - 1
+            if last < 0 or payloads[sent_positions[last]] != received_payload:
+                log("Ignoring received packet with payload {}, as it was not sent".format(received_payload))
+                received_but_not_sent_packets.append(received_payload)
+                ignored = True
+            else:
+                _examine_gap(result, log, prev_payload, prev_time, received_payload, received_time,
+                             float(times[sent_positions[last]]), last + 1, index + 1, unique_sent,
+                             unique_sent_times, unique_sent_vlan_to_t1, received_but_not_sent_packets)
+        if not ignored:
+            prev_payload, prev_time = received_payload, received_time
+            next_examined = np.searchsorted(examined, index, side="right")
+            index = int(examined[next_examined]) if next_examined < len(examined) else len(received)
+        else:
+            index += 1
+    if last_examined < len(received) - 1:
+        prev_payload = int(received[-1])
+    result.last_payload = prev_payload
+
+
+def _examine_gap(result, log, prev_payload, prev_time, received_payload, received_time, received_sent_time,
+                 sent_counter, received_counter, unique_sent, unique_sent_times, unique_sent_vlan_to_t1,
+                 received_but_not_sent_packets):
+    """Account the packets missing between prev_payload and received_payload."""
+    # Packets in a row are missing, a potential disruption.
+    log("received_payload: {}, prev_payload: {}, sent_counter: {}, received_counter: {}".format(
+        received_payload, prev_payload, sent_counter, received_counter))
+    # How many packets lost in a row.
+    lost_id = (received_payload - 1) - prev_payload
+
+    # Find previous sequential sent packet that was captured
+    first = int(np.searchsorted(unique_sent, prev_payload + 1))
+    last = int(np.searchsorted(unique_sent, received_payload))
+    prev_sent_packet_time = None
+    missing_stop = received_payload
+    if first < last:
+        prev_sent_packet_time = float(unique_sent_times[first])
+        missing_stop = int(unique_sent[first])
+    missing_sent_and_received_pkt_count = (missing_stop - prev_payload - 1) - (
+        bisect.bisect_left(received_but_not_sent_packets, missing_stop) -
+        bisect.bisect_left(received_but_not_sent_packets, prev_payload + 1))
+    if missing_sent_and_received_pkt_count > 0:
+        result.missing_sent_and_received_packet_id_sequences.append(
+            str(prev_payload + 1) if missing_sent_and_received_pkt_count == 1
+            else "{}-{}".format(prev_payload + 1, received_payload - 1))
+    if prev_sent_packet_time is not None:
+        # Disruption occurred - some sent packets were not received
+
+        # How long disrupt lasted.
+        disrupt = received_sent_time - prev_sent_packet_time
+
+        # Add disrupt to the dict:
+        result.lost_packets[prev_payload] = (lost_id, disrupt, received_time - disrupt, received_time)
+        log("Disruption between packet ID %d and %d. For %.4f " % (prev_payload, received_payload, disrupt))
+        missed_vlan_to_t1 = int(unique_sent_vlan_to_t1[last] - unique_sent_vlan_to_t1[first])
+        result.missed_vlan_to_t1 += missed_vlan_to_t1
+        result.missed_t1_to_vlan += (last - first) - missed_vlan_to_t1
+        log("")
+        if not result.disruption_start:
+            result.disruption_start = datetime.datetime.fromtimestamp(float(prev_time))
+        result.disruption_stop = datetime.datetime.fromtimestamp(float(received_time))
@@ -0,0 +1,202 @@
+"""Benchmark of the FIB loading and IP range segmentation of the FIB tests.
+
+Compare time and peak memory of the legacy Fib and LpmDict (ipaddress objects for every prefix boundary and an
+IpInterval per range) with the integer-backed ones, on a generated FIB file of IPv4 and IPv6 routes. Every
+measurement runs in its own process so that the peak memory is its own, and the ranges and the next hops of random
+addresses of both are checked to be the same.
+
+Usage:
+    python3 ansible/roles/test/files/ptftests/py3/fib_benchmark.py --prefixes 1000000
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+
+import six
+
+from ipaddress import IPv6Address, ip_address, ip_network
+from SubnetTree import SubnetTree
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+import fib  # noqa: E402
+import lpm  # noqa: E402
+
+
+class LegacyLpmDict():
+
+    def __init__(self, ipv4=True):
+        self._ipv4 = ipv4
+        self._prefix_set = set()
+        self._subnet_tree = SubnetTree()
+        self._boundaries = {ip_address(u'0.0.0.0'): 1} if ipv4 else {ip_address(u'::'): 1}
+
+    def __setitem__(self, key, value):
+        prefix = ip_network(six.text_type(key))
+        if prefix.prefixlen and key not in self._prefix_set:
+            boundary = prefix[0]
+            self._boundaries[boundary] = self._boundaries.get(boundary, 0) + 1
+            if prefix[-1] != ip_address(u'255.255.255.255') \
+                    and prefix[-1] != ip_address(u'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'):
+                next_boundary = prefix[-1] + 1
+                self._boundaries[next_boundary] = self._boundaries.get(next_boundary, 0) + 1
+            self._prefix_set.add(key)
+        self._subnet_tree.__setitem__(key, value)
+
+    def __getitem__(self, key):
+        return self._subnet_tree[key]
+
+    def ranges(self):
+        sorted_boundaries = sorted(self._boundaries.keys())
+        ranges = []
+        for index, boundary in enumerate(sorted_boundaries):
+            if index != len(sorted_boundaries) - 1:
+                interval = lpm.LpmDict.IpInterval(sorted_boundaries[index], sorted_boundaries[index + 1] - 1)
+            else:
+                if self._ipv4:
+                    interval = lpm.LpmDict.IpInterval(sorted_boundaries[index], ip_address(u'255.255.255.255'))
+                else:
+                    interval = lpm.LpmDict.IpInterval(sorted_boundaries[index], ip_address(
+                        u'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'))
+            ranges.append(interval)
+        return ranges
+
+    def contains(self, key):
+        return key in self._subnet_tree
+
+
+class LegacyFib(fib.Fib):
+
+    def __init__(self, file_path):
+        self._ipv4_lpm_dict = LegacyLpmDict()
+        for ip in fib.EXCLUDE_IPV4_PREFIXES:
+            self._ipv4_lpm_dict[ip] = self.NextHop()
+
+        self._ipv6_lpm_dict = LegacyLpmDict(ipv4=False)
+        for ip in fib.EXCLUDE_IPV6_PREFIXES:
+            self._ipv6_lpm_dict[ip] = self.NextHop()
+
+        pattern = re.compile("^#.*$|^[ \t]*$")
+
+        with open(file_path, 'r') as f:
+            for line in f.readlines():
+                if pattern.match(line):
+                    continue
+                entry = line.split(' ', 1)
+                prefix = ip_network(six.text_type(entry[0]))
+                next_hop = self.NextHop(entry[1])
+                if prefix.version == 4:
+                    self._ipv4_lpm_dict[str(prefix)] = next_hop
+                elif prefix.version == 6:
+                    self._ipv6_lpm_dict[str(prefix)] = next_hop
+
+
+def generate_fib(filename, prefixes, ipv6_ratio, seed):
+    """Write a FIB file of random routes, with the default routes and some duplicated routes."""
+    rand = random.Random(seed)
+    next_hops = []
+    for _ in range(64):
+        ports = rand.sample(range(64), rand.randint(1, 8))
+        next_hops.append(" ".join("[%s]" % " ".join(str(port) for port in ports[i:i + 2])
+                                  for i in range(0, len(ports), 2)))
+    with open(filename, "w") as f:
+        f.write("# prefix    next hops\n\n0.0.0.0/0 %s\n::/0 %s\n" % (next_hops[0], next_hops[1]))
+        for index in range(prefixes):
+            if rand.random() < ipv6_ratio:
+                prefixlen = rand.choice([48, 56, 64, 64, 64, 96, 120, 127, 128])
+                address = rand.getrandbits(128) >> (128 - prefixlen) << (128 - prefixlen)
+                prefix = "%s/%d" % (IPv6Address(address), prefixlen)
+            else:
+                prefixlen = rand.choice([16, 20, 22, 24, 24, 24, 24, 26, 28, 30, 31, 32])
+                address = rand.getrandbits(32) >> (32 - prefixlen) << (32 - prefixlen)
+                prefix = "%s/%d" % (ip_address(address), prefixlen)
+            f.write("%s %s\n" % (prefix, rand.choice(next_hops)))
+            if index % 1000 == 0:
+                f.write("%s %s\n" % (prefix, rand.choice(next_hops)))
+        # prefixes ending with the last address
+        f.write("255.255.255.0/24 %s\nffff::/16 %s\n" % (next_hops[2], next_hops[3]))
+
+
+def digest(ranges):
+    sha = hashlib.sha1()
+    for ip_range in ranges:
+        sha.update(("%s %s %d\n" % (ip_range.get_first_ip(), ip_range.get_last_ip(), ip_range.length())).encode())
+    return sha.hexdigest()
+
+
+def measure(fib_class, args, queue):
+    start = time.time()
+    dut_fib = fib_class(args.fib)
+    loaded = time.time() - start
+    start = time.time()
+    ipv4_ranges, ipv6_ranges = dut_fib.ipv4_ranges(), dut_fib.ipv6_ranges()
+    ranged = time.time() - start
+    # ru_maxrss is in KB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    # Same accesses as fib_test.check_ip_ranges, the sampled ranges are the same with the same seed
+    rand = random.Random(args.seed)
+    random.seed(args.seed)
+    lookups = []
+    for ip_ranges in (ipv4_ranges, ipv6_ranges):
+        covered_ip_ranges = ip_ranges[:100] + random.sample(ip_ranges[100:], 50)
+        for ip_range in covered_ip_ranges:
+            ip = ip_range.get_first_ip()
+            lookups.append((str(ip_range), ip in dut_fib, ip in dut_fib and str(dut_fib[ip]),
+                            ip_range.contains(ip_address(ip_range.get_last_ip()))))
+    for _ in range(1000):
+        ip = str(ip_address(rand.getrandbits(32)))
+        lookups.append((ip, ip in dut_fib, ip in dut_fib and str(dut_fib[ip])))
+    queue.put((loaded, ranged, peak, len(ipv4_ranges), len(ipv6_ranges), digest(ipv4_ranges), digest(ipv6_ranges),
+               lookups))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FIB loading and IP range segmentation")
+    parser.add_argument("--fib", help="FIB file, a random one is generated if not given")
+    parser.add_argument("--prefixes", type=int, default=1000000, help="Routes of the generated FIB file")
+    parser.add_argument("--ipv6_ratio", type=float, default=0.2, help="Ratio of IPv6 routes of the generated FIB file")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated FIB file and of the lookups")
+    parser.add_argument("--skip_legacy", action="store_true", help="Don't run the legacy implementation")
+    args = parser.parse_args()
+
+    generated = None
+    if not args.fib:
+        generated = args.fib = tempfile.mkstemp(suffix=".txt")[1]
+        start = time.time()
+        generate_fib(args.fib, args.prefixes, args.ipv6_ratio, args.seed)
+        print("Generated FIB file of {} routes, {:.0f}MB in {:.1f}s".format(
+            args.prefixes, os.path.getsize(args.fib) / 1048576.0, time.time() - start))
+    try:
+        implementations = [("integer", fib.Fib)]
+        if not args.skip_legacy:
+            implementations.append(("legacy", LegacyFib))
+        context = multiprocessing.get_context("fork")
+        results = {}
+        print("{:>8} {:>8} {:>10} {:>14} {:>12} {:>12}".format(
+            "fib", "load(s)", "ranges(s)", "peak RSS(MB)", "v4 ranges", "v6 ranges"))
+        for name, fib_class in implementations:
+            queue = context.Queue()
+            process = context.Process(target=measure, args=(fib_class, args, queue))
+            process.start()
+            results[name] = queue.get()
+            process.join()
+            print("{:>8} {:>8.2f} {:>10.2f} {:>14.0f} {:>12} {:>12}".format(name, *results[name][:5]))
+
+        if "legacy" in results:
+            assert results["integer"][3:7] == results["legacy"][3:7], "Ranges differ"
+            assert results["integer"][7] == results["legacy"][7], "Lookups differ"
+    finally:
+        if generated:
+            os.remove(generated)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Columnar access to pcap and pcapng captures.
+
+PacketCapture memory-maps a capture and locates every packet in it, then the header fields which are needed are
+read for all the packets at once into NumPy arrays, instead of dissecting every packet into scapy objects. The
+packets which don't have the plain Ether/IPv4/TCP shape can still be dissected with scapy one by one.
+
+The module is used by the advanced-reboot test on the PTF host (dataplane_loss) and by the dualtor I/O of the tests
+(tests/common/dualtor), which imports it from tests/ptftests.
+"""
+import logging
+import mmap
+import struct
+
+import scapy.all as scapyall
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+LINKTYPE_ETHERNET = 1
+ETHER_TYPE_IPV4 = 0x0800
+IP_PROTO_TCP = 6
+
+# Offsets of the fields of an Ether/IPv4/TCP packet without IP and TCP options
+ETHER_DST_OFFSET = 0
+ETHER_SRC_OFFSET = 6
+ETHER_TYPE_OFFSET = 12
+IP_OFFSET = 14
+IP_SRC_OFFSET = IP_OFFSET + 12
+IP_DST_OFFSET = IP_OFFSET + 16
+TCP_OFFSET = IP_OFFSET + 20
+TCP_SPORT_OFFSET = TCP_OFFSET
+TCP_DPORT_OFFSET = TCP_OFFSET + 2
+TCP_PAYLOAD_OFFSET = TCP_OFFSET + 20
+
+PCAP_MAGICS = {
+    b"\xa1\xb2\xc3\xd4": (">", 10 ** 6),
+    b"\xd4\xc3\xb2\xa1": ("<", 10 ** 6),
+    b"\xa1\xb2\x3c\x4d": (">", 10 ** 9),
+    b"\x4d\x3c\xb2\xa1": ("<", 10 ** 9),
+}
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_IDB = 1
+PCAPNG_OBSOLETE_PB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_OPT_END = 0
+PCAPNG_OPT_IF_TSRESOL = 9
+
+# Records checked at once for having the same length, first and at most
+RUN_BATCH = 16
+MAX_RUN_BATCH = 1 << 16
+# Payload bytes read at once
+PAYLOAD_CHUNK_BYTES = 1 << 20
+# Records written at once to a pcap file
+WRITE_CHUNK_PACKETS = 1 << 14
+
+
+class UnsupportedCapture(Exception):
+    """The capture can't be read by PacketCapture, it has to be loaded with scapy."""
+
+
+class PacketCapture(object):
+    """
+    Packets of a memory-mapped pcap or pcapng file.
+
+    offsets and caplens locate the data of every packet in the file. timestamps are the packet timestamps in units
+    of resolutions per second, and times the same timestamps in seconds, as scapy reports them.
+    """
+
+    def __init__(self, filename):
+        if np is None:
+            raise UnsupportedCapture("numpy is not installed")
+        self.filename = filename
+        with open(filename, "rb") as f:
+            try:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise UnsupportedCapture("{} is empty".format(filename))
+        self.data = np.frombuffer(self.buffer, dtype=np.uint8)
+        magic = self.buffer[:4]
+        if magic in PCAP_MAGICS:
+            self._index_pcap(*PCAP_MAGICS[magic])
+        elif len(magic) == 4 and struct.unpack("<I", magic)[0] == PCAPNG_SHB:
+            self._index_pcapng()
+        else:
+            self.close()
+            raise UnsupportedCapture("{} is not a pcap or pcapng file".format(filename))
+        # timestamps below 2**53 are exact in float64, so the division is rounded once, like scapy's
+        self.times = self.timestamps.astype(np.float64) / self.resolutions.astype(np.float64)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.buffer is not None:
+            self.data = None
+            self.buffer.close()
+            self.buffer = None
+
+    def _index_pcap(self, endian, resolution):
+        buffer = self.buffer
+        size = len(buffer)
+        if size < 24:
+            raise UnsupportedCapture("Truncated pcap header")
+        linktype = struct.unpack_from(endian + "I", buffer, 20)[0]
+        if linktype != LINKTYPE_ETHERNET:
+            raise UnsupportedCapture("Unsupported pcap linktype {}".format(linktype))
+        big_endian = endian == ">"
+        unpack_caplen = struct.Struct(endian + "I").unpack_from
+        records = []
+        previous_caplen = None
+        offset = 24
+        while offset + 16 <= size:
+            caplen = unpack_caplen(buffer, offset + 8)[0]
+            if caplen != previous_caplen:
+                records.append(offset)
+                offset += 16 + caplen
+                previous_caplen = caplen
+                continue
+            # Most packets of a flow have the same length, find them without walking them one by one
+            step = 16 + caplen
+            run = _same_length_run(
+                lambda positions: _gather_uint(self.data, positions + 8, 4, big_endian) == caplen,
+                offset, step, max(1, (size - offset) // step))
+            records.append(np.arange(offset, offset + run * step, step))
+            offset += run * step
+        records = _concatenate_positions(records)
+        self.offsets = records + 16
+        # The last record is cut when the sniffer is killed, scapy keeps what is there
+        self.caplens = np.minimum(_gather_uint(self.data, records + 8, 4, big_endian).astype(np.int64),
+                                  size - self.offsets)
+        self.timestamps = _gather_uint(self.data, records, 4, big_endian) * np.uint64(resolution) + \
+            _gather_uint(self.data, records + 4, 4, big_endian)
+        self.resolutions = np.full(len(records), resolution, dtype=np.uint64)
+
+    def _index_pcapng(self):
+        buffer = self.buffer
+        size = len(buffer)
+        endian = "<" if size >= 12 and struct.unpack_from("<I", buffer, 8)[0] == PCAPNG_BYTE_ORDER_MAGIC else ">"
+        # The blocks are 32 bits aligned, walk them as 32 bits words in the byte order of the capture
+        words = np.frombuffer(buffer, dtype=endian + "u4", count=size // 4)
+        if not words.dtype.isnative:
+            words = words.astype(np.uint32)
+        block_words = memoryview(words)
+        blocks = []
+        interfaces = []
+        previous_length = None
+        count = len(block_words)
+        index = 0
+        while index + 3 <= count:
+            block_type = block_words[index]
+            block_length = block_words[index + 1]
+            if block_length & 3:
+                raise UnsupportedCapture("Unaligned pcapng block length {}".format(block_length))
+            if block_length < 12 or index + (block_length >> 2) > count:
+                break
+            if block_type == PCAPNG_EPB:
+                step = block_length >> 2
+                run = 1
+                if block_length == previous_length:
+                    # Most packets of a flow have the same length, find them without walking them one by one
+                    run = _same_length_run(
+                        lambda positions: (words[positions] == PCAPNG_EPB) & (words[positions + 1] == block_length),
+                        index, step, (count - index) // step)
+                blocks.append(np.arange(index, index + run * step, step) if run > 1 else index)
+                previous_length = block_length
+                index += run * step
+                continue
+            previous_length = None
+            if block_type == PCAPNG_IDB:
+                interfaces.append(self._read_idb(endian, index * 4 + 8, index * 4 + block_length - 4))
+            elif block_type == PCAPNG_SHB and index:
+                raise UnsupportedCapture("Multiple pcapng sections")
+            elif block_type in (PCAPNG_OBSOLETE_PB, PCAPNG_SPB):
+                raise UnsupportedCapture("Unsupported pcapng block type {}".format(block_type))
+            index += block_length >> 2
+        blocks = _concatenate_positions(blocks)
+        interface_ids = words[blocks + 2].astype(np.int64)
+        # scapy skips the packets of unknown interfaces
+        known = interface_ids < len(interfaces)
+        blocks, interface_ids = blocks[known], interface_ids[known]
+        linktypes = np.array([linktype for linktype, _ in interfaces] or [LINKTYPE_ETHERNET], dtype=np.int64)
+        if np.any(linktypes[interface_ids] != LINKTYPE_ETHERNET):
+            raise UnsupportedCapture("Unsupported pcapng linktype")
+        resolutions = np.array([resolution for _, resolution in interfaces] or [1], dtype=np.uint64)
+        self.offsets = blocks * 4 + 28
+        self.caplens = words[blocks + 5].astype(np.int64)
+        self.timestamps = (words[blocks + 3].astype(np.uint64) << np.uint64(32)) | words[blocks + 4]
+        self.resolutions = resolutions[interface_ids]
+
+    def _read_idb(self, endian, start, end):
+        """Return the linktype and the timestamp resolution of an Interface Description Block."""
+        linktype = struct.unpack_from(endian + "H", self.buffer, start)[0]
+        resolution = 10 ** 6
+        offset = start + 8
+        while offset + 4 <= end:
+            code, length = struct.unpack_from(endian + "HH", self.buffer, offset)
+            if code == PCAPNG_OPT_END:
+                break
+            if code == PCAPNG_OPT_IF_TSRESOL and length == 1 and offset + 5 <= end:
+                tsresol = self.buffer[offset + 4]
+                resolution = (2 if tsresol & 128 else 10) ** (tsresol & 127)
+                break
+            offset += 4 + length + (-length % 4)
+        if resolution > 10 ** 9:
+            raise UnsupportedCapture("Unsupported pcapng timestamp resolution {}".format(resolution))
+        return linktype, resolution
+
+    def field(self, offset, size, indexes):
+        """Return the big endian unsigned integers of size bytes at offset of the packets at indexes."""
+        return _gather_uint(self.data, self.offsets[indexes] + offset, size, True)
+
+    def ipv4_tcp(self):
+        """
+        Return the indexes of the plain Ether/IPv4/TCP packets: no VLAN tag, no IP or TCP options, not a fragment
+        and no Ethernet padding, so that their fields and TCP payload are at the offsets above.
+        """
+        indexes = np.flatnonzero(self.caplens > TCP_PAYLOAD_OFFSET)
+        ip = self.offsets[indexes] + IP_OFFSET
+        shaped = (
+            (self.field(ETHER_TYPE_OFFSET, 2, indexes) == ETHER_TYPE_IPV4) &
+            (self.data[ip] == 0x45) &
+            (_gather_uint(self.data, ip + 2, 2, True).astype(np.int64) + IP_OFFSET == self.caplens[indexes]) &
+            # Neither more fragments nor a fragment offset
+            ((_gather_uint(self.data, ip + 6, 2, True) & np.uint64(0x3fff)) == 0) &
+            (self.data[ip + 9] == IP_PROTO_TCP) &
+            ((self.data[ip + 32] >> 4) == 5)
+        )
+        return indexes[shaped]
+
+    def payloads(self, indexes, offset=TCP_PAYLOAD_OFFSET):
+        """
+        Yield the payloads from offset of the packets at indexes, grouped by length: the indexes of a group and
+        the uint8 array of their payloads, one per row.
+        """
+        lengths = self.caplens[indexes] - offset
+        for length in np.unique(lengths[lengths > 0]):
+            group = indexes[lengths == length]
+            rows = max(1, PAYLOAD_CHUNK_BYTES // int(length))
+            columns = np.arange(length)
+            for start in range(0, len(group), rows):
+                chunk = group[start:start + rows]
+                yield chunk, self.data[self.offsets[chunk, None] + offset + columns]
+
+    def sort_times(self, indexes):
+        """
+        Return the timestamps of the packets at indexes as a sort key which orders them exactly as scapy's
+        packet.time does.
+        """
+        if len(indexes) and np.all(self.resolutions[indexes] == self.resolutions[indexes[0]]):
+            return self.timestamps[indexes]
+        return self.times[indexes]
+
+    def packet(self, index):
+        """Return the scapy packet at index, as rdpcap dissects it."""
+        offset = int(self.offsets[index])
+        packet = scapyall.Ether(self.buffer[offset:offset + int(self.caplens[index])])
+        packet.time = float(self.times[index])
+        return packet
+
+    def write_pcap(self, filename, indexes):
+        """Write the packets at indexes to a microsecond pcap file, in the order of indexes."""
+        with open(filename, "wb") as f:
+            f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+            for start in range(0, len(indexes), WRITE_CHUNK_PACKETS):
+                chunk = indexes[start:start + WRITE_CHUNK_PACKETS]
+                caplens = self.caplens[chunk]
+                resolutions = self.resolutions[chunk]
+                headers = np.empty((len(chunk), 4), dtype="<u4")
+                headers[:, 0] = self.timestamps[chunk] // resolutions
+                headers[:, 1] = (self.timestamps[chunk] % resolutions) * np.uint64(10 ** 6) // resolutions
+                headers[:, 2] = caplens
+                headers[:, 3] = caplens
+                record_lengths = caplens + 16
+                record_starts = np.cumsum(record_lengths) - record_lengths
+                data_starts = np.cumsum(caplens) - caplens
+                out = np.empty(int(record_lengths.sum()), dtype=np.uint8)
+                out[record_starts[:, None] + np.arange(16)] = headers.view(np.uint8).reshape(-1, 16)
+                data_positions = np.arange(int(caplens.sum()))
+                out[data_positions + np.repeat(record_starts + 16 - data_starts, caplens)] = \
+                    self.data[data_positions + np.repeat(self.offsets[chunk] - data_starts, caplens)]
+                f.write(out.tobytes())
+
+
+def mac_to_int(mac):
+    """Return the integer of a MAC address formatted the way scapy formats it, or None if it's not the case."""
+    try:
+        value = int(mac.replace(":", ""), 16)
+    except (AttributeError, ValueError):
+        return None
+    if mac != ":".join("{:02x}".format(b) for b in struct.pack(">Q", value)[2:]):
+        return None
+    return value
+
+
+def _gather_uint(data, positions, size, big_endian):
+    """Read the unsigned integers of size bytes at positions of data."""
+    dtype = (">u{}" if big_endian else "<u{}").format(size)
+    if size in (2, 4) and not np.any(positions % size):
+        # All aligned, read them as integers of size bytes
+        return np.frombuffer(data, dtype=dtype, count=len(data) // size)[positions // size].astype(np.uint64)
+    raw = np.zeros((len(positions), 8), dtype=np.uint8)
+    columns = slice(8 - size, 8) if big_endian else slice(0, size)
+    raw[:, columns] = data[positions[:, None] + np.arange(size)]
+    return raw.view(">u8" if big_endian else "<u8").ravel().astype(np.uint64)
+
+
+def _same_length_run(same_length, start, step, limit):
+    """
+    Return how many records of step bytes or words from start, at most limit, have the length of the first one.
+
+    same_length tells which of the records at the given positions have that length. The records are checked in
+    growing batches, so that short runs aren't checked much further than their end.
+    """
+    run, batch = 1, RUN_BATCH
+    while run < limit:
+        stop = min(limit, run + batch)
+        different = np.flatnonzero(~same_length(start + np.arange(run, stop, dtype=np.int64) * step))
+        if len(different):
+            return run + int(different[0])
+        run = stop
+        batch = min(batch * 4, MAX_RUN_BATCH)
+    return run
+
+
+def _concatenate_positions(positions):
+    """Concatenate the record positions found alone or in runs."""
+    chunks = []
+    alone = []
+    for item in positions:
+        if isinstance(item, np.ndarray):
+            if alone:
+                chunks.append(np.array(alone, dtype=np.int64))
+                alone = []
+            chunks.append(item)
+        else:
+            alone.append(item)
+    if alone:
+        chunks.append(np.array(alone, dtype=np.int64))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
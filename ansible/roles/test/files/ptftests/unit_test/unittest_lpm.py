@@ -0,0 +1,194 @@
+"""Unit tests of the LPM and IP segmentation of LpmDict.
+
+Run from the root of the repository:
+    python3 -m unittest discover -s ansible/roles/test/files/ptftests/unit_test -p "unittest_*.py"
+"""
+import os
+import random
+import sys
+import unittest
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import lpm  # noqa: E402
+from lpm import LpmDict  # noqa: E402
+
+MAX_IPV4 = '255.255.255.255'
+MAX_IPV6 = 'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'
+
+
+def segmentation(prefixes, ipv4=True):
+    """(first, last) addresses of the ranges of the prefixes, segmented with ipaddress."""
+    max_address = ip_address(MAX_IPV4 if ipv4 else MAX_IPV6)
+    boundaries = {ip_address('0.0.0.0' if ipv4 else '::')}
+    for prefix in map(ip_network, prefixes):
+        if prefix.prefixlen:
+            boundaries.add(prefix[0])
+            if prefix[-1] != max_address:
+                boundaries.add(prefix[-1] + 1)
+    boundaries = sorted(boundaries)
+    return [(str(start), str(end - 1)) for start, end in zip(boundaries, boundaries[1:])] + \
+        [(str(boundaries[-1]), str(max_address))]
+
+
+def longest_match(networks, ip):
+    matches = [network for network in networks if ip_address(ip) in network]
+    return str(max(matches, key=lambda network: network.prefixlen)) if matches else None
+
+
+def random_prefixes(rnd, count, ipv4=True):
+    bits = 32 if ipv4 else 128
+    prefixes = set()
+    while len(prefixes) < count:
+        prefixlen = rnd.randint(1, bits)
+        # few distinct high bits so that prefixes overlap and nest
+        address = rnd.choice([0, rnd.getrandbits(4) << (bits - 4), (1 << bits) - 1]) | rnd.getrandbits(bits - 8)
+        network = IPv4Network if ipv4 else IPv6Network
+        prefixes.add(str(network((address >> (bits - prefixlen) << (bits - prefixlen), prefixlen))))
+    return sorted(prefixes)
+
+
+class TestLpmDict(unittest.TestCase):
+
+    def make_lpm_dict(self, prefixes, ipv4=True):
+        lpm_dict = LpmDict(ipv4=ipv4)
+        for prefix in prefixes:
+            lpm_dict[prefix] = prefix
+        return lpm_dict
+
+    def assert_ranges(self, lpm_dict, expected):
+        ranges = lpm_dict.ranges()
+        self.assertEqual([(r.get_first_ip(), r.get_last_ip()) for r in ranges], expected)
+        self.assertEqual(len(ranges), len(expected))
+        self.assertEqual([str(r) for r in ranges[-2:]], ['{} - {}'.format(*r) for r in expected[-2:]])
+
+    def assert_lookups(self, lpm_dict, prefixes):
+        networks = [ip_network(prefix) for prefix in prefixes]
+        for ip_range in lpm_dict.ranges():
+            for ip in (ip_range.get_first_ip(), ip_range.get_last_ip(), ip_range.get_random_ip()):
+                expected = longest_match(networks, ip)
+                if expected is None:
+                    self.assertFalse(lpm_dict.contains(ip))
+                else:
+                    self.assertTrue(lpm_dict.contains(ip))
+                    self.assertEqual(lpm_dict[ip], expected)
+
+    def test_empty(self):
+        self.assert_ranges(LpmDict(), [('0.0.0.0', MAX_IPV4)])
+        self.assert_ranges(LpmDict(ipv4=False), [('::', MAX_IPV6)])
+
+    def test_default_route(self):
+        lpm_dict = self.make_lpm_dict(['0.0.0.0/0', '10.0.0.0/8'])
+        self.assert_ranges(lpm_dict, [('0.0.0.0', '9.255.255.255'), ('10.0.0.0', '10.255.255.255'),
+                                      ('11.0.0.0', MAX_IPV4)])
+        self.assertEqual(lpm_dict['11.0.0.1'], '0.0.0.0/0')
+        del lpm_dict['0.0.0.0/0']
+        self.assertFalse(lpm_dict.contains('11.0.0.1'))
+        self.assert_ranges(lpm_dict, [('0.0.0.0', '9.255.255.255'), ('10.0.0.0', '10.255.255.255'),
+                                      ('11.0.0.0', MAX_IPV4)])
+
+    def test_ipv4_nested_and_overlapping_prefixes(self):
+        prefixes = ['10.0.0.0/8', '10.1.0.0/16', '10.1.0.0/24', '10.1.0.128/25', '10.1.0.255/32', '10.2.0.0/16',
+                    '10.3.0.0/16']
+        lpm_dict = self.make_lpm_dict(prefixes)
+        self.assert_ranges(lpm_dict, [
+            ('0.0.0.0', '9.255.255.255'), ('10.0.0.0', '10.0.255.255'), ('10.1.0.0', '10.1.0.127'),
+            ('10.1.0.128', '10.1.0.254'), ('10.1.0.255', '10.1.0.255'), ('10.1.1.0', '10.1.255.255'),
+            ('10.2.0.0', '10.2.255.255'), ('10.3.0.0', '10.3.255.255'), ('10.4.0.0', '10.255.255.255'),
+            ('11.0.0.0', MAX_IPV4)])
+        self.assert_lookups(lpm_dict, prefixes)
+
+    def test_ipv4_prefixes_ending_at_the_max_address(self):
+        prefixes = ['128.0.0.0/1', '255.255.255.0/24', '255.255.255.255/32']
+        lpm_dict = self.make_lpm_dict(prefixes)
+        self.assert_ranges(lpm_dict, [('0.0.0.0', '127.255.255.255'), ('128.0.0.0', '255.255.254.255'),
+                                      ('255.255.255.0', '255.255.255.254'), ('255.255.255.255', MAX_IPV4)])
+        self.assert_lookups(lpm_dict, prefixes)
+
+    def test_ipv6_prefixes(self):
+        prefixes = ['::/0', '::/1', 'fc00::/7', 'fc00::/64', 'fc00::1/128', 'fc00:0:0:1::/64', '2001:db8::/32',
+                    'ffff::/16', 'ffff:ffff:ffff:ffff::/64', MAX_IPV6 + '/128', '::ffff:0:0/96']
+        lpm_dict = self.make_lpm_dict(prefixes, ipv4=False)
+        self.assert_ranges(lpm_dict, segmentation(prefixes, ipv4=False))
+        self.assertEqual([r for r in segmentation(prefixes, ipv4=False) if r[0].startswith('fc00::')],
+                         [('fc00::', 'fc00::'), ('fc00::1', 'fc00::1'), ('fc00::2', 'fc00::ffff:ffff:ffff:ffff')])
+        self.assertEqual(segmentation(prefixes, ipv4=False)[-1], (MAX_IPV6, MAX_IPV6))
+        self.assert_lookups(lpm_dict, prefixes)
+
+    def test_ipv6_prefixes_crossing_the_64_bit_halves(self):
+        # the address after these prefixes carries from the low to the high 64 bits
+        prefixes = ['2001:db8:0:ffff:ffff:ffff:ffff:fff0/124', '2001:db8:0:ffff:8000::/65', '2001:db8:1::/63']
+        lpm_dict = self.make_lpm_dict(prefixes, ipv4=False)
+        self.assert_ranges(lpm_dict, segmentation(prefixes, ipv4=False))
+        self.assert_lookups(lpm_dict, prefixes)
+
+    def test_random_prefixes(self):
+        rnd = random.Random(0)
+        for ipv4 in (True, False):
+            prefixes = random_prefixes(rnd, 100, ipv4)
+            with self.subTest(ipv4=ipv4):
+                lpm_dict = self.make_lpm_dict(prefixes, ipv4)
+                self.assert_ranges(lpm_dict, segmentation(prefixes, ipv4))
+                self.assert_lookups(lpm_dict, prefixes)
+
+    def test_without_numpy(self):
+        rnd = random.Random(1)
+        with mock.patch.object(lpm, 'np', None):
+            for ipv4 in (True, False):
+                prefixes = random_prefixes(rnd, 100, ipv4) + ['0.0.0.0/0' if ipv4 else '::/0',
+                                                              MAX_IPV4 + '/32' if ipv4 else 'ffff::/16']
+                with self.subTest(ipv4=ipv4):
+                    lpm_dict = self.make_lpm_dict(prefixes, ipv4)
+                    self.assert_ranges(lpm_dict, segmentation(prefixes, ipv4))
+                    self.assert_lookups(lpm_dict, prefixes)
+
+    def test_delete(self):
+        prefixes = ['10.0.0.0/8', '10.1.0.0/16', '10.2.0.0/16', '255.255.255.255/32']
+        lpm_dict = self.make_lpm_dict(prefixes)
+        del lpm_dict['10.1.0.0/16']
+        del lpm_dict['255.255.255.255/32']
+        self.assertEqual(lpm_dict['10.1.0.1'], '10.0.0.0/8')
+        self.assert_ranges(lpm_dict, segmentation(['10.0.0.0/8', '10.2.0.0/16']))
+        # deleted and added again
+        lpm_dict['10.2.0.0/16'] = 'new'
+        del lpm_dict['10.2.0.0/16']
+        lpm_dict['10.2.0.0/16'] = 'again'
+        self.assertEqual(lpm_dict['10.2.0.1'], 'again')
+        self.assert_ranges(lpm_dict, segmentation(['10.0.0.0/8', '10.2.0.0/16']))
+        del lpm_dict['10.2.0.0/16']
+        self.assert_ranges(lpm_dict, segmentation(['10.0.0.0/8']))
+
+    def test_delete_random_prefixes(self):
+        rnd = random.Random(2)
+        for ipv4 in (True, False):
+            prefixes = random_prefixes(rnd, 100, ipv4)
+            with self.subTest(ipv4=ipv4):
+                lpm_dict = self.make_lpm_dict(prefixes, ipv4)
+                deleted = rnd.sample(prefixes, 30)
+                for prefix in deleted:
+                    del lpm_dict[prefix]
+                kept = sorted(set(prefixes) - set(deleted))
+                self.assert_ranges(lpm_dict, segmentation(kept, ipv4))
+                self.assert_lookups(lpm_dict, kept)
+
+    def test_delete_missing_prefix(self):
+        lpm_dict = self.make_lpm_dict(['10.0.0.0/8'])
+        for prefix in ('10.0.0.0/16', '11.0.0.0/8'):
+            with self.assertRaises(KeyError):
+                del lpm_dict[prefix]
+        del lpm_dict['10.0.0.0/8']
+        with self.assertRaises(KeyError):
+            del lpm_dict['10.0.0.0/8']
+        self.assert_ranges(lpm_dict, [('0.0.0.0', MAX_IPV4)])
+
+    def test_invalid_prefix(self):
+        lpm_dict = LpmDict()
+        for prefix in ('10.0.0.1/8', '10.0.0.0/33', 'fc00::/64', 'not an address'):
+            with self.assertRaises(ValueError):
+                lpm_dict[prefix] = prefix
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -58,6 +58,261 @@ err_start_ignore_marker = -8
 # will not be picked up by the analyzer.
 MAX_LOG_MESSAGE_LENGTH = 1000
 
+# -- Size of the blocks read when scanning a log file backwards
+READ_BLOCK_SIZE = 1024 * 1024
+
+# -- Characters which have a special meaning in a regular expression when not escaped
+REGEX_SPECIAL_CHARS = set('.^$*+?{}[]()|\\')
+REGEX_QUANTIFIER_CHARS = set('*+?{')
+# -- Escapes of a class of characters or of an empty string, each matches a single character or nothing
+REGEX_CLASS_ESCAPES = set('dDsSwWbBAZ')
+
+# -- Max number of alternatives of a regex checked literal by literal, see literal_prefilter()
+MAX_PREFILTER_ALTERNATIVES = 32
+
+
+def split_regex_alternatives(pattern):
+    '''
+    @summary: Split a regular expression on its top level alternation operator '|'.
+    '''
+    alternatives = []
+    depth = 0
+    in_class = False
+    start = 0
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            index += 2
+            continue
+        if in_class:
+            if char == ']':
+                in_class = False
+        elif char == '[':
+            in_class = True
+            # -- ']' right after '[' or '[^' is a literal member of the class
+            if pattern[index + 1:index + 2] == '^':
+                index += 1
+            if pattern[index + 1:index + 2] == ']':
+                index += 1
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            alternatives.append(pattern[start:index])
+            start = index + 1
+        index += 1
+    alternatives.append(pattern[start:])
+    return alternatives
+
+
+def required_literals(alternative):
+    '''
+    @summary: Find literal strings which must appear in any string matched by
+              a regular expression without top level alternation.
+
+    Groups and character classes are skipped, the literal runs outside of them
+    are required regardless of what the groups match. Escaped punctuation is a
+    literal, class escapes like \\d end a literal run. Other escapes, e.g. \\x41,
+    \\101 or a backreference, are not supported.
+
+    @return: List of literal strings, None if the expression is not supported.
+    '''
+    if '(?' in alternative.replace('(?:', ''):
+        # -- Inline flags, lookarounds, conditionals, etc.
+        return None
+
+    literals = []
+    current = []
+
+    def end_run(drop_last=False):
+        if drop_last and current:
+            current.pop()
+        if current:
+            literals.append(''.join(current))
+        del current[:]
+
+    index = 0
+    depth = 0
+    while index < len(alternative):
+        char = alternative[index]
+        next_char = alternative[index + 1:index + 2]
+        if char == '\\':
+            if not next_char or (next_char.isalnum() and next_char not in REGEX_CLASS_ESCAPES):
+                # -- The escape spans more than the next char, or is a backreference
+                return None
+            if depth == 0 and not next_char.isalnum():
+                current.append(next_char)
+                if alternative[index + 2:index + 3] in REGEX_QUANTIFIER_CHARS:
+                    end_run(drop_last=True)
+            elif depth == 0:
+                end_run()
+            index += 2
+            continue
+        if char == '[':
+            end_run()
+            index += 1
+            if alternative[index:index + 1] == '^':
+                index += 1
+            if alternative[index:index + 1] == ']':
+                index += 1
+            while index < len(alternative) and alternative[index] != ']':
+                index += 2 if alternative[index] == '\\' else 1
+            index += 1
+            continue
+        if char == '{':
+            # -- Skip the repetition counts, the quantified char is not required
+            end_run(drop_last=True)
+            closing = alternative.find('}', index)
+            index = len(alternative) if closing < 0 else closing + 1
+            continue
+        if char == '(':
+            end_run()
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth < 0:
+                return None
+        elif depth == 0:
+            if char in REGEX_SPECIAL_CHARS:
+                end_run(drop_last=char in REGEX_QUANTIFIER_CHARS)
+            elif next_char and next_char in REGEX_QUANTIFIER_CHARS:
+                current.append(char)
+                end_run(drop_last=True)
+            else:
+                current.append(char)
+        index += 1
+    end_run()
+    return literals
+
+
+def regex_literals(regex):
+    '''
+    @summary: Find literals required by each alternative of a compiled alternation
+              of regular expressions. A line can match the regex only if it
+              contains all the literals of any of the alternatives.
+
+    @param regex: compiled regular expression, or None.
+
+    @return: List of tuples of utf-8 encoded literals, one tuple per alternative.
+        None if any alternative has no required literal, so every line may match.
+        Empty list if there is no regex, so no line can match.
+    '''
+    if regex is None:
+        return []
+    if not isinstance(regex.pattern, str) or regex.flags & ~re.UNICODE:
+        return None
+
+    alternatives = set()
+    for alternative in split_regex_alternatives(regex.pattern):
+        literals = required_literals(alternative)
+        if not literals:
+            return None
+        alternatives.add(frozenset(literal.encode('utf-8') for literal in literals))
+
+    # -- An alternative requiring more literals than another one is redundant
+    return sorted(tuple(sorted(literals)) for literals in alternatives
+                  if not any(other < literals for other in alternatives))
+
+
+def literals_regex(literals):
+    '''
+    @summary: Compile literals into a bytes regex of plain literals, which never
+              backtracks and is much cheaper than the regex they come from.
+    '''
+    return re.compile(b'|'.join(re.escape(literal) for literal in literals))
+
+
+def longest_literals(alternatives):
+    '''
+    @summary: Pick the longest literal of each alternative, see regex_literals().
+    '''
+    return sorted(set(max(literals, key=len) for literals in alternatives))
+
+
+def literal_prefilter(alternatives):
+    '''
+    @summary: Return function checking whether a line contains all the literals
+              of any alternative, see regex_literals().
+
+    With many alternatives, checking the literals costs about as much as the
+    regex itself, every line passes then.
+    '''
+    if alternatives is None or len(alternatives) > MAX_PREFILTER_ALTERNATIVES:
+        return lambda line: True
+    if not alternatives:
+        return lambda line: False
+
+    def _check(line):
+        for literals in alternatives:
+            for literal in literals:
+                if literal not in line:
+                    break
+            else:
+                return True
+        return False
+    return _check
+
+
+def reverse_readlines(log_file, block_size=READ_BLOCK_SIZE, line_filter=None):
+    '''
+    @summary: Yield lines of a binary file from the last to the first one.
+
+    The file is read backwards in blocks of block_size, so memory usage does not
+    depend on the size of the file. Lines are yielded as bytes with their line
+    terminator, like readlines() would return them.
+
+    @param line_filter: Compiled bytes regex. If given, only the lines in which
+        it is found are yielded. It is searched over whole blocks, lines without
+        a match cost no per-line work at all.
+    '''
+    log_file.seek(0, os.SEEK_END)
+    position = log_file.tell()
+    remainder = b''
+    while position > 0:
+        read_size = min(block_size, position)
+        position -= read_size
+        log_file.seek(position)
+        block = log_file.read(read_size) + remainder
+        # -- The first line of the block may start in the previous block
+        cut = block.find(b'\n') + 1 if position > 0 else 0
+        if position > 0 and cut == 0:
+            remainder = block
+            continue
+        remainder = block[:cut]
+        region = block[cut:]
+
+        if line_filter is None:
+            lines = region.split(b'\n')
+            # -- Content after the last line terminator, not empty only at the end of file
+            last = lines.pop()
+            if last:
+                yield last
+            for index in range(len(lines) - 1, -1, -1):
+                yield lines[index] + b'\n'
+            continue
+
+        spans = []
+        search_from = 0
+        while True:
+            match = line_filter.search(region, search_from)
+            if match is None:
+                break
+            start = region.rfind(b'\n', 0, match.start()) + 1
+            stop = region.find(b'\n', match.start())
+            stop = len(region) if stop < 0 else stop + 1
+            spans.append((start, stop))
+            search_from = stop
+        for start, stop in reversed(spans):
+            yield region[start:stop]
+
+
+def decode_line(line):
+    if line.endswith(b'\r\n'):
+        line = line[:-2] + b'\n'
+    return line.decode('utf-8', errors='replace')
+
 
 class AnsibleLogAnalyzer:
     '''
@@ -386,11 +641,11 @@ class AnsibleLogAnalyzer:
 
         ret_code = False
 
-        if ((match_messages_regex is not None) and (match_messages_regex.findall(str))):
+        if ((match_messages_regex is not None) and (match_messages_regex.search(str))):
             if (ignore_messages_regex is None):
                 ret_code = True
 
-            elif (not ignore_messages_regex.findall(str)):
+            elif (not ignore_messages_regex.search(str)):
                 self.print_diagnostic_message('matching line: %s' % str)
                 ret_code = True
 
@@ -411,7 +666,7 @@ class AnsibleLogAnalyzer:
             if (expect_messages_regex is not None) and (expect_messages_regex.match(str)):
                 ret_code = True
         else:
-            if (expect_messages_regex is not None) and (expect_messages_regex.findall(str)):
+            if (expect_messages_regex is not None) and (expect_messages_regex.search(str)):
                 ret_code = True
 
         return ret_code
@@ -451,29 +706,52 @@ class AnsibleLogAnalyzer:
         expected_lines = []
         found_start_marker = False
         found_end_marker = False
+        start_marker = self.create_start_marker().encode('utf-8')
+        end_marker = self.create_end_marker().encode('utf-8')
+        start_ignore_marker_prefix = self.start_ignore_marker_prefix.encode('utf-8')
+        end_ignore_marker_prefix = self.end_ignore_marker_prefix.encode('utf-8')
+
+        # -- Literals required by the regex, lines without any of them cannot match
+        match_literals = regex_literals(match_messages_regex)
+        expect_literals = regex_literals(expect_messages_regex)
+        match_prefilter = literal_prefilter(match_literals)
+        ignore_prefilter = literal_prefilter(regex_literals(ignore_messages_regex))
+        expect_prefilter = literal_prefilter(expect_literals)
+
         if stdin_as_input:
-            log_file = sys.stdin
+            # -- stdin cannot be read backwards
+            log_file = None
+            rev_lines = (line.encode('utf-8') for line in reversed(sys.stdin.readlines()))
         else:
-            log_file = open(log_file_path, 'r')
-
-        start_marker = self.create_start_marker()
-        end_marker = self.create_end_marker()
+            # -- Only lines with markers or literals of the regex need to be looked at
+            line_filter = None
+            if match_literals is not None and expect_literals is not None and \
+                    len(match_literals) + len(expect_literals) <= MAX_PREFILTER_ALTERNATIVES:
+                line_filter = literals_regex([start_marker, end_marker, start_ignore_marker_prefix,
+                                              end_ignore_marker_prefix] +
+                                             longest_literals(match_literals + expect_literals))
+            log_file = open(log_file_path, 'rb')
+            rev_lines = reverse_readlines(log_file, line_filter=line_filter)
+
+        if maximum_log_length is None:
+            maximum_log_length = MAX_LOG_MESSAGE_LENGTH
 
         ignore_marker_run_ids = []
-        for rev_line in reversed(log_file.readlines()):
+        for rev_line in rev_lines:
             if stdin_as_input:
                 in_analysis_range = True
             else:
                 if end_marker in rev_line:
                     self.print_diagnostic_message(
-                        'found end marker: %s' % end_marker)
+                        'found end marker: %s' % end_marker.decode('utf-8'))
                     if (found_end_marker):
                         print('ERROR: duplicate end marker found')
                         sys.exit(err_duplicate_end_marker)
                     found_end_marker = True
                     in_analysis_range = True
                     continue
-                elif self.end_ignore_marker_prefix in rev_line:
+                elif end_ignore_marker_prefix in rev_line:
+                    rev_line = decode_line(rev_line)
                     marker_run_id = rev_line.split(
                         self.end_ignore_marker_prefix)[1]
                     ignore_marker_run_ids.append(marker_run_id)
@@ -485,7 +763,8 @@ class AnsibleLogAnalyzer:
                     in_analysis_range = False
                     continue
 
-                elif self.start_ignore_marker_prefix in rev_line:
+                elif start_ignore_marker_prefix in rev_line:
+                    rev_line = decode_line(rev_line)
                     marker_run_id = ignore_marker_run_ids.pop()
                     self.print_diagnostic_message('found start ignore marker: %s'
                                                   % rev_line[rev_line.index(self.start_ignore_marker_prefix):])
@@ -496,9 +775,9 @@ class AnsibleLogAnalyzer:
                     continue
 
             if not stdin_as_input:
-                if rev_line.find(start_marker) != -1 and 'extract_log' not in rev_line:
+                if start_marker in rev_line and b'extract_log' not in rev_line:
                     self.print_diagnostic_message(
-                        'found start marker: %s' % start_marker)
+                        'found start marker: %s' % start_marker.decode('utf-8'))
                     if (found_start_marker):
                         print('ERROR: duplicate start marker found')
                         sys.exit(err_duplicate_start_marker)
@@ -506,27 +785,36 @@ class AnsibleLogAnalyzer:
 
                     if (not in_analysis_range):
                         print(
-                            ('ERROR: found start marker:%s without corresponding end marker' % rev_line))
+                            ('ERROR: found start marker:%s without corresponding end marker' % decode_line(rev_line)))
                         sys.exit(err_no_end_marker)
                     in_analysis_range = False
                     break
 
             if in_analysis_range:
+                expect_candidate = expect_prefilter(rev_line)
+                if not expect_candidate and not match_prefilter(rev_line):
+                    continue
+
                 # Skip long logs in sairedis recording since most likely
                 # they are bulk set operations for non-default routes
                 # without much insight while they are time consuming to analyze
                 # In advanced_reboot test, we need to analyze the bulk operations for mac learning
                 # So we need to allow long lines
-                if maximum_log_length is None:
-                    maximum_log_length = MAX_LOG_MESSAGE_LENGTH
-                if not check_marker and len(rev_line) > maximum_log_length:
+                line = decode_line(rev_line)
+                if not check_marker and len(line) > maximum_log_length:
                     continue
 
-                if self.line_is_expected(rev_line, expect_messages_regex):
-                    expected_lines.append(rev_line)
+                if expect_candidate and self.line_is_expected(line, expect_messages_regex):
+                    expected_lines.append(line)
+
+                elif (match_messages_regex is not None) and match_messages_regex.search(line):
+                    # -- Same criteria as line_matches(), the ignore regex only runs on lines with its literals
+                    if not (ignore_prefilter(rev_line) and ignore_messages_regex.search(line)):
+                        self.print_diagnostic_message('matching line: %s' % line)
+                        matching_lines.append(line)
 
-                elif self.line_matches(rev_line, match_messages_regex, ignore_messages_regex):
-                    matching_lines.append(rev_line)
+        if log_file is not None:
+            log_file.close()
 
         # care about the markers only if input is not stdin or no need to check start marker
         if not stdin_as_input and check_marker:
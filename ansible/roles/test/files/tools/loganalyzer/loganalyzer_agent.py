@@ -0,0 +1,204 @@
+'''
+Description:    Agent of the log analyzer executed on the DUT.
+
+                The agent is deployed once per test session next to loganalyzer.py into a directory keyed by
+                the content hash of both files. It reads a batch of requests as a JSON list from stdin, executes
+                them in order and prints a JSON list of responses on stdout, so that placing markers, extracting
+                and analyzing the logs of a test costs one round trip to the DUT instead of a copy and an
+                execution of loganalyzer.py per step. Only the matched lines are returned by 'analyze'.
+
+Usage:          echo '[{"action": "add_marker", "kind": "start", "run_id": "test_1"}]' | \
+                    python loganalyzer_agent.py
+
+Request:        {"action": <action>, "always": <bool>, <arguments of the action>}
+                Requests following a failed request are skipped, unless they are flagged with "always".
+
+Response:       {"action": <action>, "failed": <bool>, "skipped": <bool>, "msg": <error>, "elapsed": <seconds>,
+                 "result": <result of the action>}
+'''
+
+import gzip
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import traceback
+
+from loganalyzer import AnsibleLogAnalyzer
+
+# -- Name of the agent, found in the lines logged by ansible when it runs the agent
+AGENT_NAME = 'loganalyzer_agent'
+# -- Wait of the running logrotate when disabling logrotate, same values as DisableLogrotateCronContext
+LOGROTATE_WAIT_TIMEOUT = 60
+LOGROTATE_POLLING_INTERVAL = 5
+
+
+def run_command(cmd):
+    '''
+    @summary: Run a shell command ignoring its failure, return its exit code.
+    '''
+    with open(os.devnull, 'w') as devnull:
+        return subprocess.call(cmd, shell=True, stdout=devnull, stderr=devnull)
+
+
+def disable_logrotate(request):
+    '''
+    @summary: Disable logrotate cron task / systemd timer and wait for the running logrotate to finish.
+    '''
+    run_command("systemctl stop logrotate.timer")
+    run_command("sed -i 's/^/#/g' /etc/cron.d/logrotate")
+    end = time.time() + LOGROTATE_WAIT_TIMEOUT
+    while time.time() < end:
+        if run_command("pgrep -f logrotate") != 0:
+            return True
+        time.sleep(LOGROTATE_POLLING_INTERVAL)
+    return False
+
+
+def restore_logrotate(request):
+    '''
+    @summary: Restore logrotate cron task and systemd timer.
+    '''
+    run_command("sed -i 's/^#//g' /etc/cron.d/logrotate")
+    run_command("systemctl start logrotate.timer")
+    return True
+
+
+def add_marker(request):
+    '''
+    @summary: Place a start/end/start_ignore/end_ignore marker into syslog and the given log files.
+    '''
+    analyzer = AnsibleLogAnalyzer(request["run_id"], False)
+    kind = request["kind"]
+    marker = {
+        "start": analyzer.create_start_marker,
+        "end": analyzer.create_end_marker,
+        "start_ignore": analyzer.create_start_ignore_marker,
+        "end_ignore": analyzer.create_end_ignore_marker,
+    }[kind]()
+    analyzer.place_marker(request.get("logs", []), marker, wait_for_marker=(kind != "start"))
+    return marker
+
+
+def list_log_files(directory, file_prefix):
+    '''
+    @summary: Log files starting with 'file_prefix', from the newest to the oldest one, e.g. syslog, syslog.1,
+              syslog.2.gz. Same order as the extract_log module.
+    '''
+    def rotation_number(filename):
+        numbers = re.findall(r'\d+', filename)
+        return int(numbers[0]) if numbers else 0
+    return sorted([filename for filename in os.listdir(directory) if filename.startswith(file_prefix)],
+                  key=rotation_number)
+
+
+def open_log_file(path):
+    if 'gz' in path:
+        return gzip.open(path, mode='rt')
+    return open(path)
+
+
+def is_start_line(line, start_string):
+    '''
+    @summary: Check whether the line is the start marker. The lines logged by ansible when it runs the extract_log
+              module or the agent contain the start string in their arguments, they are not markers.
+    '''
+    return start_string in line and 'extract_log' not in line and AGENT_NAME not in line
+
+
+def extract(request):
+    '''
+    @summary: Combine the rotated log files into 'target_filename', from the first line containing 'start_string' in
+              the newest file containing it, like the extract_log module does.
+    '''
+    directory = request["directory"]
+    start_string = request["start_string"]
+    filenames = list_log_files(directory, request["file_prefix"])
+
+    start_file = None
+    for index, filename in enumerate(filenames):
+        with open_log_file(os.path.join(directory, filename)) as log_file:
+            if any(is_start_line(line, start_string) for line in log_file):
+                start_file = index
+                break
+    if start_file is None:
+        raise Exception("{} was not found in {}".format(start_string, directory))
+
+    copied = 0
+    with open(request["target_filename"], 'w') as target:
+        for index in range(start_file, -1, -1):
+            with open_log_file(os.path.join(directory, filenames[index])) as log_file:
+                lines = log_file
+                if index == start_file:
+                    lines = itertools.dropwhile(lambda line: not is_start_line(line, start_string), log_file)
+                for line in lines:
+                    target.write(line)
+                    copied += 1
+    return copied
+
+
+def analyze(request):
+    '''
+    @summary: Analyze the extracted log files, return <file_name, [match_lines, expect_lines]>.
+    '''
+    def compile_regex(regex_list):
+        return re.compile('|'.join(regex_list)) if regex_list else None
+
+    analyzer = AnsibleLogAnalyzer(request["run_id"], False, start_marker=request.get("start_marker"))
+    result = analyzer.analyze_file_list(request["files"],
+                                        compile_regex(request.get("match_regex")),
+                                        compile_regex(request.get("ignore_regex")),
+                                        compile_regex(request.get("expect_regex")),
+                                        maximum_log_length=request.get("maximum_log_length"))
+    for path in request["files"] if request.get("remove_files", True) else []:
+        if os.path.exists(path):
+            os.remove(path)
+    return result
+
+
+ACTIONS = {
+    "disable_logrotate": disable_logrotate,
+    "restore_logrotate": restore_logrotate,
+    "add_marker": add_marker,
+    "extract": extract,
+    "analyze": analyze,
+}
+
+
+def run_batch(requests):
+    responses = []
+    failed = False
+    for request in requests:
+        response = {"action": request.get("action"), "failed": False, "skipped": False, "msg": "",
+                    "elapsed": 0.0, "result": None}
+        if failed and not request.get("always", False):
+            response["skipped"] = True
+            responses.append(response)
+            continue
+        start = time.time()
+        try:
+            response["result"] = ACTIONS[request["action"]](request)
+        except SystemExit as err:
+            # AnsibleLogAnalyzer exits with an error code when markers are broken
+            response["failed"] = True
+            response["msg"] = "loganalyzer exited with code {}".format(err.code)
+        except Exception:
+            response["failed"] = True
+            response["msg"] = traceback.format_exc()
+        response["elapsed"] = time.time() - start
+        failed = failed or response["failed"]
+        responses.append(response)
+    return responses
+
+
+def main():
+    responses = run_batch(json.loads(sys.stdin.read()))
+    sys.stdout.write(json.dumps(responses))
+    return 1 if any(response["failed"] for response in responses) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Unit tests of the literal prefilter of the log analyzer.
+
+Run from the root of the repository:
+    python3 -m unittest discover -s ansible/roles/test/files/tools/loganalyzer/unit_test -p "unittest_*.py"
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+LOGANALYZER_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, LOGANALYZER_PATH)
+
+from loganalyzer import AnsibleLogAnalyzer, literal_prefilter, regex_literals, required_literals  # noqa: E402
+
+RUN_ID = 'unittest_loganalyzer'
+PATTERNS = [
+    r'.*orchagent.*failed',
+    r'kernel:.*\serr',
+    r'ab\d+cd',
+    r'\bword\b',
+    r'\.\*literal',
+    r'x{2}yz',
+    r'[\]]bracket',
+    r'\x41BC',
+    r'\101BC',
+    r'\u0041BC',
+    r'\U00000041BC',
+    r'\N{LATIN CAPITAL LETTER A}BC',
+    r'(A)\1BC',
+    r'(A)(B)(C)(D)(E)(F)(G)(H)(I)(J)\10X',
+    r'\0BC',
+    r'tab\tseparated',
+    r'\x41BC|.*orchagent.*failed',
+]
+LINES = [
+    'swss#orchagent: :- doTask: failed to create route',
+    'kernel: [ 12.3] err in driver',
+    'ab123cd',
+    'a word here',
+    'a .*literal here',
+    'xxyz',
+    ']bracket',
+    'ABC',
+    'AABC',
+    'ABCDEFGHIJJX',
+    '\x00BC',
+    'tab\tseparated',
+    'nothing to see',
+]
+
+
+class TestRequiredLiterals(unittest.TestCase):
+
+    def test_literals(self):
+        self.assertEqual(required_literals(r'.*orchagent.*failed'), ['orchagent', 'failed'])
+        self.assertEqual(required_literals(r'kernel:.*\serr'), ['kernel:', 'err'])
+        self.assertEqual(required_literals(r'ab\d+cd'), ['ab', 'cd'])
+        self.assertEqual(required_literals(r'\.\*literal'), ['.*literal'])
+
+    def test_unsupported_escapes(self):
+        for pattern in [r'\x41BC', r'\101BC', r'\u0041BC', r'\U00000041BC', r'\N{LATIN CAPITAL LETTER A}BC',
+                        r'(A)\1BC', r'\0BC', r'tab\tseparated', 'trailing\\']:
+            self.assertIsNone(required_literals(pattern), pattern)
+
+
+class TestPrefilterEquivalence(unittest.TestCase):
+    """The prefilters never drop a line matched by the regex."""
+
+    def test_prefilter(self):
+        for pattern in PATTERNS:
+            regex = re.compile(pattern)
+            prefilter = literal_prefilter(regex_literals(regex))
+            for line in LINES:
+                if regex.search(line):
+                    self.assertTrue(prefilter(line.encode('utf-8')), (pattern, line))
+
+    def test_analyze_file(self):
+        analyzer = AnsibleLogAnalyzer(RUN_ID, False)
+        log_dir = tempfile.mkdtemp()
+        try:
+            log_path = os.path.join(log_dir, 'syslog')
+            with open(log_path, 'w') as log_file:
+                log_file.write('Oct 17 10:00:00.000000 dut INFO {}\n'.format(analyzer.create_start_marker()))
+                log_file.writelines('Oct 17 10:00:01.000000 dut ERR {}\n'.format(line) for line in LINES)
+                log_file.write('Oct 17 10:00:02.000000 dut INFO {}\n'.format(analyzer.create_end_marker()))
+            with open(log_path) as log_file:
+                lines = list(reversed(log_file.readlines()[1:-1]))
+
+            for pattern in PATTERNS:
+                regex = re.compile(pattern)
+                # -- The regex as match regex, as ignore regex of all the lines and as expect regex
+                for match_regex, ignore_regex, expect_regex in [(regex, None, None),
+                                                                (re.compile('ERR'), regex, None),
+                                                                (None, None, regex)]:
+                    expected = ([line for line in lines if match_regex is not None and
+                                 analyzer.line_matches(line, match_regex, ignore_regex) and
+                                 not analyzer.line_is_expected(line, expect_regex)],
+                                [line for line in lines if analyzer.line_is_expected(line, expect_regex)])
+                    self.assertEqual(analyzer.analyze_file(log_path, match_regex, ignore_regex, expect_regex),
+                                     expected, pattern)
+        finally:
+            shutil.rmtree(log_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
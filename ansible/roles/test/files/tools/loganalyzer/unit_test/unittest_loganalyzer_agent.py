@@ -0,0 +1,111 @@
+"""Unit tests of the loganalyzer agent.
+
+Run from the root of the repository:
+    python3 -m unittest discover -s ansible/roles/test/files/tools/loganalyzer/unit_test -p "unittest_*.py"
+"""
+import gzip
+import json
+import locale
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+LOGANALYZER_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+LIBRARY_PATH = os.path.realpath(os.path.join(LOGANALYZER_PATH, '..', '..', '..', '..', '..', 'library'))
+sys.path.insert(0, LOGANALYZER_PATH)
+sys.path.insert(0, LIBRARY_PATH)
+
+import extract_log  # noqa: E402
+import loganalyzer_agent  # noqa: E402
+
+START = 'start-LogAnalyzer-test_1.2026-10-17-10:00:00'
+OTHER_START = 'start-LogAnalyzer-test_0.2026-10-17-09:00:00'
+START_LINE = 'Oct 17 10:00:00.100000 dut INFO logger: {}\n'.format(START)
+ERROR_LINE = 'Oct 17 10:00:01.000000 dut ERR swss#orchagent: :- doTask: Failed to create route\n'
+END_LINE = 'Oct 17 10:00:02.500000 dut INFO logger: end-LogAnalyzer-test_1.2026-10-17-10:00:00\n'
+# Logged by ansible when it runs the extraction with the start string in its arguments, after the logs of the test
+INVOCATION = '<invocation>'
+INVOCATION_LINES = {
+    'legacy': ('Oct 17 10:00:02.000000 dut INFO ansible-extract_log: Invoked with directory=/var/log '
+               'file_prefix=syslog start_string={} target_filename=/tmp/syslog\n'.format(START)),
+    'agent': ('Oct 17 10:00:02.000000 dut INFO ansible-ansible.legacy.command: Invoked with '
+              '_raw_params=python /tmp/loganalyzer_agent_0123/loganalyzer_agent.py '
+              'stdin=[{{"action": "extract", "start_string": "{}"}}]\n'.format(START)),
+}
+
+
+def setUpModule():
+    # extract_log restores the locale it reads, the C.UTF-8 locale set by python is read as en_US.UTF-8
+    locale.setlocale(locale.LC_ALL, 'C')
+
+
+class TestExtract(unittest.TestCase):
+    """The agent extracts the same lines as the extract_log module from the same logs."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        for name in INVOCATION_LINES:
+            os.mkdir(os.path.join(self.tmp_dir, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_log(self, filename, lines):
+        """Write the log file for the legacy module and for the agent, each with its own invocation line."""
+        for name, invocation_line in INVOCATION_LINES.items():
+            path = os.path.join(self.tmp_dir, name, filename)
+            with (gzip.open(path, 'wt') if filename.endswith('.gz') else open(path, 'w')) as f:
+                f.writelines(invocation_line if line == INVOCATION else line for line in lines)
+
+    def read_extracted(self, path, name):
+        with open(path) as f:
+            return [INVOCATION if line == INVOCATION_LINES[name] else line for line in f]
+
+    def extract(self):
+        """Return the lines extracted by the extract_log module and by the agent."""
+        legacy_path = os.path.join(self.tmp_dir, 'legacy.out')
+        extract_log.extract_log(os.path.join(self.tmp_dir, 'legacy'), 'syslog', START, legacy_path)
+        agent_path = os.path.join(self.tmp_dir, 'agent.out')
+        copied = loganalyzer_agent.extract({"directory": os.path.join(self.tmp_dir, 'agent'), "file_prefix": 'syslog',
+                                            "start_string": START, "target_filename": agent_path})
+        legacy_lines = self.read_extracted(legacy_path, 'legacy')
+        agent_lines = self.read_extracted(agent_path, 'agent')
+        self.assertEqual(copied, len(agent_lines))
+        self.assertEqual(agent_lines, legacy_lines)
+        return agent_lines
+
+    def test_invocation_after_test_logs(self):
+        self.write_log('syslog', [
+            'Oct 17 09:59:59.000000 dut INFO logger: before the test\n',
+            START_LINE, ERROR_LINE, INVOCATION, END_LINE,
+        ])
+        self.assertEqual(self.extract(), [START_LINE, ERROR_LINE, INVOCATION, END_LINE])
+
+    def test_rotated_logs(self):
+        # The start marker is in a rotated file, after the marker of a previous test, with NULs written by logrotate
+        self.write_log('syslog.2.gz', ['Oct 17 08:00:00.000000 dut INFO logger: {}\n'.format(START)])
+        self.write_log('syslog.1', [
+            'Oct 17 09:00:00.000000 dut INFO logger: {}\n'.format(OTHER_START),
+            '\x00\x00' + START_LINE, ERROR_LINE,
+        ])
+        self.write_log('syslog', [ERROR_LINE, INVOCATION, END_LINE])
+        self.assertEqual(self.extract(), ['\x00\x00' + START_LINE, ERROR_LINE, ERROR_LINE, INVOCATION, END_LINE])
+
+    def test_marker_logged_twice(self):
+        # The copy starts at the first marker of the newest file containing it
+        self.write_log('syslog', [START_LINE, ERROR_LINE, START_LINE, INVOCATION, END_LINE])
+        self.assertEqual(self.extract(), [START_LINE, ERROR_LINE, START_LINE, INVOCATION, END_LINE])
+
+    def test_start_string_not_found(self):
+        self.write_log('syslog', [ERROR_LINE, INVOCATION])
+        responses = loganalyzer_agent.run_batch([{"action": "extract", "directory": os.path.join(self.tmp_dir, 'agent'),
+                                                  "file_prefix": 'syslog', "start_string": START,
+                                                  "target_filename": os.path.join(self.tmp_dir, 'agent.out')}])
+        self.assertTrue(responses[0]["failed"])
+        self.assertIn("was not found", json.dumps(responses))
+
+
+if __name__ == '__main__':
+    unittest.main()
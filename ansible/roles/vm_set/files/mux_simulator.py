@@ -26,6 +26,8 @@ from flask import Flask, request, abort
 from flask.logging import default_handler
 from werkzeug.exceptions import HTTPException
 
+from simulator_metrics import Metrics
+
 UPPER_TOR = 'upper_tor'
 LOWER_TOR = 'lower_tor'
 NIC = 'nic'
@@ -36,6 +38,12 @@ DUMP_FLOW_CMD = 'ovs-ofctl --names dump-flows {}'
 DEL_FLOW_CMD = 'ovs-ofctl --names del-flows {} in_port="{}"'
 ADD_FLOW_CMD = 'ovs-ofctl --names add-flow {} in_port="{}",actions={}'
 MOD_FLOW_CMD = 'ovs-ofctl --names mod-flows {} in_port="{}",actions={}'
+BUNDLE_FLOWS_CMD = 'ovs-ofctl --names --bundle add-flows {} -'
+DUMP_BRIDGES_CMD = 'sh -s'
+DUMP_BRIDGES_SCRIPT = 'set -e; for bridge in {}; do echo "{}$bridge"; ovs-vsctl list-ports $bridge; echo "{}"; ' \
+                      'ovs-ofctl --names dump-flows $bridge; done'
+DUMP_BRIDGE_MARKER = '### bridge='
+DUMP_FLOWS_MARKER = '### flows'
 
 RANDOM = 'random'
 TOGGLE = 'toggle'
@@ -45,12 +53,15 @@ MUX_NIC_PREFIX = 'mu'      # With adaptive name, MUX NIC could be: muxy-vms21-1-
 
 OUTPUT = 'output'
 DROP = 'drop'
+RESET = 'reset'
+ACTIVE_SIDE = 'active_side'     # Action of a bulk operation setting the active side
 
 app = Flask(__name__)
 
 g_muxes = None              # Global variable holding instance of the class Muxes
 g_get_mux_counter = 0
 g_start_time = time.time()
+g_use_bundle = True         # Apply the flow changes of a request in one ovs-ofctl bundle, unless OVS cannot
 
 if sys.version_info[0] >= 3:
     unicode = str
@@ -106,11 +117,12 @@ def adaptive_name(template, vm_set, index):
     return rendered_name
 
 
-def run_cmd(cmdline):
+def run_cmd(cmdline, input=None):
     """Use subprocess to run a command line with shell=True
 
     Args:
         cmdline (string): The command to be executed.
+        input (string): The data sent to the stdin of the command.
 
     Raises:
         Exception: If return code of running command line is not zero, an exception is raised.
@@ -119,16 +131,18 @@ def run_cmd(cmdline):
         string: The stdout of running the command line.
     """
     app.logger.debug(cmdline)
+    g_metrics.count('commands')
     process = subprocess.Popen(
         shlex.split(cmdline),
         stdout=subprocess.PIPE,
         stdin=subprocess.PIPE,
         stderr=subprocess.PIPE)
-    stdout, stderr = process.communicate()
+    stdout, stderr = process.communicate(input.encode('utf-8') if input is not None else None)
     ret_code = process.returncode
 
     msg = {
         'cmd': cmdline,
+        'input': input.splitlines() if input is not None else [],
         'ret_code': ret_code,
         'stdout': stdout.decode('utf-8').splitlines(),
         'stderr': stderr.decode('utf-8').splitlines()
@@ -161,6 +175,112 @@ def config_logging(http_port):
     app.logger.removeHandler(default_handler)
 
 
+def dump_bridges(bridges):
+    """Get the ports and flows of all the bridges with a single command.
+
+    Args:
+        bridges (list): Names of the bridges.
+
+    Returns:
+        dict: The 'ovs-vsctl list-ports' and 'ovs-ofctl dump-flows' outputs of every bridge, as tuples keyed by
+            bridge name. None if the bridges could not be dumped.
+    """
+    if not bridges:
+        return {}
+    try:
+        out = run_cmd(DUMP_BRIDGES_CMD,
+                      input=DUMP_BRIDGES_SCRIPT.format(' '.join(bridges), DUMP_BRIDGE_MARKER, DUMP_FLOWS_MARKER))
+    except Exception as e:
+        app.logger.warning('Failed to dump all bridges, dump them one by one: {}'.format(repr(e)))
+        return None
+
+    dumps = {}
+    for section in out.split(DUMP_BRIDGE_MARKER)[1:]:
+        bridge, _, content = section.partition('\n')
+        ports_out, _, flows_out = content.partition(DUMP_FLOWS_MARKER + '\n')
+        dumps[bridge] = (ports_out, flows_out)
+    return dumps
+
+
+class FlowBatch(object):
+    """Flow changes of a request to a mux bridge.
+
+    The changes are applied with a single 'ovs-ofctl --bundle add-flows' command, so that they take effect atomically
+    and in one process. If the bundle fails, the changes are applied with one command per flow as before. Bundles are
+    not used any more only if they are not supported (OpenFlow 1.4 is required).
+
+    Each change may come with a function recording the new flow state of the mux, it is called only once the change
+    is applied, so that the recorded state keeps matching OVS if applying the changes fails.
+    """
+
+    def __init__(self, bridge):
+        self.bridge = bridge
+        self.changes = []
+
+    def delete(self, in_port, update=None):
+        self.changes.append(('delete', in_port, None, update))
+
+    def add(self, in_port, actions, update=None):
+        self.changes.append(('add', in_port, actions, update))
+
+    def modify(self, in_port, actions, update=None):
+        self.changes.append(('modify', in_port, actions, update))
+
+    def apply(self):
+        global g_use_bundle
+        if not self.changes:
+            return
+        changes, self.changes = self.changes, []
+        if g_use_bundle:
+            flows = []
+            for operation, in_port, actions, _ in changes:
+                flow = 'in_port="{}"'.format(in_port)
+                if actions is not None:
+                    flow += ',actions={}'.format(actions)
+                flows.append('{} {}'.format(operation, flow))
+            try:
+                run_cmd(BUNDLE_FLOWS_CMD.format(self.bridge), input='\n'.join(flows) + '\n')
+                g_metrics.count('bundles')
+                for _, _, _, update in changes:
+                    if update is not None:
+                        update()
+                return
+            except Exception as e:
+                # A failed bundle has no effect, the changes can be applied one by one
+                if bundle_unsupported(e):
+                    app.logger.warning('bridge={}, bundles are not supported, stop using bundles: {}'
+                                       .format(self.bridge, repr(e)))
+                    g_use_bundle = False
+                else:
+                    app.logger.warning('bridge={}, failed to apply flows in a bundle, apply them one by one: {}'
+                                       .format(self.bridge, repr(e)))
+        for operation, in_port, actions, update in changes:
+            if operation == 'delete':
+                run_cmd(DEL_FLOW_CMD.format(self.bridge, in_port))
+            elif operation == 'add':
+                run_cmd(ADD_FLOW_CMD.format(self.bridge, in_port, actions))
+            else:
+                run_cmd(MOD_FLOW_CMD.format(self.bridge, in_port, actions))
+            if update is not None:
+                update()
+
+
+def bundle_unsupported(error):
+    """Whether a failed 'ovs-ofctl --bundle' command failed because OVS does not support bundles.
+
+    Args:
+        error (Exception): The exception raised by run_cmd.
+
+    Returns:
+        bool: True if the bridge does not support OpenFlow 1.4 or ovs-ofctl reported an error about bundles.
+    """
+    stderr = ' '.join(error.args[0]['stderr']) if error.args and isinstance(error.args[0], dict) else str(error)
+    return 'bundle' in stderr.lower() or 'version negotiation failed' in stderr
+
+
+g_metrics = Metrics(lambda: {'use_bundle': g_use_bundle})
+
+
 # ==================================================== Models ==================================================== #
 
 class Mux(object):
@@ -169,7 +289,7 @@ class Mux(object):
     All operations related with a single mux bridge is encapsulated in this class.
     '''
 
-    def __init__(self, vm_set, port_index):
+    def __init__(self, vm_set, port_index, dump=None):
         # Flag for skipping bridge without ports attached to it.
         # Workaround for uncleaned mbr-xx bridges on server
         self.isvalid = True
@@ -189,14 +309,17 @@ class Mux(object):
 
         self._init_ports()
 
+        # The ports and flows of the bridge may have been dumped with the other bridges
+        ports_out, flows_out = dump if dump is not None else (None, None)
+
         # If the mux does not have valid ports attached, it is invalid
-        if not self._get_ports():
+        if not self._get_ports(ports_out):
             self.isvalid = False
             return
 
         # Initialize the flows configured on the mux bridge
         self._init_flows()
-        self._get_flows()
+        self._get_flows(flows_out)
 
         self.flap_counter = 0
 
@@ -217,7 +340,7 @@ class Mux(object):
         }
         self.sides = {}
 
-    def _get_ports(self):
+    def _get_ports(self, out=None):
         """Use the 'ovs-vsctl list-ports' command to get the ports attached to the mux bridge.
 
         Example bridge name: 'mbr-vms17-8-0'. In the bridge name, 'vms17-8' is vm_set. '0' is port_index.
@@ -228,10 +351,14 @@ class Mux(object):
         enp59s0f1.3272
         muxy-vms17-8-0
 
+        Args:
+            out (string): Output of the command if it was already run.
+
         Returns:
             boolean: Return False if it is not a valid mux bridge
         """
-        out = run_cmd(LIST_PORTS_CMD.format(self.bridge))
+        if out is None:
+            out = run_cmd(LIST_PORTS_CMD.format(self.bridge))
         out_lines = out.splitlines()
         if len(out_lines) != 3:
             self.error('unexpected ports, found ports:\n{}'.format(out))
@@ -292,7 +419,7 @@ class Mux(object):
             }
         }
 
-    def _get_flows(self):
+    def _get_flows(self, out=None):
         """Use the 'ovs-ofctl dump-flows' command to get the open flow details of a bridge simulating mux.
 
         Example output of the 'ovs-ofctl dump-flows' command:
@@ -306,13 +433,17 @@ class Mux(object):
         >>> re.findall(r'in_port="(\S+)"\s+actions=(\S+)', out)     # noqa: W605
         [('muxy-vms17-8-0', 'output:"enp59s0f1.3216",output:"enp59s0f1.3272"'),
          ('enp59s0f1.3216', 'output:"muxy-vms17-8-0"')]
+
+        Args:
+            out (string): Output of the command if it was already run.
         """
 
         # By default, there are only two flows per bridge:
         #   * upstream flow, PTF port (muxy-<vm_set>_<port_index>) -> both UPPER_TOR and LOWER_TOR ports
         #   * downstream flow, UPPER_TOR or LOWER_TOR port -> PTF port.
         # The current TOR port of downstream is active port
-        out = run_cmd(DUMP_FLOW_CMD.format(self.bridge))
+        if out is None:
+            out = run_cmd(DUMP_FLOW_CMD.format(self.bridge))
 
         # Parse the flows, store result in dict flows[in_port][out_port] = action
         flows = defaultdict(dict)
@@ -390,8 +521,8 @@ class Mux(object):
         """Set the active side of the mux bridge to the specified side.
 
         If the specified side is same as the current active side of bridge, no config change is required. Otherwise,
-        this method will run ovs-ofctl command to remove flow and add a new flow to switch active side. All the
-        related instance attributes are updated after open flow rules are changed.
+        this method will run ovs-ofctl command to remove flow and add a new flow to switch active side, in one bundle.
+        All the related instance attributes are updated after open flow rules are changed.
         """
         with self.lock:
             self.info('>>>>>> updating mux active side from {} to {}'.format(self.active_side, new_active_side))
@@ -411,18 +542,10 @@ class Mux(object):
 
             if len(self.flows['downstream']['out_sides']) == 1:
                 action_desc = '{}:"{}"'.format(OUTPUT, self.ports[NIC])
-                run_cmd(DEL_FLOW_CMD.format(
-                    self.bridge,
-                    self.active_port))
-                # Immediately update state after flow config changed to ensure consistency
-                self._active_standby_state_helper(None)
-                self.flows['downstream']['in_side'] = self.active_side
-                self.flows['downstream']['out_sides'] = []
-
-                run_cmd(ADD_FLOW_CMD.format(
-                    self.bridge,
-                    new_active_port,
-                    action_desc))
+                batch = FlowBatch(self.bridge)
+                batch.delete(self.active_port)
+                batch.add(new_active_port, action_desc)
+                batch.apply()
                 # Immediately update state after flow config changed to ensure consistency
                 self._active_standby_state_helper(new_active_side)
                 self.flows['downstream']['in_side'] = self.active_side
@@ -440,7 +563,7 @@ class Mux(object):
 
             self.info('updated mux active side to {} <<<<<<'.format(new_active_side))
 
-    def _update_downstream_flow(self, new_action):
+    def _update_downstream_flow(self, new_action, batch):
         self.debug('updating downstream flow, new_action={}'.format(new_action))
 
         # No action required for below scenarios
@@ -453,10 +576,10 @@ class Mux(object):
 
         if new_action == DROP:
             # Update action from OUTPUT to DROP, del-flow
-            run_cmd(DEL_FLOW_CMD.format(
-                self.bridge,
-                self.active_port))
-            self.flows['downstream']['out_sides'] = []
+            def update():
+                self.flows['downstream']['out_sides'] = []
+
+            batch.delete(self.active_port, update)
 
         else:
             # Update action from DROP to OUTPUT, add-flow
@@ -466,18 +589,16 @@ class Mux(object):
             else:
                 active_side = self.active_side
 
-            run_cmd(ADD_FLOW_CMD.format(
-                self.bridge,
-                self.ports[active_side],
-                action_desc))
-            self._active_standby_state_helper(active_side)
-            self.flows['downstream']['in_side'] = active_side
-            self.flows['downstream']['out_sides'] = [NIC]
+            def update():
+                self._active_standby_state_helper(active_side)
+                self.flows['downstream']['in_side'] = active_side
+                self.flows['downstream']['out_sides'] = [NIC]
+
+            batch.add(self.ports[active_side], action_desc, update)
 
-        self.debug('updated downstream flow, new_action={}, flows={}'
-                   .format(new_action, json.dumps(self.flows, indent=2)))
+        self.debug('staged downstream flow change, new_action={}'.format(new_action))
 
-    def _update_upstream_flow(self, new_action, out_sides=[]):
+    def _update_upstream_flow(self, new_action, batch, out_sides=[]):
         """Update upstream flow. Apply new action to sides specified in out_sides.
 
         The upstream flow has 2 output sides, to UPPER_TOR or LOWER_TOR. This is to update the action (OUTPUT or DROP)
@@ -510,42 +631,36 @@ class Mux(object):
             else:
                 operation = 'MOD-FLOW'   # Need to modify upstream flow
 
+        def update():
+            self.flows['upstream']['out_sides'] = target_out_sides
+
         if operation == 'DEL-FLOW':
-            run_cmd(DEL_FLOW_CMD.format(
-                    self.bridge,
-                    self.ports[NIC]))
-            self.flows['upstream']['out_sides'] = []
+            batch.delete(self.ports[NIC], update)
         elif operation == 'ADD-FLOW':
             action_desc = ','.join(['{}:"{}"'.format(OUTPUT, self.ports[out_side]) for out_side in target_out_sides])
-            run_cmd(ADD_FLOW_CMD.format(
-                    self.bridge,
-                    self.ports[NIC],
-                    action_desc))
-            self.flows['upstream']['out_sides'] = target_out_sides
+            batch.add(self.ports[NIC], action_desc, update)
         elif operation == 'MOD-FLOW':
             action_desc = ','.join(['{}:"{}"'.format(OUTPUT, self.ports[out_side]) for out_side in target_out_sides])
-            run_cmd(MOD_FLOW_CMD.format(
-                    self.bridge,
-                    self.ports[NIC],
-                    action_desc))
-            self.flows['upstream']['out_sides'] = target_out_sides
-        self.debug('updated upstream flow, new_action={}, out_sides={}, flows={}'
-                   .format(new_action, out_sides, json.dumps(self.flows, indent=2)))
+            batch.modify(self.ports[NIC], action_desc, update)
+        self.debug('staged upstream flow change, new_action={}, out_sides={}'.format(new_action, out_sides))
 
     def update_flows(self, new_action, out_sides):
         """
         Apply new flow action for the sides specified in out_sides.
 
-        Item in out_sides could be any of: 'nic', 'upper_tor', 'lower_tor'.
+        Item in out_sides could be any of: 'nic', 'upper_tor', 'lower_tor'. The downstream and upstream flow changes
+        are applied in one bundle, and recorded in self.flows once applied.
         """
         with self.lock:
             self.info('>>>>> calling update_flows, new_action={}, out_sides={}, current flow:\n{}'
                       .format(new_action, out_sides, json.dumps(self.flows, indent=2)))
+            batch = FlowBatch(self.bridge)
             if NIC in out_sides:
-                self._update_downstream_flow(new_action)
+                self._update_downstream_flow(new_action, batch)
             tor_sides = [out_side for out_side in out_sides if out_side != NIC]
             if len(tor_sides) > 0:
-                self._update_upstream_flow(new_action, tor_sides)
+                self._update_upstream_flow(new_action, batch, tor_sides)
+            batch.apply()
             self.info('update_flows completed, current flows:\n{} <<<<<<'.format(json.dumps(self.flows, indent=2)))
 
     def reset_flows(self):
@@ -570,10 +685,12 @@ class Muxes(object):
         self.vm_set = vm_set
         self.muxes = {}
         self.thread_pool = ThreadPool(Muxes.MUXES_CONCURRENCY)
-        for bridge in self._mux_bridges():
+        bridges = self._mux_bridges()
+        dumps = dump_bridges(bridges) or {}
+        for bridge in bridges:
             bridge_fields = bridge.split('-')
             port_index = int(bridge_fields[-1])
-            mux = Mux(vm_set, port_index)
+            mux = Mux(vm_set, port_index, dumps.get(bridge))
             if mux.isvalid:
                 self.muxes[bridge] = mux
 
@@ -613,26 +730,74 @@ class Muxes(object):
     def set_active_side(self, new_active_side, port_index=None):
         if port_index is not None:
             mux = self._port_to_mux(port_index)
-            mux.set_active_side(new_active_side)
+            with g_metrics.timed('set_active_side'):
+                mux.set_active_side(new_active_side)
             return mux.status
         else:
-            list(self.thread_pool.map(lambda args: Mux.set_active_side(*args),
-                                      [(mux, new_active_side) for mux in self.muxes.values()]))
+            with g_metrics.timed('set_active_side_all'):
+                list(self.thread_pool.map(lambda args: Mux.set_active_side(*args),
+                                          [(mux, new_active_side) for mux in self.muxes.values()]))
             return {mux.bridge: mux.status for mux in self.muxes.values()}
 
     def update_flows(self, new_action, out_sides, port_index=None):
         if port_index is not None:
             mux = self._port_to_mux(port_index)
-            mux.update_flows(new_action, out_sides)
+            with g_metrics.timed('update_flows'):
+                mux.update_flows(new_action, out_sides)
             return mux.status
         else:
-            list(self.thread_pool.map(lambda args: Mux.update_flows(*args),
-                                      [(mux, new_action, out_sides) for mux in self.muxes.values()]))
+            with g_metrics.timed('update_flows_all'):
+                list(self.thread_pool.map(lambda args: Mux.update_flows(*args),
+                                          [(mux, new_action, out_sides) for mux in self.muxes.values()]))
             return {mux.bridge: mux.status for mux in self.muxes.values()}
 
     def reset_flows(self, port_index=None):
         return self.update_flows(OUTPUT, [NIC, UPPER_TOR, LOWER_TOR], port_index=port_index)
 
+    def bulk_update(self, operations):
+        """Apply a list of operations to the muxes, concurrently for different muxes.
+
+        The operations of the same mux are applied in the order they are listed.
+
+        Args:
+            operations (list): List of validated operations, like:
+                {"port_index": 1, "action": "active_side", "active_side": "upper_tor|lower_tor|toggle|random"}
+                {"port_index": 1, "action": "output|drop", "out_sides": ["nic|upper_tor|lower_tor", ...]}
+                {"port_index": 1, "action": "reset"}
+
+        Returns:
+            dict: The status of the updated muxes, the time in seconds taken by the whole update and by each mux.
+        """
+        start = time.time()
+        mux_operations = {}
+        for operation in operations:
+            mux = self._port_to_mux(operation['port_index'])
+            mux_operations.setdefault(mux.bridge, (mux, []))[1].append(operation)
+
+        def _apply(mux_and_operations):
+            mux, operations = mux_and_operations
+            mux_start = time.time()
+            for operation in operations:
+                if operation['action'] == ACTIVE_SIDE:
+                    with g_metrics.timed('set_active_side'):
+                        mux.set_active_side(operation['active_side'])
+                elif operation['action'] == RESET:
+                    with g_metrics.timed('update_flows'):
+                        mux.update_flows(OUTPUT, [NIC, UPPER_TOR, LOWER_TOR])
+                else:
+                    with g_metrics.timed('update_flows'):
+                        mux.update_flows(operation['action'], operation['out_sides'])
+            return mux.bridge, time.time() - mux_start
+
+        mux_elapsed = dict(self.thread_pool.map(_apply, list(mux_operations.values())))
+        elapsed = time.time() - start
+        g_metrics.record('bulk_update', elapsed)
+        return {
+            'muxes': {bridge: self.muxes[bridge].status for bridge in mux_elapsed},
+            'elapsed': elapsed,
+            'mux_elapsed': mux_elapsed
+        }
+
     def get_flap_counter(self, port_index=None):
         if port_index is not None:
             mux = self._port_to_mux(port_index)
@@ -790,6 +955,49 @@ def _validate_out_sides(request):
     return data
 
 
+def _validate_operations(request):
+    """Validate the posted operations of a bulk update.
+
+    If the request is invalid, abort with 400 BadRequest. Expected data:
+        {"operations": [<operation>, <operation>, ...]}
+    where <operation> could be:
+        {"port_index": <port_index>, "action": "active_side", "active_side": "upper_tor|lower_tor|toggle|random"}
+        {"port_index": <port_index>, "action": "output|drop", "out_sides": ["nic|upper_tor|lower_tor", ...]}
+        {"port_index": <port_index>, "action": "reset"}
+
+    Args:
+        request (obj): The flask request object.
+
+    Returns:
+        dict: Return the posted data dict.
+    """
+    def _is_valid(operation):
+        if not isinstance(operation, dict) or not isinstance(operation.get('port_index'), int) \
+                or not g_muxes.has_mux(operation['port_index']):
+            return False
+        if operation.get('action') == ACTIVE_SIDE:
+            return operation.get('active_side') in [UPPER_TOR, LOWER_TOR, TOGGLE, RANDOM]
+        if operation.get('action') in [OUTPUT, DROP]:
+            return isinstance(operation.get('out_sides'), list) \
+                and all(side in [NIC, UPPER_TOR, LOWER_TOR] for side in operation['out_sides'])
+        return operation.get('action') == RESET
+
+    data = request.get_json()
+    if not data or not isinstance(data.get('operations'), list) \
+            or not all(_is_valid(operation) for operation in data['operations']):
+        msg = 'Invalid posted data, expected: {"operations": [{"port_index": <port_index>, ' \
+              '"action": "active_side|output|drop|reset", "active_side": <side>, "out_sides": [<side>, ...]}, ...]}'
+        abort(400, description='remote_addr={} method={} url={} data={} msg={}'.format(
+            request.remote_addr,
+            request.method,
+            request.url,
+            json.dumps(data),
+            msg
+        ))
+
+    return data
+
+
 @app.route('/mux/<vm_set>/<int:port_index>/<action>', methods=['POST'])
 def mux_cable_flow_update(vm_set, port_index, action):
     """Handler for changing flow action.
@@ -872,6 +1080,21 @@ def drop_flow_handler(vm_set):
     return g_muxes.update_flows('drop', data['out_sides'])
 
 
+@app.route('/mux/<vm_set>/bulk', methods=['POST'])
+def bulk_update_handler(vm_set):
+    """Handler for applying a list of operations to the muxes in one request.
+
+    The operations of different muxes are applied concurrently, see _validate_operations for the posted json data.
+
+    Returns:
+        object: Return a flask response object with the status of the updated muxes and the time taken by the update.
+    """
+    _validate_vm_set(vm_set)
+    data = _validate_operations(request)
+    app.logger.info('===== {} POST {} with {} ====='.format(request.remote_addr, request.url, json.dumps(data)))
+    return g_muxes.bulk_update(data['operations'])
+
+
 @app.route('/mux/<vm_set>/<int:port_index>/flap_counter', methods=['GET'])
 def flap_counter_port(vm_set, port_index):
     """
@@ -921,6 +1144,26 @@ def clear_flap_counter_handler(vm_set):
         return ret
 
 
+@app.route('/mux/<vm_set>/metrics', methods=['GET'])
+def metrics_handler(vm_set):
+    """Handler for retrieving the metrics of the mux simulator.
+
+    The metrics include the number of ovs commands and bundles run, and the latencies of the operations changing
+    flows, like 'set_active_side_all' for toggling all the muxes.
+    """
+    _validate_vm_set(vm_set)
+    return g_metrics.to_dict()
+
+
+@app.route('/mux/<vm_set>/clear_metrics', methods=['POST'])
+def clear_metrics_handler(vm_set):
+    """Handler for clearing the metrics of the mux simulator."""
+    _validate_vm_set(vm_set)
+    app.logger.info('===== {} POST {} ====='.format(request.remote_addr, request.url))
+    g_metrics.clear()
+    return g_metrics.to_dict()
+
+
 @app.route('/mux/<vm_set>/reload', methods=['POST'])
 def reload_muxes(vm_set):
     """Handler for reloading the mux objects
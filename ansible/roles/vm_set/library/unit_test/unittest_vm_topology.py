@@ -0,0 +1,446 @@
+"""Unit tests of the batched ip and ovs-vsctl operations of the vm_topology module.
+
+The commands of VMTopology.cmd are run by a fake host, keeping the interfaces of the host and of the PTF docker and
+the ports and flows of the OVS bridges. The batched path must leave the fake host in the same state as the per-command
+path, from the same initial state.
+
+Run from the root of the repository:
+    python3 -m unittest discover -s ansible/roles/vm_set/library/unit_test -p "unittest_*.py"
+"""
+import copy
+import json
+import os
+import re
+import shlex
+import sys
+import unittest
+from unittest import mock
+
+import ansible.module_utils
+
+LIBRARY_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+ANSIBLE_PATH = os.path.dirname(os.path.dirname(os.path.dirname(LIBRARY_PATH)))
+
+# the module utils of the repository are found by ansible when a module runs
+ansible.module_utils.__path__.append(os.path.join(ANSIBLE_PATH, 'module_utils'))
+sys.path.insert(0, LIBRARY_PATH)
+
+import vm_topology  # noqa: E402
+from vm_topology import VMTopology  # noqa: E402
+
+PID = '4242'
+VM_SET_NAME = 'vms-t0'
+
+
+class FakeHost(object):
+    """Run the ip, ifconfig, ovs-vsctl and ovs-ofctl commands of VMTopology on a model of the host."""
+
+    def __init__(self):
+        # interfaces of the host (None) and of the PTF docker (PID), name to attributes
+        self.intfs = {None: {}, PID: {}}
+        self.peers = {}
+        self.bridges = {}
+        self.flows = {}
+        self.next_port_id = 1
+        self.cmds = []
+        self.ip_batches = []
+
+    def state(self):
+        return {
+            'intfs': self.intfs,
+            'bridges': dict((bridge, set(ports)) for bridge, ports in self.bridges.items()),
+            'flows': dict((bridge, sorted(flows)) for bridge, flows in self.flows.items()),
+        }
+
+    def add_intf(self, name, ns=None, **attrs):
+        self.intfs[ns][name] = dict({'up': False, 'mtu': None}, **attrs)
+
+    def add_veth(self, name, peer, peer_ns=None):
+        self.add_intf(name)
+        self.add_intf(peer, peer_ns)
+        self.peers[name], self.peers[peer] = peer, name
+
+    def add_bridge(self, bridge, ports=()):
+        self.bridges[bridge] = {}
+        self.flows[bridge] = []
+        for port in ports:
+            self.add_port(bridge, port)
+
+    def add_port(self, bridge, port):
+        self.bridges[bridge][port] = self.next_port_id
+        self.next_port_id += 1
+
+    def cmd(self, cmdline, grep_cmd=None, retry=1, negative=False, shell=False, split_cmd=True,
+            ignore_errors=False):
+        self.cmds.append(cmdline)
+        args = shlex.split(cmdline)
+        ns = None
+        if args[:2] == ['nsenter', '-t']:
+            ns, args = args[2], args[4:]
+
+        if args[:2] == ['ifconfig', '-a']:
+            if (args[2] in self.intfs[ns]) == negative:
+                raise Exception('unexpected existence of %s' % args[2])
+            return ''
+        if args[0] == 'ifconfig':
+            self.run_ip(ns, ['link', 'set', 'dev'] + args[1:])
+            return ''
+        if args[:3] == ['ip', '-o', 'link']:
+            return ''.join('%d: %s: <BROADCAST,MULTICAST> mtu 1500\n' % (index, name)
+                           for index, name in enumerate(sorted(self.intfs[ns])))
+        if args[:2] == ['ip', '-batch']:
+            with open(args[2]) as f:
+                lines = f.read().splitlines()
+            self.ip_batches.append((ns, lines))
+            for line in lines:
+                self.run_ip(ns, line.split())
+            return ''
+        if args[0] == 'ip':
+            self.run_ip(ns, args[1:])
+            return ''
+        if args[0] == 'ovs-vsctl':
+            return self.run_ovs_vsctl(args[1:])
+        if args[0] == 'ovs-ofctl':
+            return self.run_ovs_ofctl(args[1:])
+        raise Exception('unknown command %s' % cmdline)
+
+    def run_ip(self, ns, args):
+        intfs = self.intfs[ns]
+        if args[:2] == ['link', 'add']:
+            assert args[2] not in intfs, args
+            self.add_veth(args[2], args[7])
+        elif args[:3] == ['link', 'del', 'dev']:
+            del intfs[args[3]]
+            peer = self.peers.pop(args[3], None)
+            if peer is not None:
+                del self.peers[peer]
+                for namespace_intfs in self.intfs.values():
+                    namespace_intfs.pop(peer, None)
+        elif args[:3] == ['link', 'set', 'dev'] and len(args) == 5:
+            intfs[args[3]]['up'] = args[4] == 'up'
+        elif args[:3] == ['link', 'set', 'dev']:
+            name, attr, value = args[3:6]
+            if attr == 'mtu':
+                intfs[name]['mtu'] = int(value)
+            elif attr == 'netns':
+                self.intfs[value][name] = intfs.pop(name)
+            elif attr == 'name':
+                assert value not in intfs, args
+                intfs[value] = intfs.pop(name)
+                if name in self.peers:
+                    peer = self.peers.pop(name)
+                    self.peers[value], self.peers[peer] = peer, value
+            else:
+                raise Exception('unknown ip command %s' % args)
+        elif args[:2] == ['link', 'set']:
+            intfs[args[2]]['up'] = args[3] == 'up'
+        else:
+            raise Exception('unknown ip command %s' % args)
+
+    def run_ovs_vsctl(self, args):
+        if args[0] == '--format=json':
+            if args[-1] == 'Bridge':
+                data = []
+                for bridge, ports in self.bridges.items():
+                    uuids = [['uuid', '%s-uuid' % port] for port in sorted(ports)]
+                    # ovsdb json encodes a set of one element as the element
+                    data.append([bridge, uuids[0] if len(uuids) == 1 else ['set', uuids]])
+                return json.dumps({'headings': ['name', 'ports'], 'data': data})
+            ports = [port for bridge_ports in self.bridges.values() for port in bridge_ports]
+            return json.dumps({'headings': ['_uuid', 'name'],
+                               'data': [[['uuid', '%s-uuid' % port], port] for port in ports]})
+        if args[0] == '--':
+            for operation in ' '.join(args[1:]).split(' -- '):
+                self.run_ovs_vsctl(operation.split())
+            return ''
+        if args[0] == 'list-ports':
+            return ''.join('%s\n' % port for port in sorted(self.bridges[args[1]]) if port != args[1])
+        if args[0] == 'port-to-br':
+            for bridge, ports in self.bridges.items():
+                if args[1] in ports:
+                    return bridge + '\n'
+            raise Exception('no port named %s' % args[1])
+        if args[:2] == ['--if-exists', 'del-port']:
+            self.bridges.get(args[2], {}).pop(args[3], None)
+        elif args[:2] == ['--may-exist', 'add-port']:
+            if args[3] not in self.bridges[args[2]]:
+                self.add_port(args[2], args[3])
+        elif args[:2] == ['--may-exist', 'add-br']:
+            if args[2] not in self.bridges:
+                self.add_bridge(args[2], [args[2]])
+                self.add_intf(args[2])
+        elif args[:2] == ['--if-exists', 'del-br']:
+            if self.bridges.pop(args[2], None) is not None:
+                del self.flows[args[2]]
+                del self.intfs[None][args[2]]
+        else:
+            raise Exception('unknown ovs-vsctl command %s' % args)
+        return ''
+
+    def run_ovs_ofctl(self, args):
+        bridge = args[1]
+        if args[0] == 'show':
+            return ''.join(' %d(%s): addr:00:00:00:00:00:00\n' % (port_id, port)
+                           for port, port_id in self.bridges[bridge].items() if port != bridge)
+        if args[0] == 'del-flows':
+            self.flows[bridge] = []
+        elif args[0] == 'add-flow':
+            self.flows[bridge].append(args[2])
+        elif args[0] in ('add-flows', 'replace-flows'):
+            with open(args[2]) as f:
+                flows = f.read().splitlines()
+            self.flows[bridge] = (self.flows[bridge] if args[0] == 'add-flows' else []) + flows
+        else:
+            raise Exception('unknown ovs-ofctl command %s' % args)
+        return ''
+
+
+def make_topology(fp_mtu=9216):
+    topology = VMTopology.__new__(VMTopology)
+    topology.vm_set_name = VM_SET_NAME
+    topology.pid = PID
+    topology.fp_mtu = fp_mtu
+    topology.timer = vm_topology.VMTopologyPhaseTimer()
+    return topology
+
+
+class TestVMTopologyBatch(unittest.TestCase):
+    """Test cases of the batched ip and ovs-vsctl operations of VMTopology."""
+
+    def run_on(self, host, func, *args, **kwargs):
+        with mock.patch.object(VMTopology, 'cmd', side_effect=host.cmd):
+            func(*args, **kwargs)
+        return host
+
+    def assert_same_end_state(self, host, batched, per_command):
+        """Run batched and per_command on copies of host, check they end in the same state and return the copies."""
+        batched_host = self.run_on(copy.deepcopy(host), batched)
+        per_command_host = self.run_on(copy.deepcopy(host), per_command)
+        self.assertEqual(batched_host.state(), per_command_host.state())
+        return batched_host, per_command_host
+
+    def test_ip_batch(self):
+        host = FakeHost()
+        host.add_intf('eth1')
+        host.add_intf('eth2', PID)
+        files = []
+        real_cmd = host.cmd
+
+        def cmd(cmdline, **kwargs):
+            files.append(cmdline.split()[-1])
+            return real_cmd(cmdline, **kwargs)
+        host.cmd = cmd
+
+        self.run_on(host, VMTopology.ip_batch, ['link set dev eth1 mtu 9216', 'link set eth1 up'])
+        self.run_on(host, VMTopology.ip_batch, ['link set eth2 up'], pid=PID)
+        self.run_on(host, VMTopology.ip_batch, [])
+
+        self.assertEqual(host.cmds, ['ip -batch %s' % files[0], 'nsenter -t %s -n ip -batch %s' % (PID, files[1])])
+        self.assertEqual(host.ip_batches, [(None, ['link set dev eth1 mtu 9216', 'link set eth1 up']),
+                                           (PID, ['link set eth2 up'])])
+        self.assertEqual(host.intfs, {None: {'eth1': {'up': True, 'mtu': 9216}},
+                                      PID: {'eth2': {'up': True, 'mtu': None}}})
+        self.assertFalse([name for name in files if os.path.exists(name)])
+
+        with mock.patch.object(VMTopology, 'cmd') as cmd:
+            VMTopology.ip_batch(['link set eth3 up'], netns='ns-vms-t0')
+        self.assertTrue(cmd.call_args[0][0].startswith('ip netns exec ns-vms-t0 ip -batch '))
+
+    def test_ovs_vsctl_batch(self):
+        operations = ['--may-exist add-br br-%d' % index for index in range(5)]
+        with mock.patch.object(VMTopology, 'cmd') as cmd, mock.patch.object(vm_topology, 'BATCH_MAX_OPERATIONS', 2):
+            VMTopology.ovs_vsctl_batch(operations)
+            VMTopology.ovs_vsctl_batch([])
+
+        self.assertEqual([call[0][0] for call in cmd.call_args_list], [
+            'ovs-vsctl -- --may-exist add-br br-0 -- --may-exist add-br br-1',
+            'ovs-vsctl -- --may-exist add-br br-2 -- --may-exist add-br br-3',
+            'ovs-vsctl -- --may-exist add-br br-4',
+        ])
+
+    def test_get_ovs_ports(self):
+        host = FakeHost()
+        host.add_bridge('br-a', ['br-a', 'inje-a-0', 'eth0', 'VM0100-t0'])
+        host.add_bridge('br-b', ['br-b'])
+        host.add_bridge('br-c', ['br-c', 'eth1'])
+
+        with mock.patch.object(VMTopology, 'cmd', side_effect=host.cmd):
+            ports = VMTopology.get_ovs_ports()
+
+        # the local ports of the bridges are not listed
+        self.assertEqual(ports, {'inje-a-0': 'br-a', 'eth0': 'br-a', 'VM0100-t0': 'br-a', 'eth1': 'br-c'})
+        self.assertEqual(host.cmds, ['ovs-vsctl --format=json --columns=name,ports list Bridge',
+                                     'ovs-vsctl --format=json --columns=_uuid,name list Port'])
+
+    def test_create_and_destroy_ovs_bridges(self):
+        topology = make_topology()
+        topology.vm_names = ['VM0100', 'VM0101']
+        topology.max_fp_num = 2
+        host = FakeHost()
+        host.add_bridge('br-VM0100-0', ['br-VM0100-0'])
+        host.add_intf('br-VM0100-0', up=True, mtu=9216)
+
+        batched_host, _ = self.assert_same_end_state(
+            host,
+            lambda: topology.create_ovs_bridges(['br-VM0100-0', 'br-VM0100-1', 'br-VM0101-0'], 9216),
+            lambda: [topology.create_ovs_bridge(bridge, 9216)
+                     for bridge in ['br-VM0100-0', 'br-VM0100-1', 'br-VM0101-0']])
+        self.assertEqual(batched_host.cmds[0], 'ovs-vsctl -- --may-exist add-br br-VM0100-0 -- '
+                                               '--may-exist add-br br-VM0100-1 -- --may-exist add-br br-VM0101-0')
+
+        topology.use_batch = True
+        self.run_on(batched_host, topology.destroy_bridges)
+        self.assertEqual(batched_host.cmds[-1], 'ovs-vsctl -- --if-exists del-br br-VM0100-0 -- '
+                                                '--if-exists del-br br-VM0100-1 -- --if-exists del-br br-VM0101-0 -- '
+                                                '--if-exists del-br br-VM0101-1')
+        self.assertEqual(batched_host.bridges, {})
+
+    def test_add_veth_ifs_to_docker(self):
+        topology = make_topology()
+        veth_ifs = [('inje-vms-t0-%d' % index, 'eth%d' % index) for index in range(4)]
+        stale_if = vm_topology.adaptive_temporary_interface(VM_SET_NAME, 'eth1')
+        moved_if = vm_topology.adaptive_temporary_interface(VM_SET_NAME, 'eth2')
+        host = FakeHost()
+        # eth0 is new, eth1 has a stale temporary interface, eth2 was moved but not renamed, eth3 is ready
+        host.add_veth('other-end', stale_if)
+        host.add_veth('inje-vms-t0-2', moved_if, PID)
+        host.add_veth('inje-vms-t0-3', 'eth3', PID)
+
+        batched_host, per_command_host = self.assert_same_end_state(
+            host,
+            lambda: topology.add_veth_ifs_to_docker(veth_ifs),
+            lambda: [topology.add_veth_if_to_docker(ext_if, int_if) for ext_if, int_if in veth_ifs])
+
+        t_if0 = vm_topology.adaptive_temporary_interface(VM_SET_NAME, 'eth0')
+        self.assertEqual(batched_host.ip_batches, [
+            (None, ['link del dev %s' % stale_if]),
+            (None, ['link add inje-vms-t0-0 type veth peer name %s' % t_if0,
+                    'link set dev inje-vms-t0-0 mtu 9216',
+                    'link set dev %s mtu 9216' % t_if0,
+                    'link set inje-vms-t0-0 up',
+                    'link set dev %s netns %s' % (t_if0, PID),
+                    'link add inje-vms-t0-1 type veth peer name %s' % stale_if,
+                    'link set dev inje-vms-t0-1 mtu 9216',
+                    'link set dev %s mtu 9216' % stale_if,
+                    'link set inje-vms-t0-1 up',
+                    'link set dev %s netns %s' % (stale_if, PID),
+                    'link set dev inje-vms-t0-2 mtu 9216',
+                    'link set inje-vms-t0-2 up',
+                    'link set dev inje-vms-t0-3 mtu 9216',
+                    'link set inje-vms-t0-3 up']),
+            (PID, ['link set dev %s name eth0' % t_if0,
+                   'link set eth0 up',
+                   'link set dev %s name eth1' % stale_if,
+                   'link set eth1 up',
+                   'link set dev %s mtu 9216' % moved_if,
+                   'link set dev %s name eth2' % moved_if,
+                   'link set eth2 up',
+                   'link set dev eth3 mtu 9216',
+                   'link set eth3 up']),
+        ])
+        # the interfaces are listed once in the host (again after removing stale ones) and once in the docker
+        self.assertEqual(len([cmd for cmd in batched_host.cmds if 'link show' in cmd]), 3)
+        self.assertLess(len(batched_host.cmds), len(per_command_host.cmds))
+
+    def test_add_veth_ifs_to_docker_default_mtu(self):
+        topology = make_topology(fp_mtu=vm_topology.DEFAULT_MTU)
+        veth_ifs = [('inje-vms-t0-0', 'eth0'), ('inje-vms-t0-1', 'eth1')]
+        host = FakeHost()
+        host.add_veth('inje-vms-t0-1', 'eth1', PID)
+
+        batched_host, _ = self.assert_same_end_state(
+            host,
+            lambda: topology.add_veth_ifs_to_docker(veth_ifs),
+            lambda: [topology.add_veth_if_to_docker(ext_if, int_if) for ext_if, int_if in veth_ifs])
+        self.assertFalse([line for _, lines in batched_host.ip_batches for line in lines if 'mtu' in line])
+
+    def test_add_dut_ifs_to_docker(self):
+        topology = make_topology()
+        dut_ifs = [('eth0', 'enp1s0f0'), ('eth1', 'enp1s0f1'), ('eth2', 'enp1s0f2')]
+        host = FakeHost()
+        # enp1s0f0 is in the host, enp1s0f1 was moved but not renamed, eth2 is ready
+        host.add_intf('enp1s0f0')
+        host.add_intf('enp1s0f1', PID)
+        host.add_intf('eth2', PID)
+
+        batched_host, _ = self.assert_same_end_state(
+            host,
+            lambda: topology.add_dut_ifs_to_docker(dut_ifs),
+            lambda: [topology.add_dut_if_to_docker(iface_name, dut_iface) for iface_name, dut_iface in dut_ifs])
+
+        self.assertEqual(batched_host.ip_batches, [
+            (None, ['link set dev enp1s0f0 netns %s' % PID]),
+            (PID, ['link set dev enp1s0f0 name eth0',
+                   'link set eth0 up',
+                   'link set dev enp1s0f1 name eth1',
+                   'link set eth1 up',
+                   'link set eth2 up']),
+        ])
+
+    def bind_host(self):
+        host = FakeHost()
+        host.add_bridge('br-VM0100-0', ['br-VM0100-0', 'VM0100-t0'])
+        # the injected port is left on another bridge, the DUT port isn't on any bridge yet
+        host.add_bridge('br-VM0101-0', ['br-VM0101-0', 'inje-vms-t0-0'])
+        host.flows['br-VM0100-0'] = ['table=0,in_port=1,action=drop']
+        return host
+
+    def test_bind_ovs_ports_replace_flows(self):
+        topology = make_topology()
+        for disconnect_vm in [False, True]:
+            with self.subTest(disconnect_vm=disconnect_vm):
+                def bind_ovs_ports(ovs_ports):
+                    topology.bind_ovs_ports('br-VM0100-0', 'enp1s0f0', 'inje-vms-t0-0', 'VM0100-t0',
+                                            disconnect_vm, ovs_ports=ovs_ports)
+
+                batched_host, _ = self.assert_same_end_state(
+                    self.bind_host(),
+                    lambda: bind_ovs_ports(VMTopology.get_ovs_ports()),
+                    lambda: bind_ovs_ports(None))
+
+                ovs_cmds = [cmd for cmd in batched_host.cmds if cmd.startswith('ovs-') and 'json' not in cmd]
+                self.assertEqual(ovs_cmds[:2], [
+                    'ovs-vsctl -- --if-exists del-port br-VM0101-0 inje-vms-t0-0 -- '
+                    '--may-exist add-port br-VM0100-0 inje-vms-t0-0 -- --may-exist add-port br-VM0100-0 enp1s0f0',
+                    'ovs-ofctl show br-VM0100-0'])
+                # the old flows are replaced at once, there is no window without flows
+                self.assertEqual(len(ovs_cmds), 3)
+                self.assertTrue(ovs_cmds[2].startswith('ovs-ofctl replace-flows br-VM0100-0 '))
+                self.assertNotIn('table=0,in_port=1,action=drop', batched_host.flows['br-VM0100-0'])
+                self.assertEqual(len(batched_host.flows['br-VM0100-0']), 2 if disconnect_vm else 32)
+
+    def test_bind_fp_ports_lists_ovs_ports_once(self):
+        topology = make_topology()
+        topology.use_batch = True
+        topology.worker = mock.MagicMock()
+        topology.worker.map.side_effect = lambda func, args: [func(arg) for arg in args]
+        topology.OVS_LINKs = {}
+        topology.VM_LINKs = {}
+        topology.VMs = {'ARISTA01T1': {'vlans': ['0.0@0'], 'vm_offset': 0},
+                        'ARISTA02T1': {'vlans': ['0.1@1'], 'vm_offset': 1}}
+        topology.vm_names = ['VM0100', 'VM0101']
+        topology.vm_base_index = 0
+        topology.duts_name = ['dut0']
+        topology.duts_fp_ports = {'dut0': {'0': 'enp1s0f0', '1': 'enp1s0f1'}}
+        host = FakeHost()
+        for vm in topology.vm_names:
+            host.add_bridge('br-%s-0' % vm, ['br-%s-0' % vm])
+
+        def fire_and_forget(cmdline):
+            # the flows are loaded right away instead of by a subprocess
+            host.cmd(cmdline)
+            return mock.MagicMock(returncode=0, **{'communicate.return_value': (b'', b'')})
+
+        with mock.patch.object(VMTopology, 'fire_and_forget', side_effect=fire_and_forget):
+            self.run_on(host, topology.bind_fp_ports)
+
+        self.assertEqual(len([cmd for cmd in host.cmds if re.match('ovs-vsctl --format=json .* Bridge', cmd)]), 1)
+        self.assertFalse([cmd for cmd in host.cmds if 'port-to-br' in cmd or 'list-ports' in cmd])
+        self.assertEqual(host.bridges['br-VM0100-0'].keys(), {'br-VM0100-0', 'enp1s0f0', 'inje-vms-t0-0',
+                                                              'VM0100-t0'})
+        self.assertEqual(host.bridges['br-VM0101-0'].keys(), {'br-VM0101-0', 'enp1s0f1', 'inje-vms-t0-1',
+                                                              'VM0101-t0'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -92,6 +92,7 @@ Parameters:
     - duts_mgmt_port: duts mgmt port
     - duts_name: duts names
     - fp_mtu: MTU for FP ports
+    - use_batch: run the ip and ovs-vsctl operations of the interfaces and bridges in batches (default True)
 '''
 
 EXAMPLES = '''
@@ -179,6 +180,8 @@ MIN_THREAD_WORKER_COUNT = 8
 LOG_SEPARATOR = "=" * 120
 
 DEFAULT_BATCH_PROCESSES_TIMEOUT = 600
+# max number of operations in one ovs-vsctl transaction
+BATCH_MAX_OPERATIONS = 256
 
 
 def construct_log_filename(cmd, vm_set_name):
@@ -230,10 +233,19 @@ def adaptive_temporary_interface(vm_set_name, interface_name, reserved_space=0):
     return t_int_if
 
 
+def timed_phase(func):
+    """Decorator to report the time and the subprocesses of a VMTopology method as a phase."""
+    @functools.wraps(func)
+    def _timed_phase(self, *args, **kwargs):
+        with self.timer.phase(func.__name__):
+            return func(self, *args, **kwargs)
+    return _timed_phase
+
+
 class VMTopology(object):
 
     def __init__(self, vm_names, vm_properties, fp_mtu, max_fp_num, topo, worker, current_vm_name=None,
-                 is_dpu=False, is_vs_chassis=False, dut_interfaces=None):
+                 is_dpu=False, is_vs_chassis=False, dut_interfaces=None, use_batch=True):
         self.vm_names = vm_names
         self.current_vm_name = current_vm_name
         self.vm_properties = vm_properties
@@ -247,6 +259,8 @@ class VMTopology(object):
         self.worker = worker
         self._is_dpu = is_dpu
         self._is_vs_chassis = is_vs_chassis
+        self.use_batch = use_batch
+        self.timer = VMTopologyPhaseTimer()
 
     def init(self, vm_set_name, vm_base, duts_fp_ports, duts_name, ptf_exists=True, check_bridge=True):
         self.vm_set_name = vm_set_name
@@ -457,6 +471,7 @@ class VMTopology(object):
             vlans[VM] = attr['vlans'][:]
         return vlans
 
+    @timed_phase
     def add_network_namespace(self):
         """Create a network namespace."""
         self.delete_network_namespace()
@@ -471,6 +486,7 @@ class VMTopology(object):
         """ENable ARP filter in the netns."""
         VMTopology.cmd("ip netns exec %s sysctl -w net.ipv4.conf.all.arp_filter=1" % self.netns)
 
+    @timed_phase
     def add_mgmt_port_to_netns(self, mgmt_bridge, mgmt_ip, mgmt_gw, mgmt_ipv6_addr=None, mgmt_gw_v6=None):
         if VMTopology.intf_not_exists(MGMT_PORT_NAME, netns=self.netns):
             self.add_br_if_to_netns(
@@ -478,10 +494,17 @@ class VMTopology(object):
         self.add_ip_to_netns_if(MGMT_PORT_NAME, mgmt_ip, ipv6_addr=mgmt_ipv6_addr,
                                 default_gw=mgmt_gw, default_gw_v6=mgmt_gw_v6)
 
+    @timed_phase
     def create_bridges(self):
+        bridges = []
         for vm in self.vm_names:
             for fp_num in range(self.max_fp_num):
                 fp_br_name = adaptive_name(OVS_FP_BRIDGE_TEMPLATE, vm, fp_num)
+                bridges.append(fp_br_name)
+        if self.use_batch:
+            self.create_ovs_bridges(bridges, self.fp_mtu)
+        else:
+            for fp_br_name in bridges:
                 self.create_ovs_bridge(fp_br_name, self.fp_mtu)
 
     def create_ovs_bridge(self, bridge_name, mtu):
@@ -494,12 +517,32 @@ class VMTopology(object):
 
         VMTopology.cmd('ifconfig %s up' % bridge_name)
 
+    def create_ovs_bridges(self, bridge_names, mtu):
+        """Create ovs bridges in ovs-vsctl transactions, and set their mtu and state in one ip batch."""
+        logging.info('=== Create bridges %s with mtu %d ===' % (bridge_names, mtu))
+        VMTopology.ovs_vsctl_batch(['--may-exist add-br %s' % bridge_name for bridge_name in bridge_names])
+
+        ip_cmds = []
+        for bridge_name in bridge_names:
+            if mtu != DEFAULT_MTU:
+                ip_cmds.append('link set dev %s mtu %d' % (bridge_name, mtu))
+            ip_cmds.append('link set dev %s up' % bridge_name)
+        VMTopology.ip_batch(ip_cmds)
+
+    @timed_phase
     def destroy_bridges(self):
         bridge_count = 0
+        bridges = []
         for vm in self.vm_names:
             for fp_num in range(self.max_fp_num):
                 fp_br_name = adaptive_name(OVS_FP_BRIDGE_TEMPLATE, vm, fp_num)
                 bridge_count += 1
+                bridges.append(fp_br_name)
+        if self.use_batch:
+            logging.info('=== Destroy bridges %s ===' % bridges)
+            VMTopology.ovs_vsctl_batch(['--if-exists del-br %s' % fp_br_name for fp_br_name in bridges])
+        else:
+            for fp_br_name in bridges:
                 self.destroy_ovs_bridge(fp_br_name)
 
     def destroy_ovs_bridge(self, bridge_name):
@@ -545,6 +588,7 @@ class VMTopology(object):
         # Timeout
         logging.error('Timeout after %d seconds, %d bridges may still exist' % (max_wait, remaining_count))
 
+    @timed_phase
     def add_injected_fp_ports_to_docker(self):
         """
         add injected front panel ports to docker
@@ -553,6 +597,7 @@ class VMTopology(object):
             PTF (int_if) ----------- injected port (ext_if)
 
         """
+        veth_ifs = []
         for vm, vlans in self.injected_fp_ports.items():
             for vlan in vlans:
                 (_, _, ptf_index) = VMTopology.parse_vm_vlan_port(vlan)
@@ -573,18 +618,32 @@ class VMTopology(object):
                         sub_interface_separator=vlan_subintf_sep,
                         sub_interface_vlan_id=vlan_subintf_vlan_id
                     )
+                elif self.use_batch:
+                    veth_ifs.append((ext_if, int_if))
                 else:
                     self.add_veth_if_to_docker(ext_if, int_if)
 
+        if veth_ifs:
+            self.add_veth_ifs_to_docker(veth_ifs)
+
+    @timed_phase
     def add_injected_VM_ports_to_docker(self):
+        veth_ifs = []
         for k, attr in self.OVS_LINKs.items():
             vlans = attr['vlans'][:]
             for vlan in vlans:
                 (_, _, ptf_index) = VMTopology.parse_vm_vlan_port(vlan)
                 int_if = PTF_FP_IFACE_TEMPLATE % ptf_index
                 injected_iface = adaptive_name(INJECTED_INTERFACES_TEMPLATE, self.vm_set_name, ptf_index)
-                self.add_veth_if_to_docker(injected_iface, int_if)
+                if self.use_batch:
+                    veth_ifs.append((injected_iface, int_if))
+                else:
+                    self.add_veth_if_to_docker(injected_iface, int_if)
 
+        if veth_ifs:
+            self.add_veth_ifs_to_docker(veth_ifs)
+
+    @timed_phase
     def add_mgmt_port_to_docker(self, mgmt_bridge, mgmt_ip, mgmt_gw,
                                 mgmt_ipv6_addr=None, mgmt_gw_v6=None, extra_mgmt_ip_addr=None,
                                 api_server_pid=None):
@@ -601,6 +660,7 @@ class VMTopology(object):
                                  mgmt_gw=mgmt_gw, mgmt_gw_v6=mgmt_gw_v6,
                                  extra_mgmt_ip_addr=extra_mgmt_ip_addr, api_server_pid=api_server_pid)
 
+    @timed_phase
     def add_bp_port_to_docker(self, mgmt_ip, mgmt_ipv6):
         self.add_br_if_to_docker(
             self.bp_bridge, PTF_BP_IF_TEMPLATE % self.vm_set_name, BP_PORT_NAME)
@@ -837,6 +897,88 @@ class VMTopology(object):
         if create_vlan_subintf:
             VMTopology.iface_up(int_sub_if, pid=self.pid)
 
+    def add_veth_ifs_to_docker(self, veth_ifs):
+        """
+        Create vethernet devices (ext_if, int_if) and put int_if into the ptf docker, for every pair of veth_ifs.
+
+        Same steps as add_veth_if_to_docker, decided on the interfaces listed in the host and in the docker once,
+        and run in an ip batch in the host followed by an ip batch in the docker.
+        """
+        host_intfs = VMTopology.get_intfs()
+        stale_intfs = [adaptive_temporary_interface(self.vm_set_name, int_if) for _, int_if in veth_ifs]
+        stale_intfs = [t_int_if for t_int_if in stale_intfs if t_int_if in host_intfs]
+        if stale_intfs:
+            # the peers of the stale temporary interfaces are removed with them
+            VMTopology.ip_batch(['link del dev %s' % t_int_if for t_int_if in stale_intfs])
+            host_intfs = VMTopology.get_intfs()
+        docker_intfs = VMTopology.get_intfs(pid=self.pid)
+
+        host_cmds = []
+        docker_cmds = []
+        for ext_if, int_if in veth_ifs:
+            logging.info('=== Create veth pair %s/%s, set %s to PTF docker namespace ===' %
+                         (ext_if, int_if, int_if))
+            t_int_if = adaptive_temporary_interface(self.vm_set_name, int_if)
+
+            if ext_if not in host_intfs:
+                host_cmds.append('link add %s type veth peer name %s' % (ext_if, t_int_if))
+                host_intfs.update((ext_if, t_int_if))
+
+            if self.fp_mtu != DEFAULT_MTU:
+                host_cmds.append('link set dev %s mtu %d' % (ext_if, self.fp_mtu))
+                if t_int_if in host_intfs:
+                    host_cmds.append('link set dev %s mtu %d' % (t_int_if, self.fp_mtu))
+                elif t_int_if in docker_intfs:
+                    docker_cmds.append('link set dev %s mtu %d' % (t_int_if, self.fp_mtu))
+                elif int_if in docker_intfs:
+                    docker_cmds.append('link set dev %s mtu %d' % (int_if, self.fp_mtu))
+
+            host_cmds.append('link set %s up' % ext_if)
+
+            if t_int_if in host_intfs and t_int_if not in docker_intfs and int_if not in docker_intfs:
+                host_cmds.append('link set dev %s netns %s' % (t_int_if, self.pid))
+                host_intfs.discard(t_int_if)
+                docker_intfs.add(t_int_if)
+
+            if t_int_if in docker_intfs and int_if not in docker_intfs:
+                docker_cmds.append('link set dev %s name %s' % (t_int_if, int_if))
+                docker_intfs.discard(t_int_if)
+                docker_intfs.add(int_if)
+
+            docker_cmds.append('link set %s up' % int_if)
+
+        VMTopology.ip_batch(host_cmds)
+        VMTopology.ip_batch(docker_cmds, pid=self.pid)
+
+    def add_dut_ifs_to_docker(self, dut_ifs):
+        """
+        Move DUT interfaces to the PTF docker, for every pair (iface_name, dut_iface) of dut_ifs.
+
+        Same steps as add_dut_if_to_docker, decided on the interfaces listed in the host and in the docker once,
+        and run in an ip batch in the host followed by an ip batch in the docker.
+        """
+        host_intfs = VMTopology.get_intfs()
+        docker_intfs = VMTopology.get_intfs(pid=self.pid)
+
+        host_cmds = []
+        docker_cmds = []
+        for iface_name, dut_iface in dut_ifs:
+            logging.info("=== Add DUT interface %s to PTF docker as %s ===" % (dut_iface, iface_name))
+            if dut_iface in host_intfs and dut_iface not in docker_intfs and iface_name not in docker_intfs:
+                host_cmds.append('link set dev %s netns %s' % (dut_iface, self.pid))
+                host_intfs.discard(dut_iface)
+                docker_intfs.add(dut_iface)
+
+            if dut_iface in docker_intfs and iface_name not in docker_intfs:
+                docker_cmds.append('link set dev %s name %s' % (dut_iface, iface_name))
+                docker_intfs.discard(dut_iface)
+                docker_intfs.add(iface_name)
+
+            docker_cmds.append('link set %s up' % iface_name)
+
+        VMTopology.ip_batch(host_cmds)
+        VMTopology.ip_batch(docker_cmds, pid=self.pid)
+
     def add_veth_if_to_netns(self, ext_if, int_if):
         """Create vethernet devices (ext_if, int_if) and put int_if into the netns for active-active."""
         logging.info('=== Create veth pair %s/%s, set %s to netns %s ===' %
@@ -890,6 +1032,7 @@ class VMTopology(object):
             VMTopology.cmd("brctl delif %s %s" %
                            (if_to_br[mgmt_port], mgmt_port))
 
+    @timed_phase
     def bind_devices_interconnect(self):
         for link_index, vlans in self.devices_interconnect_interfaces.items():
             interconnection_bridge = OVS_INTERCONNECTION_BRIDGE_TEMPLATE % (
@@ -906,6 +1049,7 @@ class VMTopology(object):
             self.bind_devices_interconnect_ports(
                 interconnection_bridge, vlan1_iface, vlan2_iface)
 
+    @timed_phase
     def unbind_devices_interconnect(self):
         for link_index, vlans in self.devices_interconnect_interfaces.items():
             interconnection_bridge = OVS_INTERCONNECTION_BRIDGE_TEMPLATE % (
@@ -938,6 +1082,7 @@ class VMTopology(object):
         VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
                        (br_name, vlan2_iface_id, vlan1_iface_id))
 
+    @timed_phase
     def bind_fp_ports(self, disconnect_vm=False):
         """
         bind dut front panel ports to VMs
@@ -970,9 +1115,12 @@ class VMTopology(object):
                     (br_name, self.duts_fp_ports[self.duts_name[dut_index]][str(vlan_index)],
                      injected_iface, vm_iface, disconnect_vm)
                 )
+        # the bridges are independent, the ports of all of them are listed once to bind them in parallel
+        ovs_ports = VMTopology.get_ovs_ports() if self.use_batch else None
         with VMTopologyWorker.safe_subprocess_manager() as [processes, tmpdir]:
             self.worker.map(lambda args: self.bind_ovs_ports(*args, processes=processes,
-                                                             tmpdir=tmpdir), bind_ovs_ports_args)
+                                                             tmpdir=tmpdir, ovs_ports=ovs_ports),
+                            bind_ovs_ports_args)
 
         for k, attr in self.VM_LINKs.items():
             logging.info("Create VM links for {} : {}".format(k, attr))
@@ -1006,6 +1154,7 @@ class VMTopology(object):
                 injected_iface = adaptive_name(INJECTED_INTERFACES_TEMPLATE, self.vm_set_name, ptf_index)
                 self.bind_ovs_ports(br_name, port1, injected_iface, port2, disconnect_vm)
 
+    @timed_phase
     def unbind_fp_ports(self):
         logging.info("=== unbind front panel ports ===")
         unbind_ovs_ports_args = []
@@ -1017,8 +1166,15 @@ class VMTopology(object):
                     self.vm_names[self.vm_base_index + attr['vm_offset']], vlan_num)
                 unbind_ovs_ports_args.append((br_name, vm_iface))
 
+        ovs_br_ports = None
+        if self.use_batch:
+            ovs_br_ports = {}
+            for port, bridge in VMTopology.get_ovs_ports().items():
+                ovs_br_ports.setdefault(bridge, set()).add(port)
         with VMTopologyWorker.safe_subprocess_manager() as [processes, _]:
-            self.worker.map(lambda args: self.unbind_ovs_ports(*args, processes=processes), unbind_ovs_ports_args)
+            self.worker.map(lambda args: self.unbind_ovs_ports(*args, processes=processes,
+                                                               ovs_br_ports=ovs_br_ports),
+                            unbind_ovs_ports_args)
 
         for k, attr in self.VM_LINKs.items():
             logging.info("Remove VM links for {} : {}".format(k, attr))
@@ -1088,6 +1244,7 @@ class VMTopology(object):
         VMTopology.iface_up(port1)
         VMTopology.iface_up(port2)
 
+    @timed_phase
     def bind_vm_backplane(self):
 
         if VMTopology.intf_not_exists(self.bp_bridge):
@@ -1106,12 +1263,14 @@ class VMTopology(object):
 
             VMTopology.iface_up(bp_port_name)
 
+    @timed_phase
     def unbind_vm_backplane(self):
 
         if VMTopology.intf_exists(self.bp_bridge):
             VMTopology.iface_down(self.bp_bridge)
             VMTopology.cmd('brctl delbr %s' % self.bp_bridge)
 
+    @timed_phase
     def bind_vs_chassis_ports(self, duts_midplane_ports, duts_inband_ports):
         # We have a KVM based virtaul chassis, create two ovs bridges, bind the midplane and inband ports
         self.create_ovs_bridge(self._vs_chassis_inband_br_name, self.fp_mtu)
@@ -1125,6 +1284,7 @@ class VMTopology(object):
             self.bind_vs_dut_ports(
                 self._vs_chassis_inband_br_name, dut, duts_inband_ports[dut])
 
+    @timed_phase
     def unbind_vs_chassis_ports(self, duts_midplane_ports, duts_inband_ports):
         # We have a KVM based virtaul chassis, bind the midplane and inband ports
         for dut in duts_midplane_ports.keys():
@@ -1165,56 +1325,76 @@ class VMTopology(object):
             PTF (injected_iface) --+ OVS bridge (br_name) |
                                    |                      +---- vm_iface
                                    +----------------------+
+
+        If the ports of all the ovs bridges are given in ovs_ports (port to bridge), the ports are moved and added in
+        one ovs-vsctl transaction, and the flows replace the old ones of the bridge at once.
         """
-        br = VMTopology.get_ovs_bridge_by_port(injected_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, injected_iface))
+        ovs_ports = kwargs.get("ovs_ports")
+        if ovs_ports is not None:
+            ovs_cmds = []
+            for port in (injected_iface, dut_iface, vm_iface):
+                br = ovs_ports.get(port)
+                if br is not None and br != br_name:
+                    ovs_cmds.append('--if-exists del-port %s %s' % (br, port))
+            for port in (injected_iface, dut_iface, vm_iface):
+                if ovs_ports.get(port) != br_name:
+                    ovs_cmds.append('--may-exist add-port %s %s' % (br_name, port))
+            VMTopology.ovs_vsctl_batch(ovs_cmds)
+        else:
+            br = VMTopology.get_ovs_bridge_by_port(injected_iface)
+            if br is not None and br != br_name:
+                VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, injected_iface))
 
-        br = VMTopology.get_ovs_bridge_by_port(dut_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, dut_iface))
+            br = VMTopology.get_ovs_bridge_by_port(dut_iface)
+            if br is not None and br != br_name:
+                VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, dut_iface))
 
-        br = VMTopology.get_ovs_bridge_by_port(vm_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, vm_iface))
+            br = VMTopology.get_ovs_bridge_by_port(vm_iface)
+            if br is not None and br != br_name:
+                VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, vm_iface))
 
-        ports = VMTopology.get_ovs_br_ports(br_name)
-        if injected_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' %
-                           (br_name, injected_iface))
+            ports = VMTopology.get_ovs_br_ports(br_name)
+            if injected_iface not in ports:
+                VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' %
+                               (br_name, injected_iface))
 
-        if dut_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, dut_iface))
+            if dut_iface not in ports:
+                VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, dut_iface))
 
-        if vm_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, vm_iface))
+            if vm_iface not in ports:
+                VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, vm_iface))
 
         bindings = VMTopology.get_ovs_port_bindings(br_name, [dut_iface])
         dut_iface_id = bindings[dut_iface]
         injected_iface_id = bindings[injected_iface]
         vm_iface_id = bindings[vm_iface]
 
-        # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
+        all_cmds = []
+        bind_helper = lambda cmd: \
+            all_cmds.append(cmd.split()[-1])  # noqa: E731
+
+        if ovs_ports is not None:
+            # the old bindings are replaced with all the flows
+            flow_helper = bind_helper
+        else:
+            flow_helper = VMTopology.cmd
+            # clear old bindings
+            VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
 
         if disconnect_vm:
             # Drop packets from VM
-            VMTopology.cmd(
+            flow_helper(
                 "ovs-ofctl add-flow %s table=0,in_port=%s,action=drop" % (br_name, vm_iface_id))
         else:
             # Add flow from a VM to an external iface
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, vm_iface_id, dut_iface_id))
+            flow_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
+                        (br_name, vm_iface_id, dut_iface_id))
 
         if disconnect_vm:
             # Add flow from external iface to ptf container
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, dut_iface_id, injected_iface_id))
+            flow_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
+                        (br_name, dut_iface_id, injected_iface_id))
         else:
-            all_cmds = []
-            bind_helper = lambda cmd: \
-                all_cmds.append(cmd.split()[-1])  # noqa: E731
-
             # Add flow from external iface to a VM and a ptf container
             # Allow BGP, IPinIP, fragmented packets, ICMP, SNMP packets and layer2 packets from DUT to neighbors
             # Block other traffic from DUT to EOS for EOS's stability,
@@ -1292,19 +1472,32 @@ class VMTopology(object):
             bind_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
                         (br_name, injected_iface_id, dut_iface_id))
 
-            if all_cmds:
-                processes = kwargs.get("processes")
-                tmpdir = kwargs.get("tmpdir")
-                with tempfile.NamedTemporaryFile("w", dir=tmpdir, delete=False) as f:
-                    for rule in all_cmds:
-                        f.write(rule.strip("'") + "\n")
-
-                processes.append(VMTopology.fire_and_forget("ovs-ofctl add-flows {} {}".format(br_name, f.name)))
+        if all_cmds:
+            processes = kwargs.get("processes")
+            tmpdir = kwargs.get("tmpdir")
+            with tempfile.NamedTemporaryFile("w", dir=tmpdir, delete=False) as f:
+                for rule in all_cmds:
+                    f.write(rule.strip("'") + "\n")
+
+            flows_cmd = "ovs-ofctl {} {} {}".format(
+                "replace-flows" if ovs_ports is not None else "add-flows", br_name, f.name)
+            if processes is None:
+                try:
+                    VMTopology.cmd(flows_cmd)
+                finally:
+                    os.remove(f.name)
+            else:
+                processes.append(VMTopology.fire_and_forget(flows_cmd))
 
     def unbind_ovs_ports(self, br_name, vm_port, **kwargs):
         """unbind all ports except the vm port from an ovs bridge"""
-        if VMTopology.intf_exists(br_name):
-            ports = VMTopology.get_ovs_br_ports(br_name)
+        ovs_br_ports = kwargs.get("ovs_br_ports")
+        if ovs_br_ports is not None or VMTopology.intf_exists(br_name):
+            if ovs_br_ports is not None:
+                # the ports of all the ovs bridges are listed by the caller
+                ports = ovs_br_ports.get(br_name, set())
+            else:
+                ports = VMTopology.get_ovs_br_ports(br_name)
             all_cmds = []
             bind_helper = lambda cmd: \
                 all_cmds.append(cmd[len("ovs-vsctl "):])  # noqa: E731
@@ -1398,6 +1591,7 @@ class VMTopology(object):
 
         self.destroy_ovs_bridge(br_name)
 
+    @timed_phase
     def add_host_ports(self):
         """
         add dut port in the ptf docker
@@ -1405,6 +1599,14 @@ class VMTopology(object):
         for non-dual topo, inject the dut port into ptf docker.
         for dual-tor topo, create ovs port and add to ptf docker.
         """
+        dut_ifs = []
+        # the sub interfaces of backend ToRs are created right after their DUT interfaces are in the docker
+        if self.use_batch and self.dut_type != BACKEND_TOR_TYPE:
+            add_dut_if_to_docker = lambda iface_name, dut_iface: \
+                dut_ifs.append((iface_name, dut_iface))  # noqa: E731
+        else:
+            add_dut_if_to_docker = self.add_dut_if_to_docker
+
         def _add_host_port(i, intf):
             if self._is_multi_duts and not self._is_cable:
                 if isinstance(intf, list):
@@ -1445,7 +1647,7 @@ class VMTopology(object):
                     fp_port = self.duts_fp_ports[self.duts_name[intf[0]]][str(
                         intf[1])]
                     ptf_if = PTF_FP_IFACE_TEMPLATE % host_ifindex
-                    self.add_dut_if_to_docker(ptf_if, fp_port)
+                    add_dut_if_to_docker(ptf_if, fp_port)
             elif self._is_multi_duts and self._is_cable:
                 # Since there could be multiple ToR's in cable topology, some Ports
                 # can be connected to muxcable and some to a DAC cable. But it could
@@ -1460,18 +1662,18 @@ class VMTopology(object):
                     fp_port = self.duts_fp_ports[self.duts_name[intf[0][0]]][str(
                         intf[0][1])]
                     ptf_if = PTF_FP_IFACE_TEMPLATE % host_ifindex
-                    self.add_dut_if_to_docker(ptf_if, fp_port)
+                    add_dut_if_to_docker(ptf_if, fp_port)
 
                 host_ifindex = intf[1][2]
                 if self.duts_fp_ports[self.duts_name[intf[1][0]]].get(str(intf[1][1])) is not None:
                     fp_port = self.duts_fp_ports[self.duts_name[intf[1][0]]][str(
                         intf[1][1])]
                     ptf_if = PTF_FP_IFACE_TEMPLATE % host_ifindex
-                    self.add_dut_if_to_docker(ptf_if, fp_port)
+                    add_dut_if_to_docker(ptf_if, fp_port)
             else:
                 fp_port = self.duts_fp_ports[self.duts_name[0]][str(intf)]
                 ptf_if = PTF_FP_IFACE_TEMPLATE % intf
-                self.add_dut_if_to_docker(ptf_if, fp_port)
+                add_dut_if_to_docker(ptf_if, fp_port)
                 # only create sub interface for enabled ports defined in t0-backend
                 if self.dut_type == BACKEND_TOR_TYPE and intf not in self.disabled_host_interfaces:
                     vlan_separator = self.topo.get("DUT", {}).get(
@@ -1482,10 +1684,14 @@ class VMTopology(object):
 
         self.worker.map(lambda args: _add_host_port(*args), enumerate(self.host_interfaces))
 
+        if dut_ifs:
+            self.add_dut_ifs_to_docker(dut_ifs)
+
     def enable_netns_loopback(self):
         """Enable loopback device in the netns."""
         VMTopology.cmd("ip netns exec %s ifconfig lo up" % self.netns)
 
+    @timed_phase
     def setup_netns_source_routing(self):
         """Setup policy-based routing to forward packet to its igress ports."""
 
@@ -1544,6 +1750,7 @@ class VMTopology(object):
                 VMTopology.cmd("ip netns exec %s ip route add default via %s dev %s table %s" % (
                     self.netns, gateway_addr, ns_if, rt_name))
 
+    @timed_phase
     def remove_host_ports(self):
         """
         remove dut port from the ptf docker
@@ -1592,16 +1799,19 @@ class VMTopology(object):
         if VMTopology.intf_exists(ext_if):
             VMTopology.cmd("ip link delete dev %s" % ext_if)
 
+    @timed_phase
     def remove_ptf_mgmt_port(self):
         ext_if = PTF_MGMT_IF_TEMPLATE % self.vm_set_name
         tmp_name = MGMT_PORT_NAME + VMTopology._generate_fingerprint(ext_if, MAX_INTF_LEN - len(MGMT_PORT_NAME))
         self.remove_veth_if_from_docker(ext_if, MGMT_PORT_NAME, tmp_name)
 
+    @timed_phase
     def remove_ptf_backplane_port(self):
         ext_if = PTF_BP_IF_TEMPLATE % self.vm_set_name
         tmp_name = BP_PORT_NAME + VMTopology._generate_fingerprint(ext_if, MAX_INTF_LEN - len(BP_PORT_NAME))
         self.remove_veth_if_from_docker(ext_if, BP_PORT_NAME, tmp_name)
 
+    @timed_phase
     def remove_injected_fp_ports_from_docker(self):
         for vm, vlans in self.injected_fp_ports.items():
             for vlan in vlans:
@@ -1753,7 +1963,7 @@ class VMTopology(object):
                           (cmdline, grep_cmd, attempt + 1))
             if split_cmd:
                 cmdline = shlex.split(cmdline_ori)
-            process = subprocess.Popen(
+            process = VMTopologyWorker.Popen(
                 cmdline,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
@@ -1762,7 +1972,7 @@ class VMTopology(object):
             if grep_cmd:
                 if split_cmd:
                     grep_cmd = shlex.split(grep_cmd_ori)
-                process_grep = subprocess.Popen(
+                process_grep = VMTopologyWorker.Popen(
                     grep_cmd,
                     stdin=process.stdout,
                     stdout=subprocess.PIPE,
@@ -1807,6 +2017,78 @@ class VMTopology(object):
                 % (ret_code, err, cmdline_ori, ' | ' + grep_cmd_ori if grep_cmd_ori else '')
             raise Exception(err_msg)
 
+    @staticmethod
+    def get_intfs(pid=None, netns=None):
+        """Get the names of the interfaces in the host, in the network namespace of docker pid, or in netns.
+
+        Args:
+            pid (str), optional): Pid of docker. Defaults to None.
+            netns (str), optional): netns name. Default to None.
+
+        Returns:
+            set: Names of the interfaces.
+        """
+        if pid:
+            cmdline = 'nsenter -t %s -n ip -o link show' % pid
+        elif netns:
+            cmdline = 'ip netns exec %s ip -o link show' % netns
+        else:
+            cmdline = 'ip -o link show'
+        intfs = set()
+        for line in VMTopology.cmd(cmdline).splitlines():
+            # 5: eth1.10@eth1: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 9100 ...
+            fields = line.split(':', 2)
+            if len(fields) == 3:
+                intfs.add(fields[1].strip().split('@')[0])
+        return intfs
+
+    @staticmethod
+    def ip_batch(ip_cmds, pid=None, netns=None):
+        """Run ip commands (without the leading "ip") with one "ip -batch", in the host, docker pid or netns.
+
+        The batch stops at the first failed command, and an exception is raised like for a failed command.
+        """
+        if not ip_cmds:
+            return
+        with tempfile.NamedTemporaryFile("w", prefix="vmtopology_ip_", delete=False) as f:
+            f.write("\n".join(ip_cmds) + "\n")
+        logging.debug('*** IP batch %s: \n%s' % (f.name, "\n".join(ip_cmds)))
+        try:
+            if pid:
+                VMTopology.cmd('nsenter -t %s -n ip -batch %s' % (pid, f.name))
+            elif netns:
+                VMTopology.cmd('ip netns exec %s ip -batch %s' % (netns, f.name))
+            else:
+                VMTopology.cmd('ip -batch %s' % f.name)
+        finally:
+            os.remove(f.name)
+
+    @staticmethod
+    def ovs_vsctl_batch(ovs_cmds):
+        """Run ovs-vsctl commands (without the leading "ovs-vsctl") in transactions of BATCH_MAX_OPERATIONS."""
+        for index in range(0, len(ovs_cmds), BATCH_MAX_OPERATIONS):
+            VMTopology.cmd('ovs-vsctl -- %s' % ' -- '.join(ovs_cmds[index:index + BATCH_MAX_OPERATIONS]))
+
+    @staticmethod
+    def get_ovs_ports():
+        """Get the ports of all the ovs bridges, except their local ports, as a dictionary of port to bridge."""
+        def _uuids(value):
+            # ovsdb json encodes a set of one element as the element
+            if value[0] == 'set':
+                return [uuid for _, uuid in value[1]]
+            return [value[1]]
+
+        bridges = json.loads(VMTopology.cmd('ovs-vsctl --format=json --columns=name,ports list Bridge'))
+        ports = json.loads(VMTopology.cmd('ovs-vsctl --format=json --columns=_uuid,name list Port'))
+        port_names = dict((uuid, name) for (_, uuid), name in ports['data'])
+        port_to_bridge = {}
+        for bridge, bridge_ports in bridges['data']:
+            for uuid in _uuids(bridge_ports):
+                port = port_names.get(uuid)
+                if port is not None and port != bridge:
+                    port_to_bridge[port] = bridge
+        return port_to_bridge
+
     @staticmethod
     def get_ovs_br_ports(bridge):
         out = VMTopology.cmd('ovs-vsctl list-ports %s' % bridge)
@@ -2094,9 +2376,46 @@ class ThreadBufferHandler(logging.Handler):
         super(ThreadBufferHandler, self).close()
 
 
+class VMTopologyPhaseTimer(object):
+    """Record the time and the number of subprocesses of the phases of a VM topology command."""
+
+    def __init__(self):
+        self.phases = []
+        self._phase_index = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Measure a phase, the measures of the phases with the same name are added up."""
+        start_time = time.time()
+        start_processes = VMTopologyWorker.processes_started
+        try:
+            yield
+        finally:
+            if name not in self._phase_index:
+                self._phase_index[name] = len(self.phases)
+                self.phases.append({'phase': name, 'seconds': 0.0, 'subprocesses': 0})
+            phase = self.phases[self._phase_index[name]]
+            phase['seconds'] = round(phase['seconds'] + time.time() - start_time, 3)
+            phase['subprocesses'] += VMTopologyWorker.processes_started - start_processes
+
+    def report(self):
+        """Log the phases and return them."""
+        logging.info(LOG_SEPARATOR)
+        logging.info('%-40s %10s %14s' % ('phase', 'seconds', 'subprocesses'))
+        for phase in self.phases:
+            logging.info('%-40s %10.3f %14d' % (phase['phase'], phase['seconds'], phase['subprocesses']))
+        logging.info('%-40s %10.3f %14d' % ('total', sum(phase['seconds'] for phase in self.phases),
+                                            sum(phase['subprocesses'] for phase in self.phases)))
+        logging.info(LOG_SEPARATOR)
+        return self.phases
+
+
 class VMTopologyWorker(object):
     """VM Topology worker class."""
 
+    processes_started = 0
+    _processes_lock = threading.Lock()
+
     def __init__(self, use_thread_worker, thread_worker_count):
         """
         Initialize the VMTopologyWorker object.
@@ -2211,6 +2530,8 @@ class VMTopologyWorker(object):
     @staticmethod
     def Popen(*args, **kwds):
         res = subprocess.Popen(*args, **kwds)
+        with VMTopologyWorker._processes_lock:
+            VMTopologyWorker.processes_started += 1
 
         if not hasattr(res, "args"):
             res.args = args[0]
@@ -2254,6 +2575,7 @@ def main():
             thread_worker_count=dict(required=False, type='int',
                                      default=max(MIN_THREAD_WORKER_COUNT,
                                                  multiprocessing.cpu_count() // 8)),
+            use_batch=dict(required=False, type='bool', default=True),
         ),
         supports_check_mode=False)
 
@@ -2269,6 +2591,7 @@ def main():
     dut_interfaces = module.params['dut_interfaces']
     use_thread_worker = module.params['use_thread_worker']
     thread_worker_count = module.params['thread_worker_count']
+    use_batch = module.params['use_batch']
 
     config_module_logging(construct_log_filename(cmd, vm_set_name))
 
@@ -2279,7 +2602,7 @@ def main():
         topo = module.params['topo']
         worker = VMTopologyWorker(use_thread_worker, thread_worker_count)
         net = VMTopology(vm_names, vm_properties, fp_mtu, max_fp_num, topo, worker, current_vm_name,
-                         is_dpu, is_vs_chassis, dut_interfaces)
+                         is_dpu, is_vs_chassis, dut_interfaces, use_batch)
 
         if cmd == 'create':
             net.create_bridges()
@@ -2563,7 +2886,7 @@ def main():
         logging.error(traceback.format_exc())
         module.fail_json(msg=str(error))
 
-    module.exit_json(changed=True)
+    module.exit_json(changed=True, phases=net.timer.report())
 
 
 if __name__ == "__main__":
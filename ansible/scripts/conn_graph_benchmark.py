@@ -0,0 +1,114 @@
+"""Benchmark of the group lookup of the conn_graph_facts module.
+
+Generate the csv graph files of a lab with many groups, then compare the legacy find_graph (a LabGraph parsed for
+every group until one has the hosts) with the hostname index and cached graph facts of module_utils/graph_utils.py,
+for hosts of the last group, and check that both return the same results.
+
+Usage:
+    python ansible/scripts/conn_graph_benchmark.py --groups 20 --devices 40 --ports 64
+"""
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+ANSIBLE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+sys.path.insert(0, ANSIBLE_DIR)
+
+from module_utils import graph_utils     # noqa: E402
+
+
+def write_csv(path, fieldnames, rows):
+    with open(path, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def generate_lab(path, groups, devices, ports):
+    """Every group has a fanout and devices, half of them DevSonic Force10-S6000 devices linked to the fanout."""
+    group_names = ["group{}".format(g) for g in range(groups)]
+    for group in group_names:
+        fanout = "{}-fanout".format(group)
+        device_rows = [{"Hostname": fanout, "ManagementIp": "10.0.0.1/24", "HwSku": "Arista-7260CX3-64",
+                        "Type": "FanoutLeaf", "Os": "eos"}]
+        link_rows = []
+        fanout_port = 0
+        for d in range(devices):
+            hostname = "{}-dut{}".format(group, d)
+            sonic = d % 2 == 0
+            device_rows.append({"Hostname": hostname, "ManagementIp": "10.0.{}.{}/24".format(d // 200, d % 200 + 2),
+                                "HwSku": "Force10-S6000" if sonic else "Arista-VM",
+                                "Type": "DevSonic" if sonic else "Server", "Os": "sonic" if sonic else "ubuntu"})
+            for p in range(ports // 4 if sonic else 4):
+                link_rows.append({"StartDevice": hostname,
+                                  "StartPort": "Ethernet{}".format(p * 4) if sonic else "eth{}".format(p),
+                                  "EndDevice": fanout, "EndPort": "Ethernet{}".format(fanout_port),
+                                  "BandWidth": "40000", "VlanID": str(100 + fanout_port), "VlanMode": "Access"})
+                fanout_port += 1
+        write_csv(os.path.join(path, "sonic_{}_devices.csv".format(group)),
+                  ["Hostname", "ManagementIp", "HwSku", "Type", "Os"], device_rows)
+        write_csv(os.path.join(path, "sonic_{}_links.csv".format(group)),
+                  ["StartDevice", "StartPort", "EndDevice", "EndPort", "BandWidth", "VlanID", "VlanMode"], link_rows)
+    return group_names
+
+
+def legacy_find_graph(path, graph_groups, hostnames):
+    for group in graph_groups:
+        lab_graph = graph_utils.LabGraph(path, group)
+        if set(hostnames) <= set(lab_graph.graph_facts["devices"].keys()):
+            return lab_graph
+    return None
+
+
+def indexed_find_graph(path, graph_groups, hostnames, cache_dir):
+    hostname_groups = graph_utils.load_hostname_index(path, graph_groups, cache_dir)
+    for group in graph_groups:
+        if all(group in hostname_groups.get(hostname, []) for hostname in hostnames):
+            return graph_utils.LabGraph.load(path, group, cache_dir)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark conn_graph_facts group lookup")
+    parser.add_argument("--groups", type=int, default=20, help="Number of graph groups")
+    parser.add_argument("--devices", type=int, default=40, help="Number of devices per group")
+    parser.add_argument("--ports", type=int, default=64, help="Number of front panel ports of the SONiC devices")
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix="conn_graph_benchmark_")
+    cache_dir = os.path.join(path, "cache")
+    try:
+        graph_groups = generate_lab(path, args.groups, args.devices, args.ports)
+        with open(os.path.join(path, "graph_groups.yml"), "w") as f:
+            yaml.safe_dump(graph_groups, f)
+        hostnames = ["{}-dut{}".format(graph_groups[-1], d) for d in range(0, args.devices, 2)]
+
+        measurements = [
+            ("legacy", lambda: legacy_find_graph(path, graph_groups, hostnames)),
+            ("cold", lambda: (shutil.rmtree(cache_dir, ignore_errors=True),
+                              indexed_find_graph(path, graph_groups, hostnames, cache_dir))[1]),
+            ("warm", lambda: indexed_find_graph(path, graph_groups, hostnames, cache_dir)),
+        ]
+        results = {}
+        print("{:>8} {:>10} {:>14}".format("lookup", "find(s)", "build_results(s)"))
+        for name, find in measurements:
+            start = time.time()
+            lab_graph = find()
+            found = time.time() - start
+            start = time.time()
+            results[name] = lab_graph.build_results(hostnames)
+            print("{:>8} {:>10.3f} {:>14.3f}".format(name, found, time.time() - start))
+        assert results["legacy"] == results["cold"] == results["warm"], "Results differ"
+        assert results["legacy"][0], results["legacy"][1]
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Benchmark of the dataplane loss analysis of the advanced-reboot test.
+
+Generate a synthetic sniffer capture of the advanced-reboot traffic (every payload ID sent to the DUT and received
+from it, with disruptions, floods, packets captured neither sent nor received, packets received but not sent and
+some packets which need scapy), then compare the legacy examine_flow (rdpcap, no_flood with a list of payload IDs
+and the scapy packet loop) with ptftests/py3/dataplane_loss.py, and check that both find the same flow.
+
+The legacy analysis is quadratic, so it only runs on a smaller capture of --legacy_packets packets. Every
+measurement runs in its own process so that the peak memory is its own.
+
+Usage:
+    python ansible/scripts/dataplane_loss_benchmark.py --packets 5000000 --format pcapng
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+import scapy.all as scapyall
+
+PTFTESTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../roles/test/files/ptftests/py3")
+sys.path.insert(0, PTFTESTS_DIR)
+
+import dataplane_loss     # noqa: E402
+
+DUT_MAC = "4c:76:25:f5:48:80"
+VLAN_MAC = "00:aa:bb:cc:dd:ee"
+PTF_MAC = "02:00:00:00:00:01"
+SERVER_MAC = "02:00:00:00:00:02"
+BASE_TIME_US = 1760000000 * 10 ** 6
+SEND_INTERVAL_US = 100
+DUT_LATENCY_US = 50
+
+
+def legacy_examine_flow(all_packets, dut_mac, vlan_mac):
+    """The filtering, sorting and packet loop of examine_flow before dataplane_loss."""
+    unique_id = list()
+
+    def check_tcp_payload(packet):
+        try:
+            int(bytes(packet[scapyall.TCP].payload))
+            return True
+        except Exception:
+            return False
+
+    def no_flood(packet):
+        if (not int(bytes(packet[scapyall.TCP].payload)) in unique_id) and \
+                (packet[scapyall.Ether].src == dut_mac or packet[scapyall.Ether].src == vlan_mac):
+            unique_id.append(int(bytes(packet[scapyall.TCP].payload)))
+            return True
+        elif packet[scapyall.Ether].dst == dut_mac or packet[scapyall.Ether].dst == vlan_mac:
+            return True
+        else:
+            return False
+
+    filtered_packets = [pkt for pkt in all_packets if
+                        scapyall.TCP in pkt and
+                        scapyall.ICMP not in pkt and
+                        pkt[scapyall.TCP].sport == 1234 and
+                        pkt[scapyall.TCP].dport == 5000 and
+                        check_tcp_payload(pkt) and
+                        no_flood(pkt)
+                        ]
+    packets = sorted(filtered_packets, key=lambda packet: (
+        int(bytes(packet[scapyall.TCP].payload)), float(packet.time)))
+    flow = dataplane_loss.FlowResult()
+    flow.packets = packets
+    flow.filtered_count = len(packets)
+    sent_packets = dict()
+    prev_payload, prev_time = -1, 0
+    received_but_not_sent_packets = set()
+    for packet in packets:
+        if packet[scapyall.Ether].dst == dut_mac or packet[scapyall.Ether].dst == vlan_mac:
+            sent_payload = int(bytes(packet[scapyall.TCP].payload))
+            if sent_payload in sent_packets:
+                flow.flooded_pkts.append(sent_payload)
+            sent_packets[sent_payload] = float(packet.time)
+            flow.sent_counter += 1
+            continue
+        if packet[scapyall.Ether].src == dut_mac or packet[scapyall.Ether].src == vlan_mac:
+            received_time = float(packet.time)
+            received_payload = int(bytes(packet[scapyall.TCP].payload))
+            if (received_payload % 5) == 0:
+                flow.received_vlan_to_t1 += 1
+            else:
+                flow.received_t1_to_vlan += 1
+            flow.received_counter += 1
+        if not (received_payload and received_time):
+            prev_payload = received_payload
+            prev_time = received_time
+            continue
+        if received_payload - prev_payload > 1:
+            if received_payload not in sent_packets:
+                received_but_not_sent_packets.add(received_payload)
+                continue
+            lost_id = (received_payload - 1) - prev_payload
+            missing_sent_and_received_pkt_count = 0
+            prev_pkt_pt = prev_payload + 1
+            prev_sent_packet_time = None
+            while prev_pkt_pt < received_payload:
+                if prev_pkt_pt in sent_packets:
+                    prev_sent_packet_time = sent_packets[prev_pkt_pt]
+                    break
+                else:
+                    if prev_pkt_pt not in received_but_not_sent_packets:
+                        missing_sent_and_received_pkt_count += 1
+                    prev_pkt_pt += 1
+            if missing_sent_and_received_pkt_count > 0:
+                flow.missing_sent_and_received_packet_id_sequences.append(
+                    str(prev_payload + 1) if missing_sent_and_received_pkt_count == 1
+                    else "{}-{}".format(prev_payload + 1, received_payload - 1))
+            if prev_sent_packet_time is not None:
+                this_sent_packet_time = sent_packets[received_payload]
+                disrupt = this_sent_packet_time - prev_sent_packet_time
+                flow.lost_packets[prev_payload] = (lost_id, disrupt, received_time - disrupt, received_time)
+                for lost_index in range(prev_payload + 1, received_payload):
+                    if lost_index in sent_packets:
+                        if (lost_index % 5) == 0:
+                            flow.missed_vlan_to_t1 += 1
+                        else:
+                            flow.missed_t1_to_vlan += 1
+                if not flow.disruption_start:
+                    flow.disruption_start = datetime.datetime.fromtimestamp(float(prev_time))
+                flow.disruption_stop = datetime.datetime.fromtimestamp(float(received_time))
+        prev_payload = received_payload
+        prev_time = received_time
+    flow.last_payload = prev_payload
+    return flow
+
+
+def legacy_analysis(filename):
+    return legacy_examine_flow(scapyall.rdpcap(filename), DUT_MAC, VLAN_MAC)
+
+
+def fast_analysis(filename):
+    return dataplane_loss.analyze_capture(filename, DUT_MAC, VLAN_MAC, lambda message: None)
+
+
+def flow_summary(flow):
+    """Everything examine_flow reports about the flow, and the payload IDs and times of the filtered packets."""
+    filtered = os.path.join(tempfile.gettempdir(), "dataplane_loss_benchmark_%d.pcap" % os.getpid())
+    try:
+        flow.write_filtered(filtered)
+        packets = [(int(bytes(packet[scapyall.TCP].payload)), float(packet.time)) for packet in
+                   scapyall.rdpcap(filtered)] if flow.filtered_count <= 200000 else None
+    finally:
+        os.remove(filtered)
+    return (flow.filtered_count, flow.lost_packets, flow.disruption_start, flow.disruption_stop,
+            flow.sent_counter, flow.received_counter, flow.received_t1_to_vlan, flow.received_vlan_to_t1,
+            flow.missed_t1_to_vlan, flow.missed_vlan_to_t1, flow.flooded_pkts,
+            flow.missing_sent_and_received_packet_id_sequences, flow.last_payload, packets)
+
+
+def mac_bytes(mac):
+    return bytes(int(octet, 16) for octet in mac.split(":"))
+
+
+def frame_template(dst, src, payload_length):
+    """Ether/IPv4/TCP headers of the advanced-reboot traffic."""
+    return (mac_bytes(dst) + mac_bytes(src) + struct.pack(">H", 0x0800) +
+            struct.pack(">BBHHHBBH4s4s", 0x45, 0, 40 + payload_length, 1, 0, 64, 6, 0,
+                        bytes([10, 0, 0, 1]), bytes([192, 168, 0, 2])) +
+            struct.pack(">HHIIBBHHH", 1234, 5000, 0, 0, 0x50, 0x02, 8192, 0, 0))
+
+
+def special_frames(packet_id, kind):
+    """Frames of a packet ID that the vectorized generation doesn't make, as (sent, received) lists."""
+    payload = ("0" * 60 + str(packet_id)).encode()
+    received_src = DUT_MAC if packet_id % 5 == 0 else VLAN_MAC
+    sent = bytes(scapyall.Ether(dst=DUT_MAC, src=PTF_MAC) / scapyall.IP(src="10.0.0.1", dst="192.168.0.2") /
+                 scapyall.TCP(sport=1234, dport=5000) / payload)
+    received = bytes(scapyall.Ether(dst=SERVER_MAC, src=received_src) /
+                     scapyall.IP(src="10.0.0.1", dst="192.168.0.2") / scapyall.TCP(sport=1234, dport=5000) / payload)
+    if kind == "flood_sent":
+        return [sent, sent], [received]
+    if kind == "flood_received":
+        return [sent], [received, received]
+    if kind == "not_sent":
+        return [], [received]
+    if kind == "vlan":
+        return [sent], [bytes(scapyall.Ether(dst=SERVER_MAC, src=received_src) / scapyall.Dot1Q(vlan=1000) /
+                              scapyall.IP(src="10.0.0.1", dst="192.168.0.2") /
+                              scapyall.TCP(sport=1234, dport=5000) / payload)]
+    if kind == "tcp_options":
+        return [bytes(scapyall.Ether(dst=DUT_MAC, src=PTF_MAC) / scapyall.IP(src="10.0.0.1", dst="192.168.0.2") /
+                      scapyall.TCP(sport=1234, dport=5000, options=[("MSS", 1460)]) / payload)], [received]
+    if kind == "spaced_payload":
+        return [sent], [received[:-len(payload)] + b" " + payload[1:]]
+    raise ValueError(kind)
+
+
+class CaptureWriter(object):
+    def __init__(self, filename, file_format):
+        self.f = open(filename, "wb")
+        self.pcapng = file_format == "pcapng"
+        if self.pcapng:
+            shb_body = struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1)
+            self.f.write(struct.pack("<II", 0x0A0D0D0A, 12 + len(shb_body)) + shb_body +
+                         struct.pack("<I", 12 + len(shb_body)))
+            idb_body = struct.pack("<HHI", 1, 0, 1514) + struct.pack("<HHB3x", 9, 1, 6) + struct.pack("<HH", 0, 0)
+            self.f.write(struct.pack("<II", 1, 12 + len(idb_body)) + idb_body + struct.pack("<I", 12 + len(idb_body)))
+        else:
+            self.f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+
+    def write(self, times_us, frames):
+        """Write frames, an array of frames of the same length, captured at times_us."""
+        count, length = frames.shape
+        if self.pcapng:
+            padding = -length % 4
+            block_length = 32 + length + padding
+            header = np.empty((count, 7), dtype="<u4")
+            header[:, 0] = 6
+            header[:, 1] = block_length
+            header[:, 2] = 0
+            header[:, 3] = times_us >> 32
+            header[:, 4] = times_us & 0xffffffff
+            header[:, 5] = length
+            header[:, 6] = length
+            trailer = np.full((count, 1), block_length, dtype="<u4")
+            records = np.hstack((header.view(np.uint8), frames, np.zeros((count, padding), dtype=np.uint8),
+                                 trailer.view(np.uint8)))
+        else:
+            header = np.empty((count, 4), dtype="<u4")
+            header[:, 0] = times_us // 10 ** 6
+            header[:, 1] = times_us % 10 ** 6
+            header[:, 2] = length
+            header[:, 3] = length
+            records = np.hstack((header.view(np.uint8), frames))
+        self.f.write(records.tobytes())
+
+    def close(self):
+        self.f.close()
+
+
+def generate_capture(filename, packets, file_format, seed=0):
+    """
+    Generate a capture of about packets packets: the sent and received packet of every payload ID, but the received
+    packets of a few disruptions and the packets of a few payload IDs which are not captured at all.
+    """
+    rnd = random.Random(seed)
+    ids = packets // 2
+    received_dropped = np.zeros(ids, dtype=bool)
+    all_dropped = np.zeros(ids, dtype=bool)
+    specials = {}
+    for _ in range(5):
+        length = rnd.randint(max(2, ids // 500), max(3, ids // 50))
+        start = rnd.randint(ids // 10, ids - ids // 10 - length)
+        received_dropped[start:start + length] = True
+        specials[start + length // 2] = "not_sent"
+    for _ in range(3):
+        start = rnd.randint(ids // 10, ids - ids // 10)
+        all_dropped[start:start + rnd.randint(1, 3)] = True
+    for kind in ("flood_sent", "flood_received", "vlan", "tcp_options", "spaced_payload"):
+        for _ in range(5):
+            specials[rnd.randint(ids // 10, ids - ids // 10)] = kind
+    # The captured packets are shuffled a bit between payload IDs
+    jitter = np.array([rnd.randint(0, 250) for _ in range(1024)], dtype=np.int64)
+
+    writer = CaptureWriter(filename, file_format)
+    boundaries = sorted(set([0, ids] + [10 ** digits for digits in range(1, 19) if 10 ** digits < ids] +
+                            list(range(0, ids, 65536)) + list(specials) + [i + 1 for i in specials]))
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        times_us = BASE_TIME_US + np.arange(start, stop, dtype=np.int64) * SEND_INTERVAL_US
+        if start in specials:
+            sent, received = special_frames(start, specials[start])
+            for frames, time_us in ((sent, times_us[0]), (received, times_us[0] + DUT_LATENCY_US)):
+                for frame in frames:
+                    writer.write(np.array([time_us]), np.frombuffer(frame, dtype=np.uint8)[None, :])
+            continue
+        ids_range = np.arange(start, stop)
+        digits = len(str(start))
+        payload = np.full((stop - start, 60 + digits), ord("0"), dtype=np.uint8)
+        for digit in range(digits):
+            payload[:, 60 + digit] += (ids_range // 10 ** (digits - 1 - digit) % 10).astype(np.uint8)
+        sent_frames = np.frombuffer(frame_template(DUT_MAC, PTF_MAC, payload.shape[1]), dtype=np.uint8)
+        vlan_to_t1 = np.frombuffer(frame_template(SERVER_MAC, DUT_MAC, payload.shape[1]), dtype=np.uint8)
+        t1_to_vlan = np.frombuffer(frame_template(SERVER_MAC, VLAN_MAC, payload.shape[1]), dtype=np.uint8)
+        sent_frames = np.hstack((np.broadcast_to(sent_frames, (len(payload), len(sent_frames))), payload))
+        received_frames = np.hstack((np.where((ids_range % 5 == 0)[:, None], vlan_to_t1, t1_to_vlan), payload))
+        frames = np.stack((sent_frames, received_frames), axis=1)
+        frame_times = np.stack((times_us, times_us + DUT_LATENCY_US + jitter[ids_range % len(jitter)]), axis=1)
+        kept = np.stack((~all_dropped[start:stop], ~(received_dropped | all_dropped)[start:stop]), axis=1)
+        writer.write(frame_times[kept], frames[kept])
+    writer.close()
+
+
+def measure(analysis, filename, queue):
+    start = time.time()
+    flow = analysis(filename)
+    elapsed = time.time() - start
+    # ru_maxrss is in KB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    summary = flow_summary(flow)
+    flow.close()
+    queue.put((elapsed, peak, summary))
+
+
+def run(context, analysis, filename):
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(analysis, filename, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark advanced-reboot dataplane loss analysis")
+    parser.add_argument("--packets", type=int, default=5000000, help="Number of packets of the capture")
+    parser.add_argument("--legacy_packets", type=int, default=40000,
+                        help="Number of packets of the capture compared with the legacy analysis")
+    parser.add_argument("--format", default="pcapng", choices=["pcap", "pcapng"], help="Format of the captures")
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix="dataplane_loss_benchmark_")
+    context = multiprocessing.get_context("fork")
+    try:
+        print("{:>10} {:>10} {:>10} {:>14} {:>12} {:>12}".format(
+            "analysis", "packets", "time(s)", "peak RSS(MB)", "received", "disruptions"))
+        summaries = {}
+        for packets, analyses in ((args.legacy_packets, [("fast", fast_analysis), ("legacy", legacy_analysis)]),
+                                  (args.packets, [("fast", fast_analysis)])):
+            filename = os.path.join(path, "capture_{}.{}".format(packets, args.format))
+            generate_capture(filename, packets, args.format)
+            for name, analysis in analyses:
+                elapsed, peak, summary = run(context, analysis, filename)
+                summaries[(name, packets)] = summary
+                print("{:>10} {:>10} {:>10.2f} {:>14.0f} {:>12} {:>12}".format(
+                    name, packets, elapsed, peak, summary[5], len(summary[1])))
+            os.remove(filename)
+        assert summaries[("fast", args.legacy_packets)] == summaries[("legacy", args.legacy_packets)], \
+            "Flows differ"
+        assert summaries[("fast", args.packets)][1], "No disruption found"
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark of filterout_subnet of the announce_routes module.
+
+Compare the legacy filterout_subnet (ipaddress.ip_network of every candidate parsed again for every aggregate) with
+PrefixIndex of module_utils/prefix_index_utils.py on generated candidate routes, and check that both keep the same
+routes.
+
+Usage:
+    python ansible/scripts/prefix_index_benchmark.py --candidates 500000 --aggregates 4 16
+"""
+import argparse
+import importlib.util
+import ipaddress
+import os
+import random
+import time
+
+MODULE_UTILS = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../module_utils/prefix_index_utils.py")
+spec = importlib.util.spec_from_file_location("prefix_index_utils", MODULE_UTILS)
+prefix_index_utils = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(prefix_index_utils)
+
+
+def legacy_filterout_subnet(aggregate_routes, candidate_routes):
+    subnets = []
+    for ar in aggregate_routes:
+        ar_net = ipaddress.ip_network(ar[0])
+        for cr in candidate_routes:
+            if ipaddress.ip_network(cr[0]).subnet_of(ar_net):
+                subnets.append(cr)
+    return list(set(candidate_routes) - set(subnets))
+
+
+def indexed_filterout_subnet(aggregate_routes, candidate_routes):
+    return prefix_index_utils.PrefixIndex(ar[0] for ar in aggregate_routes).filter_out(candidate_routes)
+
+
+def generate_candidates(family, count):
+    """Candidate routes like generate_routes, /24 (v4) or /64 (v6) subnets."""
+    routes = []
+    for index in range(count):
+        if family == "v4":
+            prefix = "{}.{}.{}.0/24".format(100 + (index >> 16) % 100, (index >> 8) & 0xff, index & 0xff)
+        else:
+            prefix = "20{:02X}:{:02X}{:02X}:0:{:02X}::/64".format(
+                (index >> 24) & 0xff, (index >> 16) & 0xff, (index >> 8) & 0xff, index & 0xff)
+        routes.append((prefix, "10.10.246.254", "64600 65534 6666 6667"))
+    return routes
+
+
+def generate_aggregates(candidates, count):
+    """Aggregates covering some of the candidates."""
+    random.seed(0)
+    aggregates = []
+    for route in random.sample(candidates, count):
+        network = ipaddress.ip_network(route[0])
+        aggregates.append((str(network.supernet(new_prefix=network.prefixlen - random.randint(2, 8))), "", ""))
+    return aggregates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filterout_subnet")
+    parser.add_argument("--candidates", type=int, default=500000, help="Number of candidate routes")
+    parser.add_argument("--aggregates", type=int, nargs="+", default=[4, 16], help="Number of aggregate routes")
+    parser.add_argument("--skip_legacy", action="store_true", help="Don't run the legacy implementation")
+    args = parser.parse_args()
+
+    print("{:>6} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "family", "candidates", "aggregates", "impl", "kept", "time(s)"))
+    for family in ["v4", "v6"]:
+        candidates = generate_candidates(family, args.candidates)
+        for count in args.aggregates:
+            aggregates = generate_aggregates(candidates, count)
+            results = {}
+            implementations = [("indexed", indexed_filterout_subnet)]
+            if not args.skip_legacy:
+                implementations.append(("legacy", legacy_filterout_subnet))
+            for name, func in implementations:
+                start = time.time()
+                results[name] = func(aggregates, candidates)
+                print("{:>6} {:>10} {:>10} {:>10} {:>10} {:>10.2f}".format(
+                    family, len(candidates), count, name, len(results[name]), time.time() - start))
+            if "legacy" in results:
+                assert set(results["legacy"]) == set(results["indexed"]), "Kept routes differ"
+
+
+if __name__ == "__main__":
+    main()
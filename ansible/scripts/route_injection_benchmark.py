@@ -0,0 +1,156 @@
+"""Benchmark of route injection into exabgp as done by the announce_routes module.
+
+Start local stand-ins of the exabgp HTTP API (http_api.py of the exabgp module), one per exabgp port, and inject
+routes through them with the legacy approach (requests.post with a new connection for every batch of 200 routes,
+one thread per port) and with RouteInjector (keep-alive session per port and adaptive batch size), then report
+routes/second. The stand-in charges a fixed cost per request and a cost per command, like exabgp reading commands
+from the http_api.py process.
+
+Usage:
+    python ansible/scripts/route_injection_benchmark.py --ports 16 --routes 50000
+    # Only run the stand-in endpoint, e.g. for exercising announce_routes against it
+    python ansible/scripts/route_injection_benchmark.py --serve --base_port 5000 --ports 4
+"""
+import argparse
+import importlib.util
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.pool import ThreadPool
+from urllib.parse import parse_qs
+
+import requests
+
+MODULE_UTILS = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../module_utils/route_injection_utils.py")
+spec = importlib.util.spec_from_file_location("route_injection_utils", MODULE_UTILS)
+route_injection_utils = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(route_injection_utils)
+
+
+class ExabgpStandIn(object):
+    """HTTP endpoint accepting the same requests as http_api.py of exabgp, commands are only counted."""
+
+    def __init__(self, port, request_cost=0.001, command_cost=0.00002):
+        self.commands = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                # Headers and body are written separately, don't let Nagle delay the body on kept alive connections
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+                form = parse_qs(body)
+                values = []
+                for command in form.get("command", []):
+                    values.append(command)
+                for commands in form.get("commands", []):
+                    values.extend(commands.split(";"))
+                time.sleep(request_cost + command_cost * len(values))
+                with stand_in._lock:
+                    stand_in.commands += len(values)
+                    stand_in.requests += 1
+                response = b"OK\n"
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.port)
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def generate_routes(count, offset=0):
+    for index in range(offset, offset + count):
+        yield ("{}.{}.{}.0/24".format(100 + (index >> 16) % 100, (index >> 8) & 0xff, index & 0xff),
+               "10.10.246.254", "64600 65534 6666 6667")
+
+
+def legacy_change_routes(action, url, routes, routes_batch_size=200):
+    """change_routes of announce_routes before RouteInjector, retries omitted."""
+    messages = list(route_injection_utils.format_route_commands(action, routes))
+    for i in range(0, len(messages), routes_batch_size):
+        data = {"commands": ";".join(messages[i:i + routes_batch_size])}
+        r = requests.post(url, data=data, timeout=360, proxies={"http": None, "https": None})
+        assert r.status_code == 200
+
+
+def legacy_inject(route_sets):
+    pool = ThreadPool(processes=len(route_sets))
+    try:
+        pool.map(lambda args: legacy_change_routes(args[2], args[1], args[0]), route_sets)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route injection into exabgp")
+    parser.add_argument("--ports", type=int, default=16, help="Number of exabgp ports (VMs x address families)")
+    parser.add_argument("--routes", type=int, default=50000, help="Number of routes per port")
+    parser.add_argument("--request_cost", type=float, default=0.001, help="Seconds spent by exabgp per request")
+    parser.add_argument("--command_cost", type=float, default=0.00002, help="Seconds spent by exabgp per route")
+    parser.add_argument("--serve", action="store_true", help="Only run the stand-in endpoints until interrupted")
+    parser.add_argument("--base_port", type=int, default=0, help="First port of the stand-in endpoints")
+    args = parser.parse_args()
+
+    stand_ins = [ExabgpStandIn(args.base_port + index if args.base_port else 0, args.request_cost,
+                               args.command_cost) for index in range(args.ports)]
+    try:
+        if args.serve:
+            print("Serving exabgp stand-ins on {}".format(", ".join(stand_in.url for stand_in in stand_ins)))
+            while True:
+                time.sleep(3600)
+
+        def route_sets():
+            return [(generate_routes(args.routes, index * args.routes), stand_in.url, "announce")
+                    for index, stand_in in enumerate(stand_ins)]
+
+        measurements = [
+            ("legacy", legacy_inject),
+            ("keep-alive", lambda sets: route_injection_utils.RouteInjector(adaptive=False)
+             .change_routes_in_parallel(sets)),
+            ("adaptive", lambda sets: route_injection_utils.RouteInjector().change_routes_in_parallel(sets)),
+        ]
+        print("{:>12} {:>10} {:>10} {:>10} {:>12}".format("injector", "routes", "requests", "time(s)", "routes/s"))
+        for name, inject in measurements:
+            for stand_in in stand_ins:
+                stand_in.commands = stand_in.requests = 0
+            start = time.time()
+            inject(route_sets())
+            elapsed = time.time() - start
+            routes = sum(stand_in.commands for stand_in in stand_ins)
+            assert routes == args.ports * args.routes
+            print("{:>12} {:>10} {:>10} {:>10.2f} {:>12.0f}".format(
+                name, routes, sum(stand_in.requests for stand_in in stand_ins), elapsed, routes / elapsed))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for stand_in in stand_ins:
+            stand_in.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 """
-AF_PACKET receive support
+AF_PACKET receive and transmit support
 
 When VLAN offload is enabled on the NIC Linux will not deliver the VLAN tag
 in the data returned by recv. Instead, it delivers the VLAN TCI in a control
 message. Python 2.x doesn't have built-in support for recvmsg, so we have to
 use ctypes to call it. The recv function exported by this module reconstructs
 the VLAN tag if it was offloaded.
+
+The TxRing class exported by this module sends frames in batches through a
+PACKET_TX_RING memory mapped ring: the frames are copied in the ring, and
+are sent with one system call when the ring is flushed. The RxRing class
+reads the frames received by a socket from a TPACKET_V3 PACKET_RX_RING
+memory mapped ring, a block of frames at a time, without copying them.
 """
 
+import mmap
+import select
+import socket
 import struct
 from ctypes import sizeof
 from ctypes import get_errno
@@ -28,8 +37,21 @@ from ctypes import c_uint32
 ETH_P_8021Q = 0x8100
 SOL_PACKET = 263
 PACKET_AUXDATA = 8
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+PACKET_TX_RING = 13
+PACKET_LOSS = 14
+TPACKET_V2 = 1
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+TP_STATUS_AVAILABLE = 0
+TP_STATUS_SEND_REQUEST = 1
 TP_STATUS_VLAN_VALID = 1 << 4
 
+# data offset in a TPACKET_V2 frame: TPACKET_ALIGN(sizeof(struct tpacket2_hdr))
+TPACKET2_DATA_OFFSET = 32
+
 
 class struct_iovec(Structure):
     _fields_ = [
@@ -131,3 +153,128 @@ def recv(sk, bufsize):
         return buf.raw[:12] + tag + buf.raw[12:rv]
     else:
         return buf.raw[:rv]
+
+
+class TxRing(object):
+    """
+    Send frames through a PACKET_TX_RING of an AF_PACKET socket bound to iface
+
+    Frames are queued with send and sent when the ring is full or by flush.
+    """
+
+    def __init__(self, iface, frames=64, frame_size=16384):
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V2)
+            # skip the frames the kernel can't send instead of stopping the ring
+            self.sock.setsockopt(SOL_PACKET, PACKET_LOSS, 1)
+            # struct tpacket_req: one frame per block, the frame size is a multiple of the page size
+            frame_size = (frame_size + mmap.PAGESIZE - 1) // mmap.PAGESIZE * mmap.PAGESIZE
+            req = struct.pack("IIII", frame_size, frames, frame_size, frames)
+            self.sock.setsockopt(SOL_PACKET, PACKET_TX_RING, req)
+            self.sock.bind((iface, 0))
+            self.ring = mmap.mmap(self.sock.fileno(), frame_size * frames, mmap.MAP_SHARED,
+                                  mmap.PROT_READ | mmap.PROT_WRITE)
+        except Exception:
+            self.sock.close()
+            raise
+        self.frames = frames
+        self.frame_size = frame_size
+        self.max_len = frame_size - TPACKET2_DATA_OFFSET
+        self.index = 0
+        self.pending = 0
+
+    def send(self, data):
+        """Queue frame data, return None if it is too large for the ring."""
+        if len(data) > self.max_len:
+            self.flush()
+            return None
+        offset = self.index * self.frame_size
+        if struct.unpack_from("I", self.ring, offset)[0] != TP_STATUS_AVAILABLE:
+            self.flush()
+        self.ring[offset + TPACKET2_DATA_OFFSET:offset + TPACKET2_DATA_OFFSET + len(data)] = data
+        # tp_len then tp_status, the kernel sends the frame once its status is TP_STATUS_SEND_REQUEST
+        struct.pack_into("I", self.ring, offset + 4, len(data))
+        struct.pack_into("I", self.ring, offset, TP_STATUS_SEND_REQUEST)
+        self.index = (self.index + 1) % self.frames
+        self.pending = self.pending + 1
+        if self.pending >= self.frames:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        """Send the queued frames, return when they are sent."""
+        if not self.pending:
+            return 0
+        self.pending = 0
+        return self.sock.send(b"")
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.ring.close()
+            self.sock.close()
+
+
+class RxRing(object):
+    """
+    Read the frames received by AF_PACKET socket sk from a TPACKET_V3 PACKET_RX_RING
+
+    The kernel fills the blocks of the ring with frames, and hands a block over when it is full or
+    after timeout ms. The frames of a block are read from ring, and the block is given back to the
+    kernel by release.
+    """
+
+    def __init__(self, sk, block_size=1 << 18, blocks=16, timeout=10):
+        self.sock = sk
+        self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        # struct tpacket_req3, the frame size only sets the number of frames of the ring in TPACKET_V3
+        frame_size = 2048
+        req = struct.pack("IIIIIII", block_size, blocks, frame_size, block_size // frame_size * blocks, timeout, 0, 0)
+        self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+        self.ring = mmap.mmap(self.sock.fileno(), block_size * blocks, mmap.MAP_SHARED,
+                              mmap.PROT_READ | mmap.PROT_WRITE)
+        self.block_size = block_size
+        self.blocks = blocks
+        self.block = 0
+
+    def read(self, timeout):
+        """
+        Wait timeout seconds at most for the next block, return its frames as (offset in ring, length, VLAN tag)
+        or None if no block is filled, the VLAN tag is the one to insert if the kernel removed it.
+        """
+        offset = self.block * self.block_size
+        # struct tpacket_block_desc: version, offset_to_priv, then struct tpacket_hdr_v1
+        if not struct.unpack_from("I", self.ring, offset + 8)[0] & TP_STATUS_USER:
+            select.select([self.sock], [], [], timeout)
+            if not struct.unpack_from("I", self.ring, offset + 8)[0] & TP_STATUS_USER:
+                return None
+        num_pkts, pos = struct.unpack_from("II", self.ring, offset + 12)
+        pos = offset + pos
+        frames = []
+        for _ in range(num_pkts):
+            # struct tpacket3_hdr: next_offset, sec, nsec, snaplen, len, status, mac, net, then hv1
+            next_offset, snaplen, status, mac = struct.unpack_from("I8xI4xIH", self.ring, pos)
+            tci = struct.unpack_from("I", self.ring, pos + 32)[0]
+            tag = None
+            if tci != 0 or status & TP_STATUS_VLAN_VALID:
+                tag = struct.pack("!HH", ETH_P_8021Q, tci)
+            frames.append((pos + mac, snaplen, tag))
+            pos = pos + next_offset
+        return frames
+
+    def frame(self, offset, length, tag):
+        """Return a frame of the block read, with its VLAN tag."""
+        data = self.ring[offset:offset + length]
+        if tag:
+            return data[:12] + tag + data[12:]
+        return data
+
+    def release(self):
+        """Give the block read back to the kernel."""
+        struct.pack_into("I", self.ring, self.block * self.block_size + 8, TP_STATUS_KERNEL)
+        self.block = (self.block + 1) % self.blocks
+
+    def close(self):
+        self.ring.close()
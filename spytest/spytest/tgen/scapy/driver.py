@@ -1,5 +1,6 @@
 import os
 import time
+import binascii
 import traceback
 import threading
 
@@ -121,6 +122,9 @@ class ScapyDriver(object):
             # read packets
             while self.rx_any_enable():
                 try:
+                    if self.packet.rx_ring:
+                        self.handle_recv_ring()
+                        continue
                     packet = self.packet.readp(self.iface, self.port)
                     if packet:
                         self.handle_recv(packet)
@@ -168,6 +172,58 @@ class ScapyDriver(object):
         if self.captureState.is_set():
             self.handle_capture(packet)
 
+    def handle_recv_ring(self):
+        frames = self.packet.readp_ring(self.iface, self.port)
+        if not frames:
+            return
+        rx_ring = self.packet.rx_ring
+        try:
+            if self.statState.is_set():
+                self.handle_stats_ring(rx_ring, frames)
+            if self.captureState.is_set():
+                for frame in frames:
+                    self.handle_capture(rx_ring.frame(*frame))
+        finally:
+            rx_ring.release()
+
+    def handle_stats_ring(self, rx_ring, frames):
+        """Count the frames of a block of the RX ring, matching the streams by the signature at the frame end."""
+        streams = {}
+        for stream in self.port.track_streams:
+            sid = stream.get_sid()
+            if sid:
+                # first matching stream, as handle_stats
+                streams.setdefault(binascii.unhexlify(sid), stream)
+        sizes = set(len(sid) for sid in streams)
+
+        ring = rx_ring.ring
+        total, oversize = 0, 0
+        stream_stats = {}
+        for offset, length, tag in frames:
+            end = offset + length
+            if tag:
+                length = length + 4
+            total = total + length
+            if length > 1518:
+                oversize = oversize + 1
+            for size in sizes:
+                stream = streams.get(ring[end - size - 4:end - 4]) if length >= size + 4 else None
+                if stream:
+                    stats = stream_stats.setdefault(stream, [0, 0])
+                    stats[0] = stats[0] + 1
+                    stats[1] = stats[1] + length
+                    break
+
+        framesReceived = self.port.incrStat('framesReceived', len(frames))
+        self.port.incrStat('bytesReceived', total)
+        if self.dbg > 2:
+            self.logger.debug("{} framesReceived: {}".format(self.iface, framesReceived))
+        if oversize:
+            self.port.incrStat('oversizeFramesReceived', oversize)
+        for stream, stats in stream_stats.items():
+            stream.incrStat('framesReceived', stats[0])
+            stream.incrStat('bytesReceived', stats[1])
+
     def txInit(self):
         self.txState = threading.Event()
         self.txState.clear()
@@ -349,6 +405,7 @@ class ScapyDriver(object):
                 self.txThreadMainInner()
             except Exception as e:
                 self.logger.log_exception(e, traceback.format_exc())
+            self.packet.flush_tx()
             self.clear_tx_state()
 
     def txThreadMainInnerStart(self, pwa_list, sids):
@@ -454,6 +511,9 @@ class ScapyDriver(object):
         if self.dbg > 2 or (self.dbg > 1 and pwa.left != 0):
             self.logger.debug("stream: {} delay: {} pps: {}".format(pwa.stream.stream_id, delay, pwa.rate_pps))
         delay = 0 if delay < 0 else delay
+        if delay > 0:
+            # send the queued frames before waiting
+            self.packet.flush_tx()
         if delay > 1.0 / 10:
             self.utils.msleep(delay * 1000, 10)
         elif delay > 1.0 / 100:
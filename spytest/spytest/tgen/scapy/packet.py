@@ -31,6 +31,7 @@ from interface import PacketInterface
 from bgp_exabgp import ExaBgp
 from dot1x import Dot1x
 from dhcps import Dhcps
+from packet_template import PacketTemplate
 
 try:
     print("SCAPY VERSION = {}".format(Conf().version))
@@ -149,8 +150,15 @@ class ScapyPacket(object):
         self.tx_count = 0
         self.rx_count = 0
         self.rx_sock = None
+        self.rx_ring = None
+        self.use_rx_ring = bool(os.getenv("SPYTEST_SCAPY_RX_RING", "1") != "0")
         self.tx_sock = None
         self.tx_sock_failed = False
+        self.tx_ring = None
+        self.tx_ring_failed = False
+        self.use_tx_ring = bool(os.getenv("SPYTEST_SCAPY_TX_RING", "1") != "0")
+        self.tx_ring_frames = self.utils.get_env_int("SPYTEST_SCAPY_TX_RING_FRAMES", 64)
+        self.use_templates = bool(os.getenv("SPYTEST_SCAPY_USE_TEMPLATES", "1") != "0")
         self.finished = False
         self.mtu = 9194
         self.use_bridge = bool(os.getenv("SPYTEST_SCAPY_USE_BRIDGE", "1") != "0")
@@ -261,9 +269,12 @@ class ScapyPacket(object):
         self.dot1x.cleanup()
         self.dhcps.cleanup()
         self.finished = True
+        self.rx_ring = self.close_sock(self.rx_ring)
         self.rx_sock = self.close_sock(self.rx_sock)
         self.tx_sock = self.close_sock(self.tx_sock)
         self.tx_sock_failed = False
+        self.tx_ring = self.close_sock(self.tx_ring)
+        self.tx_ring_failed = False
         self.init_bridge(self.iface)
         self.finished = False
 
@@ -282,6 +293,11 @@ class ScapyPacket(object):
                 raise exp
             raise RunTimeException(exp, msg)
         afpacket.enable_auxdata(self.rx_sock)
+        if self.use_rx_ring:
+            try:
+                self.rx_ring = afpacket.RxRing(self.rx_sock)
+            except Exception as exp:
+                self.error("Failed to create RX ring {} {}".format(self.iface, exp))
 
     def set_link(self, status):
         msg = "link:{} status:{}".format(self.iface, status)
@@ -321,7 +337,48 @@ class ScapyPacket(object):
 
         return packet
 
-    def sendp(self, pkt, data, iface, stream_name, left):
+    def readp_ring(self, iface, port):
+        """
+        Read the next block of frames of the RX ring, which stays valid until rx_ring.release.
+        Only the frames handled by the protocols are dissected.
+        """
+        try:
+            frames = self.rx_ring.read(1)
+        except Exception as exp:
+            if self.finished:
+                return None
+            raise exp
+        if not frames:
+            return None
+        self.stats_lock.acquire()
+        self.rx_count = self.rx_count + len(frames)
+        self.stats_lock.release()
+        self.trace_stats()
+
+        ring = self.rx_ring.ring
+        try:
+            for offset, length, tag in frames:
+                if self.dbg > 1:
+                    msg = "readp:{} len:{} count:{}".format
+                    self.logger.debug(msg(iface, length + (4 if tag else 0), self.rx_count))
+                if self.dbg > 2 or self.pp.needs(ring, offset, length):
+                    packet = Ether(self.rx_ring.frame(offset, length, tag))
+                    if self.dbg > 3:
+                        self.trace_packet(packet, self.hex)
+                    # handle protocol packets, the other frames of the block are still counted on error
+                    try:
+                        self.pp.process(port, packet)
+                    except Exception as exp:
+                        self.logger.debug(exp, traceback.format_exc())
+                        self.logger.debug("readp:{} '{}' - ignoring".format(iface, exp))
+            self.pp.periodic(port)
+        except Exception as exp:
+            self.rx_ring.release()
+            raise exp
+
+        return frames
+
+    def sendp(self, pkt, data, iface, stream_name, left, queue=False):
         self.stats_lock.acquire()
         self.tx_count = self.tx_count + 1
         self.stats_lock.release()
@@ -335,7 +392,7 @@ class ScapyPacket(object):
         if self.dbg > 3:
             self.trace_packet(pkt, self.hex)
 
-        return self.send(data, iface)
+        return self.send(data, iface, queue=queue)
 
     def mkcmd(self, data):
         try:
@@ -349,7 +406,7 @@ class ScapyPacket(object):
         cmd = self.mkcmd(data)
         return "{}:{} len:{} {} {}".format(func, iface, len(data), cmd, str(exp))
 
-    def send(self, data, iface, trace=False):
+    def send(self, data, iface, trace=False, queue=False):
 
         if trace and self.dbg > 2:
             cmd = self.mkcmd(data)
@@ -359,6 +416,12 @@ class ScapyPacket(object):
         if self.dry:
             return
 
+        # queue in the TX ring, sent by flush_tx
+        if queue and self.use_tx_ring:
+            rv = self.send_ring(data, iface)
+            if rv is not None:
+                return rv
+
         if not self.tx_sock:
             try:
                 self.tx_sock = L2Socket(iface)
@@ -389,6 +452,32 @@ class ScapyPacket(object):
         self.logger.error("Failed to send normal {}".format(err1))
         self.logger.error("Failed to send legacy {}".format(err2))
 
+    def send_ring(self, data, iface):
+        if not self.tx_ring:
+            try:
+                self.tx_ring = afpacket.TxRing(iface, self.tx_ring_frames)
+                self.tx_ring_failed = False
+            except Exception as exp:
+                func = self.logger.debug if self.tx_ring_failed else self.error
+                self.tx_ring_failed = True
+                func("Failed to create TX ring {} {}".format(iface, exp))
+                return None
+        try:
+            return self.tx_ring.send(data)
+        except Exception as exp:
+            self.logger.error("Failed to send ring {}".format(self.expmsg(data, iface, exp, "ring-send")))
+            self.tx_ring = self.close_sock(self.tx_ring)
+        return None
+
+    def flush_tx(self):
+        if not self.tx_ring:
+            return
+        try:
+            self.tx_ring.flush()
+        except Exception as exp:
+            self.logger.error("Failed to flush TX ring {} {}".format(self.iface, exp))
+            self.tx_ring = self.close_sock(self.tx_ring)
+
     def trace_stats(self):
         # self.logger.debug("Name: {} RX: {} TX: {}".format(self.iface, self.rx_count, self.tx_count))
         pass
@@ -414,6 +503,12 @@ class ScapyPacket(object):
             self.logger.debug(hexdump(pkt, dump=True))
 
     def send_packet(self, pwa, iface, stream_name, left):
+        if pwa.template:
+            bstr = pwa.template.frame()
+            pkt = Ether(bstr) if self.dbg > 2 else None
+            self.sendp(pkt, bstr, iface, stream_name, left, queue=True)
+            return bstr
+
         if pwa.padding:
             strpkt = self.utils.tobytes(pwa.pkt / pwa.padding)
         else:
@@ -916,6 +1011,11 @@ class ScapyPacket(object):
         pwa.frame_size_step = frame_size_step
         self.add_padding(pwa, True)
 
+        pwa.template = None
+        if self.use_templates:
+            pwa.template = PacketTemplate.compile(pwa, self.utils)
+        self.logger.debug("stream {} compiled: {}".format(stream.stream_id, bool(pwa.template)))
+
         return pwa
 
     def add_padding(self, pwa, first):
@@ -944,6 +1044,14 @@ class ScapyPacket(object):
 
     def build_next_dma(self, pwa):
 
+        # change the fields of the compiled stream unless the stream is modified
+        if pwa.template:
+            if not pwa.template.modified():
+                pwa.template.advance()
+                return pwa
+            pwa.template.sync(pwa)
+            pwa.template = None
+
         # Change Ether SRC MAC
         mac_src_mode = pwa.stream.kws.get("mac_src_mode", "fixed").strip()
         mac_src_step = pwa.stream.kws.get("mac_src_step", "00:00:00:00:00:01")
@@ -0,0 +1,281 @@
+"""
+Compiled packet streams
+
+A stream whose frames only differ by the fields changed by build_next_dma
+(MAC, ARP hardware, IP and IPv6 addresses, VLAN and TCP/UDP ports) and whose
+frame size is fixed is compiled into a PacketTemplate: the first packet is
+built once with scapy, and the next frames are made by writing the changed
+fields at their offsets in the frame, updating the IP header and L4
+checksums incrementally (RFC 1624) instead of building the packet again.
+
+The fields change as build_next_dma changes them, with the same steps,
+counts and resets, so that the frames are the same as the scapy ones.
+"""
+
+import socket
+import struct
+import binascii
+import zlib
+
+from scapy.packet import Padding, Raw, NoPayload
+from scapy.layers.l2 import Ether, Dot1Q, ARP
+from scapy.layers.inet import IP, UDP, TCP, ICMP
+from scapy.layers.inet6 import IPv6
+from scapy.contrib.igmp import IGMP
+
+from utils import Utils
+
+# fields changed by build_next_dma, in the same order
+# (name, layer, scapy field, kind, offset in layer, default step, reset value (kws key, default))
+FIELDS = [
+    ("mac_src", Ether, "src", "mac", 6, "00:00:00:00:00:01", None),
+    ("mac_dst", Ether, "dst", "mac", 0, "00:00:00:00:00:01", None),
+    ("arp_src_hw", ARP, "hwsrc", "mac", 8, "00:00:00:00:00:01", ("arp_src_hw_addr", "00:00:01:00:00:02")),
+    ("arp_dst_hw", ARP, "hwdst", "mac", 18, "00:00:00:00:00:01", ("arp_dst_hw_addr", "00:00:00:00:00:00")),
+    ("ip_src", IP, "src", "ipv4", 12, "0.0.0.1", ("ip_src_addr", "0.0.0.0")),
+    ("ip_dst", IP, "dst", "ipv4", 16, "0.0.0.1", ("ip_dst_addr", "192.0.0.1")),
+    ("ipv6_src", IPv6, "src", "ipv6", 8, "::1", ("ipv6_src_addr", "fe80:0:0:0:0:0:0:12")),
+    ("ipv6_dst", IPv6, "dst", "ipv6", 24, "::1", ("ipv6_dst_addr", "fe80:0:0:0:0:0:0:22")),
+    ("vlan_id", Dot1Q, "vlan", "vlan", 0, 1, ("vlan_id", 0)),
+    ("tcp_src_port", TCP, "sport", "port", 0, 1, ("tcp_src_port", 0)),
+    ("tcp_dst_port", TCP, "dport", "port", 2, 1, ("tcp_dst_port", 0)),
+    ("udp_src_port", UDP, "sport", "port", 0, 1, ("udp_src_port", 0)),
+    ("udp_dst_port", UDP, "dport", "port", 2, 1, ("udp_dst_port", 0)),
+]
+
+MAC_MODES = ["increment", "decrement", "list"]
+PORT_MODES = ["increment", "decrement", "incr", "decr"]
+INCREMENT_MODES = ["increment", "incr"]
+
+# offset of the checksum in the L4 layers using the IP pseudo header
+PSEUDO_HEADER_CHECKSUMS = {UDP: 6, TCP: 16}
+
+# payloads of IP and IPv6 not using the IP pseudo header in their checksum
+NO_PSEUDO_HEADER_LAYERS = (ICMP, IGMP, Padding, Raw, NoPayload)
+
+
+def mac2int(mac):
+    return int(mac.replace(":", "").replace(".", ""), 16)
+
+
+def ipv42int(ip):
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+
+def ipv62int(ip):
+    return Utils.ipv6_ip2long(ip)
+
+
+def update_checksum(checksum, old, new):
+    """Return checksum updated for the change of the 16 bits aligned data old to new (RFC 1624 eqn. 3)."""
+    # sum of the 16 bits words of data, in one's complement, is the data modulo 0xffff
+    total = (0xffff - checksum + int.from_bytes(new, "big") - int.from_bytes(old, "big")) % 0xffff
+    return 0xffff - (total or 0xffff)
+
+
+class TemplateField(object):
+
+    def __init__(self, name, layer, attr, kind, offset, mode, step, count, reset, values, checksums):
+        self.name = name
+        self.layer = layer
+        self.attr = attr
+        self.kind = kind
+        self.offset = offset
+        self.size = {"mac": 6, "ipv4": 4, "ipv6": 16, "vlan": 2, "port": 2}[kind]
+        self.mode = mode
+        self.step = step
+        self.count = count
+        self.reset = reset
+        self.values = values
+        self.value = None
+        self.counter = 0
+        # the TCP and UDP destination ports are stepped from the source port, like build_next_dma does
+        self.sport = None
+        self.sport_field = None
+        # (offset of the checksum, is a UDP checksum)
+        self.checksums = checksums
+
+    def advance(self):
+        if self.mode == "list":
+            self.counter = self.counter + 1
+            if self.counter >= len(self.values):
+                self.value = self.values[0]
+                self.counter = 0
+            else:
+                self.value = self.values[self.counter]
+            return
+
+        value = self.value
+        if self.sport_field:
+            value = self.sport_field.value
+        elif self.sport is not None:
+            value = self.sport
+        if self.mode in INCREMENT_MODES:
+            value = value + self.step
+        else:
+            value = value - self.step
+        if self.kind == "ipv4":
+            # same error as Utils.incrementIPv4 out of the IPv4 range
+            struct.pack("!I", value)
+        elif self.kind == "ipv6" and not 0 <= value < 1 << 128:
+            value = Utils.ipv6_ip2long(Utils.ipv6_long2ip(value))
+        self.value = value
+        self.counter = self.counter + 1
+        if self.count > 0 and self.counter >= self.count:
+            self.value = self.reset
+            self.counter = 0
+
+    def pack(self, buf):
+        if self.kind == "mac":
+            return self.value.to_bytes(6, "big")
+        if self.kind == "ipv4":
+            return struct.pack("!I", self.value)
+        if self.kind == "ipv6":
+            return self.value.to_bytes(16, "big")
+        if self.kind == "vlan":
+            # priority and CFI bits are kept, the VLAN ID is truncated to 12 bits like scapy does
+            tci = (buf[self.offset] << 8) & 0xf000
+            return struct.pack("!H", tci | (self.value & 0xfff))
+        return struct.pack("!H", self.value)
+
+    def scapy_value(self):
+        if self.kind == "mac":
+            return ':'.join(("%012X" % self.value)[i:i + 2] for i in range(0, 12, 2))
+        if self.kind == "ipv4":
+            return socket.inet_ntoa(struct.pack("!I", self.value))
+        if self.kind == "ipv6":
+            return Utils.ipv6_long2ip(self.value)
+        return self.value
+
+
+class PacketTemplate(object):
+    """
+    Frames of a stream made from the first one by patching the changing fields.
+
+    Returns None from compile if the stream can't be compiled, the stream is then built with scapy.
+    """
+
+    def __init__(self, pwa, frame, fields, sid):
+        self.stream = pwa.stream
+        self.version = pwa.stream.version
+        self.fields = fields
+        self.buf = bytearray(frame)
+        # the stream signature replaces the end of the frame, after the checksums are computed
+        self.sid = sid
+        self.sid_start = len(frame) - len(sid) if sid else len(frame)
+
+    @staticmethod
+    def compile(pwa, utils):
+        if pwa.length_mode != "fixed" or pwa.padding:
+            return None
+        pkt, kws = pwa.pkt, pwa.stream.kws
+        frame = utils.tobytes(pkt)
+        offsets = {}
+        layer = pkt
+        while not isinstance(layer, NoPayload):
+            offsets.setdefault(type(layer), len(frame) - len(utils.tobytes(layer)))
+            layer = layer.payload
+
+        fields = []
+        for name, layer, attr, kind, offset, step, reset in FIELDS:
+            if layer not in offsets:
+                continue
+            mode = kws.get("{}_mode".format(name), "fixed").strip()
+            if mode == "fixed":
+                continue
+            modes = MAC_MODES if layer == Ether else PORT_MODES if kind == "port" else ["increment", "decrement"]
+            if mode not in modes:
+                # let build_next_dma report it
+                return None
+            checksums = PacketTemplate.checksums(pkt, offsets, layer)
+            if checksums is None:
+                return None
+            values = None
+            step = kws.get("{}_step".format(name), step)
+            if kind == "mac":
+                step = mac2int(step)
+                if reset:
+                    reset = mac2int(kws.get(reset[0], reset[1]).replace(".", ":"))
+                else:
+                    values = [mac2int(mac) for mac in kws[name]]
+                    reset = values[0]
+            elif kind == "ipv4":
+                step, reset = ipv42int(step), ipv42int(kws.get(reset[0], reset[1]))
+            elif kind == "ipv6":
+                step, reset = ipv62int(step), ipv62int(kws.get(reset[0], reset[1]))
+            else:
+                step, reset = utils.intval(kws, "{}_step".format(name), step), utils.intval(kws, reset[0], reset[1])
+            count = utils.intval(kws, "{}_count".format(name), 0)
+            field = TemplateField(name, layer, attr, kind, offsets[layer] + offset, mode, step, count,
+                                  reset, values, checksums)
+            field.value = int.from_bytes(frame[field.offset:field.offset + field.size], "big")
+            if kind == "vlan":
+                field.value = getattr(pkt[Dot1Q], attr)
+            if attr == "dport":
+                field.sport = pkt[layer].sport
+                field.sport_field = ([f for f in fields if f.layer == layer and f.attr == "sport"] or [None])[0]
+            fields.append(field)
+
+        sid = None
+        if pwa.add_signature:
+            sid = binascii.unhexlify(pwa.stream.get_sid() or "DeadBeef")
+        return PacketTemplate(pwa, frame, fields, sid)
+
+    @staticmethod
+    def checksums(pkt, offsets, layer):
+        """Return the checksums changed with a field of layer, None if unknown."""
+        if layer in PSEUDO_HEADER_CHECKSUMS:
+            return [(offsets[layer] + PSEUDO_HEADER_CHECKSUMS[layer], layer == UDP)]
+        if layer not in [IP, IPv6]:
+            return []
+        rv = [(offsets[IP] + 10, False)] if layer == IP else []
+        ip = pkt[layer]
+        payload = ip.payload
+        if type(payload) in PSEUDO_HEADER_CHECKSUMS:
+            offset = offsets[type(payload)] + PSEUDO_HEADER_CHECKSUMS[type(payload)]
+            rv.append((offset, type(payload) is UDP))
+        elif layer == IPv6 and ip.nh == 58 and type(payload).__name__.startswith("ICMPv6"):
+            rv.append((offsets[type(payload)] + 2, False))
+        elif not isinstance(payload, NO_PSEUDO_HEADER_LAYERS):
+            return None
+        return rv
+
+    def modified(self):
+        """Return True if the stream is modified since it was compiled."""
+        return self.stream.version != self.version
+
+    def advance(self):
+        """Change the fields for the next frame, as build_next_dma does."""
+        for field in self.fields:
+            field.advance()
+        return self
+
+    def frame(self):
+        """Return the current frame, with its CRC."""
+        buf = self.buf
+        for field in self.fields:
+            data = field.pack(buf)
+            start, end = field.offset, field.offset + field.size
+            old = buf[start:end]
+            if old == data:
+                continue
+            buf[start:end] = data
+            for offset, udp in field.checksums:
+                checksum = (buf[offset] << 8) | buf[offset + 1]
+                if udp and checksum == 0:
+                    # no UDP checksum
+                    continue
+                checksum = update_checksum(checksum, old, data)
+                if udp and checksum == 0:
+                    checksum = 0xffff
+                buf[offset] = checksum >> 8
+                buf[offset + 1] = checksum & 0xff
+        strpkt = bytes(buf[:self.sid_start]) + self.sid if self.sid else bytes(buf)
+        return strpkt + struct.pack("!I", socket.htonl(zlib.crc32(strpkt) & 0xFFFFFFFF))
+
+    def sync(self, pwa):
+        """Set the scapy packet and the counters of pwa to the current fields, to continue with build_next_dma."""
+        for field in self.fields:
+            layer = pwa.pkt[0] if field.layer == Ether else pwa.pkt[field.layer]
+            setattr(layer, field.attr, field.scapy_value())
+            pwa["{}_count".format(field.name)] = field.counter
@@ -24,6 +24,8 @@ class ScapyStream(object):
         self.stream_id = stream_id
         self.args = args
         self.kws = copy.copy(kws)
+        # changed with the kws, the compiled frames of the stream are built again
+        self.version = 0
         self.enable = True
         self.enable2 = False
         self.stats = port_stats_init()
@@ -41,6 +43,10 @@ class ScapyStream(object):
     def get_sid(self):
         return '{:08x}'.format((int(self.port) << 16) + (int(self.index)))
 
+    def update(self, kws):
+        self.kws.update(kws)
+        self.version = self.version + 1
+
     def lock(self):
         self.stream_lock.acquire()
 
@@ -407,7 +413,7 @@ class ScapyPort(object):
                     if not validate_stream_id:
                         break
                     self.error("invalid", "traffic_config-modify-stream_id", stream_id)
-                self.streams[stream_id].kws.update(kws)
+                self.streams[stream_id].update(kws)
         elif mode == "reset":
             self.streams = SpyTestDict()
         else:
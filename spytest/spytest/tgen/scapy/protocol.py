@@ -20,6 +20,14 @@ from scapy.contrib.igmp import IGMP
 from scapy.contrib.igmpv3 import IGMPv3, IGMPv3mr, IGMPv3gr, IGMPv3mq
 from scapy.utils import chexdump
 
+# frames process may handle, found without dissecting them (see PacketProtocol.needs):
+# EAPOL, IGMP and OSPF, BOOTP and RADIUS, and the tunnels and IPv6 extension headers scapy dissects through
+VLAN_ETHER_TYPES = (0x8100, 0x88a8, 0x9100)
+PROCESS_ETHER_TYPES = (0x888e,)
+PROCESS_IP_PROTOCOLS = (2, 4, 41, 47, 51, 89)
+PROCESS_IPV6_HEADERS = (0, 4, 41, 43, 44, 47, 51, 60)
+PROCESS_UDP_PORTS = (67, 68, 434, 1701, 1812, 1813, 3799, 4754, 4789, 4790, 6633, 8472, 48879)
+
 
 class PacketProtocol(object):
 
@@ -46,9 +54,45 @@ class PacketProtocol(object):
         if EAP in pkt:
             self.dot1x_rx(port, pkt)
 
+        self.periodic(port)
+
+    def periodic(self, port):
         self.igmp_tx_query_periodic(port)
         self.dot1x_tx_periodic(port)
 
+    def needs(self, data, offset, length):
+        """Return True if process may handle the frame at offset of data, from the headers of the frame."""
+        end = offset + length
+        pos = offset + 12
+        while pos + 2 <= end and ((data[pos] << 8) | data[pos + 1]) in VLAN_ETHER_TYPES:
+            pos = pos + 4
+        if pos + 2 > end:
+            return False
+        ether_type = (data[pos] << 8) | data[pos + 1]
+        pos = pos + 2
+        # LLC frames may be SNAP encapsulated IP
+        if ether_type <= 1500 or ether_type in PROCESS_ETHER_TYPES:
+            return True
+        if ether_type == 0x0800:
+            if pos + 20 > end or data[pos] & 0xf < 5 or data[pos + 9] in PROCESS_IP_PROTOCOLS:
+                return True
+            # the UDP header is only dissected in the first fragment
+            if data[pos + 9] != 17 or ((data[pos + 6] << 8) | data[pos + 7]) & 0x1fff:
+                return False
+            pos = pos + (data[pos] & 0xf) * 4
+        elif ether_type == 0x86dd:
+            if pos + 40 > end or data[pos + 6] in PROCESS_IPV6_HEADERS:
+                return True
+            if data[pos + 6] != 17:
+                return False
+            pos = pos + 40
+        else:
+            return False
+        if pos + 4 > end:
+            return True
+        return ((data[pos] << 8) | data[pos + 1]) in PROCESS_UDP_PORTS or \
+            ((data[pos + 2] << 8) | data[pos + 3]) in PROCESS_UDP_PORTS
+
     def pkt_write(self, file_path, pkt, append):
         try:
             self.logger.write_pcap(pkt, append=True, filename=file_path)
@@ -0,0 +1,178 @@
+"""Benchmark of the receive path of the scapy traffic generator.
+
+Send the frames of a few signed streams through a veth pair <iface> <iface>-rx at the highest rate of the TX ring,
+and count them with the receive thread of the driver reading <iface>-rx: once reading a frame at a time from the
+socket, dissecting it with scapy and matching the streams on the scapy packet, and once reading the blocks of the RX
+ring and matching the streams in the ring. The frames received and matched per stream are compared with the frames sent.
+
+Must run as root to create the veth pair.
+
+Usage:
+    python3 spytest/spytest/tgen/scapy/rx_benchmark.py --frames 200000
+"""
+import argparse
+import copy
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+import afpacket  # noqa: E402
+from driver import ScapyDriver  # noqa: E402
+from lock import Lock  # noqa: E402
+from packet import ScapyPacket  # noqa: E402
+from port import ScapyStream, incrStat  # noqa: E402
+from stats import port_stats_init  # noqa: E402
+
+STREAMS = [
+    dict(l3_protocol='ipv4', l4_protocol='udp', ip_src_addr='10.0.0.1', ip_dst_addr='20.0.0.1',
+         ip_src_mode='increment', ip_src_count=1000, udp_src_port_mode='increment', frame_size=64),
+    dict(l3_protocol='ipv4', l4_protocol='tcp', ip_dst_addr='20.0.0.2', tcp_dst_port_mode='increment',
+         l2_encap='ethernet_ii_vlan', vlan_id=10, vlan_id_mode='increment', vlan_id_count=10, frame_size=128),
+    dict(l3_protocol='ipv6', l4_protocol='udp', ipv6_src_addr='2001::1', ipv6_dst_addr='2002::1',
+         ipv6_dst_mode='increment', ipv6_dst_count=1000, frame_size=512),
+    dict(l3_protocol='ipv4', l4_protocol='udp', udp_dst_port=1000, frame_size=1500),
+]
+
+
+class BenchPort(object):
+    """Port of the streams tracked by the driver, as ScapyPort."""
+
+    def __init__(self):
+        self.interfaces = {}
+        self.dot1x_clients = {}
+        self.track_streams = []
+        self.stats = port_stats_init()
+        self.stats_lock = Lock()
+
+    def incrStat(self, name, val=1):
+        self.stats_lock.acquire()
+        rv = incrStat(self.stats, name, val)
+        self.stats_lock.release()
+        return rv
+
+
+def make_streams(port, frames_per_stream):
+    """Return the streams tracked by port, and the frames sent for each of them."""
+    packet = ScapyPacket("", dry=True)
+    streams, frames = [], []
+    for index, kws in enumerate(STREAMS):
+        kws = copy.deepcopy(kws)
+        kws.setdefault("transmit_mode", "continuous")
+        kws.setdefault("mode", "create")
+        stream = ScapyStream(1, index, "stream-{}".format(index), [port], **kws)
+        pwa = packet.build_first(stream)
+        stream_frames = []
+        for _ in range(frames_per_stream):
+            stream_frames.append(packet.send_packet(pwa, "", stream.stream_id, pwa.left))
+            pwa = packet.build_next(pwa)
+        streams.append(stream)
+        frames.append(stream_frames)
+    return streams, frames
+
+
+def make_driver(args, port, use_rx_ring):
+    """Return a driver receiving from the peer, without the interface setup of ScapyPacket."""
+    packet = ScapyPacket("", dry=False)
+    packet.use_rx_ring = use_rx_ring
+    # rx_open binds <iface>-rx
+    packet.iface = args.iface
+    packet.rx_open()
+    assert bool(packet.rx_ring) == use_rx_ring
+    driver = ScapyDriver.__new__(ScapyDriver)
+    driver.port = port
+    driver.dry = False
+    driver.dbg = 0
+    driver.errs = []
+    driver.finished = False
+    driver.logger = packet.logger
+    driver.iface = packet.iface
+    driver.packet = packet
+    driver.linkThread = None
+    driver.iface_status = True
+    driver.captureQueueInit()
+    driver.captureState = threading.Event()
+    driver.protocolState = threading.Event()
+    driver.statState = threading.Event()
+    driver.statState.set()
+    driver.txState = threading.Event()
+    return driver
+
+
+def measure(args, use_rx_ring):
+    port = BenchPort()
+    streams, frames = make_streams(port, args.frames_per_stream)
+    driver = make_driver(args, port, use_rx_ring)
+    thread = threading.Thread(target=driver.rxThreadMain)
+    thread.daemon = True
+    thread.start()
+
+    tx_ring = afpacket.TxRing(args.iface)
+    sent = [0] * len(streams)
+    start = time.time()
+    for num in range(args.frames):
+        index = num % len(streams)
+        tx_ring.send(frames[index][(num // len(streams)) % args.frames_per_stream])
+        sent[index] = sent[index] + 1
+    tx_ring.flush()
+    elapsed = time.time() - start
+
+    # wait for the receive thread to count the last frames
+    received = -1
+    while received != port.stats["framesReceived"]:
+        received = port.stats["framesReceived"]
+        time.sleep(0.5)
+    driver.statState.clear()
+    driver.finished = True
+    # wake up the receive thread blocked reading the socket
+    tx_ring.send(frames[0][0])
+    tx_ring.flush()
+    thread.join(5)
+    tx_ring.close()
+    driver.packet.finished = True
+    driver.packet.rx_ring = driver.packet.close_sock(driver.packet.rx_ring)
+    driver.packet.rx_sock = driver.packet.close_sock(driver.packet.rx_sock)
+    # no interface to clean up when ScapyPacket is deleted
+    driver.packet.iface = ""
+
+    matched = [stream.stats["framesReceived"] for stream in streams]
+    for stream in streams:
+        port.track_streams.remove(stream)
+        stream.track_ports = []
+    return sum(sent) / elapsed, sent, received, matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the receive path of the scapy traffic generator")
+    parser.add_argument("--frames", type=int, default=200000, help="Frames sent per measure")
+    parser.add_argument("--frames_per_stream", type=int, default=100, help="Different frames of each stream")
+    parser.add_argument("--iface", default="rxbench", help="Transmitting end of the veth pair")
+    args = parser.parse_args()
+
+    peer = "{}-rx".format(args.iface)
+    created = not os.path.exists("/sys/class/net/{}".format(args.iface))
+    if created:
+        subprocess.check_call(["ip", "link", "add", args.iface, "type", "veth", "peer", "name", peer])
+    try:
+        for iface in [args.iface, peer]:
+            # no IPv6 neighbor discovery frames from the kernel
+            subprocess.call(["sysctl", "-qw", "net.ipv6.conf.{}.disable_ipv6=1".format(iface)])
+            subprocess.check_call(["ip", "link", "set", iface, "up"])
+        time.sleep(1)
+        print("{:>8} {:>10} {:>10} {:>10} {:>10} {:>8}  {}".format(
+            "path", "tx pps", "sent", "received", "matched", "loss", "matched per stream"))
+        for name, use_rx_ring in [("socket", False), ("ring", True)]:
+            pps, sent, received, matched = measure(args, use_rx_ring)
+            loss = 100.0 * (sum(sent) - sum(matched)) / sum(sent)
+            print("{:>8} {:>10.0f} {:>10} {:>10} {:>10} {:>7.2f}%  {}".format(
+                name, pps, sum(sent), received, sum(matched), loss, matched))
+    finally:
+        if created:
+            subprocess.call(["ip", "link", "del", args.iface])
+
+
+if __name__ == "__main__":
+    main()
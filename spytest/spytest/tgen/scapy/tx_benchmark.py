@@ -0,0 +1,171 @@
+"""Benchmark of the stream transmission of the scapy traffic generator.
+
+Compare the frames of the streams built with scapy for every packet with the frames of the compiled streams
+(packet_template), and the rate of the streams sent through a veth pair: scapy built frames sent one by one through
+the L2Socket, and compiled frames sent through the TX ring. The rate is counted by the receiving end of the veth pair.
+
+Must run as root to create the veth pair.
+
+Usage:
+    python3 spytest/spytest/tgen/scapy/tx_benchmark.py --duration 5
+"""
+import argparse
+import copy
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from packet import ScapyPacket  # noqa: E402
+from port import ScapyStream  # noqa: E402
+from ut_streams import ut_stream_get  # noqa: E402
+
+# streams compiled or not, checked in addition to the unit test streams
+STREAMS = [
+    dict(l3_protocol='ipv4', l4_protocol='udp', ip_src_addr='10.0.0.1', ip_dst_addr='20.0.0.1',
+         ip_src_mode='increment', ip_src_count=100, ip_dst_mode='decrement', ip_dst_step='0.0.1.0',
+         udp_src_port=1000, udp_dst_port=2000, udp_src_port_mode='increment', udp_src_port_count=7,
+         udp_dst_port_mode='decrement', frame_size=128),
+    dict(l3_protocol='ipv4', l4_protocol='tcp', ip_src_addr='10.0.0.1', ip_src_mode='increment',
+         tcp_src_port=40000, tcp_dst_port=179, tcp_dst_port_mode='increment', tcp_dst_port_step=3,
+         l2_encap='ethernet_ii_vlan', vlan_id_mode='decrement', vlan_id_step=5, frame_size=96),
+    dict(l3_protocol='ipv6', l4_protocol='udp', ipv6_src_addr='2001::1', ipv6_dst_addr='2002::ffff',
+         ipv6_src_mode='increment', ipv6_src_step='::1:0', ipv6_dst_mode='increment', ipv6_dst_count=50,
+         udp_src_port_mode='incr', frame_size=256),
+    dict(l3_protocol='ipv6', l4_protocol='tcp', ipv6_src_addr='ffff:ffff:ffff:ffff:ffff:ffff:ffff:fff0',
+         ipv6_src_mode='increment', ipv6_src_step='::7', ipv6_src_count=0, frame_size=100),
+    dict(l3_protocol='ipv6', l4_protocol='icmp', icmp_type=136, ipv6_src_addr='2001::2',
+         ipv6_dst_addr='ff02::1', ipv6_dst_mode='increment', frame_size=90),
+    dict(l3_protocol='ipv4', l4_protocol='icmp', ip_dst_mode='increment', ip_dst_count=3,
+         mac_src='00:00:00:00:00:01 00:00:00:00:00:02 00:00:00:00:00:03', mac_src_mode='list', frame_size=70),
+    dict(l3_protocol='ipv4', l4_protocol='udp', ip_src_mode='increment', ip_src_count=0,
+         udp_dst_port=65530, udp_src_port=65530, udp_dst_port_mode='increment', frame_size=64),
+    dict(l3_protocol='ipv4', l4_protocol='udp', ip_src_addr='1.1.1.1', ip_src_mode='increment', frame_size=46),
+    dict(l3_protocol='ipv4', l4_protocol='udp', ip_src_mode='increment', length_mode='random'),
+]
+
+# streams of the measured rate
+RATE_STREAMS = {
+    "udp-64": dict(l3_protocol='ipv4', l4_protocol='udp', ip_src_addr='10.0.0.1', ip_dst_addr='20.0.0.1',
+                   ip_src_mode='increment', ip_src_count=1000, udp_src_port_mode='increment',
+                   udp_src_port_count=100, frame_size=64),
+    "ipv6-512": dict(l3_protocol='ipv6', l4_protocol='tcp', ipv6_src_addr='2001::1', ipv6_dst_addr='2002::1',
+                     ipv6_dst_mode='increment', ipv6_dst_count=1000, l2_encap='ethernet_ii_vlan',
+                     vlan_id_mode='increment', vlan_id_count=100, frame_size=512),
+}
+
+
+def make_stream(index, kws):
+    kws = copy.deepcopy(kws)
+    kws.setdefault("transmit_mode", "continuous")
+    kws.setdefault("mode", "create")
+    return ScapyStream(1, index, "stream-{}".format(index), None, **kws)
+
+
+def stream_frames(packet, index, kws, count, modify_at=None, modify=None):
+    """Return the frames of a stream built by packet, and if it was compiled."""
+    # same random frame sizes
+    random.seed(index)
+    stream = make_stream(index, kws)
+    pwa = packet.build_first(stream)
+    if not pwa:
+        return [], False
+    compiled = bool(pwa.template)
+    frames = []
+    try:
+        for num in range(count):
+            if num == modify_at:
+                stream.update(modify)
+            frames.append(packet.send_packet(pwa, "", stream.stream_id, pwa.left))
+            pwa = packet.build_next(pwa)
+            if not pwa:
+                break
+    except Exception as exp:
+        frames.append(type(exp).__name__)
+    return frames, compiled
+
+
+def verify(args):
+    packet = ScapyPacket("", dry=True)
+    streams = []
+    index = 0
+    while ut_stream_get(index):
+        streams.append(ut_stream_get(index))
+        index = index + 1
+    streams.extend(STREAMS)
+    for index, kws in enumerate(streams):
+        for modify_at, modify in [(None, None), (args.frames // 2, dict(mac_dst_mode="increment"))]:
+            packet.use_templates = False
+            expected, _ = stream_frames(packet, index, kws, args.frames, modify_at, modify)
+            packet.use_templates = True
+            frames, compiled = stream_frames(packet, index, kws, args.frames, modify_at, modify)
+            assert frames == expected, "stream {} frames differ {}".format(index, kws)
+        print("stream {:>2}: {:>4} frames {}".format(index, len(frames), "compiled" if compiled else "scapy"))
+
+
+def rx_packets(iface):
+    with open("/sys/class/net/{}/statistics/rx_packets".format(iface)) as f:
+        return int(f.read())
+
+
+def measure(args, name, kws, compiled):
+    packet = ScapyPacket("", dry=False)
+    packet.use_templates = compiled
+    packet.use_tx_ring = compiled
+    pwa = packet.build_first(make_stream(0, kws))
+    assert bool(pwa.template) == compiled
+    rx_start = rx_packets(args.peer)
+    sent = 0
+    start = time.time()
+    end = start + args.duration
+    while time.time() < end:
+        # as txThreadMainInner, without rate limit
+        for _ in range(100):
+            packet.send_packet(pwa, args.iface, name, pwa.left)
+            pwa = packet.build_next(pwa)
+        sent = sent + 100
+    packet.flush_tx()
+    elapsed = time.time() - start
+    time.sleep(0.2)
+    received = rx_packets(args.peer) - rx_start
+    packet.cleanup()
+    return sent / elapsed, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stream transmission of the scapy traffic generator")
+    parser.add_argument("--frames", type=int, default=300, help="Compared frames per stream")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds of transmission per stream")
+    parser.add_argument("--iface", default="txbench0", help="Transmitting end of the veth pair")
+    parser.add_argument("--peer", default="txbench1", help="Receiving end of the veth pair")
+    parser.add_argument("--skip_verify", action="store_true", help="Don't compare the frames")
+    parser.add_argument("--skip_rate", action="store_true", help="Don't measure the rate")
+    args = parser.parse_args()
+
+    if not args.skip_verify:
+        verify(args)
+    if args.skip_rate:
+        return
+
+    created = not os.path.exists("/sys/class/net/{}".format(args.iface))
+    if created:
+        subprocess.check_call(["ip", "link", "add", args.iface, "type", "veth", "peer", "name", args.peer])
+    try:
+        for iface in [args.iface, args.peer]:
+            subprocess.check_call(["ip", "link", "set", iface, "up"])
+        print("{:>10} {:>8} {:>10} {:>10} {:>8}".format("stream", "frames", "scapy pps", "compiled", "speedup"))
+        for name, kws in RATE_STREAMS.items():
+            scapy_pps, scapy_rx = measure(args, name, kws, False)
+            compiled_pps, compiled_rx = measure(args, name, kws, True)
+            print("{:>10} {:>8} {:>10.0f} {:>10.0f} {:>7.1f}x".format(
+                name, scapy_rx + compiled_rx, scapy_pps, compiled_pps, compiled_pps / scapy_pps))
+    finally:
+        if created:
+            subprocess.call(["ip", "link", "del", args.iface])
+
+
+if __name__ == "__main__":
+    main()
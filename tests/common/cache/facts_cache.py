@@ -4,14 +4,14 @@ import inspect
 import logging
 import os
 import pickle
-import random
 import shutil
+import sqlite3
 import sys
-import time
+import tempfile
 
-from collections import defaultdict
+from collections import OrderedDict
 from pickle import UnpicklingError
-from threading import Lock
+from threading import Lock, RLock
 from six import with_metaclass
 
 
@@ -24,6 +24,16 @@ SIZE_LIMIT = 1000000000  # 1G bytes, max disk usage allowed by cache
 ENTRY_LIMIT = 1000000    # Max number of pickle files allowed in cache.
 DISABLE_CACHE_PARAM = "disable_cache"
 
+MEMORY_SIZE_LIMIT = 256 * 1024 * 1024   # Max pickled size of facts kept in the in-process LRU.
+MEMORY_ENTRY_LIMIT = 10000              # Max number of facts kept in the in-process LRU.
+
+# Storage engine used by FactsCache, can be overridden by environment variable FACTS_CACHE_BACKEND.
+BACKEND_PICKLE = "pickle"
+BACKEND_SQLITE = "sqlite"
+DEFAULT_BACKEND = BACKEND_PICKLE
+BACKEND_ENV = "FACTS_CACHE_BACKEND"
+SQLITE_DB_NAME = "facts_cache.db"
+
 
 class Singleton(type):
 
@@ -38,43 +48,332 @@ class Singleton(type):
         return cls._instances[cls]
 
 
+class CacheUsageExceeded(Exception):
+    pass
+
+
+class LRUCache(object):
+    """Bounded in-process cache of facts with size based eviction.
+
+    Entries are keyed by (zone, key). The size of an entry is the length of its pickled representation, which is
+    already known by the time an entry is loaded from or stored to the backend.
+    """
+
+    def __init__(self, size_limit=MEMORY_SIZE_LIMIT, entry_limit=MEMORY_ENTRY_LIMIT):
+        self.size_limit = size_limit
+        self.entry_limit = entry_limit
+        self.total_size = 0
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item):
+        return item in self._entries
+
+    def get(self, zone, key, default=None):
+        with self._lock:
+            try:
+                value, _ = self._entries[(zone, key)]
+            except KeyError:
+                return default
+            self._entries.move_to_end((zone, key))
+            return value
+
+    def put(self, zone, key, value, size):
+        with self._lock:
+            self._remove((zone, key))
+            if size > self.size_limit:
+                return
+            self._entries[(zone, key)] = (value, size)
+            self.total_size += size
+            while self._entries and (self.total_size > self.size_limit or len(self._entries) > self.entry_limit):
+                (evicted_zone, evicted_key), (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_size -= evicted_size
+                logger.debug('[Cache] Evicted "{}.{}" from memory'.format(evicted_zone, evicted_key))
+
+    def _remove(self, item):
+        entry = self._entries.pop(item, None)
+        if entry is not None:
+            self.total_size -= entry[1]
+
+    def remove(self, zone, key=None):
+        with self._lock:
+            if key is not None:
+                self._remove((zone, key))
+            else:
+                for item in [item for item in self._entries if item[0] == zone]:
+                    self._remove(item)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_size = 0
+
+
+class FactsCacheBackend(object):
+    """Base class of the storage engines of FactsCache.
+
+    A backend stores pickled facts as bytes and keeps track of the total size and number of entries it holds, so that
+    FactsCache can enforce SIZE_LIMIT and ENTRY_LIMIT without walking the whole cache on every write.
+    """
+
+    name = None
+
+    def __init__(self, cache_location):
+        self._cache_location = cache_location
+
+    def load(self, zone, key):
+        """Return pickled bytes of facts, or None if not cached."""
+        raise NotImplementedError
+
+    def store(self, zone, key, data):
+        """Store pickled bytes of facts."""
+        raise NotImplementedError
+
+    def delete(self, zone, key):
+        raise NotImplementedError
+
+    def delete_zone(self, zone):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def usage(self, refresh=False):
+        """Return tuple (total_size, total_entries) of the cache."""
+        raise NotImplementedError
+
+    def location(self, zone, key):
+        """Return description of where the facts are stored, used for logging."""
+        return os.path.join(self._cache_location, zone, key)
+
+
+class PickleFileBackend(FactsCacheBackend):
+    """Store each cached facts in file '<cache_location>/<zone>/<key>.pickle'.
+
+    Files are written to a temporary file in the same folder first and then renamed, so concurrent readers (for
+    example other xdist workers) either see the old complete file or the new complete file, never a partial one.
+    Usage of the cache folder is scanned once and then tracked incrementally. Because other processes can write the
+    same folder, the folder is re-scanned before reporting that a limitation is exceeded.
+    """
+
+    name = BACKEND_PICKLE
+
+    def __init__(self, cache_location):
+        super(PickleFileBackend, self).__init__(cache_location)
+        self._lock = Lock()
+        self._total_size = None
+        self._total_entries = None
+        self._file_sizes = {}
+
+    def location(self, zone, key):
+        return os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
+
+    def _scan(self):
+        total_size = 0
+        total_entries = 0
+        file_sizes = {}
+        for root, _, files in os.walk(self._cache_location):
+            for f in files:
+                fp = os.path.join(root, f)
+                try:
+                    size = os.path.getsize(fp)
+                except OSError:
+                    continue
+                file_sizes[fp] = size
+                total_size += size
+                total_entries += 1
+        self._total_size, self._total_entries, self._file_sizes = total_size, total_entries, file_sizes
+
+    def usage(self, refresh=False):
+        with self._lock:
+            if refresh or self._total_size is None:
+                self._scan()
+            return self._total_size, self._total_entries
+
+    def _account(self, facts_file, size):
+        """Update usage counters after facts_file is written (size) or removed (None)."""
+        with self._lock:
+            if self._total_size is None:
+                return
+            old_size = self._file_sizes.pop(facts_file, None)
+            if old_size is not None:
+                self._total_size -= old_size
+                self._total_entries -= 1
+            if size is not None:
+                self._file_sizes[facts_file] = size
+                self._total_size += size
+                self._total_entries += 1
+
+    def load(self, zone, key):
+        facts_file = self.location(zone, key)
+        try:
+            with open(facts_file, 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def store(self, zone, key, data):
+        facts_file = self.location(zone, key)
+        cache_subfolder = os.path.dirname(facts_file)
+        if not os.path.exists(cache_subfolder):
+            logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
+            os.makedirs(cache_subfolder, exist_ok=True)
+
+        fd, tmp_file = tempfile.mkstemp(prefix='.{}.'.format(key), suffix='.tmp', dir=cache_subfolder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, facts_file)
+        except Exception:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        self._account(facts_file, len(data))
+
+    def delete(self, zone, key):
+        facts_file = self.location(zone, key)
+        os.remove(facts_file)
+        self._account(facts_file, None)
+
+    def delete_zone(self, zone):
+        cache_subfolder = os.path.join(self._cache_location, zone)
+        shutil.rmtree(cache_subfolder)
+        with self._lock:
+            self._total_size = None
+
+    def clear(self):
+        with self._lock:
+            self._total_size = None
+        shutil.rmtree(self._cache_location)
+
+
+class SqliteBackend(FactsCacheBackend):
+    """Store all cached facts in a single SQLite database '<cache_location>/facts_cache.db'.
+
+    The database runs in WAL mode, so readers in other processes are never blocked by a writer and never see a
+    partially written entry. Total size and number of entries are maintained by triggers in table 'usage', reading
+    them is a single row lookup.
+    """
+
+    name = BACKEND_SQLITE
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS facts (zone TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, '
+        'size INTEGER NOT NULL, PRIMARY KEY (zone, key))',
+        'CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), total_size INTEGER NOT NULL, '
+        'total_entries INTEGER NOT NULL)',
+        'INSERT OR IGNORE INTO usage VALUES (0, 0, 0)',
+        'CREATE TRIGGER IF NOT EXISTS facts_insert AFTER INSERT ON facts BEGIN '
+        'UPDATE usage SET total_size = total_size + NEW.size, total_entries = total_entries + 1; END',
+        'CREATE TRIGGER IF NOT EXISTS facts_delete AFTER DELETE ON facts BEGIN '
+        'UPDATE usage SET total_size = total_size - OLD.size, total_entries = total_entries - 1; END',
+        'CREATE TRIGGER IF NOT EXISTS facts_update AFTER UPDATE ON facts BEGIN '
+        'UPDATE usage SET total_size = total_size - OLD.size + NEW.size; END',
+    ]
+
+    def __init__(self, cache_location):
+        super(SqliteBackend, self).__init__(cache_location)
+        self._db_file = os.path.join(cache_location, SQLITE_DB_NAME)
+        self._lock = RLock()
+        self._conn = None
+        self._pid = None
+
+    def location(self, zone, key):
+        return '{}:{}/{}'.format(self._db_file, zone, key)
+
+    def _connection(self):
+        # A sqlite connection must not be shared with a forked child process, reconnect after fork.
+        if self._conn is None or self._pid != os.getpid():
+            if not os.path.exists(self._cache_location):
+                os.makedirs(self._cache_location, exist_ok=True)
+            conn = sqlite3.connect(self._db_file, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def load(self, zone, key):
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT value FROM facts WHERE zone = ? AND key = ?', (zone, key)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def store(self, zone, key, data):
+        with self._lock:
+            self._connection().execute(
+                'INSERT INTO facts (zone, key, value, size) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (zone, key) DO UPDATE SET value = excluded.value, size = excluded.size',
+                (zone, key, sqlite3.Binary(data), len(data)))
+
+    def delete(self, zone, key):
+        with self._lock:
+            self._connection().execute('DELETE FROM facts WHERE zone = ? AND key = ?', (zone, key))
+
+    def delete_zone(self, zone):
+        with self._lock:
+            self._connection().execute('DELETE FROM facts WHERE zone = ?', (zone,))
+
+    def clear(self):
+        with self._lock:
+            self._close()
+            shutil.rmtree(self._cache_location)
+
+    def usage(self, refresh=False):
+        with self._lock:
+            return self._connection().execute('SELECT total_size, total_entries FROM usage').fetchone()
+
+
+BACKENDS = {
+    BACKEND_PICKLE: PickleFileBackend,
+    BACKEND_SQLITE: SqliteBackend,
+}
+
+
 class FactsCache(with_metaclass(Singleton, object)):
     """Singleton class for reading from cache and write to cache.
 
     Used singleton design pattern. Only a single instance of this class can be initialized.
 
+    Facts are kept in a bounded in-process LRU and persisted by a pluggable storage engine, see BACKENDS.
+
     Args:
         with_metaclass ([function]): Python 2&3 compatible function from the six library for adding metaclass.
     """
 
     NOTEXIST = object()
 
-    def __init__(self, cache_location=CACHE_LOCATION):
+    def __init__(self, cache_location=CACHE_LOCATION, backend=None):
         self._cache_location = os.path.abspath(cache_location)
-        self._cache = defaultdict(dict)
+        backend = backend or os.environ.get(BACKEND_ENV, DEFAULT_BACKEND)
+        if backend not in BACKENDS:
+            raise ValueError('Unsupported facts cache backend "{}", supported: {}'.format(backend, list(BACKENDS)))
+        self._backend = BACKENDS[backend](self._cache_location)
+        self._cache = LRUCache()
         self._write_lock = Lock()
 
-    def _check_usage(self):
+    def _check_usage(self, incoming_size=0):
         """Check cache usage, raise exception if usage exceeds the limitations.
         """
-        total_size = 0
-        total_entries = 0
-        for root, _, files in os.walk(self._cache_location):
-            for f in files:
-                fp = os.path.join(root, f)
-                total_size += os.path.getsize(fp)
-                total_entries += 1
-
+        total_size, total_entries = self._backend.usage()
+        if total_size + incoming_size > SIZE_LIMIT or total_entries + 1 > ENTRY_LIMIT:
+            # Usage is tracked incrementally, make sure it is accurate before failing.
+            total_size, total_entries = self._backend.usage(refresh=True)
         if total_size > SIZE_LIMIT or total_entries > ENTRY_LIMIT:
             msg = 'Cache usage exceeds limitations. total_size={}, SIZE_LIMIT={}, total_entries={}, ENTRY_LIMIT={}' \
                 .format(total_size, SIZE_LIMIT, total_entries, ENTRY_LIMIT)
-            raise Exception(msg)
-
-    def _read_facts_file(self, facts_file, z, k):
-        with open(facts_file, 'rb') as f:
-            self._cache[z][k] = pickle.load(f)
-            logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(z, k, facts_file))
-            return self._cache[z][k]
+            raise CacheUsageExceeded(msg)
 
     def read(self, zone, key):
         """Read cached facts.
@@ -88,41 +387,30 @@ class FactsCache(with_metaclass(Singleton, object)):
             obj: Cached object, usually a dictionary.
         """
         # Lazy load
-        if zone in self._cache and key in self._cache[zone]:
+        value = self._cache.get(zone, key, self.NOTEXIST)
+        if value is not self.NOTEXIST:
             logger.debug('[Cache] Read cached facts "{}.{}"'.format(zone, key))
-            return self._cache[zone][key]
-        else:
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
-            try:
-                return self._read_facts_file(facts_file, zone, key)
-            except (IOError, ValueError) as e:
-                logger.info('[Cache] Load cache file "{}" failed with IOError or ValueError: {}'
-                            .format(os.path.abspath(facts_file), repr(e)))
-                return self.NOTEXIST
-            except (EOFError, UnpicklingError) as e:
-                # When parallel run is enabled, multiple processes may try to read/write the same cache file,
-                # so there will be a chance that
-                #   - a file is being written by process1 while process2 is reading it, causing EOFError in process2
-                #   - a file is being read by multiple processes at the same time, causing UnpicklingError in some of
-                #     the processes
-                # In these cases, we will retry to read the file after a short random sleep. If we still get the same
-                # error after retrying, we will return NOTEXIST to overwrite the file.
-                retry_attempts = 3
-                for attempt in range(retry_attempts):
-                    time.sleep(random.randint(3, 6))
-                    try:
-                        return self._read_facts_file(facts_file, zone, key)
-                    except (EOFError, UnpicklingError):
-                        logger.warning('[Cache] Retry {}/{} failed for file "{}"'
-                                       .format(attempt + 1, retry_attempts, facts_file))
-
-                logger.error('[Cache] Load cache file "{}" failed with EOFError or UnpicklingError: {}'
-                             .format(facts_file, repr(e)))
-                return self.NOTEXIST
-            except Exception as e:
-                logger.info('[Cache] Load cache file "{}" failed with unknown exception: {}'
-                            .format(os.path.abspath(facts_file), repr(e)))
+            return value
+
+        location = self._backend.location(zone, key)
+        try:
+            data = self._backend.load(zone, key)
+            if data is None:
+                logger.info('[Cache] Cached facts "{}.{}" not found in {}'.format(zone, key, location))
                 return self.NOTEXIST
+            value = pickle.loads(data)
+        except (EOFError, UnpicklingError, ValueError) as e:
+            # Backends never expose partially written entries, a broken entry will be overwritten by next write.
+            logger.error('[Cache] Load cached facts "{}" failed with exception: {}'.format(location, repr(e)))
+            return self.NOTEXIST
+        except Exception as e:
+            logger.info('[Cache] Load cached facts "{}" failed with unknown exception: {}'
+                        .format(location, repr(e)))
+            return self.NOTEXIST
+
+        self._cache.put(zone, key, value, len(data))
+        logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(zone, key, location))
+        return value
 
     def write(self, zone, key, value):
         """Store facts to cache.
@@ -137,22 +425,17 @@ class FactsCache(with_metaclass(Singleton, object)):
             boolean: Caching facts is successful or not.
         """
         with self._write_lock:
-            self._check_usage()
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
+            location = self._backend.location(zone, key)
             try:
-                cache_subfolder = os.path.join(self._cache_location, zone)
-                if not os.path.exists(cache_subfolder):
-                    logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
-                    os.makedirs(cache_subfolder)
-
-                with open(facts_file, 'wb') as f:
-                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
-                    self._cache[zone][key] = value
-                    logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
-                    return True
-            except (IOError, ValueError) as e:
-                logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
+                data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                self._check_usage(len(data))
+                self._backend.store(zone, key, data)
+            except (IOError, OSError, ValueError, sqlite3.Error, pickle.PicklingError) as e:
+                logger.error('[Cache] Dump cached facts "{}" failed with exception: {}'.format(location, repr(e)))
                 return False
+            self._cache.put(zone, key, value, len(data))
+            logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, location))
+            return True
 
     def cleanup(self, zone=None, key=None):
         """Cleanup cached files.
@@ -165,30 +448,26 @@ class FactsCache(with_metaclass(Singleton, object)):
         """
         if zone:
             if key:
-                if zone in self._cache and key in self._cache[zone]:
-                    del self._cache[zone][key]
-                    logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
+                self._cache.remove(zone, key)
+                logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
                 try:
-                    cache_file = os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
-                    os.remove(cache_file)
-                    logger.debug('[Cache] Removed cache file "{}.pickle"'.format(cache_file))
-                except OSError as e:
-                    logger.error('[Cache] Cleanup cache {}.{}.pickle failed with exception: {}'
+                    self._backend.delete(zone, key)
+                    logger.debug('[Cache] Removed cached facts "{}"'.format(self._backend.location(zone, key)))
+                except (OSError, sqlite3.Error) as e:
+                    logger.error('[Cache] Cleanup cache {}.{} failed with exception: {}'
                                  .format(zone, key, repr(e)))
             else:
-                if zone in self._cache:
-                    del self._cache[zone]
-                    logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
+                self._cache.remove(zone)
+                logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
                 try:
-                    cache_subfolder = os.path.join(self._cache_location, zone)
-                    shutil.rmtree(cache_subfolder)
-                    logger.debug('[Cache] Removed cache subfolder "{}"'.format(cache_subfolder))
-                except OSError as e:
-                    logger.error('[Cache] Remove cache subfolder "{}" failed with exception: {}'.format(zone, repr(e)))
+                    self._backend.delete_zone(zone)
+                    logger.debug('[Cache] Removed cached zone "{}"'.format(zone))
+                except (OSError, sqlite3.Error) as e:
+                    logger.error('[Cache] Remove cached zone "{}" failed with exception: {}'.format(zone, repr(e)))
         else:
-            self._cache = defaultdict(dict)
+            self._cache.clear()
             try:
-                shutil.rmtree(self._cache_location)
+                self._backend.clear()
                 logger.debug('[Cache] Removed all cache files under "{}"'.format(self._cache_location))
             except OSError as e:
                 logger.error('[Cache] Remove cache folder "{}" failed with exception: {}'
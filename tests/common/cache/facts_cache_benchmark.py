@@ -0,0 +1,117 @@
+"""Microbenchmark of FactsCache storage engines.
+
+Compare read/write latency of the storage engines of FactsCache against the legacy pickle-per-file layout, which
+walked the whole cache folder on every write.
+
+Usage:
+    python facts_cache_benchmark.py --entries 10000 100000 --samples 200
+"""
+import argparse
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from facts_cache import BACKENDS, FactsCache, LRUCache     # noqa: E402
+
+
+ZONES = 100
+
+
+def _facts(index):
+    return {
+        "hostname": "dut-{}".format(index),
+        "hwsku": "HWSKU-{}".format(index % 10),
+        "ports": ["Ethernet{}".format(i * 4) for i in range(32)],
+    }
+
+
+def _zone_key(index):
+    return "zone-{}".format(index % ZONES), "key-{}".format(index)
+
+
+def _legacy_write(cache_location, zone, key, value):
+    """Write path of FactsCache before the storage engines were introduced."""
+    total_size = 0
+    total_entries = 0
+    for root, _, files in os.walk(cache_location):
+        for f in files:
+            total_size += os.path.getsize(os.path.join(root, f))
+            total_entries += 1
+    cache_subfolder = os.path.join(cache_location, zone)
+    if not os.path.exists(cache_subfolder):
+        os.makedirs(cache_subfolder)
+    with open(os.path.join(cache_subfolder, "{}.pickle".format(key)), "wb") as f:
+        pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+
+
+def _legacy_read(cache_location, zone, key):
+    with open(os.path.join(cache_location, zone, "{}.pickle".format(key)), "rb") as f:
+        return pickle.load(f)
+
+
+def _populate(backend, entries):
+    for index in range(entries):
+        zone, key = _zone_key(index)
+        backend.store(zone, key, pickle.dumps(_facts(index), pickle.HIGHEST_PROTOCOL))
+
+
+def _timeit(func, indexes):
+    start = time.time()
+    for index in indexes:
+        func(index)
+    return (time.time() - start) / len(indexes) * 1000000
+
+
+def _new_cache(cache_location, backend):
+    # Bypass the singleton so that every engine gets its own instance.
+    cache = object.__new__(FactsCache)
+    FactsCache.__init__(cache, cache_location, backend=backend)
+    return cache
+
+
+def run(entries, samples):
+    results = []
+    for name in ["legacy"] + sorted(BACKENDS):
+        cache_location = tempfile.mkdtemp(prefix="facts_cache_benchmark_")
+        try:
+            _populate(BACKENDS[name if name != "legacy" else "pickle"](cache_location), entries)
+            indexes = random.sample(range(entries), samples)
+            if name == "legacy":
+                write_us = _timeit(lambda i: _legacy_write(cache_location, *_zone_key(i), value=_facts(i)), indexes)
+                read_us = _timeit(lambda i: _legacy_read(cache_location, *_zone_key(i)), indexes)
+                # The legacy in-memory cache was an unbounded dict, hot reads are equivalent to the LRU.
+                hot_read_us = float("nan")
+            else:
+                cache = _new_cache(cache_location, name)
+                write_us = _timeit(lambda i: cache.write(*_zone_key(i), value=_facts(i)), indexes)
+                cache._cache = LRUCache()
+                read_us = _timeit(lambda i: cache.read(*_zone_key(i)), indexes)
+                hot_read_us = _timeit(lambda i: cache.read(*_zone_key(i)), indexes)
+            results.append((entries, name, write_us, read_us, hot_read_us))
+        finally:
+            shutil.rmtree(cache_location, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FactsCache storage engines")
+    parser.add_argument("--entries", type=int, nargs="+", default=[10000, 100000],
+                        help="Number of entries to populate the cache with")
+    parser.add_argument("--samples", type=int, default=200, help="Number of sampled reads/writes per engine")
+    args = parser.parse_args()
+
+    print("{:>8} {:>8} {:>14} {:>14} {:>14}".format("entries", "engine", "write(us)", "cold read(us)",
+                                                    "hot read(us)"))
+    for entries in args.entries:
+        for result in run(entries, min(args.samples, entries)):
+            print("{:>8} {:>8} {:>14.1f} {:>14.1f} {:>14.1f}".format(*result))
+
+
+if __name__ == "__main__":
+    main()
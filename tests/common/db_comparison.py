@@ -10,15 +10,21 @@ Main features:
 - Compare snapshots and generate detailed diffs
 - Filter out volatile/transient data that changes frequently
 - Provide metrics on database differences
+
+Snapshot files are diffed by streaming them and comparing a digest of every top-level key first, only the keys whose
+digests differ are loaded, so dumps with hundreds of thousands of keys are never fully held in memory.
 """
 
 from enum import Enum
+import functools
+import hashlib
 import json
 import logging
 import os
 import re
-import copy
-from typing import Dict, List, Tuple
+import shutil
+import struct
+from typing import Dict, Iterator, List, Tuple
 from collections import Counter
 from dataclasses import dataclass
 
@@ -40,17 +46,42 @@ def match_key(key, kset):
     Returns:
         bool: True if the key matches any pattern in kset, False otherwise
     """
-    for k in kset:
-        if key.startswith(k):
-            return True
-        elif re.match(k, key):
-            return True
-    return False
+    return _get_key_matcher(frozenset(kset))(key)
 
 
-def dut_dump(redis_cmd, duthost, data_dir, fname):
+class _KeyMatcher:
+    """Matcher of keys against patterns like match_key, with the patterns compiled once and results memoized."""
+
+    MAX_MEMOIZED_KEYS = 65536
+
+    def __init__(self, patterns):
+        self._prefixes = tuple(patterns)
+        self._regexes = []
+        for pattern in patterns:
+            try:
+                self._regexes.append(re.compile(pattern).match)
+            except re.error:
+                # Fail when the pattern is reached, like re.match does
+                self._regexes.append(functools.partial(re.match, pattern))
+        self._memo = {}
+
+    def __call__(self, key):
+        matched = self._memo.get(key)
+        if matched is None:
+            matched = key.startswith(self._prefixes) or any(regex(key) for regex in self._regexes)
+            if len(self._memo) < self.MAX_MEMOIZED_KEYS:
+                self._memo[key] = matched
+        return matched
+
+
+@functools.lru_cache(maxsize=32)
+def _get_key_matcher(patterns: frozenset) -> _KeyMatcher:
+    return _KeyMatcher(sorted(patterns))
+
+
+def dut_dump_file(redis_cmd, duthost, data_dir, fname):
     """
-    Execute a Redis dump command on a DUT and fetch the resulting JSON file.
+    Execute a Redis dump command on a DUT and fetch the resulting JSON file without loading it.
 
     Args:
         redis_cmd (str): The Redis dump command to execute on the DUT
@@ -59,13 +90,11 @@ def dut_dump(redis_cmd, duthost, data_dir, fname):
         fname (str): Base filename for the dump file (without extension)
 
     Returns:
-        dict: The parsed JSON content from the Redis dump file
+        str: Local path of the fetched dump file
 
     Raises:
         AssertionError: If the Redis command fails or file operations fail
     """
-    db_read = {}
-
     dump_file = "/tmp/{}.json".format(fname)
     ret = duthost.shell("{} -o {}".format(redis_cmd, dump_file))
     assert ret["rc"] == 0, "Failed to run cmd:{}".format(redis_cmd)
@@ -75,12 +104,164 @@ def dut_dump(redis_cmd, duthost, data_dir, fname):
 
     assert dest_file is not None, "Failed to fetch src={} dest:{}".format(dump_file, data_dir)
     assert os.path.exists(dest_file), "Fetched file not exist: {}".format(dest_file)
+    return dest_file
+
+
+def dut_dump(redis_cmd, duthost, data_dir, fname):
+    """
+    Execute a Redis dump command on a DUT and fetch the resulting JSON file.
+
+    Args:
+        redis_cmd (str): The Redis dump command to execute on the DUT
+        duthost: The DUT host object with shell and fetch capabilities
+        data_dir (str): Local directory path where the dump file will be stored
+        fname (str): Base filename for the dump file (without extension)
+
+    Returns:
+        dict: The parsed JSON content from the Redis dump file
 
+    Raises:
+        AssertionError: If the Redis command fails or file operations fail
+    """
+    dest_file = dut_dump_file(redis_cmd, duthost, data_dir, fname)
     with open(dest_file, "r") as s:
         db_read = json.load(s)
     return db_read
 
 
+# Snapshot files smaller than this are diffed in memory, see SnapshotDiff.from_files
+STREAMED_DIFF_MIN_FILE_SIZE = 16 << 20
+
+_JSON_OBJECT_START = re.compile(r'[ \t\n\r]*\{[ \t\n\r]*(\}?)')
+_JSON_MEMBER_KEY = re.compile(r'"((?:[^"\\]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*', re.DOTALL)
+_JSON_MEMBER_END = re.compile(r'[ \t\n\r]*([,}])[ \t\n\r]*')
+_JSON_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+class _JsonObjectReader:
+    """Incremental reader of the members of the top-level JSON object of a file.
+
+    The file is read in chunks and every member value is decoded on its own by the C scanner of the json module, so
+    only one member is held in memory.
+    """
+
+    def __init__(self, f, chunk_size=1 << 20):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._scan_once = json.JSONDecoder().scan_once
+        self._buf = ""
+        self._pos = 0
+        # Offset in the file of the beginning of the buffer
+        self._offset = 0
+        self._eof = False
+
+    def _fill(self):
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._offset += self._pos
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _match(self, regex, what):
+        while True:
+            m = regex.match(self._buf, self._pos)
+            # The trailing whitespace of a match ending the buffer may continue in the next chunk
+            if m and (m.end() < len(self._buf) or self._eof):
+                self._pos = m.end()
+                return m
+            if not self._fill():
+                if m:
+                    self._pos = m.end()
+                    return m
+                raise ValueError("Expecting {} at offset {} of {}".format(
+                    what, self._pos, getattr(self._f, "name", "JSON stream")))
+
+    def _scan_value(self):
+        while True:
+            try:
+                value, end = self._scan_once(self._buf, self._pos)
+                # A number cut by the end of the buffer decodes to its beginning, it is complete only when followed by
+                # a character which can't be part of a number
+                if self._eof or (end < len(self._buf) and self._buf[end] not in _JSON_NUMBER_CHARS):
+                    self._pos = end
+                    return value
+            except (StopIteration, json.JSONDecodeError) as e:
+                # Values cut by the end of the buffer fail to decode until the next chunk is read
+                if self._eof:
+                    raise ValueError("Expecting value at offset {} of {}: {}".format(
+                        self._pos, getattr(self._f, "name", "JSON stream"), repr(e)))
+            self._fill()
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        for key, value, _, _ in self.members():
+            yield key, value
+
+    def members(self) -> Iterator[Tuple[str, object, int, int]]:
+        """Yield (key, value, start, end) of the members, start and end are the offsets of the value in the file."""
+        if self._match(_JSON_OBJECT_START, "object").group(1):
+            return
+        match_key = _JSON_MEMBER_KEY.match
+        match_end = _JSON_MEMBER_END.match
+        scan_once = self._scan_once
+        while True:
+            # Members fully inside the buffer are decoded inline, the others go through the refilling methods
+            m = match_key(self._buf, self._pos)
+            if not m or m.end() == len(self._buf):
+                m = self._match(_JSON_MEMBER_KEY, "member name")
+            key = m.group(1)
+            if "\\" in key:
+                key = json.loads('"{}"'.format(key))
+            start = self._offset + m.end()
+            try:
+                value, end = scan_once(self._buf, m.end())
+                if end == len(self._buf) or self._buf[end] in _JSON_NUMBER_CHARS:
+                    raise StopIteration
+                self._pos = end
+            except (StopIteration, json.JSONDecodeError):
+                self._pos = m.end()
+                value = self._scan_value()
+            yield key, value, start, self._offset + self._pos
+            m = match_end(self._buf, self._pos)
+            if not m or m.end() == len(self._buf):
+                m = self._match(_JSON_MEMBER_END, "',' or '}'")
+            else:
+                self._pos = m.end()
+            if m.group(1) == "}":
+                return
+
+
+def iter_json_object_items(path: str) -> Iterator[Tuple[str, object]]:
+    """Yield (key, value) of the top-level JSON object of a file one at a time, like json.load(f).items()."""
+    with open(path, "r") as f:
+        yield from _JsonObjectReader(f).items()
+
+
+def _iter_json_object_members(path: str) -> Iterator[Tuple[str, object, int, int]]:
+    """Yield (key, value, start, end) of the top-level JSON object of a file, see _JsonObjectReader.members."""
+    with open(path, "r") as f:
+        yield from _JsonObjectReader(f).members()
+
+
+def _read_json_values(path: str, spans: List[Tuple[int, int]]) -> Iterator[object]:
+    """Decode the JSON values at the (start, end) offsets of a file given by _iter_json_object_members.
+
+    The spans must be sorted, the text between them is read but not decoded.
+    """
+    with open(path, "r") as f:
+        offset = 0
+        for start, end in spans:
+            while offset < start:
+                skipped = len(f.read(min(start - offset, 1 << 20)))
+                if not skipped:
+                    raise ValueError("{} is shorter than offset {}, modified while diffing?".format(path, start))
+                offset += skipped
+            yield json.loads(f.read(end - start))
+            offset = end
+
+
 class DBType(Enum):
     """Supported Redis database types in SONiC. Value is their numeric DB index."""
     APPL = 0
@@ -292,21 +473,36 @@ class DbComparisonMetrics:
 class SnapshotDiff:
     """Container for differing values and metrics of a snapshot comparison for a singleDB supporting metric tracking
     """
-    def __init__(self, db_type: DBType, snapshot_a: dict, snapshot_b: dict, label_a: str = "a", label_b: str = "b"):
+    def __init__(self, db_type: DBType, snapshot_a: dict, snapshot_b: dict, label_a: str = "a", label_b: str = "b",
+                 snapshot_totals: Tuple[Tuple[int, int, int], Tuple[int, int, int]] = None):
+        """
+        Args:
+            db_type (DBType): Type of the snapshotted DB
+            snapshot_a (dict): Dump of snapshot a
+            snapshot_b (dict): Dump of snapshot b
+            label_a (str): Label of snapshot a in the diff
+            label_b (str): Label of snapshot b in the diff
+            snapshot_totals (tuple, optional): (keys, values incl volatile, values excl volatile) of the full snapshot
+                a and b, when the snapshots are reduced to the keys that can differ. Counted from the snapshots
+                when not given.
+        """
         self._db_type = db_type
         self._snapshot_a = snapshot_a
         self._snapshot_b = snapshot_b
         self._label_a = label_a
         self._label_b = label_b
+        self._always_ignore_keys = frozenset(VOLATILE_VALUES.get(db_type, []))
+        self._always_ignore_matcher = _get_key_matcher(self._always_ignore_keys)
+
+        if snapshot_totals is None:
+            snapshot_totals = (_snapshot_totals(db_type, self._snapshot_a), _snapshot_totals(db_type, self._snapshot_b))
 
         # Start building metrics on snapshot
         self._metrics = DbComparisonMetrics()
-        self._metrics.total_a_keys = len(self._snapshot_a)
-        self._metrics.total_a_values_incl_volatile, self._metrics.total_a_values_excl_volatile = \
-            _sum_total_values(db_type, self._snapshot_a)
-        self._metrics.total_b_keys = len(self._snapshot_b)
-        self._metrics.total_b_values_incl_volatile, self._metrics.total_b_values_excl_volatile = \
-            _sum_total_values(db_type, self._snapshot_b)
+        (self._metrics.total_a_keys, self._metrics.total_a_values_incl_volatile,
+         self._metrics.total_a_values_excl_volatile) = snapshot_totals[0]
+        (self._metrics.total_b_keys, self._metrics.total_b_values_incl_volatile,
+         self._metrics.total_b_values_excl_volatile) = snapshot_totals[1]
 
         # Build the diff
         if db_type == DBType.STATE:
@@ -322,6 +518,79 @@ class SnapshotDiff:
         # Now that diff has been built, get metrics on the diff components
         self._metrics.populate_diff_metrics_from_diff(self._diff, label_a=self._label_a, label_b=self._label_b)
 
+    @classmethod
+    def from_files(cls, db_type: DBType, file_a: str, file_b: str, label_a: str = "a",
+                   label_b: str = "b") -> "SnapshotDiff":
+        """
+        Diff two snapshot files without loading them fully.
+
+        Snapshot a is streamed first, keeping the digest and file offsets of every top-level key. Snapshot b is
+        streamed next, keeping only the values whose digests differ from a. The values of a for those keys and for
+        the keys only in a are then read at their offsets, and both are diffed like in-memory snapshots.
+
+        Digesting every value is slower than diffing the loaded snapshots when few keys differ (17.5s vs 11.8s at 500k
+        keys, see db_comparison_benchmark.py), but the peak memory is a fraction of it (201MB vs 977MB). So snapshot
+        files smaller than STREAMED_DIFF_MIN_FILE_SIZE are loaded and diffed in memory, only large dumps are streamed.
+
+        Args:
+            db_type (DBType): Type of the snapshotted DB
+            file_a (str): Path of the JSON dump of snapshot a
+            file_b (str): Path of the JSON dump of snapshot b
+            label_a (str): Label of snapshot a in the diff
+            label_b (str): Label of snapshot b in the diff
+
+        Returns:
+            SnapshotDiff: Same diff and metrics as diffing the loaded snapshots
+        """
+        if max(os.path.getsize(file_a), os.path.getsize(file_b)) < STREAMED_DIFF_MIN_FILE_SIZE:
+            with open(file_a, "r") as f:
+                snapshot_a = json.load(f)
+            with open(file_b, "r") as f:
+                snapshot_b = json.load(f)
+            return cls(db_type, snapshot_a, snapshot_b, label_a=label_a, label_b=label_b)
+
+        always_ignore_keys = frozenset(VOLATILE_VALUES.get(db_type, []))
+
+        def _always_loaded(key):
+            # PROCESS_STATS entries are always diffed together, see _diff_state_db_process_stats
+            return db_type == DBType.STATE and key.startswith("PROCESS_STATS|")
+
+        # Digest and offsets of the value of every key of a
+        digests_a = {}
+        totals_a = [0, 0]
+        for key, content, start, end in _iter_json_object_members(file_a):
+            _add_values(totals_a, db_type, key, content, always_ignore_keys)
+            digests_a[key] = _digest(content, always_ignore_keys) + _VALUE_SPAN.pack(start, end)
+        num_keys_a = len(digests_a)
+
+        # Keep the values of b whose digest differ, and forget the keys with the same digest in both snapshots
+        snapshot_b = {}
+        totals_b = [0, 0]
+        num_keys_b = 0
+        spans_a = {}
+        for key, content in iter_json_object_items(file_b):
+            num_keys_b += 1
+            _add_values(totals_b, db_type, key, content, always_ignore_keys)
+            digest_a = digests_a.pop(key, None)
+            if digest_a is None or digest_a[:_DIGEST_SIZE] != _digest(content, always_ignore_keys) or \
+                    _always_loaded(key):
+                snapshot_b[key] = content
+                if digest_a is not None:
+                    spans_a[key] = _VALUE_SPAN.unpack_from(digest_a, _DIGEST_SIZE)
+        # Keys only in a
+        for key, digest_a in digests_a.items():
+            spans_a[key] = _VALUE_SPAN.unpack_from(digest_a, _DIGEST_SIZE)
+        del digests_a
+
+        # Only decode the values of a which can differ
+        keys_a = sorted(spans_a, key=spans_a.get)
+        snapshot_a = dict(zip(keys_a, _read_json_values(file_a, [spans_a[key] for key in keys_a])))
+        logger.debug(f"{len(snapshot_a)}/{len(snapshot_b)} of {num_keys_a}/{num_keys_b} keys of "
+                     f"{db_type.name} DB can differ")
+
+        return cls(db_type, snapshot_a, snapshot_b, label_a=label_a, label_b=label_b,
+                   snapshot_totals=((num_keys_a,) + tuple(totals_a), (num_keys_b,) + tuple(totals_b)))
+
     @property
     def diff(self) -> dict:
         return self._diff
@@ -376,54 +645,45 @@ class SnapshotDiff:
     def _diff_dict(self, db_type: DBType, dict_a: dict, dict_b: dict) -> dict:
 
         result = {}
-        always_ignore_keys = set(VOLATILE_VALUES.get(db_type, []))
+        always_ignore_keys = self._always_ignore_keys
 
-        a_keys = set(dict_a.keys()) - always_ignore_keys
-        b_keys = set(dict_b.keys()) - always_ignore_keys
+        a_keys = dict_a.keys() - always_ignore_keys
+        b_keys = dict_b.keys() - always_ignore_keys
         a_only_keys = a_keys - b_keys
         b_only_keys = b_keys - a_keys
         keys_in_both = a_keys & b_keys
 
         # Process a-only keys
         for key in a_only_keys:
-            if isinstance(dict_a[key], dict):
-                # Remove always ignore keys
-                val = copy.deepcopy(dict_a[key])
-                _recursively_remove_keys_matching_pattern(val, always_ignore_keys)
-            else:
-                val = dict_a[key]
             result[key] = {
-                self._label_a: val,
+                # Remove always ignore keys, unchanged subtrees are shared with the snapshot
+                self._label_a: _without_keys_matching(dict_a[key], self._always_ignore_matcher),
                 self._label_b: None
             }
 
         # Process b-only keys
         for key in b_only_keys:
-            if isinstance(dict_b[key], dict):
-                # Remove always ignore keys
-                val = copy.deepcopy(dict_b[key])
-                _recursively_remove_keys_matching_pattern(val, always_ignore_keys)
-            else:
-                val = dict_b[key]
             result[key] = {
                 self._label_a: None,
-                self._label_b: val
+                self._label_b: _without_keys_matching(dict_b[key], self._always_ignore_matcher)
             }
 
         # Process keys that are in both
         for key in keys_in_both:
             value_a = dict_a[key]
             value_b = dict_b[key]
+            if value_a == value_b:
+                # Equal subtrees have no diff, don't walk them
+                continue
             if isinstance(value_a, dict) and isinstance(value_b, dict):
                 nested_diff = self._diff_dict(db_type, value_a, value_b)
                 if nested_diff:
                     result[key] = nested_diff
-            elif value_a != value_b:
+            else:
                 result[key] = {
                     self._label_a: value_a,
                     self._label_b: value_b
                 }
-            # otherwise they are the same and therefore not included in the diff
 
         return result
 
@@ -500,24 +760,32 @@ class SnapshotDiff:
         del self._diff[top_level_key]
 
 
-def _recursively_remove_keys_matching_pattern(d_for_removal, patterns):
+def _without_keys_matching(value, matcher):
     """
-    Recursively remove keys from a dictionary that match any pattern in the given set.
+    Remove keys matching a pattern from a dictionary at any depth, without modifying it.
 
-    This function traverses a dictionary structure and removes any keys that match
-    patterns in the provided set. It modifies the dictionary in-place and recursively
-    processes nested dictionaries.
+    Only the dictionaries on the path to a removed key are copied, the unchanged subtrees are shared with the
+    original value, which is returned as is when nothing matches.
 
     Args:
-        d_for_removal (dict): Dictionary to remove keys from (modified in-place)
-        patterns (iterable): Set of patterns to match against keys using match_key()
+        value: Value to remove keys from, only dictionaries are walked
+        matcher (_KeyMatcher): Matcher of the keys to remove
+
+    Returns:
+        The value without the matching keys
     """
-    if isinstance(d_for_removal, dict):
-        keys_to_remove = [k for k in d_for_removal if match_key(k, patterns)]
-        for k in keys_to_remove:
-            del d_for_removal[k]
-        for v in d_for_removal.values():
-            _recursively_remove_keys_matching_pattern(v, patterns)
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    changed = False
+    for k, v in value.items():
+        if matcher(k):
+            changed = True
+            continue
+        new_v = _without_keys_matching(v, matcher)
+        changed = changed or new_v is not v
+        result[k] = new_v
+    return result if changed else value
 
 
 def _sum_total_values(db_type: DBType, db_dump: dict) -> Tuple[int, int]:
@@ -526,15 +794,61 @@ def _sum_total_values(db_type: DBType, db_dump: dict) -> Tuple[int, int]:
     total_excl_volatile = 0
     always_ignore_keys = VOLATILE_VALUES.get(db_type, [])
     for tl_key, content in db_dump.items():
-        assert "value" in content, f"Unexpected entry in {db_type.name} DB: {tl_key} : {content}"
-        value_dict = content["value"]
-        for key in value_dict:
-            total_incl_volatile += 1
-            if key not in always_ignore_keys:
-                total_excl_volatile += 1
+        incl_volatile, excl_volatile = _count_values(db_type, tl_key, content, always_ignore_keys)
+        total_incl_volatile += incl_volatile
+        total_excl_volatile += excl_volatile
+    return total_incl_volatile, total_excl_volatile
+
+
+def _count_values(db_type: DBType, tl_key: str, content: dict, always_ignore_keys) -> Tuple[int, int]:
+    """Number of values of a top-level key including and excluding volatile."""
+    assert "value" in content, f"Unexpected entry in {db_type.name} DB: {tl_key} : {content}"
+    value_dict = content["value"]
+    total_incl_volatile = 0
+    total_excl_volatile = 0
+    for key in value_dict:
+        total_incl_volatile += 1
+        if key not in always_ignore_keys:
+            total_excl_volatile += 1
     return total_incl_volatile, total_excl_volatile
 
 
+def _snapshot_totals(db_type: DBType, db_dump: dict) -> Tuple[int, int, int]:
+    """Number of keys, values including volatile and values excluding volatile of the DB dump."""
+    return (len(db_dump),) + _sum_total_values(db_type, db_dump)
+
+
+def _without_keys(value, keys):
+    """Value with the keys removed from its dictionaries reached through dictionaries, like _diff_dict ignores them."""
+    if not isinstance(value, dict):
+        return value
+    return {k: _without_keys(v, keys) if isinstance(v, dict) else v for k, v in value.items() if k not in keys}
+
+
+_DIGEST_SIZE = 16
+# Offsets of a value in a snapshot file, packed after its digest
+_VALUE_SPAN = struct.Struct("<QQ")
+_CANONICAL_JSON_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _add_values(totals: list, db_type: DBType, tl_key: str, content: dict, always_ignore_keys):
+    """Add the number of values of a top-level key to [values incl volatile, values excl volatile]."""
+    incl_volatile, excl_volatile = _count_values(db_type, tl_key, content, always_ignore_keys)
+    totals[0] += incl_volatile
+    totals[1] += excl_volatile
+
+
+def _digest(content, always_ignore_keys) -> bytes:
+    """
+    Digest of the content of a top-level key.
+
+    Contents with the same digest in two snapshots have no diff, the volatile keys ignored by _diff_dict are left out
+    of the digest.
+    """
+    canonical = _CANONICAL_JSON_ENCODER.encode(_without_keys(content, always_ignore_keys))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=_DIGEST_SIZE).digest()
+
+
 class SonicRedisDBSnapshotter:
     """
     Class for taking and comparing Redis database snapshots on SONiC devices.
@@ -579,9 +893,9 @@ class SonicRedisDBSnapshotter:
         os.makedirs(snapshot_dir, exist_ok=True)
         for db in snapshot_dbs:
             cmd = f"redis-dump -d {db.value} --pretty"
-            dump = dut_dump(cmd, self._duthost, snapshot_dir, db.name)
-            with open(f"{snapshot_dir}/{db.name}.json", "w") as f:
-                f.write(json.dumps(dump, indent=4, default=str))
+            # The dump is already pretty printed JSON, move it in place instead of loading and writing it again
+            dump_file = dut_dump_file(cmd, self._duthost, snapshot_dir, db.name)
+            shutil.move(dump_file, f"{snapshot_dir}/{db.name}.json")
 
         logger.info(f"Snapshot {snapshot_name} taken for {self._duthost.hostname} at {snapshot_dir}")
 
@@ -620,9 +934,9 @@ class SonicRedisDBSnapshotter:
             if db_type == DBType.ASIC:
                 # NOTE: ASIC DB diffing not currently supported
                 continue
-            db_dump_a = json.load(open(os.path.join(snapshot_a_dir, db_file), 'r'))
-            db_dump_b = json.load(open(os.path.join(snapshot_b_dir, db_file), 'r'))
-            snapshot_diff = SnapshotDiff(db_type, db_dump_a, db_dump_b, label_a=snapshot_a, label_b=snapshot_b)
+            snapshot_diff = SnapshotDiff.from_files(db_type, os.path.join(snapshot_a_dir, db_file),
+                                                    os.path.join(snapshot_b_dir, db_file),
+                                                    label_a=snapshot_a, label_b=snapshot_b)
 
             result[db_type] = snapshot_diff
 
@@ -0,0 +1,193 @@
+"""Benchmark of the snapshot diff of db_comparison.
+
+Generate two synthetic redis-dump files with many keys, where the second one has some changed, removed and added
+keys and different volatile fields, then compare time and peak memory of the legacy diff (json.load of both dumps,
+deep copy of every one-sided subtree and uncompiled ignore patterns) with SnapshotDiff.from_files (streamed digests,
+only differing keys loaded) and SnapshotDiff on loaded dumps. Every measurement runs in its own process so that the
+peak memory is its own, and the diffs and metrics of all of them are checked to be the same.
+
+Usage:
+    python tests/common/db_comparison_benchmark.py --keys 500000 --db STATE
+"""
+import argparse
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+# The folder of this script has packages shadowing the standard library (e.g. platform), use the repo root instead
+sys.path[0] = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../..")
+
+from tests.common import db_comparison     # noqa: E402
+from tests.common.db_comparison import DBType, SnapshotDiff     # noqa: E402
+
+
+def legacy_match_key(key, kset):
+    for k in kset:
+        if key.startswith(k):
+            return True
+        elif re.match(k, key):
+            return True
+    return False
+
+
+def legacy_remove_keys_matching_pattern(d_for_removal, patterns):
+    if isinstance(d_for_removal, dict):
+        keys_to_remove = [k for k in d_for_removal if legacy_match_key(k, patterns)]
+        for k in keys_to_remove:
+            del d_for_removal[k]
+        for v in d_for_removal.values():
+            legacy_remove_keys_matching_pattern(v, patterns)
+
+
+class LegacySnapshotDiff(SnapshotDiff):
+    """SnapshotDiff with the _diff_dict before the structural sharing diff engine."""
+
+    def _diff_dict(self, db_type, dict_a, dict_b):
+        result = {}
+        always_ignore_keys = set(db_comparison.VOLATILE_VALUES.get(db_type, []))
+        a_keys = set(dict_a.keys()) - always_ignore_keys
+        b_keys = set(dict_b.keys()) - always_ignore_keys
+        for key in a_keys - b_keys:
+            val = dict_a[key]
+            if isinstance(val, dict):
+                val = copy.deepcopy(val)
+                legacy_remove_keys_matching_pattern(val, always_ignore_keys)
+            result[key] = {self._label_a: val, self._label_b: None}
+        for key in b_keys - a_keys:
+            val = dict_b[key]
+            if isinstance(val, dict):
+                val = copy.deepcopy(val)
+                legacy_remove_keys_matching_pattern(val, always_ignore_keys)
+            result[key] = {self._label_a: None, self._label_b: val}
+        for key in a_keys & b_keys:
+            value_a = dict_a[key]
+            value_b = dict_b[key]
+            if isinstance(value_a, dict) and isinstance(value_b, dict):
+                nested_diff = self._diff_dict(db_type, value_a, value_b)
+                if nested_diff:
+                    result[key] = nested_diff
+            elif value_a != value_b:
+                result[key] = {self._label_a: value_a, self._label_b: value_b}
+        return result
+
+
+def legacy_diff(db_type, file_a, file_b):
+    with open(file_a) as f:
+        dump_a = json.load(f)
+    with open(file_b) as f:
+        dump_b = json.load(f)
+    return LegacySnapshotDiff(db_type, dump_a, dump_b)
+
+
+def loaded_diff(db_type, file_a, file_b):
+    with open(file_a) as f:
+        dump_a = json.load(f)
+    with open(file_b) as f:
+        dump_b = json.load(f)
+    return SnapshotDiff(db_type, dump_a, dump_b)
+
+
+def streamed_diff(db_type, file_a, file_b):
+    # Stream the dumps whatever their size
+    db_comparison.STREAMED_DIFF_MIN_FILE_SIZE = 0
+    return SnapshotDiff.from_files(db_type, file_a, file_b)
+
+
+def generate_entry(index, rnd, version):
+    if index % 10 == 0:
+        # Entries with volatile fields, which always change between snapshots
+        return {"expireat": 1760000000.0 + rnd.random(), "ttl": -0.001, "type": "hash",
+                "value": {"state": "ok", "timestamp": str(rnd.random()), "update_time": str(version),
+                          "speed": str(rnd.randint(1000, 9000)), "index": str(index)}}
+    return {"expireat": 1760000000.0 + rnd.random(), "ttl": -0.001, "type": "hash",
+            "value": {"nexthop": "10.0.{}.{}".format((index >> 8) & 0xff, index & 0xff),
+                      "ifname": "Ethernet{}".format(index % 128 * 4), "weight": str(index % 8 + 1)}}
+
+
+def generate_dumps(path, keys, changed):
+    """Dump b has `changed` of the keys changed, removed or added and new volatile fields for all of them."""
+    rnd = random.Random(0)
+    file_a = os.path.join(path, "a.json")
+    file_b = os.path.join(path, "b.json")
+    with open(file_a, "w") as fa, open(file_b, "w") as fb:
+        fa.write("{\n")
+        fb.write("{\n")
+        first_a = first_b = True
+        for index in range(keys):
+            key = "ROUTE_TABLE:{}.{}.{}.0/24".format(100 + (index >> 16) % 100, (index >> 8) & 0xff, index & 0xff)
+            entry_a = generate_entry(index, rnd, 0)
+            entry_b = generate_entry(index, rnd, 1)
+            change = rnd.random() < changed
+            kind = rnd.randint(0, 2) if change else None
+            if kind == 0:
+                entry_b["value"]["weight"] = "9"
+            if kind != 2:
+                fa.write("{}    {}: {}".format("" if first_a else ",\n", json.dumps(key),
+                                               json.dumps(entry_a, indent=4)))
+                first_a = False
+            if kind != 1:
+                fb.write("{}    {}: {}".format("" if first_b else ",\n", json.dumps(key),
+                                               json.dumps(entry_b, indent=4)))
+                first_b = False
+        fa.write("\n}\n")
+        fb.write("\n}\n")
+    return file_a, file_b
+
+
+def measure(func, db_type, file_a, file_b, queue):
+    start = time.time()
+    snapshot_diff = func(db_type, file_a, file_b)
+    elapsed = time.time() - start
+    content = snapshot_diff.to_dict()
+    digest = hashlib.md5(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    # ru_maxrss is in KB on Linux
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, digest,
+               content["metrics"]["num_overall_differing_keys"], content["metrics"]["num_overall_differing_values"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark db_comparison snapshot diff")
+    parser.add_argument("--keys", type=int, default=500000, help="Number of top-level keys of the dumps")
+    parser.add_argument("--changed", type=float, default=0.01, help="Ratio of changed, removed or added keys")
+    parser.add_argument("--db", default="STATE", choices=[db.name for db in DBType], help="DB type of the dumps")
+    parser.add_argument("--skip_legacy", action="store_true", help="Don't run the legacy implementation")
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix="db_comparison_benchmark_")
+    try:
+        start = time.time()
+        file_a, file_b = generate_dumps(path, args.keys, args.changed)
+        print("Generated {} keys dumps of {:.0f}MB in {:.1f}s".format(
+            args.keys, os.path.getsize(file_a) / 1048576.0, time.time() - start))
+
+        implementations = [("streamed", streamed_diff), ("loaded", loaded_diff)]
+        if not args.skip_legacy:
+            implementations.append(("legacy", legacy_diff))
+        context = multiprocessing.get_context("fork")
+        results = {}
+        print("{:>10} {:>10} {:>14} {:>14} {:>16}".format("diff", "time(s)", "peak RSS(MB)", "differing keys",
+                                                          "differing values"))
+        for name, func in implementations:
+            queue = context.Queue()
+            process = context.Process(target=measure, args=(func, DBType[args.db], file_a, file_b, queue))
+            process.start()
+            results[name] = queue.get()
+            process.join()
+            elapsed, peak, _, keys, values = results[name]
+            print("{:>10} {:>10.2f} {:>14.0f} {:>14} {:>16}".format(name, elapsed, peak, keys, values))
+        assert len(set(result[2:] for result in results.values())) == 1, "Diffs differ"
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
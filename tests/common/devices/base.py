@@ -1,7 +1,10 @@
-import inspect
+import sys
 import json
 import logging
 import collections
+import functools
+import threading
+import time
 from multiprocessing.pool import ThreadPool
 
 from tests.common.errors import RunAnsibleModuleFail
@@ -23,6 +26,100 @@ except Exception as e:
     logger.error("Hack for https://github.com/ansible/pytest-ansible/issues/47 failed: {}".format(repr(e)))
 
 
+class CallSite(object):
+    """
+    @summary: Lazily resolved caller location of an ansible module call.
+
+    Only the code object and line number of the calling frame are captured. The string "<file>::<function>#<line>"
+    is built only when a log record using it is actually emitted.
+    """
+    __slots__ = ('code', 'lineno')
+
+    def __init__(self, frame):
+        self.code = frame.f_code
+        self.lineno = frame.f_lineno
+
+    def __str__(self):
+        return "{}::{}#{}".format(self.code.co_filename, self.code.co_name, self.lineno)
+
+
+class LazyJson(object):
+    """
+    @summary: Serialize an object to json only when a log record using it is actually emitted.
+    """
+    __slots__ = ('obj', )
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return json.dumps(self.obj, cls=AnsibleHostBase.CustomEncoder)
+
+
+_JSON_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def is_json_native(obj):
+    """
+    @summary: Check whether an object is left unchanged by a round trip of json.dumps and json.loads.
+    """
+    if isinstance(obj, _JSON_SCALAR_TYPES):
+        return True
+    if type(obj) is list:
+        return all(is_json_native(item) for item in obj)
+    if type(obj) is dict:
+        return all(isinstance(k, str) and is_json_native(v) for k, v in obj.items())
+    return False
+
+
+def normalize_args(obj):
+    """
+    @summary: Convert arguments of ansible module to json native objects, skipped if they already are.
+    """
+    if is_json_native(obj):
+        return obj
+    return json.loads(json.dumps(obj, cls=AnsibleHostBase.CustomEncoder))
+
+
+class ModuleCallStats(object):
+    """
+    @summary: Per ansible module call counts and timing of AnsibleHostBase._run.
+
+    'total' is the wall time of _run, 'overhead' is the part of it spent outside the ansible module itself
+    (argument processing and logging).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = collections.defaultdict(lambda: {"calls": 0, "total": 0.0, "overhead": 0.0})
+
+    def record(self, module_name, total, overhead):
+        with self._lock:
+            stat = self.stats[module_name]
+            stat["calls"] += 1
+            stat["total"] += total
+            stat["overhead"] += overhead
+
+    def report(self):
+        """
+        @summary: Return lines of report sorted by cumulative time, most expensive module first.
+        """
+        with self._lock:
+            stats = sorted(self.stats.items(), key=lambda item: item[1]["total"], reverse=True)
+        lines = ["{:<32} {:>8} {:>12} {:>14}".format("module", "calls", "total(s)", "overhead(ms)")]
+        for module_name, stat in stats:
+            lines.append("{:<32} {:>8} {:>12.3f} {:>14.3f}".format(
+                module_name, stat["calls"], stat["total"], stat["overhead"] * 1000))
+        return lines
+
+
+module_call_stats = ModuleCallStats()
+
+
 class AnsibleHostBase(object):
     """
     @summary: The base class for various objects.
@@ -40,6 +137,9 @@ class AnsibleHostBase(object):
                 return obj.data
             return super().default(obj)
 
+    # SshTransport running the shell and command modules, instead of ansible
+    ssh_transport = None
+
     def __init__(self, ansible_adhoc, hostname, *args, **kwargs):
         if hostname == 'localhost':
             self.host = ansible_adhoc(connection='local', host_pattern=hostname)[hostname]
@@ -54,84 +154,64 @@ class AnsibleHostBase(object):
 
     def __getattr__(self, module_name):
         if self.host.has_module(module_name):
-            self.module_name = module_name
-            self.module = getattr(self.host, module_name)
-
-            return self._run
+            # The module is bound to the call, not stored on the host shared by concurrent callers
+            return functools.partial(self._run, module_name, getattr(self.host, module_name))
         raise AttributeError(
             "'%s' object has no attribute '%s'" % (self.__class__, module_name)
             )
 
-    def _run(self, *module_args, **complex_args):
+    def _run(self, module_name, module, *module_args, **complex_args):
 
-        previous_frame = inspect.currentframe().f_back
-        filename, line_number, function_name, lines, index = inspect.getframeinfo(previous_frame)
+        start = time.time()
+        callsite = CallSite(sys._getframe(1))
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
 
         verbose = complex_args.pop('verbose', True)
 
-        if verbose:
-            logger.debug(
-                "{}::{}#{}: [{}] AnsibleModule::{}, args={}, kwargs={}".format(
-                    filename,
-                    function_name,
-                    line_number,
-                    self.hostname,
-                    self.module_name,
-                    json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder),
-                    json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder)
-                )
-            )
-        else:
-            logger.debug(
-                "{}::{}#{}: [{}] AnsibleModule::{} executing...".format(
-                    filename,
-                    function_name,
-                    line_number,
-                    self.hostname,
-                    self.module_name
-                )
-            )
+        if debug_enabled:
+            if verbose:
+                logger.debug("%s: [%s] AnsibleModule::%s, args=%s, kwargs=%s", callsite, self.hostname,
+                             module_name, LazyJson(module_args), LazyJson(complex_args))
+            else:
+                logger.debug("%s: [%s] AnsibleModule::%s executing...", callsite, self.hostname, module_name)
 
         module_ignore_errors = complex_args.pop('module_ignore_errors', False)
         module_async = complex_args.pop('module_async', False)
 
         if module_async:
             def run_module(module_args, complex_args):
-                return self.module(*module_args, **complex_args)[self.hostname]
+                return module(*module_args, **complex_args)[self.hostname]
             pool = ThreadPool()
             result = pool.apply_async(run_module, (module_args, complex_args))
             return pool, result
 
-        module_args = json.loads(json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder))
-        complex_args = json.loads(json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder))
-        res = self.module(*module_args, **complex_args)[self.hostname]
+        module_args = normalize_args(list(module_args))
+        complex_args = normalize_args(complex_args)
+        module_start = time.time()
+        res = None
+        module_stats_name = module_name
+        if self.ssh_transport is not None:
+            res = self.ssh_transport.run(module_name, module_args, complex_args)
+            module_stats_name = "{} (ssh)".format(module_name)
+        if res is None:
+            res = module(*module_args, **complex_args)[self.hostname]
+            module_stats_name = module_name
+        module_time = time.time() - module_start
         res.encoder = AnsibleHostBase.CustomEncoder
 
-        if verbose:
-            logger.debug(
-                "{}::{}#{}: [{}] AnsibleModule::{} Result => {}".format(
-                    filename,
-                    function_name,
-                    line_number,
-                    self.hostname,
-                    self.module_name, json.dumps(res, cls=AnsibleHostBase.CustomEncoder)
-                )
-            )
-        else:
-            logger.debug(
-                "{}::{}#{}: [{}] AnsibleModule::{} done, is_failed={}, rc={}".format(
-                    filename,
-                    function_name,
-                    line_number,
-                    self.hostname,
-                    self.module_name,
-                    res.is_failed,
-                    res.get('rc', None)
-                )
-            )
+        if debug_enabled:
+            if verbose:
+                logger.debug("%s: [%s] AnsibleModule::%s Result => %s", callsite, self.hostname, module_name,
+                             LazyJson(res))
+            else:
+                logger.debug("%s: [%s] AnsibleModule::%s done, is_failed=%s, rc=%s", callsite, self.hostname,
+                             module_name, res.is_failed, res.get('rc', None))
+
+        total_time = time.time() - start
+        module_call_stats.record(module_stats_name, total_time, total_time - module_time)
 
         if (res.is_failed or 'exception' in res) and not module_ignore_errors:
-            raise RunAnsibleModuleFail("run module {} failed".format(self.module_name), res)
+            raise RunAnsibleModuleFail("run module {} failed".format(module_name), res)
 
         return res
 
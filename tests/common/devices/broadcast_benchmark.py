@@ -0,0 +1,184 @@
+"""Benchmark of the calls broadcast to all the ASICs of a DUT and to all the DUTs of a testbed.
+
+The DUTs are MultiAsicSonicHost instances of stand-in hosts and ASICs, whose ansible modules just wait for a simulated
+round trip. A T2 chassis is simulated by default: 3 linecards of 3 ASICs and a supervisor. The broadcasts are run one
+after another like before, and concurrently by BroadcastExecutor.
+
+The command module of AnsibleHostBase hosts of an inventory of the local host is also broadcast, one host after
+another and concurrently, to check the concurrent calls run real ansible modules.
+
+Usage:
+    python tests/common/devices/broadcast_benchmark.py --linecards 3 --asics 3 --latency 0.05
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../.."))
+
+try:
+    from pytest_ansible.host_manager.utils import get_host_manager  # noqa: E402
+except ImportError:
+    from pytest_ansible.host_manager import get_host_manager        # noqa: E402
+
+from tests.common.devices.base import AnsibleHostBase     # noqa: E402
+from tests.common.devices.duthosts import DutHosts     # noqa: E402
+from tests.common.devices.multi_asic import MultiAsicSonicHost     # noqa: E402
+from tests.common.errors import RunAnsibleModuleFail     # noqa: E402
+from tests.common.helpers.parallel import BroadcastExecutor, set_broadcast_executor     # noqa: E402
+
+INVENTORY_HOST = "{} ansible_host=127.0.0.1 ansible_connection=local ansible_become=false " \
+                 "ansible_python_interpreter={}\n"
+
+
+class FakeSonicHost(object):
+    """Stand-in of SonicHost, bgp_facts of the default namespace takes a round trip to the DUT."""
+
+    def __init__(self, hostname, num_asic, latency):
+        self.hostname = hostname
+        self.facts = {"num_asic": num_asic}
+        self.is_multi_asic = num_asic > 1
+        self.latency = latency
+
+    def bgp_facts(self, *module_args, **complex_args):
+        time.sleep(self.latency)
+        return {"host": self.hostname}
+
+
+class FakeAsic(object):
+    """Stand-in of SonicAsic, bgp_facts takes a round trip to the DUT."""
+
+    def __init__(self, sonichost, asic_index, latency, fail=False):
+        self.sonichost = sonichost
+        self.asic_index = asic_index
+        self.latency = latency
+        self.fail = fail
+
+    def __str__(self):
+        return "<SonicAsic {}>".format(self.asic_index)
+
+    def bgp_facts(self, *module_args, **complex_args):
+        time.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("{} asic{} failed".format(self.sonichost.hostname, self.asic_index))
+        return {"host": self.sonichost.hostname, "asic": self.asic_index}
+
+
+def make_host(hostname, num_asic, latency, failed_asics=()):
+    host = MultiAsicSonicHost.__new__(MultiAsicSonicHost)
+    host.sonichost = FakeSonicHost(hostname, num_asic, latency)
+    host.asics = [FakeAsic(host.sonichost, index, latency, index in failed_asics) for index in range(num_asic)]
+    return host
+
+
+def make_nodes(args, latency):
+    nodes = [make_host("lc{}".format(index), args.asics, latency) for index in range(args.linecards)]
+    nodes.append(make_host("sup", args.supervisor_asics, latency))
+    return DutHosts._Nodes(nodes)
+
+
+def expected_results(nodes):
+    return {node.hostname: [{"host": node.hostname, "asic": asic.asic_index} for asic in node.asics]
+            for node in nodes}
+
+
+def verify(args):
+    """Check the results and exceptions of concurrent broadcasts are the ones of the serial broadcasts."""
+    set_broadcast_executor(BroadcastExecutor(max_workers=args.workers))
+    nodes = make_nodes(args, 0.01)
+    expected = expected_results(nodes)
+    for concurrent in [False, True]:
+        assert nodes.bgp_facts(asic_index="all", concurrent=concurrent) == expected
+        assert list(nodes.bgp_facts(asic_index="all", concurrent=concurrent)) == [node.hostname for node in nodes]
+
+    # the exception of the first ASIC in order is raised, whichever ASIC fails first
+    host = make_host("lc0", 4, 0.01, failed_asics=(1, 3))
+    host.asics[1].latency = 0.2
+    for concurrent in [False, True]:
+        try:
+            host.bgp_facts(asic_index="all", concurrent=concurrent)
+            assert False, "no exception"
+        except RuntimeError as e:
+            assert str(e) == "lc0 asic1 failed", str(e)
+
+
+def verify_ansible(args):
+    """Broadcast the command module to hosts of the local host, check the results and return the time taken."""
+    tmpdir = tempfile.mkdtemp()
+    try:
+        inventory = os.path.join(tmpdir, "inventory")
+        hostnames = ["bench-local{}".format(index) for index in range(args.ansible_hosts)]
+        with open(inventory, "w") as f:
+            f.write("[bench]\n" + "".join(INVENTORY_HOST.format(hostname, sys.executable) for hostname in hostnames))
+
+        def ansible_adhoc(**kwargs):
+            return get_host_manager(inventory=inventory, host_pattern="bench", **kwargs)
+        nodes = DutHosts._Nodes([AnsibleHostBase(ansible_adhoc, hostname) for hostname in hostnames])
+
+        rv = []
+        for workers in [0, args.workers]:
+            set_broadcast_executor(BroadcastExecutor(max_workers=workers))
+            start = time.time()
+            results = nodes.shell("sleep 1; echo $PPID")
+            rv.append(time.time() - start)
+            assert list(results) == hostnames, results
+            assert all(result["rc"] == 0 for result in results.values()), results
+            # Run concurrently, the hosts have run the module in different processes
+            assert workers == 0 or len(set(result["stdout"] for result in results.values())) == len(hostnames), \
+                results
+            try:
+                nodes.command("false")
+                assert False, "no exception"
+            except RunAnsibleModuleFail as e:
+                assert e.results["rc"] == 1, e.results
+        return rv
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def measure(args, executor):
+    set_broadcast_executor(executor)
+    nodes = make_nodes(args, args.latency)
+    expected = expected_results(nodes)
+    rv = []
+    for name, func, expected_result in [
+            ("asics", lambda: nodes[0].bgp_facts(asic_index="all"), expected["lc0"]),
+            ("duts", lambda: nodes.bgp_facts(), dict((node.hostname, {"host": node.hostname}) for node in nodes)),
+            ("duts x asics", lambda: nodes.bgp_facts(asic_index="all"), expected)]:
+        start = time.time()
+        for _ in range(args.rounds):
+            assert func() == expected_result
+        rv.append((name, (time.time() - start) / args.rounds))
+    return rv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the broadcasts to the ASICs and to the DUTs")
+    parser.add_argument("--linecards", type=int, default=3, help="Number of linecards")
+    parser.add_argument("--asics", type=int, default=3, help="Number of ASICs per linecard")
+    parser.add_argument("--supervisor_asics", type=int, default=1, help="Number of ASICs of the supervisor")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of a round trip to an ASIC")
+    parser.add_argument("--workers", type=int, default=16, help="Processes of the BroadcastExecutor")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of calls per measurement")
+    parser.add_argument("--ansible_hosts", type=int, default=3,
+                        help="Hosts of the local host the command module is broadcast to, 0 to skip")
+    args = parser.parse_args()
+
+    verify(args)
+    serial = measure(args, BroadcastExecutor(max_workers=0))
+    concurrent = measure(args, BroadcastExecutor(max_workers=args.workers))
+    if args.ansible_hosts:
+        serial_time, concurrent_time = verify_ansible(args)
+        serial.append(("ansible hosts", serial_time))
+        concurrent.append(("ansible hosts", concurrent_time))
+    print("{:>14} {:>12} {:>16} {:>8}".format("broadcast", "serial(ms)", "concurrent(ms)", "speedup"))
+    for (name, serial_time), (_, concurrent_time) in zip(serial, concurrent):
+        print("{:>14} {:>12.1f} {:>16.1f} {:>7.1f}x".format(
+            name, serial_time * 1000, concurrent_time * 1000, serial_time / concurrent_time))
+
+
+if __name__ == "__main__":
+    main()
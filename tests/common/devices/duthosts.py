@@ -1,7 +1,9 @@
 import logging
 import sys
+from functools import partial
 
 from tests.common.devices.multi_asic import MultiAsicSonicHost
+from tests.common.helpers.parallel import broadcast
 from tests.common.helpers.parallel_utils import is_initial_checks_active
 
 logger = logging.getLogger(__name__)
@@ -19,9 +21,17 @@ class DutHosts(object):
     """
     class _Nodes(list):
         """ Internal class representing a list of MultiAsicSonicHosts """
-        def _run_on_nodes(self, *module_args, **complex_args):
-            """ Delegate the call to each of the nodes, return the results in a dict."""
-            return {node.hostname: getattr(node, self.attr)(*module_args, **complex_args) for node in self}
+        def _run_on_nodes(self, attr, *module_args, **complex_args):
+            """ Delegate the call to each of the nodes, return the results in a dict.
+
+            With --broadcast_workers set, the nodes are called concurrently, unless 'concurrent' is False in
+            complex_args.
+            """
+            concurrent = complex_args.pop("concurrent", True)
+            results = broadcast("duthosts:{}".format(attr),
+                                lambda node: getattr(node, attr)(*module_args, **complex_args),
+                                self, concurrent=concurrent)
+            return {node.hostname: result for node, result in zip(self, results)}
 
         def __getattr__(self, attr):
             """ To support calling ansible modules on a list of MultiAsicSonicHost
@@ -32,8 +42,7 @@ class DutHosts(object):
                a dictionary with key being the MultiAsicSonicHost's hostname,
                and value being the output of ansible module on that MultiAsicSonicHost
             """
-            self.attr = attr
-            return self._run_on_nodes
+            return partial(self._run_on_nodes, attr)
 
         def __eq__(self, o):
             """ To support eq operator on the DUTs (nodes) in the testbed """
@@ -218,11 +227,12 @@ class DutHosts(object):
         return self.nodes.__repr__()
 
     def config_facts(self, *module_args, **complex_args):
-        result = {}
-        for node in self.nodes:
-            complex_args['host'] = node.hostname
-            result[node.hostname] = node.config_facts(*module_args, **complex_args)['ansible_facts']
-        return result
+        nodes = self.nodes
+        concurrent = complex_args.pop("concurrent", True)
+        results = broadcast("duthosts:config_facts",
+                            lambda node: node.config_facts(*module_args, **dict(complex_args, host=node.hostname)),
+                            nodes, concurrent=concurrent)
+        return {node.hostname: result['ansible_facts'] for node, result in zip(nodes, results)}
 
     def reset(self):
         self.__initialize_nodes()
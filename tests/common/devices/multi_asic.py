@@ -1,5 +1,5 @@
 import copy
-from functools import lru_cache
+from functools import lru_cache, partial
 import ipaddress
 import json
 import logging
@@ -10,6 +10,7 @@ from tests.common.devices.sonic_asic import SonicAsic
 from tests.common.devices.sonic_docker import SonicDockerManager
 from tests.common.helpers.assertions import pytest_assert
 from tests.common.helpers.constants import DEFAULT_ASIC_ID, DEFAULT_NAMESPACE, ASICS_PRESENT
+from tests.common.helpers.parallel import broadcast
 from tests.common.platform.interface_utils import get_dut_interfaces_status
 
 logger = logging.getLogger(__name__)
@@ -124,12 +125,15 @@ class MultiAsicSonicHost(object):
     def get_default_critical_services_list(self):
         return self._DEFAULT_SERVICES
 
-    def _run_on_asics(self, *module_args, **complex_args):
+    def _run_on_asics(self, multi_asic_attr, *module_args, **complex_args):
         """ Run an asible module on asics based on 'asic_index' keyword in complex_args
 
         Args:
+            multi_asic_attr: name of the ansible module
             module_args: other ansible module args passed from the caller
             complex_args: other ansible keyword args
+                With asic_index 'all' and --broadcast_workers set, the module runs concurrently on the asics,
+                unless 'concurrent' is False.
 
         Raises:
             ValueError:  if asic_index is specified and it is neither an int or string 'all'.
@@ -146,9 +150,10 @@ class MultiAsicSonicHost(object):
                 for all the asics on the SonicHost
                     - for single asic, this would be a list of size 1.
         """
+        concurrent = complex_args.pop("concurrent", True)
         if "asic_index" not in complex_args:
             # Default ASIC/namespace
-            return getattr(self.sonichost, self.multi_asic_attr)(*module_args, **complex_args)
+            return getattr(self.sonichost, multi_asic_attr)(*module_args, **complex_args)
         else:
             asic_complex_args = copy.deepcopy(complex_args)
             asic_index = asic_complex_args.pop("asic_index")
@@ -157,11 +162,13 @@ class MultiAsicSonicHost(object):
                 if self.sonichost.facts['num_asic'] == 1:
                     if asic_index != 0:
                         raise ValueError("Trying to run module '{}' against asic_index '{}' on a single asic dut '{}'"
-                                         .format(self.multi_asic_attr, asic_index, self.sonichost.hostname))
-                return getattr(self.asic_instance(asic_index), self.multi_asic_attr)(*module_args, **asic_complex_args)
+                                         .format(multi_asic_attr, asic_index, self.sonichost.hostname))
+                return getattr(self.asic_instance(asic_index), multi_asic_attr)(*module_args, **asic_complex_args)
             elif type(asic_index) == str and asic_index.lower() == "all":
                 # All ASICs/namespace
-                return [getattr(asic, self.multi_asic_attr)(*module_args, **asic_complex_args) for asic in self.asics]
+                return broadcast("{}:{}".format(self.hostname, multi_asic_attr),
+                                 lambda asic: getattr(asic, multi_asic_attr)(*module_args, **asic_complex_args),
+                                 self.asics, concurrent=concurrent)
             else:
                 raise ValueError("Argument 'asic_index' must be an int or string 'all'.")
 
@@ -358,8 +365,7 @@ class MultiAsicSonicHost(object):
         """
         sonic_asic_attr = getattr(SonicAsic, attr, None)
         if not attr.startswith("_") and sonic_asic_attr and callable(sonic_asic_attr):
-            self.multi_asic_attr = attr
-            return self._run_on_asics
+            return partial(self._run_on_asics, attr)
         else:
             return getattr(self.sonichost, attr)  # For backward compatibility
 
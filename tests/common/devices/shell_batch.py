@@ -0,0 +1,135 @@
+"""Run a batch of shell commands on a host in a single call of the shell module.
+
+Each call of the shell module is a round trip to the host. The commands of a ShellBatch are run one after another by
+a single shell, each in its own subshell. The output of each command is framed by delimiters made of a random token,
+its exit code is written after its stdout, so that the rc, stdout and stderr of each command are split from the
+output of the shell.
+
+Example:
+    with duthost.shell_batch() as batch:
+        mac = batch.shell("cat /sys/class/net/eth0/address")
+        status = batch.shell("docker exec swss supervisorctl status")
+    logger.info(mac["stdout"])
+"""
+import re
+import shlex
+import uuid
+
+from tests.common.errors import RunAnsibleModuleFail
+
+
+class ShellBatch(object):
+    """Commands run on a host by a single call of the shell module."""
+
+    def __init__(self, host, continue_on_fail=True, module_ignore_errors=False, timeout=0):
+        """Initialize an empty batch.
+
+        Args:
+            host: AnsibleHostBase running the batch with its shell module.
+            continue_on_fail: Run the next commands after a command failed, like the shell_cmds module.
+            module_ignore_errors: Do not raise RunAnsibleModuleFail when a command failed.
+            timeout: Time limit in seconds of each command, 0 for no limit.
+        """
+        self.host = host
+        self.continue_on_fail = continue_on_fail
+        self.module_ignore_errors = module_ignore_errors
+        self.timeout = timeout
+        self.cmds = []
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.run()
+        return False
+
+    def shell(self, cmd, timeout=None):
+        """Add a command to the batch.
+
+        Args:
+            cmd: Command run by /bin/sh.
+            timeout: Time limit in seconds of the command, the one of the batch by default.
+
+        Returns:
+            The result of the command, filled when the batch is run: cmd, rc, stdout, stderr, stdout_lines,
+            stderr_lines and failed like the result of the shell module. It is only {"cmd": cmd, "skipped": True} if
+            the command is not run because a previous command failed.
+        """
+        result = {"cmd": cmd}
+        self.cmds.append((cmd, self.timeout if timeout is None else timeout))
+        self.results.append(result)
+        return result
+
+    def script(self, token):
+        lines = []
+        for index, (cmd, timeout) in enumerate(self.cmds):
+            lines.append("printf '%s\\n' '{0} {1}'; printf '\\n%s\\n' '{0} {1}' >&2".format(token, index))
+            # The commands must not read the rest of the script, or block, when the shell reads it from its stdin
+            if timeout:
+                lines.append("timeout --preserve-status {} /bin/sh -c {} < /dev/null".format(timeout, shlex.quote(cmd)))
+            else:
+                # ':' keeps the subshell valid when the command is only a comment
+                lines.extend(["( :", cmd, ") < /dev/null"])
+            lines.append("rc=$?; printf '\\n%s\\n' \"{} {} $rc\"".format(token, index))
+            if not self.continue_on_fail:
+                lines.append("[ $rc -eq 0 ] || exit 0")
+        return "\n".join(lines)
+
+    def run(self):
+        """Run the commands of the batch.
+
+        Returns:
+            The list of the results of the commands run, of all the commands if continue_on_fail is set. The rc of a
+            command is None when the shell stopped before its end.
+        """
+        if not self.cmds:
+            return []
+        token = "--shell-batch-{}--".format(uuid.uuid4().hex)
+        res = self.host.shell(self.script(token), module_ignore_errors=True, verbose=False)
+
+        stdouts = {}
+        for match in re.finditer(r"^{0} (\d+)\n(.*?)\n{0} \1 (-?\d+)$".format(token), res.get("stdout", ""),
+                                 re.MULTILINE | re.DOTALL):
+            stdouts[int(match.group(1))] = (int(match.group(3)), match.group(2))
+        # The stderr of a command starts after its delimiter and ends at the delimiter of the next command
+        parts = re.split(r"(?:^|\n){} (\d+)(?:\n|$)".format(token), res.get("stderr", ""))
+        stderrs = dict((int(index), stderr) for index, stderr in zip(parts[1::2], parts[2::2]))
+
+        results = []
+        stopped = False
+        for index, result in enumerate(self.results):
+            if stopped:
+                result["skipped"] = True
+                continue
+            if index in stdouts:
+                rc, stdout = stdouts[index]
+                msg = "non-zero return code" if rc != 0 else ""
+            else:
+                # The shell stopped before the end of the command, e.g. the host rebooted
+                rc, stdout, msg = None, "", "command did not complete: {}".format(res.get("msg", ""))
+            stdout = stdout.rstrip("\r\n")
+            stderr = stderrs.get(index, "").rstrip("\r\n")
+            result.update({
+                "rc": rc,
+                "stdout": stdout,
+                "stderr": stderr,
+                "stdout_lines": stdout.splitlines(),
+                "stderr_lines": stderr.splitlines(),
+                "failed": rc != 0,
+                "msg": msg,
+            })
+            results.append(result)
+            stopped = rc != 0 and not self.continue_on_fail
+
+        failed_cmds = [result["cmd"] for result in results if result["failed"]]
+        if failed_cmds and not self.module_ignore_errors:
+            raise RunAnsibleModuleFail("run shell_batch failed", {
+                "failed": True,
+                "msg": "At least running one of the commands failed",
+                "cmds": [cmd for cmd, _ in self.cmds],
+                "failed_cmds": failed_cmds,
+                "results": results,
+            })
+        return results
@@ -0,0 +1,179 @@
+"""Benchmark of the round trips to a DUT of the helpers of SonicHost running batches of shell commands.
+
+The DUT is simulated: the shell module runs its command with the local /bin/sh, after a simulated round trip, with
+stand-in docker, systemctl, show, config and sonic_installer commands answering like a SONiC DUT. The round trips and
+time of the helpers moved to shell_batch are reported, and the interface status of all the ASICs of a DUT is read
+like the sanity check did, with the show_interface and show_ip_interface modules per ASIC, and with one batch.
+
+Usage:
+    python tests/common/devices/shell_batch_benchmark.py --asics 3 --latency 0.2
+"""
+import argparse
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../.."))
+
+from tests.common.devices.sonic import SonicHost     # noqa: E402
+from tests.common.devices.sonic_asic import SonicAsic     # noqa: E402
+from tests.common.errors import RunAnsibleModuleFail     # noqa: E402
+
+SERVICES = ["database", "bgp", "lldp", "pmon", "swss", "syncd", "teamd"]
+PORTS = 32
+
+# Stand-in of the commands of a SONiC DUT, installed under the names of the commands
+FAKE_COMMAND = r'''#!{python}
+import os
+import sys
+
+name, args = os.path.basename(sys.argv[0]), sys.argv[1:]
+ports = ["Ethernet{{}}".format(4 * index) for index in range({ports})]
+if name == "sudo":
+    os.execvp(args[0], args)
+elif name == "systemctl":
+    print("ExecMainStartTimestamp=Mon 2026-10-12 10:00:00 UTC")
+elif name == "sonic_installer":
+    print("Current: SONiC-OS-201911.1\nNext: SONiC-OS-201911.1\nAvailable:\nSONiC-OS-201911.1")
+elif name == "docker" and args[0] == "inspect":
+    print("true")
+elif name == "docker" and args[0] == "exec" and "critical_processes" in args[-1]:
+    print("group:{{}}d\nprogram:{{}}mgrd".format(args[1], args[1]))
+elif name == "docker" and args[0] == "exec" and args[2:] == ["supervisorctl", "status"]:
+    print("supervisord RUNNING pid 1, uptime 1:00:00")
+    print("{{0}}d:{{0}}d RUNNING pid 10, uptime 1:00:00".format(args[1]))
+    print("{{}}mgrd RUNNING pid 11, uptime 1:00:00".format(args[1]))
+elif name == "show" and args[0] in ["ip", "ipv6"]:
+    print("Interface        Master    IPv4 address/mask    Admin/Oper    BGP Neighbor    Neighbor IP")
+    print("---------------  --------  -------------------  ------------  --------------  -------------")
+    print("Loopback0                  10.1.0.32/32         up/up         N/A             N/A")
+    print("PortChannel101             10.0.0.56/31         up/up         ARISTA01T1      10.0.0.57")
+elif name == "show" and args[:2] == ["interface", "status"]:
+    print("  Interface    Lanes    Speed    MTU    FEC    Alias    Vlan    Oper    Admin    Type    Asym PFC")
+    print("-----------  -------  -------  -----  -----  -------  ------  ------  -------  ------  ----------")
+    for index, port in enumerate(ports):
+        print("{{:>11}}  {{:>7}}     100G   9100     rs  etp{{:<4}}  routed      up       up  QSFP28         off"
+              .format(port, index, index))
+'''
+
+
+class FakeDut(object):
+    """Run the commands of the shell and command modules with the local shell, counting the round trips."""
+
+    def __init__(self, bindir, latency):
+        self.env = dict(os.environ, PATH="{}:{}".format(bindir, os.environ["PATH"]))
+        self.latency = latency
+        self.round_trips = 0
+
+    def run(self, cmd, module_ignore_errors=False, round_trip=True):
+        if round_trip:
+            self.round_trips += 1
+            time.sleep(self.latency)
+        proc = subprocess.run(["/bin/sh", "-c", cmd], stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                              env=self.env)
+        stdout, stderr = proc.stdout.rstrip("\r\n"), proc.stderr.rstrip("\r\n")
+        res = {"cmd": cmd, "rc": proc.returncode, "stdout": stdout, "stderr": stderr,
+               "stdout_lines": stdout.splitlines(), "stderr_lines": stderr.splitlines(),
+               "failed": proc.returncode != 0}
+        if res["failed"] and not module_ignore_errors:
+            raise RunAnsibleModuleFail("run module shell failed", res)
+        return res
+
+
+def make_sonichost(dut, num_asic):
+    """Return a SonicHost whose modules are run by dut."""
+    host = SonicHost.__new__(SonicHost)
+    host.hostname = "bench-dut"
+    host._facts = {"num_asic": num_asic, "asic_type": "broadcom"}
+    host.is_multi_asic = num_asic > 1
+    host._os_version = "201911.1"
+    host._critical_services = SERVICES
+
+    def shell(cmd, module_ignore_errors=False, **kwargs):
+        return dut.run(cmd, module_ignore_errors)
+
+    def shell_cmds(cmds, continue_on_fail=True, module_ignore_errors=False, timeout=0):
+        # The shell_cmds module runs all its commands in one round trip
+        dut.run("true")
+        return {"results": [dut.run(cmd, True, round_trip=False) for cmd in cmds]}
+
+    def show_interface(command, namespace=None, **kwargs):
+        ns_option = " -n {} -d all".format(namespace) if namespace is not None else ""
+        rows = host._parse_show(dut.run("show interface status{}".format(ns_option))["stdout_lines"])
+        return {"ansible_facts": {"int_status": dict(
+            (row["interface"], {"oper_state": row["oper"]}) for row in rows)}}
+
+    def show_ip_interface(namespace=None, **kwargs):
+        ns_option = " -n {} -d all".format(namespace) if namespace is not None else ""
+        rows = host._parse_show(dut.run("show ip interfaces{}".format(ns_option))["stdout_lines"])
+        return {"ansible_facts": {"ip_interfaces": dict(
+            (row["interface"], {"oper_state": row["admin/oper"].split("/")[1]}) for row in rows)}}
+
+    host.shell = host.command = shell
+    host.shell_cmds = shell_cmds
+    host.show_interface = show_interface
+    host.show_ip_interface = show_ip_interface
+    return host
+
+
+def interfaces_by_modules(host, asics):
+    # The sanity check before: the show_interface and show_ip_interface modules per ASIC
+    for asic in asics:
+        asic.show_ip_interface()
+        asic.show_interface(command="status", include_internal_intfs=True)
+
+
+def interfaces_by_batch(host, asics):
+    ns_options = [" -n {} -d all".format(asic.namespace) if asic.namespace is not None else "" for asic in asics]
+    cmds = []
+    for ns_option in ns_options:
+        cmds.extend(["show ip interfaces{}".format(ns_option), "show interface status{}".format(ns_option)])
+    host.show_and_parse_batch(cmds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the round trips of the helpers running shell batches")
+    parser.add_argument("--asics", type=int, default=3, help="Number of ASICs of the DUT")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds of a round trip of a module call")
+    args = parser.parse_args()
+
+    bindir = tempfile.mkdtemp()
+    try:
+        command = os.path.join(bindir, "fake_command")
+        with open(command, "w") as f:
+            f.write(FAKE_COMMAND.format(python=sys.executable, ports=PORTS))
+        os.chmod(command, os.stat(command).st_mode | stat.S_IXUSR)
+        for name in ["sudo", "systemctl", "sonic_installer", "docker", "show", "config"]:
+            os.symlink(command, os.path.join(bindir, name))
+
+        dut = FakeDut(bindir, args.latency)
+        host = make_sonichost(dut, args.asics)
+        asics = [SonicAsic(host, index) for index in range(args.asics)]
+        scenarios = [
+            ("get_networking_uptime", lambda: host.get_networking_uptime()),
+            ("critical_process_status(swss)", lambda: host.critical_process_status("swss")),
+            ("get_critical_group_and_process_lists(pmon)",
+             lambda: host.get_critical_group_and_process_lists("pmon")),
+            ("all_critical_process_status", lambda: host.all_critical_process_status()),
+            ("shutdown_multiple (201911, 8 ports)",
+             lambda: host.shutdown_multiple(["Ethernet{}".format(4 * index) for index in range(8)])),
+            ("interfaces of {} ASICs by modules".format(args.asics), lambda: interfaces_by_modules(host, asics)),
+            ("interfaces of {} ASICs by batch".format(args.asics), lambda: interfaces_by_batch(host, asics)),
+        ]
+
+        print("{:<45} {:>12} {:>10}".format("helper", "round trips", "time(ms)"))
+        for name, func in scenarios:
+            dut.round_trips = 0
+            start = time.time()
+            func()
+            print("{:<45} {:>12} {:>10.0f}".format(name, dut.round_trips, (time.time() - start) * 1000))
+    finally:
+        shutil.rmtree(bindir)
+
+
+if __name__ == "__main__":
+    main()
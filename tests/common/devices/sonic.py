@@ -15,6 +15,8 @@ from ansible.plugins.loader import connection_loader
 
 from tests.common.devices.base import AnsibleHostBase
 from tests.common.devices.constants import ACL_COUNTERS_UPDATE_INTERVAL_IN_SEC
+from tests.common.devices.shell_batch import ShellBatch
+from tests.common.devices.ssh_transport import SshTransport, ssh_transport_enabled
 from tests.common.helpers.dut_utils import is_supervisor_node, is_macsec_capable_node
 from tests.common.str_utils import str2bool
 from tests.common.utilities import get_host_visible_vars
@@ -95,6 +97,9 @@ class SonicHost(AnsibleHostBase):
             }
             self.host.options['variable_manager'].extra_vars.update(evars)
 
+        if ssh_transport_enabled():
+            self.ssh_transport = SshTransport.from_host(self)
+
         self._facts = self._gather_facts()
         self._os_version = self._get_os_version()
 
@@ -394,6 +399,29 @@ class SonicHost(AnsibleHostBase):
         output = self.command('uname -r')
         return output["stdout"].split('-')[0]
 
+    def shell_batch(self, cmds=None, continue_on_fail=True, module_ignore_errors=False, timeout=0):
+        """
+        @summary: Run shell commands one after another in a single call of the shell module, i.e. in one round trip
+            to the DUT instead of one per command.
+        @param cmds: List of commands. If not set, return a ShellBatch to add the commands to, run when its context
+            is exited:
+                with duthost.shell_batch() as batch:
+                    status = batch.shell("docker exec swss supervisorctl status")
+                logger.info(status["stdout"])
+        @param continue_on_fail: Run the next commands after a command failed.
+        @param module_ignore_errors: Do not raise RunAnsibleModuleFail when a command failed.
+        @param timeout: Time limit in seconds of each command, 0 for no limit.
+        @return: A list of the results of the commands run, each with the cmd, rc, stdout, stderr, stdout_lines,
+            stderr_lines and failed keys of the result of the shell module.
+        """
+        batch = ShellBatch(self, continue_on_fail=continue_on_fail, module_ignore_errors=module_ignore_errors,
+                           timeout=timeout)
+        if cmds is None:
+            return batch
+        for cmd in cmds:
+            batch.shell(cmd)
+        return batch.run()
+
     def get_service_props(self, service, props=["ActiveState", "SubState"]):
         """
         @summary: Use 'systemctl show' command to get detailed properties of a service. By default, only get
@@ -406,10 +434,18 @@ class SonicHost(AnsibleHostBase):
                 "SubState": "running"
             }
         """
+        output = self.command(self._service_props_cmd(service, props))
+        return self._parse_service_props(output["stdout_lines"])
+
+    @staticmethod
+    def _service_props_cmd(service, props):
         props = " ".join(["-p %s" % prop for prop in props])
-        output = self.command("systemctl %s show %s" % (props, service))
+        return "systemctl %s show %s" % (props, service)
+
+    @staticmethod
+    def _parse_service_props(output_lines):
         result = {}
-        for line in output["stdout_lines"]:
+        for line in output_lines:
             fields = line.split("=")
             if len(fields) >= 2:
                 result[fields[0]] = fields[1]
@@ -601,12 +637,27 @@ class SonicHost(AnsibleHostBase):
                   critical_processes file in the specified container
         @return: Two lists which include the critical groups and critical processes respectively
         """
+        cmds = [self._critical_processes_cmd(container_name)]
+        if container_name == "pmon":
+            cmds.append("docker exec {} supervisorctl status".format(container_name))
+        results = self.shell_batch(cmds, module_ignore_errors=True)
+        return self._parse_critical_group_and_process_lists(
+            container_name, results[0], results[1] if len(results) > 1 else None)
+
+    @staticmethod
+    def _critical_processes_cmd(container_name):
+        return "docker exec {} bash -c '[ -f /etc/supervisor/critical_processes ] " \
+               "&& cat /etc/supervisor/critical_processes'".format(container_name)
+
+    def _parse_critical_group_and_process_lists(self, container_name, file_content, process_list):
+        """
+        @summary: Parse the critical_processes file of a container, and for PMon the supervisor status of its
+                  processes, like get_critical_group_and_process_lists
+        """
         critical_group_list = []
         critical_process_list = []
         succeeded = True
 
-        file_content = self.shell("docker exec {} bash -c '[ -f /etc/supervisor/critical_processes ] \
-                && cat /etc/supervisor/critical_processes'".format(container_name), module_ignore_errors=True)
         for line in file_content["stdout_lines"]:
             line_info = line.strip().split(':')
             if len(line_info) != 2:
@@ -633,8 +684,6 @@ class SonicHost(AnsibleHostBase):
         if succeeded and container_name == "pmon":
             expected_critical_group_list = []
             expected_critical_process_list = []
-            process_list = self.shell("docker exec {} supervisorctl status"
-                                      .format(container_name), module_ignore_errors=True)
             for process_info in process_list["stdout_lines"]:
                 process_name = process_info.split()[0].strip()
                 process_status = process_info.split()[1].strip()
@@ -654,20 +703,14 @@ class SonicHost(AnsibleHostBase):
 
     def critical_group_process(self):
         # Get critical group and process definitions by running cmds in batch to save overhead
-        cmds = []
-        for service in self.critical_services:
-            cmd = 'docker exec {} bash -c "[ -f /etc/supervisor/critical_processes ]' \
-                  ' && cat /etc/supervisor/critical_processes"'.format(service)
-
-            cmds.append(cmd)
-        results = self.shell_cmds(cmds=cmds, continue_on_fail=True, module_ignore_errors=True, timeout=30)['results']
-
-        # Extract service name of each command result, transform results list to a dict keyed by service name
-        service_results = {}
-        for res in results:
-            service = res['cmd'].split()[2]
-            service_results[service] = res
+        cmds = [self._critical_processes_cmd(service) for service in self.critical_services]
+        results = self.shell_batch(cmds, module_ignore_errors=True, timeout=30)
+        return self._parse_critical_group_process(dict(zip(self.critical_services, results)))
 
+    def _parse_critical_group_process(self, service_results):
+        """
+        @summary: Parse the critical_processes files of the services, keyed by service name
+        """
         # Parse critical group and service definition of all services
         group_process_results = {}
         for service in self.critical_services:
@@ -714,20 +757,24 @@ class SonicHost(AnsibleHostBase):
             'running_critical_process': []
         }
 
+        # get the container state, the critical group and process lists and the process status of the service
+        # in one round trip
+        service_status, file_content, output = self.shell_batch([
+            r"docker inspect -f \{\{.State.Running\}\} %s" % service,
+            self._critical_processes_cmd(service),
+            "docker exec {} supervisorctl status".format(service)], module_ignore_errors=True)
+
         # return false if the service is not started
-        service_status = self.is_service_fully_started(service)
-        if service_status is False:
+        if service_status["stdout"].strip() != "true":
             result['status'] = False
             return result
 
-        # get critical group and process lists for the service
-        critical_group_list, critical_process_list, succeeded = self.get_critical_group_and_process_lists(service)
+        critical_group_list, critical_process_list, succeeded = self._parse_critical_group_and_process_lists(
+            service, file_content, output)
         if succeeded is False:
             result['status'] = False
             return result
 
-        # get process status for the service
-        output = self.command("docker exec {} supervisorctl status".format(service), module_ignore_errors=True)
         logging.info("====== supervisor process status for service {} ======".format(service))
 
         return self.parse_service_status_and_critical_process(
@@ -740,21 +787,15 @@ class SonicHost(AnsibleHostBase):
         """
         @summary: Check whether all critical processes status for all critical services
         """
-        # Get critical process definition of all services
-        group_process_results = self.critical_group_process()
-
-        # Get process status of all services. Run cmds in batch to save overhead
-        cmds = []
-        for service in self.critical_services:
-            cmd = 'docker exec {} supervisorctl status'.format(service)
-            cmds.append(cmd)
-        results = self.shell_cmds(cmds=cmds, continue_on_fail=True, module_ignore_errors=True, timeout=60)['results']
-
-        # Extract service name of each command result, transform results list to a dict keyed by service name
+        # Get critical process definition and process status of all services. Run cmds in one batch to save overhead
+        file_results = {}
         service_results = {}
-        for res in results:
-            service = res['cmd'].split()[2]
-            service_results[service] = res
+        with self.shell_batch(module_ignore_errors=True) as batch:
+            for service in self.critical_services:
+                file_results[service] = batch.shell(self._critical_processes_cmd(service), timeout=30)
+                service_results[service] = batch.shell('docker exec {} supervisorctl status'.format(service),
+                                                       timeout=60)
+        group_process_results = self._parse_critical_group_process(file_results)
 
         # Parse critical process status of all services
         all_critical_process = {}
@@ -1129,10 +1170,13 @@ class SonicHost(AnsibleHostBase):
         return timedelta(seconds=float(uptime_text))
 
     def get_networking_uptime(self):
-        start_time = self.get_service_props("networking", props=["ExecMainStartTimestamp", ])
+        # Start time of the networking service and current time of the DUT, in one round trip
+        start_time, now_time = self.shell_batch([self._service_props_cmd("networking", ["ExecMainStartTimestamp"]),
+                                                 'date +"%Y-%m-%d %H:%M:%S"'])
+        start_time = self._parse_service_props(start_time["stdout_lines"])
         try:
-            return self.get_now_time() - datetime.strptime(start_time["ExecMainStartTimestamp"],
-                                                           "%a %Y-%m-%d %H:%M:%S %Z")
+            return datetime.strptime(now_time["stdout"], "%Y-%m-%d %H:%M:%S") - \
+                datetime.strptime(start_time["ExecMainStartTimestamp"], "%a %Y-%m-%d %H:%M:%S %Z")
         except Exception as e:
             logging.error("Exception raised while getting networking restart time: %s" % repr(e))
             return None
@@ -1177,11 +1221,12 @@ class SonicHost(AnsibleHostBase):
         """
         image_info = self.get_image_info()
         # 201811 & 201911 images do not support multiple interface shutdown
-        # Change the batch shutdown call to individual call here
+        # Change the batch shutdown call to individual commands here, run in a single batch
         current_image = image_info.get("current")
         if "201811" in current_image or "201911" in current_image:
-            for ifname in ifnames:
-                self.shutdown(ifname)
+            logging.info("Shutting down {}".format(",".join(ifnames)))
+            self.shell_batch(["sudo config interface shutdown {}".format(ifname) for ifname in ifnames],
+                             continue_on_fail=False)
             return
         else:
             intf_str = ','.join(ifnames)
@@ -1206,11 +1251,12 @@ class SonicHost(AnsibleHostBase):
         """
         image_info = self.get_image_info()
         # 201811 & 201911 images do not support multiple interface startup
-        # Change the batch startup call to individual call here
+        # Change the batch startup call to individual commands here, run in a single batch
         current_image = image_info.get("current")
         if "201811" in current_image or "201911" in current_image:
-            for ifname in ifnames:
-                self.no_shutdown(ifname)
+            logging.info("Starting up {}".format(",".join(ifnames)))
+            self.shell_batch(["sudo config interface startup {}".format(ifname) for ifname in ifnames],
+                             continue_on_fail=False)
             return
         else:
             intf_str = ','.join(ifnames)
@@ -1813,6 +1859,19 @@ Totals               6450                 6449
             output = output[start_line_index:end_line_index]
         return self._parse_show(output, header_len)
 
+    def show_and_parse_batch(self, show_cmds, header_len=1, **kwargs):
+        """Run show commands in a single batch and parse the output of each of them like show_and_parse.
+
+        Args:
+            show_cmds: The show commands that will be executed.
+            kwargs: Other keyword args of shell_batch.
+
+        Returns:
+            A list of the parsed output of each show command, in the format of show_and_parse.
+        """
+        results = self.shell_batch(show_cmds, **kwargs)
+        return [self._parse_show(result["stdout_lines"], header_len) for result in results]
+
     @cached(name='mg_facts')
     def get_extended_minigraph_facts(self, tbinfo, namespace=DEFAULT_NAMESPACE):
         mg_facts = self.minigraph_facts(host=self.hostname, namespace=namespace)['ansible_facts']
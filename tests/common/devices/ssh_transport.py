@@ -0,0 +1,314 @@
+"""Persistent SSH transport of the shell and command modules.
+
+The shell and command modules of a host are run through the whole ansible task machinery: the module is packaged,
+sent to the host and run by a python interpreter, for every call. SshTransport runs these commands directly over one
+SSH connection per host, kept open by the session, each command in its own channel of the connection. Commands of
+concurrent calls are multiplexed over the same connection.
+
+The result has the same keys as the result of the ansible modules. A call with arguments not supported here is run
+by ansible, like any other module.
+"""
+import datetime
+import logging
+import os
+import re
+import select
+import shlex
+import socket
+import threading
+import time
+import weakref
+
+import paramiko
+from pytest_ansible.results import ModuleResult
+
+logger = logging.getLogger(__name__)
+
+SSH_TRANSPORT_MODULES = ("shell", "command")
+# Keyword arguments of the modules supported by the transport
+SSH_TRANSPORT_ARGS = {
+    "shell": ("executable", "stdin", "stdin_add_newline", "strip_empty_ends"),
+    "command": ("stdin", "stdin_add_newline", "strip_empty_ends"),
+}
+# Arguments of the modules given in the free form command, like 'chdir=/tmp ls'
+FREE_FORM_ARGS = re.compile(r"(^|\s)(creates|removes|chdir|executable|warn|stdin|stdin_add_newline|strip_empty_ends|"
+                            r"expand_argument_vars|argv|cmd)=")
+SSH_CONNECT_TIMEOUT = 10
+SSH_KEEPALIVE_INTERVAL = 30
+# Sessions run at the same time on a connection, the default MaxSessions of sshd is 10
+SSH_MAX_SESSIONS = 8
+# Time to run the calls by ansible after a failure to connect, e.g. while the host reboots
+SSH_RETRY_INTERVAL = 60
+SSH_READ_SIZE = 65536
+# Time to wait for the output of a command before checking that the connection is still up
+SSH_POLL_INTERVAL = 5
+
+_ssh_transport_enabled = False
+_ssh_transports = weakref.WeakSet()
+
+
+def set_ssh_transport_enabled(enabled):
+    """Run the shell and command modules of the hosts created from now on over SshTransport, or not."""
+    global _ssh_transport_enabled
+    _ssh_transport_enabled = enabled
+
+
+def ssh_transport_enabled():
+    return _ssh_transport_enabled
+
+
+def close_ssh_transports():
+    for transport in list(_ssh_transports):
+        transport.close()
+
+
+class SshTransportError(Exception):
+    """The command could not be started over SSH, it can be run by ansible instead."""
+
+
+class SshTransport(object):
+    """Run the commands of the shell and command modules of a host over a persistent SSH connection."""
+
+    def __init__(self, hostname, addresses, username, passwords, port=22, become=True, become_password=None,
+                 max_sessions=SSH_MAX_SESSIONS):
+        """Initialize the transport of a host, the connection is made by the first call.
+
+        Args:
+            hostname: Name of the host in the inventory, for the logs.
+            addresses: Addresses of the host, tried in order.
+            username: SSH user.
+            passwords: Passwords of the user, tried in order. Keys are tried when there is none.
+            port: SSH port.
+            become: Run the commands as root with sudo, like ansible modules run with 'become'.
+            become_password: Password of sudo, the password of the connection when not set.
+            max_sessions: Commands run at the same time on the connection.
+        """
+        self.hostname = hostname
+        self.addresses = [address for address in addresses if address]
+        self.username = username
+        self.passwords = [password for password in passwords if password]
+        self.port = port
+        self.become = become and username != "root"
+        self.become_password = become_password
+        self._sudo = None
+        self._connect_failed = None
+        self._max_sessions = max_sessions
+        self._reset()
+        _ssh_transports.add(self)
+
+    def _reset(self):
+        """Forget the connection, lock and sessions, used by the threads of the process that created them."""
+        self._pid = os.getpid()
+        self._client = None
+        self._lock = threading.Lock()
+        self._sessions = threading.BoundedSemaphore(self._max_sessions)
+
+    def _check_fork(self):
+        # A forked process, e.g. a worker of parallel_run, makes its own connection: the connection of the parent
+        # process cannot be shared, and its lock could be held by a thread that does not exist in the child.
+        if self._pid != os.getpid():
+            self._reset()
+
+    @staticmethod
+    def from_host(host):
+        """Return the transport of an AnsibleHostBase, with the connection variables of its inventory."""
+        options = host.host.options
+        hostvars = options["variable_manager"].get_vars(host=options["inventory_manager"].get_host(host.hostname))
+
+        def _var(*names):
+            # Like the options of the connection plugins, the last variable defined has precedence
+            value = None
+            for name in names:
+                if name in hostvars:
+                    value = hostvars[name]
+            if isinstance(value, str) and "{{" in value:
+                from ansible.template import Templar
+                value = Templar(loader=options["loader"], variables=hostvars).template(value)
+            return value
+
+        passwords = [_var("ansible_password", "ansible_ssh_pass", "ansible_ssh_password"),
+                     _var("ansible_altpassword", "ansible_ssh_altpass", "ansible_ssh_altpassword")]
+        passwords.extend(_var("ansible_altpasswords", "ansible_ssh_altpasswords") or [])
+        return SshTransport(host.hostname,
+                            [_var("ansible_host") or host.hostname, _var("ansible_hostv6")],
+                            _var("ansible_user", "ansible_ssh_user"),
+                            passwords,
+                            port=int(_var("ansible_port", "ansible_ssh_port") or 22),
+                            become=options.get("become", False),
+                            become_password=_var("ansible_become_password", "ansible_become_pass",
+                                                 "ansible_sudo_pass"))
+
+    def close(self):
+        self._check_fork()
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def _connect(self):
+        error = None
+        for address in self.addresses:
+            for password in self.passwords or [None]:
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                try:
+                    client.connect(address, port=self.port, username=self.username, password=password,
+                                   allow_agent=password is None, look_for_keys=password is None,
+                                   timeout=SSH_CONNECT_TIMEOUT, banner_timeout=SSH_CONNECT_TIMEOUT,
+                                   auth_timeout=SSH_CONNECT_TIMEOUT)
+                except paramiko.AuthenticationException as e:
+                    error = e
+                    client.close()
+                    continue
+                except (paramiko.SSHException, socket.error) as e:
+                    # Unreachable address, try the next one
+                    error = e
+                    client.close()
+                    break
+                client.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
+                if self.become_password is None:
+                    self.become_password = password
+                return client
+        raise SshTransportError("Cannot connect to {} over SSH: {}".format(self.hostname, repr(error)))
+
+    def _get_transport(self, reconnect=False):
+        with self._lock:
+            if reconnect and self._client is not None:
+                self._client.close()
+                self._client = None
+            transport = self._client.get_transport() if self._client is not None else None
+            if transport is None or not transport.is_active():
+                if self._connect_failed is not None and time.time() - self._connect_failed < SSH_RETRY_INTERVAL:
+                    raise SshTransportError("Not connected to {} over SSH".format(self.hostname))
+                try:
+                    self._client = self._connect()
+                    self._sudo = None
+                    self._connect_failed = None
+                except SshTransportError:
+                    self._connect_failed = time.time()
+                    raise
+                transport = self._client.get_transport()
+            return transport
+
+    def _open_session(self):
+        for reconnect in [False, True]:
+            try:
+                return self._get_transport(reconnect=reconnect).open_session(timeout=SSH_CONNECT_TIMEOUT)
+            except (paramiko.SSHException, socket.error, EOFError) as e:
+                # The connection is not usable any more, e.g. after a reboot, connect again once
+                error = e
+        raise SshTransportError("Cannot open a SSH session to {}: {}".format(self.hostname, repr(error)))
+
+    def _exec(self, command, stdin=None):
+        """Run command, return its exit code, stdout and stderr as bytes."""
+        self._check_fork()
+        with self._sessions:
+            channel = self._open_session()
+            try:
+                try:
+                    channel.exec_command(command)
+                except paramiko.SSHException as e:
+                    raise SshTransportError("Cannot run command on {}: {}".format(self.hostname, repr(e)))
+                if stdin:
+                    channel.sendall(stdin)
+                channel.shutdown_write()
+
+                stdout, stderr = [], []
+                while not channel.eof_received and not channel.closed:
+                    if channel.recv_stderr_ready():
+                        stderr.append(channel.recv_stderr(SSH_READ_SIZE))
+                    elif channel.recv_ready():
+                        stdout.append(channel.recv(SSH_READ_SIZE))
+                    elif not select.select([channel], [], [], SSH_POLL_INTERVAL)[0] and \
+                            not channel.get_transport().is_active():
+                        raise paramiko.SSHException("Connection closed before the end of the command")
+                # Nothing is received after the end of file
+                while channel.recv_stderr_ready():
+                    stderr.append(channel.recv_stderr(SSH_READ_SIZE))
+                while channel.recv_ready():
+                    stdout.append(channel.recv(SSH_READ_SIZE))
+                rc = channel.recv_exit_status()
+                if rc == -1 and not channel.get_transport().is_active():
+                    raise paramiko.SSHException("Connection closed before the end of the command")
+                return rc, b"".join(stdout), b"".join(stderr)
+            finally:
+                channel.close()
+
+    def _become(self, command):
+        """Return command run as root, and the data to send first to its stdin."""
+        if not self.become:
+            return command, b""
+        if self._sudo is None:
+            rc, _, _ = self._exec("sudo -n true")
+            # The password is always read from stdin when the credentials of sudo are not cached (-k)
+            self._sudo = "sudo -H -n -u root -- " if rc == 0 else "sudo -H -S -k -p '' -u root -- "
+        if "-S" not in self._sudo:
+            return self._sudo + command, b""
+        if not self.become_password:
+            raise SshTransportError("No password for sudo on {}".format(self.hostname))
+        return self._sudo + command, (self.become_password + "\n").encode("utf-8")
+
+    def run(self, module_name, module_args, complex_args):
+        """Run the shell or command module over SSH.
+
+        Args:
+            module_name: 'shell' or 'command'.
+            module_args: Free form command of the module.
+            complex_args: Other arguments of the module.
+
+        Returns:
+            The result of the module, or None if the call must be run by ansible: the module or its arguments are not
+            supported, or the command could not be started.
+        """
+        if module_name not in SSH_TRANSPORT_MODULES or len(module_args) != 1 or \
+                not isinstance(module_args[0], str) or FREE_FORM_ARGS.search(module_args[0]):
+            return None
+        if any(arg not in SSH_TRANSPORT_ARGS[module_name] for arg in complex_args):
+            return None
+
+        cmd = module_args[0]
+        if module_name == "shell":
+            command = "{} -c {}".format(complex_args.get("executable") or "/bin/sh", shlex.quote(cmd))
+        else:
+            cmd = shlex.split(cmd)
+            # The command module expands the variables and '~' of the arguments on the host
+            if not cmd or any("$" in arg or arg.startswith("~") for arg in cmd):
+                return None
+            command = " ".join(shlex.quote(arg) for arg in cmd)
+        stdin = complex_args.get("stdin")
+        if stdin is not None:
+            stdin = str(stdin) + ("\n" if complex_args.get("stdin_add_newline", True) else "")
+
+        start = datetime.datetime.now()
+        try:
+            command, become_stdin = self._become(command)
+            rc, stdout, stderr = self._exec(command, become_stdin + (stdin or "").encode("utf-8"))
+        except SshTransportError as e:
+            logger.warning("{}, run module {} by ansible".format(e, module_name))
+            return None
+        except (paramiko.SSHException, socket.error, EOFError) as e:
+            # The connection was lost while the command was running, like an unreachable host in ansible
+            self.close()
+            return ModuleResult({"failed": True, "unreachable": True, "changed": False, "cmd": cmd,
+                                 "msg": "Lost SSH connection to {}: {}".format(self.hostname, repr(e))})
+        end = datetime.datetime.now()
+
+        stdout = stdout.decode("utf-8", errors="replace")
+        stderr = stderr.decode("utf-8", errors="replace")
+        if complex_args.get("strip_empty_ends", True):
+            stdout = stdout.rstrip("\r\n")
+            stderr = stderr.rstrip("\r\n")
+        return ModuleResult({
+            "changed": True,
+            "cmd": cmd,
+            "rc": rc,
+            "stdout": stdout,
+            "stderr": stderr,
+            "stdout_lines": stdout.splitlines(),
+            "stderr_lines": stderr.splitlines(),
+            "start": str(start),
+            "end": str(end),
+            "delta": str(end - start),
+            "failed": rc != 0,
+            "msg": "non-zero return code" if rc != 0 else "",
+        })
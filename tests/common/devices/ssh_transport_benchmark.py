@@ -0,0 +1,97 @@
+"""Benchmark of the shell and command modules of a host run by ansible and over SshTransport.
+
+The host is an AnsibleHostBase of an inventory of a single SSH host, e.g. the SONiC DUT of a testbed or an sshd in a
+container:
+
+    docker run -d -p 2222:2222 -e USER_NAME=admin -e USER_PASSWORD=password -e PASSWORD_ACCESS=true \
+        -e SUDO_ACCESS=true linuxserver/openssh-server
+
+The same command is run with the ansible command module, one call after another since ansible runs its plays in
+the main thread only, then over SshTransport, one call after another and by a number of threads. The calls per second
+are compared.
+
+Usage:
+    python tests/common/devices/ssh_transport_benchmark.py --host 127.0.0.1 --port 2222 --calls 50 --threads 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../.."))
+
+try:
+    from pytest_ansible.host_manager.utils import get_host_manager  # noqa: E402
+except ImportError:
+    from pytest_ansible.host_manager import get_host_manager        # noqa: E402
+
+from tests.common.devices.base import AnsibleHostBase   # noqa: E402
+from tests.common.devices.ssh_transport import SshTransport   # noqa: E402
+
+INVENTORY = """[bench]
+{hostname} ansible_host={host} ansible_port={port} ansible_user={user} ansible_password={password} \
+ansible_become_password={password} ansible_connection={connection} ansible_host_key_checking=False \
+ansible_python_interpreter={python} ansible_pipelining=True
+"""
+
+
+def make_host(args, inventory):
+    def ansible_adhoc(**kwargs):
+        return get_host_manager(inventory=inventory, host_pattern=args.hostname, **kwargs)
+    return AnsibleHostBase(ansible_adhoc, args.hostname)
+
+
+def measure(host, args, threads):
+    def call(_):
+        res = host.command(args.command)
+        assert res["rc"] == 0, res
+        return res["stdout"]
+
+    call(0)
+    start = time.time()
+    if threads == 1:
+        outputs = [call(num) for num in range(args.calls)]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            outputs = list(executor.map(call, range(args.calls)))
+    return args.calls / (time.time() - start), outputs[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the command module run by ansible and over SSH")
+    parser.add_argument("--host", default="127.0.0.1", help="Address of the SSH host")
+    parser.add_argument("--port", type=int, default=22, help="SSH port")
+    parser.add_argument("--user", default="admin", help="SSH user")
+    parser.add_argument("--password", default="password", help="Password of the SSH user and of sudo")
+    parser.add_argument("--connection", default="ssh", help="Ansible connection plugin, e.g. paramiko")
+    parser.add_argument("--python", default="/usr/bin/python3", help="Python interpreter on the host")
+    parser.add_argument("--hostname", default="bench-host", help="Name of the host in the inventory")
+    parser.add_argument("--command", default="cat /proc/uptime", help="Command run by the calls")
+    parser.add_argument("--calls", type=int, default=50, help="Calls per measure")
+    parser.add_argument("--threads", type=int, default=4, help="Threads making the calls over SSH")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        inventory = os.path.join(tmpdir, "inventory")
+        with open(inventory, "w") as f:
+            f.write(INVENTORY.format(**vars(args)))
+        host = make_host(args, inventory)
+        results = [("ansible", 1) + measure(host, args, 1)]
+        host.ssh_transport = SshTransport.from_host(host)
+        for threads in sorted(set([1, args.threads])):
+            results.append(("ssh", threads) + measure(host, args, threads))
+        host.ssh_transport.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print("{:>8} {:>8} {:>10} {:>8}  {}".format("path", "threads", "calls/s", "speedup", "output"))
+    for path, threads, rate, output in results:
+        print("{:>8} {:>8} {:>10.1f} {:>7.1f}x  {!r}".format(path, threads, rate, rate / results[0][2], output))
+
+
+if __name__ == "__main__":
+    main()
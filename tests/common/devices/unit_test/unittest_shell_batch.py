@@ -0,0 +1,104 @@
+import shlex
+import subprocess
+import unittest
+from unittest.mock import MagicMock
+
+from tests.common.devices.sonic import SonicHost
+from tests.common.plugins.sanity_check.checks import _find_down_ports
+
+# Outputs of the show commands of a multi-ASIC DUT, by the arguments of the show command
+SHOW_OUTPUTS = {
+    "ip interfaces -n asic0 -d all": """\
+Interface        Master    IPv4 address/mask    Admin/Oper    BGP Neighbor    Neighbor IP
+---------------  --------  -------------------  ------------  --------------  -------------
+Loopback0                  10.1.0.32/32         up/up         N/A             N/A
+                           10.1.0.33/32
+PortChannel101             10.0.0.56/31         up/up         ARISTA01T1      10.0.0.57
+PortChannel102             10.0.0.58/31         up/down       ARISTA02T1      10.0.0.59
+Vlan1000                   192.168.0.1/21       up/up         N/A             N/A
+                           192.168.8.1/21
+                           192.168.16.1/21
+""",
+    "interface status -n asic0 -d all": """\
+     Interface            Lanes    Speed    MTU    FEC         Alias             Vlan    Oper    Admin             Type    Asym PFC
+--------------  ---------------  -------  -----  -----  ------------  ---------------  ------  -------  ---------------  ----------
+     Ethernet0      33,34,35,36     100G   9100     rs   Ethernet1/1   PortChannel101      up       up  QSFP28 or later         off
+     Ethernet4      37,38,39,40     100G   9100     rs   Ethernet1/2   PortChannel102    down       up  QSFP28 or later         off
+  Ethernet-BP0      13,14,15,16     100G   9100     rs  Ethernet-BP0  PortChannel4001      up       up         Internal         off
+""",  # noqa: E501
+    "ip interfaces -n asic1 -d all": """\
+Interface        Master    IPv4 address/mask    Admin/Oper    BGP Neighbor    Neighbor IP
+---------------  --------  -------------------  ------------  --------------  -------------
+PortChannel4001            10.1.0.1/31          up/up         N/A             N/A
+                           10.1.0.3/31
+""",
+    "interface status -n asic1 -d all": """\
+     Interface            Lanes    Speed    MTU    FEC         Alias             Vlan    Oper    Admin             Type    Asym PFC
+--------------  ---------------  -------  -----  -----  ------------  ---------------  ------  -------  ---------------  ----------
+  Ethernet-BP4      17,18,19,20     100G   9100     rs  Ethernet-BP4  PortChannel4001      up       up         Internal         off
+""",  # noqa: E501
+}
+
+
+def make_sonichost(stdin=""):
+    """Return a SonicHost whose shell module runs the script with the local /bin/sh, stdin being sent to the shell."""
+    host = SonicHost.__new__(SonicHost)
+    show = "\n".join("{}) printf '%s' {};;".format(shlex.quote(args), shlex.quote(output))
+                     for args, output in SHOW_OUTPUTS.items())
+    functions = 'show() {{\ncase "$*" in\n{}\nesac\n}}\n'.format(show)
+
+    def shell(cmd, module_ignore_errors=False, **kwargs):
+        proc = subprocess.run(["/bin/sh", "-c", functions + cmd], input=stdin, capture_output=True, text=True)
+        return {"rc": proc.returncode, "stdout": proc.stdout, "stderr": proc.stderr}
+
+    host.shell = shell
+    return host
+
+
+class TestShellBatch(unittest.TestCase):
+    """Test cases of the commands run by SonicHost.shell_batch."""
+
+    def test_commands_do_not_read_stdin(self):
+        # The stdin of the shell module may be left open, a command reading it would block
+        host = make_sonichost(stdin="input of the shell\n")
+        for timeout in [0, 10]:
+            with self.subTest(timeout=timeout):
+                results = host.shell_batch(["cat", "echo after"], timeout=timeout)
+                self.assertEqual([result["stdout"] for result in results], ["", "after"])
+                self.assertEqual([result["rc"] for result in results], [0, 0])
+
+    def test_show_and_parse_batch(self):
+        host = make_sonichost()
+        ip_interfaces, interface_status = host.show_and_parse_batch(
+            ["show ip interfaces -n asic0 -d all", "show interface status -n asic0 -d all"])
+
+        self.assertEqual([(row["interface"], row["ipv4 address/mask"], row["admin/oper"]) for row in ip_interfaces], [
+            ("Loopback0", "10.1.0.32/32", "up/up"),
+            ("", "10.1.0.33/32", ""),
+            ("PortChannel101", "10.0.0.56/31", "up/up"),
+            ("PortChannel102", "10.0.0.58/31", "up/down"),
+            ("Vlan1000", "192.168.0.1/21", "up/up"),
+            ("", "192.168.8.1/21", ""),
+            ("", "192.168.16.1/21", ""),
+        ])
+        self.assertEqual([(row["interface"], row["vlan"], row["oper"], row["type"]) for row in interface_status], [
+            ("Ethernet0", "PortChannel101", "up", "QSFP28 or later"),
+            ("Ethernet4", "PortChannel102", "down", "QSFP28 or later"),
+            ("Ethernet-BP0", "PortChannel4001", "up", "Internal"),
+        ])
+
+    def test_find_down_ports(self):
+        dut = MagicMock()
+        dut.sonichost.get_facts.return_value = {}
+        dut.os_version = "202305"
+        dut.show_and_parse_batch = make_sonichost().show_and_parse_batch
+        asic0, asic1 = MagicMock(namespace="asic0"), MagicMock(namespace="asic1")
+        asic_interfaces = [
+            (asic0, ["Ethernet0", "Ethernet4", "Ethernet8", "Ethernet-BP0"],
+             ["PortChannel101", "PortChannel102", "Vlan1000"]),
+            (asic1, ["Ethernet-BP4"], ["PortChannel4001"]),
+        ]
+
+        # Ethernet8 is missing from the output, the continuation rows of Vlan1000 and PortChannel4001 are skipped
+        self.assertEqual(_find_down_ports(dut, asic_interfaces),
+                         ["PortChannel102", "Ethernet4", "Ethernet8"])
@@ -11,6 +11,8 @@ OUTPUT = "output"
 FLAP_COUNTER = "flap_counter"
 CLEAR_FLAP_COUNTER = "clear_flap_counter"
 RESET = "reset"
+ACTIVE_SIDE = "active_side"
+BULK = "bulk"
 
 MUX_SIM_ALLOWED_DISRUPTION_SEC = 30
 CONFIG_RELOAD_ALLOWED_DISRUPTION_SEC = 120
@@ -1,4 +1,3 @@
-import copy
 import pytest
 import json
 import os.path
@@ -7,12 +6,11 @@ import time
 import random
 import shutil
 
-from itertools import groupby
-
 from tests.common.dualtor.dual_tor_common import active_active_ports        # noqa: F401
 from tests.common.dualtor.dual_tor_common import active_standby_ports       # noqa: F401
 from tests.common.dualtor.dual_tor_common import cable_type     # noqa: F401
 from tests.common.dualtor.dual_tor_common import CableType
+from tests.common.dualtor import dual_tor_flow
 from tests.common.dualtor.dual_tor_io import DualTorIO
 from tests.common.helpers.assertions import pytest_assert
 from tests.common.utilities import InterruptableThread
@@ -92,47 +90,18 @@ def validate_traffic_results(tor_IO, allowed_disruption, delay,
                          server_ip, json.dumps(result['disruptions'], indent=4))
             logger.debug("Server %s duplications before merge:\n%s",
                          server_ip, json.dumps(result['duplications'], indent=4))
-            disruptions = []
-            intervals = copy.deepcopy(result['disruptions']) + copy.deepcopy(result['duplications'])
-            intervals.sort(key=lambda interval: interval['start_time'])
-            for interval in intervals:
-                if disruptions and interval['start_id'] <= disruptions[-1]['end_id'] + 1:
-                    if disruptions[-1]['end_id'] < interval['end_id']:
-                        disruptions[-1]['end_id'] = interval['end_id']
-                        disruptions[-1]['end_time'] = interval['end_time']
-                    # "duplication_count" is used to distinguish duplications, so if we merge a
-                    # disruption into a duplication, remove the "duplication_count" key to make the
-                    # last entry as a disruption.
-                    if "duplication_count" in disruptions[-1] and "duplication_count" not in interval:
-                        disruptions[-1].pop("duplication_count")
-                else:
-                    disruptions.append(interval)
-
-            # keep only disruptions
-            result['disruptions'] = [_ for _ in disruptions if "duplication_count" not in _]
+            result['disruptions'] = dual_tor_flow.merge_duplications_into_disruptions(
+                result['disruptions'], result['duplications'])
             logger.debug("Server %s disruptions after merge:\n%s",
                          server_ip, json.dumps(result['disruptions'], indent=4))
 
         total_disruptions = len(result['disruptions'])
 
-        longest_disruption = 0
-        for disruption in result['disruptions']:
-            disruption_length = disruption['end_time'] - disruption['start_time']
-            if disruption_length > longest_disruption:
-                longest_disruption = disruption_length
-
-        total_duplications = len([_ for _ in groupby(enumerate(result['duplications']),
-                                                     lambda t: t[0] - t[1]['start_id'])])
-        largest_duplication_count = 0
-        largest_duplication_count_packet_id = None
-        longest_duplication = 0
-        for duplication in result['duplications']:
-            duplication_length = duplication['end_time'] - duplication['start_time']
-            if duplication_length > longest_duplication:
-                longest_duplication = duplication_length
-            if duplication['duplication_count'] > largest_duplication_count:
-                largest_duplication_count = duplication['duplication_count']
-                largest_duplication_count_packet_id = duplication['start_id']
+        longest_disruption = dual_tor_flow.longest_interval(result['disruptions'])
+        total_duplications = dual_tor_flow.count_duplication_sequences(result['duplications'])
+        largest_duplication_count, largest_duplication_count_packet_id = \
+            dual_tor_flow.largest_duplication(result['duplications'])
+        longest_duplication = dual_tor_flow.longest_interval(result['duplications'])
 
         disruption_before_traffic = result['disruption_before_traffic']
         disruption_after_traffic = result['disruption_after_traffic']
@@ -234,10 +203,7 @@ def _validate_long_disruption(disruptions, allowed_disruption, delay):
     Helper function to validate when two continuous disruption combine as one.
     """
 
-    total_disruption_length = 0
-
-    for disruption in disruptions:
-        total_disruption_length += disruption['end_time'] - disruption['start_time']
+    total_disruption_length = dual_tor_flow.total_interval_length(disruptions)
 
     logger.debug("total_disruption_length: {}, total_allowed_disruption_length=allowed_disruption*delay: {}".format(
         total_disruption_length, allowed_disruption*delay))
@@ -0,0 +1,289 @@
+"""
+Vectorized examination of the dualtor I/O test traffic.
+
+ServerFlows reads the capture of the ptf sniffer with PacketCapture and computes the per-server results of
+DualTorIO.examine_each_packet with array passes over the header fields, instead of dissecting every packet with
+scapy. The interval helpers merge and summarize the disruptions and duplications of those results, whichever way
+they were computed, for data_plane_utils.validate_traffic_results.
+"""
+import logging
+import socket
+import struct
+
+import scapy.all as scapyall
+
+from tests.ptftests.py3 import packet_capture
+from tests.ptftests.py3.packet_capture import UnsupportedCapture, np
+
+logger = logging.getLogger(__name__)
+
+# The payload IDs are decoded as int64
+MAX_DIGITS = 18
+DIGIT_ZERO = ord("0")
+PADDING = ord("X")
+
+
+class ServerFlows(object):
+    """
+    The test packets of a capture, split per server and sorted by payload ID then timestamp.
+
+    A packet is a test packet if it's TCP from tcp_sport to tcp_dport, its payload is the packet ID padded with
+    'X', and it's either sent (Ether dst is sent_pkt_dst_mac) or received (Ether src is in received_pkt_src_mac).
+    The server of a packet is its IP src or dst address, as given by server_field.
+    """
+
+    def __init__(self, capture, sent_pkt_dst_mac, received_pkt_src_mac, tcp_sport, tcp_dport, server_field):
+        self.capture = capture
+        self.sent_pkt_dst_mac = sent_pkt_dst_mac
+        self.received_pkt_src_mac = received_pkt_src_mac
+        self.tcp_sport = tcp_sport
+        self.tcp_dport = tcp_dport
+        self.server_field = server_field
+
+        indexes, payloads, sent, server_ids = self._filter()
+        self.filtered_count = len(indexes)
+        # Sort by server, then payload ID, then timestamp; lexsort is stable like the sort of the packet lists
+        order = np.lexsort((capture.sort_times(indexes), payloads, server_ids))
+        self._indexes = indexes[order]
+        self._payloads = payloads[order]
+        self._sent = sent[order]
+        self._times = capture.times[self._indexes]
+        server_ids = server_ids[order]
+        bounds = np.flatnonzero(np.diff(server_ids)) + 1
+        starts = np.concatenate(([0], bounds))
+        stops = np.concatenate((bounds, [len(server_ids)]))
+        self._slices = dict((self._server_names[server_ids[start]], slice(int(start), int(stop)))
+                            for start, stop in zip(starts, stops))
+        # Servers in the order in which their first packet was captured, like the packet map of DualTorIO
+        self.servers = [self._server_names[server_id] for server_id in self._first_seen]
+
+    def _filter(self):
+        """Return the capture indexes, payload IDs, sent flags and server IDs of the test packets."""
+        capture = self.capture
+        received_macs = [mac for mac in map(packet_capture.mac_to_int, self.received_pkt_src_mac) if mac is not None]
+        sent_mac = packet_capture.mac_to_int(self.sent_pkt_dst_mac)
+        # The Ethernet addresses are at the same offsets for every packet, drop the packets of other flows first
+        candidates = np.flatnonzero(capture.caplens >= 12)
+        sent = capture.field(packet_capture.ETHER_DST_OFFSET, 6, candidates) == np.uint64(
+            sent_mac if sent_mac is not None else 1 << 48)
+        received = np.isin(capture.field(packet_capture.ETHER_SRC_OFFSET, 6, candidates),
+                           np.array(received_macs, dtype=np.uint64))
+        candidates = candidates[sent | received]
+
+        shaped = capture.ipv4_tcp()
+        shaped = shaped[np.isin(shaped, candidates)]
+        shaped = shaped[(capture.field(packet_capture.TCP_SPORT_OFFSET, 2, shaped) == self.tcp_sport) &
+                        (capture.field(packet_capture.TCP_DPORT_OFFSET, 2, shaped) == self.tcp_dport)]
+        payloads = np.zeros(len(capture), dtype=np.int64)
+        decoded = np.zeros(len(capture), dtype=bool)
+        for group, rows in capture.payloads(shaped):
+            values, valid = _decode_payload_ids(rows)
+            payloads[group] = values
+            decoded[group] = valid
+
+        # Everything else which may still be a test packet is checked by scapy, as DualTorIO did
+        server_names = []
+        server_ids = {}
+        servers = np.zeros(len(capture), dtype=np.int64)
+        fast = shaped[decoded[shaped]]
+        addresses = capture.field(packet_capture.IP_SRC_OFFSET if self.server_field == "src"
+                                  else packet_capture.IP_DST_OFFSET, 4, fast)
+        unique_addresses, inverse = np.unique(addresses, return_inverse=True)
+        for address in unique_addresses:
+            server_ids[socket.inet_ntoa(struct.pack(">I", int(address)))] = len(server_names)
+            server_names.append(socket.inet_ntoa(struct.pack(">I", int(address))))
+        servers[fast] = inverse.ravel()
+
+        slow = np.setdiff1d(candidates, fast, assume_unique=True)
+        kept = np.zeros(len(capture), dtype=bool)
+        kept[fast] = True
+        for index in slow:
+            packet = capture.packet(index)
+            payload_id = self._legacy_payload_id(packet)
+            if payload_id is None:
+                continue
+            if not -2 ** 63 <= payload_id < 2 ** 63:
+                raise UnsupportedCapture("Payload ID {} out of range".format(payload_id))
+            server = getattr(packet[scapyall.IP], self.server_field)
+            if server not in server_ids:
+                server_ids[server] = len(server_names)
+                server_names.append(server)
+            kept[index] = True
+            payloads[index] = payload_id
+            servers[index] = server_ids[server]
+
+        indexes = np.flatnonzero(kept)
+        servers = servers[indexes]
+        self._server_names = server_names
+        _, first = np.unique(servers, return_index=True)
+        self._first_seen = servers[np.sort(first)]
+        sent_flags = capture.field(packet_capture.ETHER_DST_OFFSET, 6, indexes) == np.uint64(
+            sent_mac if sent_mac is not None else 1 << 48)
+        return indexes, payloads[indexes], sent_flags, servers
+
+    def _legacy_payload_id(self, packet):
+        """Return the payload ID of a test packet dissected by scapy, or None if it's not one."""
+        if scapyall.TCP not in packet or scapyall.ICMP in packet or \
+                packet[scapyall.TCP].sport != self.tcp_sport or packet[scapyall.TCP].dport != self.tcp_dport:
+            return None
+        try:
+            return int(bytes(packet[scapyall.TCP].payload).decode().replace('X', ''))
+        except Exception:
+            return None
+
+    def indexes(self, server):
+        """Return the capture indexes of the packets of server, sorted by payload ID then timestamp."""
+        return self._indexes[self._slices[server]]
+
+    def result(self, server, packets_sent):
+        """
+        Return the results of server in the format of DualTorIO.examine_each_packet, packets_sent being the number
+        of packets sent to or by the server. reordered_packets is only reported, see count_reordered.
+        """
+        part = self._slices[server]
+        sent = self._sent[part]
+        payloads = self._payloads[part][~sent]
+        times = self._times[part][~sent]
+        result = {
+            'sent_packets': int(np.count_nonzero(sent)),
+            'received_packets': len(payloads),
+            'disruption_before_traffic': False,
+            'disruption_after_traffic': False,
+            'duplications': [],
+            'disruptions': [],
+            'reordered_packets': 0
+        }
+        if not len(payloads):
+            logger.error("Sniffer failed to filter any traffic from DUT")
+            return result
+
+        duplicates = np.flatnonzero(payloads[1:] == payloads[:-1]) + 1
+        if len(duplicates):
+            # Consecutive duplicates of the same packet make one duplication
+            duplicate_ids = payloads[duplicates]
+            starts = np.flatnonzero(np.concatenate(([True], duplicate_ids[1:] != duplicate_ids[:-1])))
+            stops = np.concatenate((starts[1:], [len(duplicates)])) - 1
+            result['duplications'] = [{
+                'start_time': float(times[duplicates[start]]),
+                'end_time': float(times[duplicates[stop]]),
+                'start_id': int(duplicate_ids[start]),
+                'end_id': int(duplicate_ids[stop]),
+                'duplication_count': int(stop - start + 1)
+            } for start, stop in zip(starts, stops)]
+
+        gaps = np.flatnonzero(payloads[:-1] + 1 < payloads[1:])
+        result['disruptions'] = [{
+            'start_time': float(times[gap]),
+            'end_time': float(times[gap + 1]),
+            'start_id': int(payloads[gap]),
+            'end_id': int(payloads[gap + 1])
+        } for gap in gaps]
+
+        if payloads[0] != 0:
+            result['disruption_before_traffic'] = int(payloads[0])
+        if payloads[-1] != packets_sent - 1:
+            result['disruption_after_traffic'] = int(payloads[-1])
+        result['reordered_packets'] = count_reordered(payloads, times)
+        return result
+
+
+def count_reordered(payloads, times):
+    """
+    Count the packets captured after a packet with a higher payload ID, payloads and times being sorted by payload
+    ID then timestamp.
+
+    The packets are examined in the order of their payload IDs, so a reordering is not a disruption: the count is
+    reported in the results of the servers as reordered_packets, for information, and is not validated.
+    """
+    if np is None:
+        reordered = 0
+        earliest_later = float("inf")
+        group_earliest = float("inf")
+        for position in range(len(payloads) - 1, -1, -1):
+            if position + 1 < len(payloads) and payloads[position + 1] != payloads[position]:
+                earliest_later = min(earliest_later, group_earliest)
+                group_earliest = float("inf")
+            if times[position] > earliest_later:
+                reordered += 1
+            group_earliest = min(group_earliest, times[position])
+        return reordered
+    payloads = np.asarray(payloads)
+    times = np.asarray(times, dtype=np.float64)
+    if len(payloads) < 2:
+        return 0
+    # Earliest timestamp of the packets from every position to the end
+    earliest = np.minimum.accumulate(times[::-1])[::-1]
+    # First position of the next payload ID, for every position
+    next_ids = np.searchsorted(payloads, payloads, side="right")
+    earliest = np.append(earliest, np.inf)
+    return int(np.count_nonzero(times > earliest[next_ids]))
+
+
+def merge_duplications_into_disruptions(disruptions, duplications):
+    """
+    Merge the disruptions with the duplications between them, and return the merged disruptions.
+
+    The intervals are taken by start time, and an interval starting at most one packet ID after the end of the
+    previous merged interval extends it. Merged intervals made of duplications only are dropped. The given
+    intervals are not modified.
+    """
+    intervals = sorted(list(disruptions) + list(duplications), key=lambda interval: interval['start_time'])
+    merged = []
+    for interval in intervals:
+        if merged and interval['start_id'] <= merged[-1]['end_id'] + 1:
+            last = merged[-1]
+            if last['end_id'] < interval['end_id']:
+                last['end_id'] = interval['end_id']
+                last['end_time'] = interval['end_time']
+            # A merged interval with a disruption is a disruption
+            if "duplication_count" in last and "duplication_count" not in interval:
+                last.pop("duplication_count")
+        else:
+            merged.append(dict(interval))
+    return [interval for interval in merged if "duplication_count" not in interval]
+
+
+def longest_interval(intervals):
+    """Return the length in seconds of the longest of intervals, or 0."""
+    longest = 0
+    for interval in intervals:
+        length = interval['end_time'] - interval['start_time']
+        if length > longest:
+            longest = length
+    return longest
+
+
+def total_interval_length(intervals):
+    """Return the total length in seconds of intervals."""
+    return sum(interval['end_time'] - interval['start_time'] for interval in intervals)
+
+
+def count_duplication_sequences(duplications):
+    """Count the sequences of duplications of consecutive packet IDs."""
+    return sum(1 for position, duplication in enumerate(duplications)
+               if not position or duplication['start_id'] != duplications[position - 1]['start_id'] + 1)
+
+
+def largest_duplication(duplications):
+    """Return the largest duplication count and its packet ID, or 0 and None."""
+    largest_count, largest_id = 0, None
+    for duplication in duplications:
+        if duplication['duplication_count'] > largest_count:
+            largest_count, largest_id = duplication['duplication_count'], duplication['start_id']
+    return largest_count, largest_id
+
+
+def _decode_payload_ids(rows):
+    """
+    Decode payloads made of the packet ID digits padded with 'X', one per row of rows.
+
+    Return the IDs and whether every payload could be decoded; the others are left to scapy.
+    """
+    digits = (rows >= DIGIT_ZERO) & (rows <= DIGIT_ZERO + 9)
+    digit_count = np.count_nonzero(digits, axis=1)
+    valid = np.all(digits | (rows == PADDING), axis=1) & (digit_count > 0) & (digit_count <= MAX_DIGITS)
+    # Power of ten of every digit: the number of digits after it
+    after = digit_count[:, None] - np.cumsum(digits, axis=1)
+    powers = np.where(digits & valid[:, None], np.power(np.int64(10), np.minimum(after, MAX_DIGITS - 1)), 0)
+    values = np.sum(powers * (rows.astype(np.int64) - DIGIT_ZERO), axis=1)
+    return values, valid
@@ -14,7 +14,10 @@ import ptf.testutils as testutils
 from itertools import groupby
 
 from tests.common.dualtor.dual_tor_common import CableType
+from tests.common.dualtor.dual_tor_flow import ServerFlows, count_reordered
+from tests.ptftests.py3.packet_capture import PacketCapture, UnsupportedCapture
 from tests.common.utilities import wait_until, convert_scapy_packet_to_bytes
+from tests.common.helpers.assertions import pytest_assert
 from natsort import natsorted
 from collections import defaultdict
 
@@ -622,8 +625,6 @@ class DualTorIO:
         """Fetch the captured packet file generated by the ptf sniffer."""
         logger.info('Fetching pcap file from ptf')
         self.ptfhost.fetch(src=self.capture_pcap, dest='/tmp/', flat=True, fail_on_missing=False)
-        self.all_packets = scapyall.rdpcap(self.capture_pcap)
-        logger.info("Number of all packets captured: {}".format(len(self.all_packets)))
 
     def send_packets(self):
         """Send packets generated."""
@@ -671,6 +672,12 @@ class DualTorIO:
             server_addr = packet[scapyall.IP].src
         return server_addr
 
+    def get_server_address_field(self):
+        """Return the IP header field of the server address, as get_server_address reads it."""
+        if self.traffic_direction in ("t1_to_server", "t1_to_soc"):
+            return "dst"
+        return "src"
+
     def get_test_results(self):
         return self.test_results
 
@@ -687,9 +694,57 @@ class DualTorIO:
         examine_start = datetime.datetime.now()
         logger.info("Packet flow examine started {}".format(str(examine_start)))
 
-        if not self.all_packets:
-            logger.error("self.all_packets not defined.")
-            return None
+        pytest_assert(os.path.exists(self.capture_pcap), "Capture file {} not found".format(self.capture_pcap))
+
+        try:
+            capture = PacketCapture(self.capture_pcap)
+        except UnsupportedCapture as e:
+            logger.info("Examining the capture with scapy: {}".format(repr(e)))
+            return self.examine_captured_packets()
+        try:
+            logger.info("Number of all packets captured: {}".format(len(capture)))
+            if not len(capture):
+                capture.close()
+                pytest_assert(False, "Sniffer failed to capture any packet")
+            server_flows = ServerFlows(capture, self.sent_pkt_dst_mac, self.received_pkt_src_mac,
+                                       self.tcp_sport, TCP_DST_PORT, self.get_server_address_field())
+        except UnsupportedCapture as e:
+            capture.close()
+            logger.info("Examining the capture with scapy: {}".format(repr(e)))
+            return self.examine_captured_packets()
+
+        with capture:
+            logger.info("Number of filtered packets captured: {}".format(server_flows.filtered_count))
+            if not server_flows.filtered_count:
+                logger.error("Sniffer failed to capture any traffic")
+
+            logger.info("Measuring traffic disruptions...")
+            for server_ip in server_flows.servers:
+                filename = '/tmp/capture_filtered_{}.pcap'.format(server_ip)
+                capture.write_pcap(filename, server_flows.indexes(server_ip))
+                logger.info("Filtered pcap dumped to {}".format(filename))
+
+            self.test_results = {}
+
+            for server_ip in natsorted(server_flows.servers):
+                result = server_flows.result(server_ip, self.packets_sent_per_server.get(server_ip))
+                if result['sent_packets'] < self.packets_sent_per_server.get(server_ip):
+                    logger.error('Not all sent packets were captured. '
+                                 'Something went wrong!')
+                    logger.error('Dumping server {} results and continuing:\n{}'
+                                 .format(server_ip, json.dumps(result, indent=4)))
+                logger.info("Server {} results:\n{}"
+                            .format(server_ip, json.dumps(result, indent=4)))
+                self.test_results[server_ip] = result
+
+    def examine_captured_packets(self):
+        """
+        @summary: Examine the packets collected by sniffer thread with scapy, for the captures
+            which PacketCapture can't read.
+        """
+        self.all_packets = scapyall.rdpcap(self.capture_pcap)
+        logger.info("Number of all packets captured: {}".format(len(self.all_packets)))
+        pytest_assert(self.all_packets, "Sniffer failed to capture any packet")
 
         # Filter out packets:
         filtered_packets = [pkt for pkt in self.all_packets if
@@ -742,6 +797,12 @@ class DualTorIO:
             self.test_results[server_ip] = result
 
     def examine_each_packet(self, server_ip, packets):
+        """
+        @summary: Examine the packets of a server, sorted by payload ID then timestamp, and return the result of the
+            server: the sent and received packet counts, the disruptions, duplications and the disruptions before
+            and after the traffic. reordered_packets counts the received packets captured after a packet with a
+            higher payload ID. Sorting hides them from the disruptions, they are only reported.
+        """
         num_sent_packets = 0
         received_packet_list = list()
         duplicate_packet_list = list()
@@ -749,6 +810,7 @@ class DualTorIO:
         disruption_before_traffic = False
         disruption_after_traffic = False
         duplicate_ranges = []
+        reordered_packets = 0
 
         for packet in packets:
             if packet[scapyall.Ether].dst == self.sent_pkt_dst_mac:
@@ -835,6 +897,8 @@ class DualTorIO:
             # Store the id of the last received packet
             if received_packet_list[-1][0] != self.packets_sent_per_server.get(server_ip) - 1:
                 disruption_after_traffic = received_packet_list[-1][0]
+            reordered_packets = count_reordered([payload for payload, _ in received_packet_list],
+                                                [packet_time for _, packet_time in received_packet_list])
 
         result = {
             'sent_packets': num_sent_packets,
@@ -842,7 +906,8 @@ class DualTorIO:
             'disruption_before_traffic': disruption_before_traffic,
             'disruption_after_traffic': disruption_after_traffic,
             'duplications': duplicate_ranges,
-            'disruptions': disruption_ranges
+            'disruptions': disruption_ranges,
+            'reordered_packets': reordered_packets
         }
 
         if num_sent_packets < self.packets_sent_per_server.get(server_ip):
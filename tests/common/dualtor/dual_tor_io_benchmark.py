@@ -0,0 +1,327 @@
+"""Benchmark of the dualtor I/O flow examination.
+
+Compare time and peak memory of the legacy DualTorIO examination (rdpcap of the whole capture, scapy filtering and
+sorting of the packets and wrpcap of the filtered ones) with ServerFlows on the memory-mapped capture, on a recorded
+ptf sniffer capture or a synthetic one. The synthetic capture has sent and received packets of many servers with
+disruptions, duplications and reordered packets, and packets of other flows. Every measurement runs in its own
+process so that the peak memory is its own, and the per-server results, the validate_traffic_results summaries and
+the filtered pcap files of both are checked to be the same.
+
+Usage:
+    python tests/common/dualtor/dual_tor_io_benchmark.py --servers 8 --packets 40000
+    python tests/common/dualtor/dual_tor_io_benchmark.py --pcap /tmp/capture.pcap --direction t1_to_server \\
+        --sent_mac 00:aa:bb:cc:dd:ee --received_macs 00:11:22:33:44:55
+"""
+import argparse
+import copy
+import filecmp
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from itertools import groupby
+
+# The tests/common folder has packages shadowing the standard library (e.g. platform), use the repo root instead
+sys.path[0] = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../..")
+
+import scapy.all as scapyall     # noqa: E402
+
+from tests.ptftests.py3 import packet_capture     # noqa: E402
+from tests.common.dualtor import dual_tor_flow      # noqa: E402
+
+TCP_SPORT = 1234
+TCP_DST_PORT = 5000
+SENT_MAC = "00:aa:bb:cc:dd:ee"
+RECEIVED_MACS = ["00:11:22:33:44:55", "00:11:22:33:44:66"]
+OTHER_MAC = "00:de:ad:be:ef:00"
+
+
+def server_field(direction):
+    return "dst" if direction in ("t1_to_server", "t1_to_soc") else "src"
+
+
+def legacy_payload_id(packet):
+    return int(bytes(packet[scapyall.TCP].payload).decode().replace('X', ''))
+
+
+def legacy_examine(args, output):
+    """DualTorIO.examine_flow and examine_each_packet before ServerFlows."""
+    all_packets = scapyall.rdpcap(args.pcap)
+
+    def check_tcp_payload(packet):
+        try:
+            legacy_payload_id(packet)
+            return True
+        except Exception:
+            return False
+
+    filtered_packets = [pkt for pkt in all_packets if
+                        scapyall.TCP in pkt and
+                        scapyall.ICMP not in pkt and
+                        pkt[scapyall.TCP].sport == args.sport and
+                        pkt[scapyall.TCP].dport == TCP_DST_PORT and
+                        check_tcp_payload(pkt) and
+                        (
+                            pkt[scapyall.Ether].dst == args.sent_mac or
+                            pkt[scapyall.Ether].src in args.received_macs
+                        )]
+    server_to_packet_map = defaultdict(list)
+    for packet in filtered_packets:
+        server_to_packet_map[getattr(packet[scapyall.IP], server_field(args.direction))].append(packet)
+    for server in list(server_to_packet_map.keys()):
+        server_to_packet_map[server].sort(key=lambda packet: (legacy_payload_id(packet), packet.time))
+    for server_ip, packet_list in list(server_to_packet_map.items()):
+        scapyall.wrpcap(os.path.join(output, "capture_filtered_{}.pcap".format(server_ip)), packet_list)
+
+    results = {}
+    for server_ip, packets in server_to_packet_map.items():
+        num_sent_packets = 0
+        received_packet_list = []
+        duplicate_packet_list = []
+        disruption_ranges = []
+        duplicate_ranges = []
+        disruption_before_traffic = False
+        disruption_after_traffic = False
+        for packet in packets:
+            if packet[scapyall.Ether].dst == args.sent_mac:
+                num_sent_packets += 1
+                continue
+            if packet[scapyall.Ether].src in args.received_macs:
+                curr_time = float(packet.time)
+                curr_payload = legacy_payload_id(packet)
+                if len(received_packet_list) > 0:
+                    prev_payload, prev_time = received_packet_list[-1]
+                    if prev_payload == curr_payload:
+                        duplicate_packet_list.append((curr_payload, curr_time))
+                    if prev_payload + 1 < curr_payload:
+                        disruption_ranges.append({'start_time': prev_time, 'end_time': curr_time,
+                                                  'start_id': prev_payload, 'end_id': curr_payload})
+                received_packet_list.append((curr_payload, curr_time))
+        reordered_packets = 0
+        if received_packet_list:
+            for _, grouper in groupby(duplicate_packet_list, lambda d: d[0]):
+                duplicates = list(grouper)
+                duplicate_ranges.append({'start_time': duplicates[0][1], 'end_time': duplicates[-1][1],
+                                         'start_id': duplicates[0][0], 'end_id': duplicates[-1][0],
+                                         'duplication_count': len(duplicates)})
+            if received_packet_list[0][0] != 0:
+                disruption_before_traffic = received_packet_list[0][0]
+            if received_packet_list[-1][0] != args.packets_sent - 1:
+                disruption_after_traffic = received_packet_list[-1][0]
+            # Received after a packet with a higher ID, by brute force over the capture order
+            highest = None
+            for payload, _ in sorted(received_packet_list, key=lambda received: received[1]):
+                if highest is not None and payload < highest:
+                    reordered_packets += 1
+                highest = payload if highest is None else max(highest, payload)
+        results[server_ip] = {
+            'sent_packets': num_sent_packets,
+            'received_packets': len(received_packet_list),
+            'disruption_before_traffic': disruption_before_traffic,
+            'disruption_after_traffic': disruption_after_traffic,
+            'duplications': duplicate_ranges,
+            'disruptions': disruption_ranges,
+            'reordered_packets': reordered_packets
+        }
+    return results
+
+
+def legacy_summary(result):
+    """The merge and summary of data_plane_utils.validate_traffic_results before dual_tor_flow."""
+    result = copy.deepcopy(result)
+    disruptions = []
+    intervals = copy.deepcopy(result['disruptions']) + copy.deepcopy(result['duplications'])
+    intervals.sort(key=lambda interval: interval['start_time'])
+    for interval in intervals:
+        if disruptions and interval['start_id'] <= disruptions[-1]['end_id'] + 1:
+            if disruptions[-1]['end_id'] < interval['end_id']:
+                disruptions[-1]['end_id'] = interval['end_id']
+                disruptions[-1]['end_time'] = interval['end_time']
+            if "duplication_count" in disruptions[-1] and "duplication_count" not in interval:
+                disruptions[-1].pop("duplication_count")
+        else:
+            disruptions.append(interval)
+    merged = [_ for _ in disruptions if "duplication_count" not in _]
+    longest_disruption = 0
+    for disruption in merged:
+        if disruption['end_time'] - disruption['start_time'] > longest_disruption:
+            longest_disruption = disruption['end_time'] - disruption['start_time']
+    total_duplications = len([_ for _ in groupby(enumerate(result['duplications']),
+                                                 lambda t: t[0] - t[1]['start_id'])])
+    largest_duplication_count = 0
+    largest_duplication_count_packet_id = None
+    longest_duplication = 0
+    for duplication in result['duplications']:
+        if duplication['end_time'] - duplication['start_time'] > longest_duplication:
+            longest_duplication = duplication['end_time'] - duplication['start_time']
+        if duplication['duplication_count'] > largest_duplication_count:
+            largest_duplication_count = duplication['duplication_count']
+            largest_duplication_count_packet_id = duplication['start_id']
+    total_length = 0
+    for disruption in merged:
+        total_length += disruption['end_time'] - disruption['start_time']
+    return (merged, longest_disruption, total_duplications, largest_duplication_count,
+            largest_duplication_count_packet_id, longest_duplication, total_length)
+
+
+def summary(result):
+    merged = dual_tor_flow.merge_duplications_into_disruptions(result['disruptions'], result['duplications'])
+    largest_count, largest_id = dual_tor_flow.largest_duplication(result['duplications'])
+    return (merged, dual_tor_flow.longest_interval(merged),
+            dual_tor_flow.count_duplication_sequences(result['duplications']), largest_count, largest_id,
+            dual_tor_flow.longest_interval(result['duplications']), dual_tor_flow.total_interval_length(merged))
+
+
+def server_flows_examine(args, output):
+    with packet_capture.PacketCapture(args.pcap) as capture:
+        server_flows = dual_tor_flow.ServerFlows(capture, args.sent_mac, args.received_macs, args.sport,
+                                                 TCP_DST_PORT, server_field(args.direction))
+        for server_ip in server_flows.servers:
+            capture.write_pcap(os.path.join(output, "capture_filtered_{}.pcap".format(server_ip)),
+                               server_flows.indexes(server_ip))
+        return dict((server_ip, server_flows.result(server_ip, args.packets_sent))
+                    for server_ip in server_flows.servers)
+
+
+def measure(func, args, output, queue):
+    start = time.time()
+    results = func(args, output)
+    elapsed = time.time() - start
+    # ru_maxrss is in KB on Linux
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, results))
+
+
+def generate_capture(filename, servers, packets, seed):
+    """
+    Write a t1_to_server capture: every packet is captured once as sent, then, unless dropped, as received, up to
+    a few times. Every server has a disruption, and some packets are received late; packets of other flows,
+    IP-in-IP encapsulated test packets and malformed payloads are mixed in.
+    """
+    rnd = random.Random(seed)
+    templates = []
+    for server in range(servers):
+        dst = "192.168.0.{}".format(server + 2)
+        sent = scapyall.Ether(src=OTHER_MAC, dst=SENT_MAC) / scapyall.IP(src="10.0.0.1", dst=dst) / \
+            scapyall.TCP(sport=TCP_SPORT, dport=TCP_DST_PORT, flags="")
+        received = scapyall.Ether(src=RECEIVED_MACS[server % 2], dst=OTHER_MAC) / \
+            scapyall.IP(src="10.0.0.1", dst=dst, ttl=63) / scapyall.TCP(sport=TCP_SPORT, dport=TCP_DST_PORT, flags="")
+        templates.append((sent, received))
+    frames = {}
+
+    def frame(template, payload):
+        # The headers only depend on the payload length, the checksums aren't examined
+        key = (id(template), len(payload))
+        if key not in frames:
+            frames[key] = bytes(template / ("0" * len(payload)))[:-len(payload)]
+        return frames[key] + payload.encode()
+
+    records = []
+    timestamp = 1700000000 * 10 ** 6
+    late = []
+    for packet_id in range(packets):
+        payload = str(packet_id) + "X" * 60
+        for server, (sent, received) in enumerate(templates):
+            timestamp += rnd.randint(1, 50)
+            records.append((timestamp, frame(sent, payload)))
+            position = packet_id * 10 // packets
+            if position == 4 + server % 3 and packet_id % 7:
+                continue
+            copies = 1 + (rnd.random() < 0.002) * rnd.randint(1, 3)
+            for _ in range(copies):
+                if rnd.random() < 0.001:
+                    late.append((packet_id + rnd.randint(1, 5), frame(received, payload)))
+                else:
+                    timestamp += rnd.randint(1, 50)
+                    records.append((timestamp, frame(received, payload)))
+            if rnd.random() < 0.01:
+                timestamp += 1
+                kind = rnd.randint(0, 3)
+                if kind == 0:
+                    noise = received / scapyall.Raw(b"-" + payload.encode())
+                elif kind == 1:
+                    noise = scapyall.Ether(src=RECEIVED_MACS[0], dst=OTHER_MAC) / \
+                        scapyall.IP(src="10.1.0.1", dst="10.1.0.2") / received[scapyall.IP] / payload
+                elif kind == 2:
+                    noise = received.copy()
+                    noise[scapyall.TCP].sport = TCP_SPORT + 1
+                    noise = noise / payload
+                else:
+                    noise = received / ("X" * 61)
+                records.append((timestamp, bytes(noise)))
+        while late and late[0][0] <= packet_id:
+            timestamp += 1
+            records.append((timestamp, late.pop(0)[1]))
+    with open(filename, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for timestamp, data in records:
+            f.write(struct.pack("<IIII", timestamp // 10 ** 6, timestamp % 10 ** 6, len(data), len(data)))
+            f.write(data)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dualtor I/O flow examination")
+    parser.add_argument("--pcap", help="Recorded capture of the ptf sniffer, a synthetic one is generated if not given")
+    parser.add_argument("--direction", default="t1_to_server", help="Traffic direction of the recorded capture")
+    parser.add_argument("--sent_mac", default=SENT_MAC, help="Ether dst of the sent packets")
+    parser.add_argument("--received_macs", nargs="+", default=RECEIVED_MACS, help="Ether src of the received packets")
+    parser.add_argument("--sport", type=int, default=TCP_SPORT, help="TCP source port of the test packets")
+    parser.add_argument("--servers", type=int, default=8, help="Number of servers of the synthetic capture")
+    parser.add_argument("--packets", type=int, default=40000, help="Packets sent per server, synthetic or recorded")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic capture")
+    parser.add_argument("--skip_legacy", action="store_true", help="Don't run the legacy implementation")
+    args = parser.parse_args()
+    args.packets_sent = args.packets
+
+    path = tempfile.mkdtemp(prefix="dual_tor_io_benchmark_")
+    try:
+        if not args.pcap:
+            args.pcap = os.path.join(path, "capture.pcap")
+            start = time.time()
+            count = generate_capture(args.pcap, args.servers, args.packets, args.seed)
+            print("Generated {} packets capture of {:.0f}MB in {:.1f}s".format(
+                count, os.path.getsize(args.pcap) / 1048576.0, time.time() - start))
+
+        implementations = [("mapped", server_flows_examine)]
+        if not args.skip_legacy:
+            implementations.append(("legacy", legacy_examine))
+        context = multiprocessing.get_context("fork")
+        results = {}
+        print("{:>8} {:>10} {:>14} {:>8} {:>12} {:>12}".format("examine", "time(s)", "peak RSS(MB)", "servers",
+                                                               "disruptions", "duplications"))
+        for name, func in implementations:
+            output = os.path.join(path, name)
+            os.mkdir(output)
+            queue = context.Queue()
+            process = context.Process(target=measure, args=(func, args, output, queue))
+            process.start()
+            elapsed, peak, results[name] = queue.get()
+            process.join()
+            print("{:>8} {:>10.2f} {:>14.0f} {:>8} {:>12} {:>12}".format(
+                name, elapsed, peak, len(results[name]),
+                sum(len(result['disruptions']) for result in results[name].values()),
+                sum(len(result['duplications']) for result in results[name].values())))
+
+        if "legacy" in results:
+            assert json.dumps(results["mapped"], sort_keys=True) == json.dumps(results["legacy"], sort_keys=True), \
+                "Results differ"
+            for result in results["mapped"].values():
+                assert summary(result) == legacy_summary(result), "Summaries differ"
+            files = sorted(os.listdir(os.path.join(path, "legacy")))
+            assert files == sorted(os.listdir(os.path.join(path, "mapped"))), "Filtered pcap files differ"
+            for name in files:
+                assert filecmp.cmp(os.path.join(path, "legacy", name), os.path.join(path, "mapped", name),
+                                   shallow=False), "Filtered pcap {} differs".format(name)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
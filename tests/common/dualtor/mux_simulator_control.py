@@ -3,6 +3,7 @@ import logging
 import pytest
 import time
 import json
+import threading
 import uuid
 import warnings
 
@@ -17,7 +18,7 @@ from tests.common.dualtor.dual_tor_common import mux_config
 from tests.common.dualtor.dual_tor_common import CableType
 from tests.common.helpers.assertions import pytest_assert
 from tests.common.dualtor.constants import UPPER_TOR, LOWER_TOR, TOGGLE, RANDOM, NIC, DROP, \
-                                           OUTPUT, FLAP_COUNTER, CLEAR_FLAP_COUNTER, RESET
+                                           OUTPUT, FLAP_COUNTER, CLEAR_FLAP_COUNTER, RESET, ACTIVE_SIDE, BULK
 
 __all__ = [
     'mux_server_info',
@@ -44,12 +45,16 @@ __all__ = [
     'check_mux_status',
     'validate_check_result',
     'simulator_flap_counter',
+    'bulk_update_simulator_ports',
     ]
 
 logger = logging.getLogger(__name__)
 
 TOGGLE_SIDES = [UPPER_TOR, LOWER_TOR, TOGGLE, RANDOM]
 
+_sessions = {}
+_sessions_lock = threading.Lock()
+
 
 @pytest.fixture(scope='session')
 def mux_server_info(request, tbinfo):
@@ -152,6 +157,35 @@ def url(mux_server_url, duthost, tbinfo):
     return _url
 
 
+def _session(retry=False):
+    """
+    Helper function to get the session for requests to y_cable server.
+
+    The sessions are created once and reused for the whole test session, so the connections to the server are kept
+    alive between requests instead of being opened for each request.
+
+    Args:
+        retry: a bool, whether the requests of the session are retried on connection errors or non-200 status.
+    Returns:
+        requests.Session: The session.
+    """
+    with _sessions_lock:
+        if retry not in _sessions:
+            session = Session()
+            if retry:
+                if "allowed_methods" in inspect.signature(Retry).parameters:
+                    retry_config = Retry(total=3, connect=3, backoff_factor=1,
+                                         allowed_methods=frozenset(['GET', 'POST']),
+                                         status_forcelist=[x for x in requests.status_codes._codes if x != 200])
+                else:
+                    retry_config = Retry(total=3, connect=3, backoff_factor=1,
+                                         method_whitelist=frozenset(['GET', 'POST']),
+                                         status_forcelist=[x for x in requests.status_codes._codes if x != 200])
+                session.mount('http://', HTTPAdapter(max_retries=retry_config))
+            _sessions[retry] = session
+        return _sessions[retry]
+
+
 def _get(server_url):
     """
     Helper function for polling status from y_cable server.
@@ -165,7 +199,7 @@ def _get(server_url):
     try:
         logger.debug('GET {}'.format(server_url))
         headers = {'Accept': 'application/json'}
-        resp = requests.get(server_url, headers=headers)
+        resp = _session().get(server_url, headers=headers)
         if resp.status_code == 200:
             return resp.json()
         else:
@@ -176,42 +210,88 @@ def _get(server_url):
     return None
 
 
-def _post(server_url, data):
+def _post_request(server_url, data):
     """
-    Helper function for posting data to y_cable server.
+    Helper function for posting data to y_cable server and getting the response.
 
     Args:
         server_url: a str, the full address of mux server, like http://10.0.0.64:8080/mux/vms17-8[/1/drop|output]
         data: data to post {"out_sides": ["nic", "upper_tor", "lower_tor"]}
     Returns:
-        True if succeed. False otherwise
+        requests.Response: The response if succeed. None otherwise
     """
     try:
-        session = Session()
-        if "allowed_methods" in inspect.signature(Retry).parameters:
-            retry = Retry(total=3, connect=3, backoff_factor=1,
-                          allowed_methods=frozenset(['GET', 'POST']),
-                          status_forcelist=[x for x in requests.status_codes._codes if x != 200])
-        else:
-            retry = Retry(total=3, connect=3, backoff_factor=1,
-                          method_whitelist=frozenset(['GET', 'POST']),
-                          status_forcelist=[x for x in requests.status_codes._codes if x != 200])
-
-        session.mount('http://', HTTPAdapter(max_retries=retry))
         server_url = '{}?reqId={}'.format(server_url, uuid.uuid4())  # Add query string param reqId for debugging
         logger.debug('POST {} with {}'.format(server_url, data))
         headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
-        resp = session.post(server_url, json=data, headers=headers, timeout=(3.5, 30))
+        resp = _session(retry=True).post(server_url, json=data, headers=headers, timeout=(3.5, 30))
         logger.debug('Received response {}/{} with content {}'.format(resp.status_code, resp.reason, resp.text))
-        return resp.status_code == 200
+        if resp.status_code == 200:
+            return resp
     except Exception as e:
         logger.warning("POST {} with data {} failed, err: {}".format(server_url, data, repr(e)))
 
-    return False
+    return None
+
+
+def _post(server_url, data):
+    """
+    Helper function for posting data to y_cable server.
+
+    Args:
+        server_url: a str, the full address of mux server, like http://10.0.0.64:8080/mux/vms17-8[/1/drop|output]
+        data: data to post {"out_sides": ["nic", "upper_tor", "lower_tor"]}
+    Returns:
+        True if succeed. False otherwise
+    """
+    return _post_request(server_url, data) is not None
+
+
+@pytest.fixture(scope='module')
+def bulk_update_simulator_ports(mux_server_url, duthost, tbinfo):
+    """
+    Returns _bulk_update_simulator_ports to update many y_cable simulator ports in one request
+    """
+
+    def _bulk_update_simulator_ports(operations):
+        """
+        Function to apply a list of operations to the y_cable simulator ports in one request
+
+        The mux simulator applies the operations of different ports concurrently, and the operations of the same port
+        in the listed order.
+
+        Args:
+            operations: a list of (interface_name, action, sides) tuples. action is "active_side", "output", "drop"
+                        or "reset". sides is the active side for "active_side", like "upper_tor", and the list of out
+                        sides for "output" and "drop", like ["upper_tor", "lower_tor"]; it's ignored for "reset".
+        Returns:
+            dict: The status of the updated muxes, and the time in seconds taken by the mux simulator to update them
+                  under "elapsed". None on non dualtor testbed.
+        """
+        # Skip on non dualtor testbed
+        if not mux_server_url:
+            return None
+        mg_facts = duthost.get_extended_minigraph_facts(tbinfo)
+        data = {"operations": []}
+        for interface_name, action, sides in operations:
+            operation = {"port_index": mg_facts['minigraph_ptf_indices'][interface_name], "action": action}
+            if action == ACTIVE_SIDE:
+                operation["active_side"] = sides
+            elif action != RESET:
+                operation["out_sides"] = sides
+            data["operations"].append(operation)
+
+        resp = _post_request(mux_server_url + "/{}".format(BULK), data)
+        pytest_assert(resp is not None, "Failed to apply operations {}".format(operations))
+        result = resp.json()
+        logger.info("Mux simulator applied {} operations in {:.3f}s".format(len(operations), result["elapsed"]))
+        return result
+
+    return _bulk_update_simulator_ports
 
 
 @pytest.fixture(scope='function')
-def set_drop(url, recover_directions):
+def set_drop(url, bulk_update_simulator_ports):
     """
     A helper function is returned to make fixture accept arguments
     """
@@ -234,8 +314,8 @@ def set_drop(url, recover_directions):
 
     yield _set_drop
 
-    for intf in drop_intfs:
-        recover_directions(intf)
+    if drop_intfs:
+        bulk_update_simulator_ports([(intf, OUTPUT, [UPPER_TOR, LOWER_TOR, NIC]) for intf in drop_intfs])
 
 
 @pytest.fixture(scope='function')
@@ -876,7 +956,7 @@ def toggle_all_simulator_ports_to_random_side(active_standby_ports, duthosts,
 
 
 @pytest.fixture
-def simulator_server_down(set_drop, set_output):
+def simulator_server_down(set_drop, bulk_update_simulator_ports):
     """
     A fixture to set drop on a given mux cable
     """
@@ -888,8 +968,8 @@ def simulator_server_down(set_drop, set_output):
 
     yield _drop_helper
 
-    for port in tmp_list:
-        set_output(port, [UPPER_TOR, LOWER_TOR])
+    if tmp_list:
+        bulk_update_simulator_ports([(port, OUTPUT, [UPPER_TOR, LOWER_TOR]) for port in tmp_list])
 
 
 @pytest.fixture
@@ -1,5 +1,6 @@
 """Control utilities to interacts with nic_simulator."""
 import grpc
+import json
 import pytest
 import time
 import logging
@@ -32,7 +33,8 @@ __all__ = [
     "toggle_active_active_simulator_ports",
     "stop_nic_grpc_server",
     "simulator_server_down_active_active",
-    "nic_simulator_flap_counter"
+    "nic_simulator_flap_counter",
+    "nic_simulator_metrics"
 ]
 
 logger = logging.getLogger(__name__)
@@ -45,6 +47,8 @@ class ForwardingState(object):
 
 
 GRPC_CLIENT_TIMEOUT_MAX = 60
+# JSON service of nic_simulator.MgmtServer.QueryMetrics
+NIC_SIMULATOR_METRICS_METHOD = "/nic_simulator.Metrics/QueryMetrics"
 
 
 def call_grpc(func, args=None, kwargs=None, timeout=5, retries=3, ignore_errors=False):
@@ -445,3 +449,29 @@ def nic_simulator_flap_counter(mux_config, nic_simulator_client):   # noqa: F811
         return [dict(zip(_.portid, _.flaps)) for _ in flap_counter_replies]
 
     return _get_nic_simulator_flap_counter
+
+
+@pytest.fixture
+def nic_simulator_metrics(nic_simulator_channel):
+    """
+    Return a helper function to retrieve the metrics of the nic_simulator.
+
+    The metrics are the count and latency of the gRPC calls and the count of the OVS commands run, the helper
+    function clears them after retrieving them if clear is True.
+    """
+    channel = nic_simulator_channel()
+
+    def _get_nic_simulator_metrics(clear=False):
+        if channel is None:
+            return None
+
+        query_metrics = channel.unary_unary(
+            NIC_SIMULATOR_METRICS_METHOD,
+            request_serializer=lambda request: json.dumps(request).encode(),
+            response_deserializer=lambda data: json.loads(data.decode())
+        )
+        response = call_grpc(query_metrics, args=({"clear": clear},))
+        logging.debug("Query metrics response:\n%s", response)
+        return response
+
+    return _get_nic_simulator_metrics
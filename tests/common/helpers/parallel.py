@@ -1,21 +1,27 @@
+import collections
 import datetime
 import logging
-import math
 import os
+import pickle
 import shutil
 import signal
 import tempfile
+import threading
 import time
 import traceback
-from multiprocessing import Process, Manager, Pipe, TimeoutError
+from multiprocessing import Process, Pipe, TimeoutError
+from multiprocessing.connection import wait as wait_connections
 from multiprocessing.pool import ThreadPool
 
-from psutil import wait_procs
-
 from tests.common.helpers.assertions import pytest_assert as pt_assert
 
 logger = logging.getLogger(__name__)
 
+BROADCAST_MAX_WORKERS = 0
+
+# Marks the threads running a broadcast serially, see BroadcastExecutor.run.
+_broadcast_context = threading.local()
+
 
 class SonicProcess(Process):
     """
@@ -24,24 +30,40 @@ class SonicProcess(Process):
 
     This exception (including backtrace) can be logged in test log
     to provide better info of why a particular Process failed.
+
+    When the 'results' keyword argument of the target is a plain dict, its content is sent back to the parent
+    process over the same pipe, see property 'results'.
     """
     def __init__(self, *args, **kwargs):
         Process.__init__(self, *args, **kwargs)
         self._pconn, self._cconn = Pipe(duplex=False)  # unidirectional: child_conn can send, parent_conn can recv
         self._exception = None
+        self._results = None
         self._exception_read = False  # Flag to track read status
 
+    def start(self):
+        Process.start(self)
+        # Only the child writes to the pipe. Close the parent copy so that the parent gets EOF if the child dies.
+        self._cconn.close()
+
     def run(self):
+        results = self._kwargs.get('results')
+        results = results if isinstance(results, dict) else None
         try:
             Process.run(self)
-            self._cconn.send(None)
+            self._cconn.send((None, results))
         except Exception as e:
             tb = traceback.format_exc()
-            self._cconn.send((e, tb))
+            self._cconn.send(((e, tb), results))
             raise e
         finally:
             self._cconn.close()  # Close the child-side pipe
 
+    @property
+    def connection(self):
+        """Parent side of the pipe, becomes readable when the child has sent its outcome or died."""
+        return self._pconn
+
     # for wait_procs
     def wait(self, timeout):
         return self.join(timeout=timeout)
@@ -50,20 +72,169 @@ class SonicProcess(Process):
     def is_running(self):
         return self.is_alive()
 
-    @property
-    def exception(self):
-        """Read exception data once and close parent-side pipe."""
+    def _read(self):
+        """Read outcome of the child once and close parent-side pipe."""
         if not self._exception_read:
             try:
                 if self._pconn.poll():
-                    self._exception = self._pconn.recv()
+                    self._exception, self._results = self._pconn.recv()
             except (EOFError, OSError):
                 pass
             finally:
                 self._pconn.close()
                 self._exception_read = True
+
+    @property
+    def exception(self):
+        self._read()
         return self._exception
 
+    @property
+    def results(self):
+        self._read()
+        return self._results
+
+
+class _Task(object):
+    """A target run on a single node."""
+
+    def __init__(self, target, node, init_result):
+        self.node = node
+        self.name = "{}--{}".format(target.__name__, node)
+        self.results = {}
+        # For sanity check process, initial results in case of timeout.
+        if init_result:
+            self.results[node.hostname] = dict(init_result, host=node.hostname)
+        self.init_result = init_result
+        self.deadline = None
+        self.started = None
+        self.exit_code = None
+        self.exception = None
+
+    def timeout_results(self):
+        # If sanity check task is killed, it still has init results, set its failed to True.
+        if self.init_result:
+            return {self.node.hostname: dict(self.init_result, host=self.node.hostname, failed=True)}
+        return {self.name: {'failed': True}}
+
+
+class ParallelRunner(object):
+    """Session scoped executor of parallel_run.
+
+    Each node is run in a forked SonicProcess, like before. Results of the nodes are returned over the pipe of the
+    process instead of a multiprocessing.Manager() proxy dict, so no manager server process is started per call. A node
+    exceeding its timeout is killed without affecting other nodes.
+
+    The targets of parallel_run are usually closures of fixtures, which cannot be sent to a pre-forked process. That is
+    why a process is still forked per node. Threads are not an option either, ansible runs its modules from the main
+    thread only.
+    """
+
+    def run(self, target, args, kwargs, nodes_list, timeout=None, concurrent_tasks=24, init_result=None):
+        """Run target function on nodes in parallel, see parallel_run."""
+        start_time = datetime.datetime.now()
+        tasks = [_Task(target, node, init_result) for node in nodes_list]
+        self._run_processes(target, args, kwargs, tasks, timeout, concurrent_tasks)
+
+        results = {}
+        for task in tasks:
+            results.update(task.results)
+
+        delta_time = datetime.datetime.now() - start_time
+        _check_failed_tasks([task for task in tasks if task.exception is not None])
+        logger.info(
+            'Completed running processes for target "{}" in {} seconds'.format(
+                target.__name__, str(delta_time)
+            )
+        )
+        return results
+
+    def _expire(self, tasks, now):
+        expired = [task for task in tasks if task.deadline is not None and now >= task.deadline]
+        for task in expired:
+            logger.error('Task {} exceeds timeout, started at {}.'.format(task.name, task.started))
+            task.results = task.timeout_results()
+        return expired
+
+    def _run_processes(self, target, args, kwargs, tasks, timeout, concurrent_tasks):
+        pending = list(tasks)
+        running = {}    # SonicProcess => _Task
+
+        while pending or running:
+            while pending and len(running) < concurrent_tasks:
+                task = pending.pop(0)
+                task_kwargs = dict(kwargs, node=task.node, results=task.results)
+                worker = SonicProcess(name=task.name, target=target, args=args, kwargs=task_kwargs)
+                worker.start()
+                task.started = time.time()
+                task.deadline = task.started + timeout if timeout else None
+                running[worker] = task
+                logger.debug('Started process {} running target "{}"'.format(worker.pid, task.name))
+
+            deadlines = [task.deadline for task in running.values() if task.deadline is not None]
+            wait_timeout = max(min(deadlines) - time.time(), 0) if deadlines else None
+            ready = wait_connections([worker.connection for worker in running], timeout=wait_timeout)
+
+            for worker in [worker for worker in running if worker.connection in ready]:
+                task = running.pop(worker)
+                # Read the outcome before join, the child may block on sending large results.
+                worker_exception, worker_results = worker.exception, worker.results
+                worker.join()
+                task.exit_code = worker.exitcode
+                logger.info("process {} terminated with exit code {}".format(worker.name, worker.exitcode))
+                if worker_results is not None:
+                    task.results = worker_results
+                if worker_exception is not None:
+                    logger.info("Process {} has exception, record the error.".format(worker.name))
+                    task.exception = worker_exception
+
+            expired = self._expire(running.values(), time.time())
+            for worker in [worker for worker, task in running.items() if task in expired]:
+                running.pop(worker)
+                logger.info('Process {} is still running, try to kill it.'.format(worker.name))
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except OSError as err:
+                    logger.error("Unable to kill {}:{}, error:{}".format(worker.pid, worker.name, err))
+                    pt_assert(
+                        False,
+                        """Processes running target "{}" could not be terminated.
+                        Unable to kill {}:{}, error:{}""".format(target.__name__, worker.pid, worker.name, err)
+                    )
+                worker.join()
+                # The outcome of a killed process is never read, close the parent side of its pipe here.
+                worker.connection.close()
+
+
+def _check_failed_tasks(failed_tasks):
+    # if we have failed tasks, we should log the exception and exit code of each task and fail
+    for task in failed_tasks:
+        p_exception, p_traceback = task.exception
+        p_exitcode = task.exit_code
+        # For analyzed matched syslog, don't need to log the traceback
+        if "analyze_logs" in task.name and "Match Messages" in str(p_exception):
+            failure_message = 'Got matched syslog in processes "{}" exit code:"{}"\n{}'.format(
+                task.name, p_exitcode, p_exception
+            )
+        else:
+            failure_message = 'Processes "{}" failed with exit code "{}"\nException:\n{}\nTraceback:\n{}'.format(
+                [failed.name for failed in failed_tasks], p_exitcode, p_exception, p_traceback)
+        pt_assert(False, failure_message)
+
+
+_parallel_runner = ParallelRunner()
+
+
+def get_parallel_runner():
+    return _parallel_runner
+
+
+def set_parallel_runner(runner):
+    """Replace the session scoped executor used by parallel_run, returns the previous one."""
+    global _parallel_runner
+    previous, _parallel_runner = _parallel_runner, runner
+    return previous
+
 
 def parallel_run(
     target, args, kwargs, nodes_list, timeout=None, concurrent_tasks=24, init_result=None
@@ -73,178 +244,24 @@ def parallel_run(
     Args:
         target (function): The target function to be executed in parallel.
         args (list of tuple): List of arguments for the target function.
-        kwargs (dict): Keyword arguments for the target function. It will be extended with two keys: 'node' and
-            'results'. The 'node' key will hold an item of the nodes list. The 'result' key will hold an instance of
-            multiprocessing.Manager().dict(). It is a proxy of the shared dict that will be used by each process for
-            returning execution results.
+        kwargs (dict): Keyword arguments for the target function. A copy of it is extended with two keys for each
+            node: 'node' and 'results'. The 'node' key will hold an item of the nodes list. The 'results' key will
+            hold a dict for returning execution results of the node. The dicts of all nodes are merged and returned.
         nodes (list of nodes): List of nodes to be used by the target function
-        timeout (int or float, optional): Total time allowed for the spawned multiple processes to run. Defaults to
-            None. When timeout is specified, this function will wait at most 'timeout' seconds for the processes to
-            run. When time is up, this function will try to terminate or even kill all the processes.
+        timeout (int or float, optional): Time allowed for the target to run on each node. Defaults to None. When
+            time is up for a node, it is terminated and its results are marked as failed. Other nodes are not
+            affected.
+        concurrent_tasks (int, optional): Max number of nodes to run at the same time.
+        init_result (dict, optional): Initial results of each node, used when the node times out.
 
     Raises:
-        flag.: In case any of the spawned process cannot be terminated, fail the test.
+        flag.: In case any of the spawned process cannot be terminated or the target failed on any node, fail the test.
 
     Returns:
-        dict: An instance of multiprocessing.Manager().dict(). It is a proxy to the shared dict that is used by all the
-            spawned processes.
+        dict: Merged results of all the nodes.
     """
-    nodes = [node for node in nodes_list]
-
-    # Callback API for wait_procs
-    def on_terminate(worker):
-        logger.info("process {} terminated with exit code {}".format(
-            worker.name, worker.returncode)
-        )
-
-    def force_terminate(workers, init_result):
-        # Some processes cannot be terminated. Try to kill them and raise flag.
-        running_processes = [worker for worker in workers if worker.is_alive()]
-        if len(running_processes) > 0:
-            logger.info(
-                'Found processes still running: {}. Try to kill them.'.format(str(running_processes))
-            )
-            for p in running_processes:
-                # If sanity check process is killed, it still has init results.
-                # set its failed to True.
-                if init_result:
-                    init_result['failed'] = True
-                    results[list(results.keys())[0]] = init_result
-                else:
-                    results[p.name] = {'failed': True}
-                try:
-                    os.kill(p.pid, signal.SIGKILL)
-                except OSError as err:
-                    logger.error("Unable to kill {}:{}, error:{}".format(
-                        p.pid, p.name, err
-                    ))
-
-                    pt_assert(
-                        False,
-                        """Processes running target "{}" could not be terminated.
-                        Unable to kill {}:{}, error:{}""".format(target.__name__, p.pid, p.name, err)
-                    )
-
-    workers = []
-    results = Manager().dict()
-    start_time = datetime.datetime.now()
-    tasks_done = 0
-    total_tasks = len(nodes)
-    tasks_running = 0
-    total_timeout = timeout * math.ceil(
-        len(nodes)/float(concurrent_tasks)
-    ) if timeout else None
-    failed_processes = {}
-
-    while tasks_done < total_tasks:
-        # If execution time of processes exceeds timeout, need to force
-        # terminate them all.
-        if total_timeout is not None:
-            if (datetime.datetime.now() - start_time).seconds > total_timeout:
-                logger.error('Process execution time exceeds {} seconds.'.format(
-                    str(total_timeout)
-                ))
-                break
-
-        while len(nodes) and tasks_running < concurrent_tasks:
-            node = nodes.pop(0)
-            # For sanity check process, initial results in case of timeout.
-            if init_result:
-                init_result["host"] = node.hostname
-                results[node.hostname] = init_result
-            kwargs['node'] = node
-            kwargs['results'] = results
-            process_name = "{}--{}".format(target.__name__, node)
-            worker = SonicProcess(
-                        name=process_name, target=target, args=args,
-                        kwargs=kwargs
-                    )
-            worker.start()
-            tasks_running += 1
-            logger.debug('Started process {} running target "{}"'.format(
-                worker.pid, process_name
-            ))
-            workers.append(worker)
-
-        gone, alive = wait_procs(workers, timeout=timeout, callback=on_terminate)
-        workers = alive
-
-        logger.debug("task completed {}, running {}".format(
-            len(gone), len(alive)
-        ))
-
-        # Sometimes the child processes finished run but still alive, causing exception hidden.
-        # It mainly caused by child processes hang on send() if parent doesn't read from the pipe.
-        # Therefore, explicitly check the processes exception to prevent any error miss.
-        logger.info("Force read exception regardless of whether the process exited normally.")
-        for worker in gone + alive:
-            worker_exception = worker.exception  # Force-read to prevent pipe hangs
-            if worker_exception is not None:
-                logger.info(f"Process {worker.name} has exception, is_alive={worker.is_running()}, record the error.")
-                failed_processes[worker.name] = {
-                    'exit_code': worker.exitcode,
-                    'exception': worker_exception
-                }
-
-        if len(gone) == 0:
-            logger.debug("all processes have timedout")
-            tasks_running -= len(workers)
-            tasks_done += len(workers)
-            force_terminate(workers, init_result)
-            del workers[:]
-        else:
-            tasks_running -= len(gone)
-            tasks_done += len(gone)
-
-    # In case of timeout force terminate spawned processes
-    for worker in workers:
-        if worker.is_alive():
-            logger.error('Process {} is alive, force terminate it.'.format(
-                worker.name
-            ))
-            worker.terminate()
-            # If sanity check process is killed, it still has init results.
-            # set its failed to True.
-            if init_result:
-                init_result['failed'] = True
-                results[list(results.keys())[0]] = init_result
-            else:
-                results[worker.name] = {'failed': True}
-
-    end_time = datetime.datetime.now()
-    delta_time = end_time - start_time
-
-    # force terminate any workers still running
-    force_terminate(workers, init_result)
-
-    # if we have failed processes, we should log the exception and exit code
-    # of each Process and fail
-    if len(list(failed_processes.keys())):
-        for process_name, process in list(failed_processes.items()):
-            p_exitcode = ""
-            p_exception = ""
-            p_traceback = ""
-            if 'exception' in process and process['exception']:
-                p_exception = process['exception'][0]
-                p_traceback = process['exception'][1]
-                p_exitcode = process['exit_code']
-            # For analyzed matched syslog, don't need to log the traceback
-            if "analyze_logs" in process_name and "Match Messages" in str(p_exception):
-                failure_message = 'Got matched syslog in processes "{}" exit code:"{}"\n{}'.format(
-                    process_name, p_exitcode, p_exception
-                )
-            else:
-                failure_message = 'Processes "{}" failed with exit code "{}"\nException:\n{}\nTraceback:\n{}'.format(
-                    list(failed_processes.keys()), p_exitcode, p_exception, p_traceback)
-            pt_assert(False, failure_message)
-
-    logger.info(
-        'Completed running processes for target "{}" in {} seconds'.format(
-            target.__name__, str(delta_time)
-        )
-    )
-
-    return dict(results)
+    return _parallel_runner.run(target, args, kwargs, nodes_list, timeout=timeout,
+                                concurrent_tasks=concurrent_tasks, init_result=init_result)
 
 
 def reset_ansible_local_tmp(target):
@@ -311,3 +328,166 @@ def parallel_run_threaded(target_functions, timeout=10, thread_count=2):
             raise error
         outputs.append(output)
     return outputs
+
+
+@reset_ansible_local_tmp
+def _broadcast_call(func, target, results):
+    """Call func on target in the forked process of a broadcast, put its result or its exception in results."""
+    try:
+        result = func(target)
+        # Fail here with a clear message rather than when the result is sent to the caller
+        pickle.dumps(result)
+        results["result"] = result
+    except BaseException as e:
+        # Including the failures of pytest, they are raised by the caller
+        tb = traceback.format_exc()
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(repr(e))
+        results["exception"] = (e, tb)
+
+
+class BroadcastStats(object):
+    """Per target call counts and latency of the broadcasts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = collections.defaultdict(lambda: {"calls": 0, "total": 0.0, "max": 0.0})
+
+    def record(self, name, target, latency):
+        with self._lock:
+            stat = self.stats[(name, str(target))]
+            stat["calls"] += 1
+            stat["total"] += latency
+            stat["max"] = max(stat["max"], latency)
+
+    def report(self):
+        """Return lines of report sorted by cumulative latency, slowest target first."""
+        with self._lock:
+            stats = sorted(self.stats.items(), key=lambda item: item[1]["total"], reverse=True)
+        lines = ["{:<32} {:<40} {:>8} {:>12} {:>10}".format("call", "target", "calls", "total(s)", "max(s)")]
+        for (name, target), stat in stats:
+            lines.append("{:<32} {:<40} {:>8} {:>12.3f} {:>10.3f}".format(
+                name, target, stat["calls"], stat["total"], stat["max"]))
+        return lines
+
+
+class BroadcastExecutor(object):
+    """Session scoped executor of the calls broadcast to all the ASICs of a DUT or to all the DUTs of a testbed.
+
+    Ansible runs its modules from the main thread only, so the calls of a broadcast run concurrently each in a forked
+    process, like the targets of parallel_run. Only the result or the exception of a call is returned to the caller,
+    any change made by the call to the objects of the session is lost with its process. At most max_workers calls of
+    a broadcast run at the same time, with max_workers 0 the calls run one after another by the caller.
+    """
+
+    def __init__(self, max_workers=BROADCAST_MAX_WORKERS):
+        self.max_workers = max_workers
+        self.stats = BroadcastStats()
+
+    def run(self, name, func, targets, concurrent=True):
+        """Call func on each target, return the results in the order of targets.
+
+        Args:
+            name (str): Name of the broadcast, for the logs and the latency statistics.
+            func (function): Function called with a target. When run in a forked process, its result must be
+                picklable.
+            targets (list): Targets of the broadcast.
+            concurrent (bool, optional): Call func on the targets one after another by the caller when False, like
+                any broadcast made from these calls.
+
+        Raises:
+            The exception of the first target in order for which func raised, once all the calls are done. When
+            not concurrent, the calls stop at the first exception.
+
+        Returns:
+            list: Result of func for each target.
+        """
+        serial = not concurrent or getattr(_broadcast_context, "serial", False)
+        if serial or self.max_workers <= 0 or len(targets) <= 1:
+            return self._run_serial(name, func, targets, serial)
+
+        results, exceptions, latencies = self._run_processes(name, func, targets)
+        for target, latency in zip(targets, latencies):
+            self.stats.record(name, target, latency)
+        logger.debug("Broadcast {} to {} targets, latency: {}".format(
+            name, len(targets), ", ".join("{}={:.3f}s".format(target, latency)
+                                          for target, latency in zip(targets, latencies))))
+        failed = [(target, exception) for target, exception in zip(targets, exceptions) if exception is not None]
+        for target, (exception, tb) in failed:
+            logger.error("Broadcast {} failed on {}: {}\n{}".format(name, target, repr(exception), tb))
+        if failed:
+            raise failed[0][1][0]
+        return results
+
+    def _run_processes(self, name, func, targets):
+        results = [None] * len(targets)
+        exceptions = [None] * len(targets)
+        latencies = [None] * len(targets)
+        pending = list(range(len(targets)))
+        running = {}    # SonicProcess => (index of the target, start time)
+
+        while pending or running:
+            while pending and len(running) < self.max_workers:
+                index = pending.pop(0)
+                worker = SonicProcess(name="{}--{}".format(name, targets[index]), target=_broadcast_call,
+                                      kwargs={"func": func, "target": targets[index], "results": {}})
+                worker.start()
+                running[worker] = (index, time.time())
+
+            ready = wait_connections([worker.connection for worker in running])
+            for worker in [worker for worker in running if worker.connection in ready]:
+                index, start = running.pop(worker)
+                # Read the outcome before join, the child may block on sending a large result.
+                worker_exception, worker_results = worker.exception, worker.results
+                worker.join()
+                latencies[index] = time.time() - start
+                if worker_results and "exception" in worker_results:
+                    exceptions[index] = worker_results["exception"]
+                elif worker_results and "result" in worker_results:
+                    results[index] = worker_results["result"]
+                elif worker_exception is not None:
+                    exceptions[index] = worker_exception
+                else:
+                    exceptions[index] = (RuntimeError("Process of broadcast {} to {} exited with code {} without "
+                                                      "result".format(name, targets[index], worker.exitcode)), "")
+        return results, exceptions, latencies
+
+    def _run_serial(self, name, func, targets, serial):
+        previous = getattr(_broadcast_context, "serial", False)
+        _broadcast_context.serial = serial
+        try:
+            results = []
+            for target in targets:
+                start = time.time()
+                try:
+                    results.append(func(target))
+                finally:
+                    self.stats.record(name, target, time.time() - start)
+            return results
+        finally:
+            _broadcast_context.serial = previous
+
+
+_broadcast_executor = BroadcastExecutor()
+
+
+def get_broadcast_executor():
+    return _broadcast_executor
+
+
+def set_broadcast_executor(executor):
+    """Replace the session scoped executor of the broadcasts, returns the previous one."""
+    global _broadcast_executor
+    previous, _broadcast_executor = _broadcast_executor, executor
+    return previous
+
+
+def broadcast(name, func, targets, concurrent=True):
+    """Call func on each target with the session scoped BroadcastExecutor, see BroadcastExecutor.run."""
+    return _broadcast_executor.run(name, func, targets, concurrent=concurrent)
@@ -0,0 +1,81 @@
+"""Benchmark latency of parallel_run.
+
+Compare the latency of an N-node parallel_run with a short per-node task between the legacy implementation
+(multiprocessing.Manager() per call and psutil.wait_procs polling) and ParallelRunner.
+
+Usage:
+    python tests/common/helpers/parallel_benchmark.py --nodes 8 16 32 --rounds 5
+"""
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Manager, Process
+
+from psutil import wait_procs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../.."))
+
+from tests.common.helpers.parallel import ParallelRunner     # noqa: E402
+
+
+class FakeNode(object):
+    def __init__(self, hostname):
+        self.hostname = hostname
+
+    def __str__(self):
+        return self.hostname
+
+
+def _task(*args, **kwargs):
+    node = kwargs["node"]
+    time.sleep(kwargs["task_time"])
+    kwargs["results"][node.hostname] = {"failed": False, "host": node.hostname}
+
+
+class _LegacyProcess(Process):
+    def wait(self, timeout):
+        return self.join(timeout=timeout)
+
+    def is_running(self):
+        return self.is_alive()
+
+
+def _legacy_parallel_run(target, args, kwargs, nodes, timeout=None):
+    """Essential cost of parallel_run before ParallelRunner: a Manager server process per call."""
+    results = Manager().dict()
+    workers = []
+    for node in nodes:
+        worker = _LegacyProcess(target=target, args=args, kwargs=dict(kwargs, node=node, results=results))
+        worker.start()
+        workers.append(worker)
+    while workers:
+        _, workers = wait_procs(workers, timeout=timeout)
+    return dict(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel_run latency")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[8, 16, 32], help="Number of nodes")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of parallel_run calls per measurement")
+    parser.add_argument("--task_time", type=float, default=0.01, help="Seconds spent by the target on each node")
+    args = parser.parse_args()
+
+    runner = ParallelRunner()
+    print("{:>6} {:>10} {:>12}".format("nodes", "runner", "latency(ms)"))
+    for count in args.nodes:
+        nodes = [FakeNode("dut-{}".format(index)) for index in range(count)]
+        kwargs = {"task_time": args.task_time}
+        measurements = [("legacy", lambda: _legacy_parallel_run(_task, (), kwargs, nodes, timeout=60)),
+                        ("process", lambda: runner.run(_task, (), kwargs, nodes, timeout=60,
+                                                       concurrent_tasks=count))]
+        for name, func in measurements:
+            start = time.time()
+            for _ in range(args.rounds):
+                results = func()
+                assert len(results) == count
+            print("{:>6} {:>10} {:>12.1f}".format(count, name, (time.time() - start) / args.rounds * 1000))
+
+
+if __name__ == "__main__":
+    main()
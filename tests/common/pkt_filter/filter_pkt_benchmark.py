@@ -0,0 +1,75 @@
+"""Benchmark of the matching of FilterPktBuffer.
+
+Time the check of the matched fields per frame with the legacy matching (every frame dissected and converted to a
+dict of strings) and with the compiled mask of the raw frames, on Ether/Dot1Q/IP/TCP frames with six matched fields.
+Both are checked to match the same frames.
+
+Usage:
+    python tests/common/pkt_filter/filter_pkt_benchmark.py --frames 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# The folder of this script is not a package root, use the repo root instead
+sys.path[0] = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../..")
+
+import ptf.packet as packet     # noqa: E402
+
+from tests.common.pkt_filter.filter_pkt_in_buffer import compile_match_fields, convert_pkt_to_dict     # noqa: E402
+
+MATCH_FIELDS = [("802.1Q", "vlan"), ("Ethernet", "src"), ("Ethernet", "dst"), ("IP", "src"), ("IP", "dst"),
+                ("TCP", "dport")]
+
+
+def make_frame(rnd, dport):
+    return bytes(packet.Ether(src="00:01:02:03:04:05", dst="00:06:07:08:09:0a") / packet.Dot1Q(vlan=100) /
+                 packet.IP(src="10.0.0.1", dst="10.0.0.2", ttl=rnd.randint(1, 64)) /
+                 packet.TCP(sport=rnd.randint(1024, 65535), dport=dport) / ("x" * 64))
+
+
+def legacy_matches(exp_pkt, frames):
+    exp_pkt_dict = convert_pkt_to_dict(exp_pkt)
+    matched = []
+    for frame in frames:
+        packet_dict = convert_pkt_to_dict(packet.Ether(frame))
+        for field, value in MATCH_FIELDS:
+            try:
+                if packet_dict[field][value] != exp_pkt_dict[field][value]:
+                    break
+            except KeyError:
+                break
+        else:
+            matched.append(frame)
+    return matched
+
+
+def compiled_matches(exp_pkt, frames):
+    first_byte, end_byte, mask_value, value = compile_match_fields(exp_pkt, MATCH_FIELDS)
+    return [frame for frame in frames
+            if len(frame) >= end_byte and int.from_bytes(frame[first_byte:end_byte], "big") & mask_value == value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FilterPktBuffer matching")
+    parser.add_argument("--frames", type=int, default=2000, help="Number of frames in the buffer")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    exp_pkt = packet.Ether(make_frame(rnd, 80))
+    frames = [make_frame(rnd, rnd.choice((80, 443))) for _ in range(args.frames)]
+
+    print("{:>10} {:>12} {:>10}".format("matching", "us/frame", "matched"))
+    results = {}
+    for name, func in (("legacy", legacy_matches), ("compiled", compiled_matches)):
+        start = time.time()
+        results[name] = func(exp_pkt, frames)
+        elapsed = time.time() - start
+        print("{:>10} {:>12.1f} {:>10}".format(name, elapsed * 1e6 / len(frames), len(results[name])))
+    assert results["legacy"] == results["compiled"], "Matched frames differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,6 @@ from collections import OrderedDict
 import sys
 import time
 import json
-import copy
 
 import ptf.mask as mask
 import ptf.packet as packet
@@ -13,6 +12,9 @@ if sys.version_info.major > 2:
 else:
     NATIVE_TYPE = (int, float, long, bool, list, dict, tuple, set, str, bytes, unicode, type(None))     # noqa: F821
 
+NEXT_HEADER_FIELDS = ('type', 'proto', 'nh')
+HEADER_LENGTH_FIELDS = ('ihl',)
+
 
 def _parse_layer(layer):
     """
@@ -69,11 +71,120 @@ def convert_pkt_to_dict(pkt):
     return packet_dict
 
 
+def _bit_length(built):
+    """
+    Get the length in bits of a partially built layer
+
+    Args:
+        built: Bytes built so far, or a tuple (bytes, bits, value) after an incomplete byte of bit fields
+
+    Returns:
+        Length in bits
+    """
+    if isinstance(built, tuple):
+        return len(built[0]) * 8 + built[1]
+    return len(built) * 8
+
+
+def _field_bits(layer, field_name):
+    """
+    Find the position of a field in its layer
+
+    Args:
+        layer: Layer of packet
+        field_name: Name of field
+
+    Returns:
+        Tuple of the first bit of the field in the layer and its width in bits, None if the layer doesn't have it
+    """
+    built = b""
+    for field in layer.fields_desc:
+        start = _bit_length(built)
+        built = field.addfield(layer, built, layer.getfieldval(field.name))
+        if field.name == field_name:
+            width = _bit_length(built) - start
+            return (start, width) if width else None
+    return None
+
+
+def compile_match_fields(pkt, match_fields):
+    """
+    Compile the matched fields of the expected packet into one masked comparison of raw frames
+
+    The layers are found by name like in convert_pkt_to_dict, the last one wins when several have the same name.
+    The fields binding the layers up to the matched ones (like Ether type, IP proto and ihl) are matched as well, so
+    that the received frames have the same headers as the expected packet.
+
+    Args:
+        pkt: Expected scapy packet
+        match_fields: List of packet fields that should be matched
+
+    Returns:
+        Tuple of first byte, end byte, mask and value as integers, None if the expected packet doesn't have a field
+    """
+    raw = bytes(pkt)
+    built_pkt = pkt.__class__(raw)
+    layers = {}
+    stack = []
+    counter = 0
+    while True:
+        layer = built_pkt.getlayer(counter)
+        if not layer:
+            break
+        if hasattr(layer, 'fields_desc'):
+            layers[layer.name] = (len(raw) - len(bytes(layer)), layer, counter)
+        stack.append(layer)
+        counter += 1
+
+    fields = []
+    for layer_name, field_name in match_fields:
+        if layer_name not in layers:
+            return None
+        fields.append((layer_name, field_name))
+    if fields:
+        deepest = max(layers[layer_name][2] for layer_name, _ in fields)
+        for lower, upper in zip(stack[:deepest], stack[1:deepest + 1]):
+            for binding, layer_class in lower.payload_guess:
+                if layer_class is upper.__class__ and \
+                        all(lower.getfieldval(name) == value for name, value in binding.items()):
+                    fields.extend((lower.name, name) for name in binding)
+                    break
+            else:
+                # Layers like 802.1Q guess the next layer from their own next header field
+                fields.extend((lower.name, field.name) for field in lower.fields_desc
+                              if field.name in NEXT_HEADER_FIELDS)
+            # The next layer moves with the length of the lower one
+            fields.extend((lower.name, field.name) for field in lower.fields_desc
+                          if field.name in HEADER_LENGTH_FIELDS)
+
+    bit_ranges = []
+    for layer_name, field_name in fields:
+        layer_offset, layer, _ = layers[layer_name]
+        bits = _field_bits(layer, field_name)
+        if bits is None:
+            return None
+        bit_ranges.append((layer_offset * 8 + bits[0], bits[1]))
+
+    if not bit_ranges:
+        return (0, 0, 0, 0)
+
+    first_byte = min(start for start, _ in bit_ranges) // 8
+    end_byte = (max(start + width for start, width in bit_ranges) + 7) // 8
+    mask_value = 0
+    for start, width in bit_ranges:
+        shift = end_byte * 8 - start - width
+        mask_value |= ((1 << width) - 1) << shift
+    value = int.from_bytes(raw[first_byte:end_byte], 'big') & mask_value
+
+    return (first_byte, end_byte, mask_value, value)
+
+
 class FilterPktBuffer(object):
     """
     FilterPktBuffer class for finding of packets in the buffer of PTF
     """
-    def __init__(self, ptfadapter, exp_pkt, dst_port_numbers, match_fields=None, ignore_fields=None):
+    def __init__(self, ptfadapter, exp_pkt, dst_port_numbers, match_fields=None, ignore_fields=None, timeout=3,
+                 settle_time=0.5, poll_interval=0.1):
         """
         Initialize an object for finding packets in the buffer
 
@@ -83,6 +194,9 @@ class FilterPktBuffer(object):
             dst_port_numbers: Destination port numbers
             match_fields: List of packet fields that should be matched
             ignore_fields: List of packet fields that should be ignored
+            timeout: Seconds to wait for the expected packet
+            settle_time: Seconds without new packets to wait for more matched packets after the first one
+            poll_interval: Seconds between checks of the buffer
         """
         self.received_pkt = None
         self.received_pkt_diff = []
@@ -99,11 +213,25 @@ class FilterPktBuffer(object):
             ignore_fields = []
         self.ignore_fields = ignore_fields
 
+        self.timeout = timeout
+        self.settle_time = settle_time
+        self.poll_interval = poll_interval
+
         self.masked_exp_pkt = mask.Mask(self.pkt)
-        self.pkt_dict = convert_pkt_to_dict(self.pkt)
+        self.match_check = compile_match_fields(self.pkt, self.match_fields)
+        self._pkt_dict = None
 
         self.__ignore_fields()
 
+    @property
+    def pkt_dict(self):
+        """
+        Expected packet dictionary, only built for the difference and the output of packets
+        """
+        if self._pkt_dict is None:
+            self._pkt_dict = convert_pkt_to_dict(self.pkt)
+        return self._pkt_dict
+
     def __ignore_fields(self):
         """
         Ignore fields of packet
@@ -121,44 +249,75 @@ class FilterPktBuffer(object):
         Returns:
             Packet dictionary without ignored fields
         """
-        pkt_dict = copy.deepcopy(pkt_dict)
-
+        ignored = {}
         for field, value in self.ignore_fields:
-            if pkt_dict.get(field):
-                pkt_dict[field].pop(value)
+            ignored.setdefault(field, set()).add(value)
 
-        return pkt_dict
+        # Values of the fields are strings, a copy of the layer dictionaries is enough
+        return OrderedDict(
+            (layer, {name: value for name, value in fields.items() if name not in ignored[layer]}
+             if ignored.get(layer) else fields)
+            for layer, fields in pkt_dict.items()
+        )
 
-    def __find_pkt_in_buffer(self, dst_port_number):
+    def __match_pkt(self, pkt):
         """
-        Find expected packet in buffer by using matched fields
+        Check the matched fields of raw packet
+
+        Args:
+            pkt: Raw packet
 
         Returns:
-            Received packet
+            Bool value
         """
-        time.sleep(3)
-        common_buffer = self.ptfadapter.dataplane.packet_queues
-        packet_buffer = common_buffer[(0, dst_port_number)][:]
-        matched_index = 0
-        received_pkt = None
-
-        for pkt in packet_buffer:
-            packet_dict = convert_pkt_to_dict(packet.Ether(pkt[0]))
-
-            for field, value in self.match_fields:
-                try:
-                    if packet_dict[field][value] != self.pkt_dict[field][value]:
-                        break
-                except KeyError:
-                    break
-            else:
-                matched_index += 1
-                received_pkt = packet.Ether(pkt[0])
+        if self.match_check is None:
+            return False
+        first_byte, end_byte, mask_value, value = self.match_check
+        if len(pkt) < end_byte:
+            return False
+        return int.from_bytes(pkt[first_byte:end_byte], 'big') & mask_value == value
+
+    def __find_pkt_in_buffer(self):
+        """
+        Find expected packet in buffers of destination ports by using matched fields
 
-        if received_pkt:
-            return ({dst_port_number: matched_index}, received_pkt)
+        New packets are checked until the timeout, or until no packets arrived for the settle time after one matched.
 
-        return (None, None)
+        Returns:
+            Dictionary of matched packet counters and dictionary of last matched raw packets, by port number
+        """
+        common_buffer = self.ptfadapter.dataplane.packet_queues
+        matched_index = {}
+        matched_pkts = {}
+        last_checked = {}
+        deadline = time.time() + self.timeout
+        last_arrival = time.time()
+
+        while True:
+            for dst_port_number in self.dst_port_numbers:
+                packet_buffer = common_buffer[(0, dst_port_number)][:]
+                # Packets are appended, and removed from the head when the buffer is full
+                new_index = 0
+                last_pkt = last_checked.get(dst_port_number)
+                if last_pkt is not None:
+                    for index in range(len(packet_buffer) - 1, -1, -1):
+                        if packet_buffer[index] is last_pkt:
+                            new_index = index + 1
+                            break
+                if new_index == len(packet_buffer):
+                    continue
+
+                last_arrival = time.time()
+                last_checked[dst_port_number] = packet_buffer[-1]
+                for pkt in packet_buffer[new_index:]:
+                    if self.__match_pkt(pkt[0]):
+                        matched_index[dst_port_number] = matched_index.get(dst_port_number, 0) + 1
+                        matched_pkts[dst_port_number] = pkt[0]
+
+            now = time.time()
+            if now >= deadline or (matched_pkts and now - last_arrival >= self.settle_time):
+                return matched_index, matched_pkts
+            time.sleep(min(self.poll_interval, deadline - now))
 
     def __diff_between_dict(self, rcv_pkt_dict, exp_pkt_dict, path=''):
         """
@@ -211,12 +370,12 @@ class FilterPktBuffer(object):
         Returns:
             Bool value or difference between received packet and expected packet
         """
-        for dst_port in self.dst_port_numbers:
-            matched_index, received_pkt = self.__find_pkt_in_buffer(dst_port)
+        matched_index, matched_pkts = self.__find_pkt_in_buffer()
+        self.matched_index.update(matched_index)
 
-            if received_pkt:
-                self.received_pkt = received_pkt
-                self.matched_index.update(matched_index)
+        for dst_port in self.dst_port_numbers:
+            if dst_port in matched_pkts:
+                self.received_pkt = packet.Ether(matched_pkts[dst_port])
 
         if self.received_pkt:
             return self.masked_exp_pkt.pkt_match(self.received_pkt) or self._diff_between_pkt(self.received_pkt)
@@ -0,0 +1,192 @@
+import unittest
+
+import ptf.packet as packet
+
+from tests.common.pkt_filter.filter_pkt_in_buffer import FilterPktBuffer, compile_match_fields, convert_pkt_to_dict
+
+ETH = {"src": "00:01:02:03:04:05", "dst": "00:06:07:08:09:0a"}
+TCP_MATCH_FIELDS = [("IP", "src"), ("IP", "dst"), ("TCP", "dport")]
+
+
+def legacy_match(exp_pkt, frame, match_fields):
+    """Matching of the matched fields before they were compiled: both packets dissected into dicts of strings."""
+    exp_pkt_dict = convert_pkt_to_dict(exp_pkt)
+    packet_dict = convert_pkt_to_dict(packet.Ether(frame))
+    for field, value in match_fields:
+        try:
+            if packet_dict[field][value] != exp_pkt_dict[field][value]:
+                return False
+        except KeyError:
+            return False
+    return True
+
+
+def compiled_match(exp_pkt, frame, match_fields):
+    """Matching of FilterPktBuffer with the compiled matched fields."""
+    match_check = compile_match_fields(exp_pkt, match_fields)
+    if match_check is None:
+        return False
+    first_byte, end_byte, mask_value, value = match_check
+    return len(frame) >= end_byte and int.from_bytes(frame[first_byte:end_byte], "big") & mask_value == value
+
+
+def tcp_pkt(vlan=None, ip_options=None, **ip_fields):
+    ip_fields.setdefault("src", "10.0.0.1")
+    ip_fields.setdefault("dst", "10.0.0.2")
+    if ip_options:
+        ip_fields["options"] = ip_options
+    pkt = packet.Ether(**ETH)
+    if vlan is not None:
+        pkt = pkt / packet.Dot1Q(vlan=vlan)
+    return pkt / packet.IP(**ip_fields) / packet.TCP(sport=1234, dport=80) / ("x" * 20)
+
+
+def ipv6_pkt(l4=None):
+    l4 = packet.UDP(sport=1234, dport=4789) if l4 is None else l4
+    return packet.Ether(**ETH) / packet.IPv6(src="fc00::1", dst="fc00::2") / l4 / ("x" * 20)
+
+
+class TestCompiledMatch(unittest.TestCase):
+    """Test cases of the compiled matched fields against the matching of the dissected packets."""
+
+    def assert_matches(self, exp_pkt, match_fields, frames):
+        """Check the compiled and the legacy matching of frames, given with their expected result."""
+        for frame, expected in frames:
+            with self.subTest(frame=repr(frame), match_fields=match_fields):
+                frame = bytes(frame)
+                self.assertEqual(compiled_match(exp_pkt, frame, match_fields), expected)
+                self.assertEqual(legacy_match(exp_pkt, frame, match_fields), expected)
+
+    def assert_only_legacy_matches(self, exp_pkt, match_fields, frame):
+        frame = bytes(frame)
+        self.assertTrue(legacy_match(exp_pkt, frame, match_fields))
+        self.assertFalse(compiled_match(exp_pkt, frame, match_fields))
+
+    def test_vlan_tagged_frames(self):
+        exp_pkt = tcp_pkt(vlan=100)
+        self.assert_matches(exp_pkt, [("802.1Q", "vlan")] + TCP_MATCH_FIELDS, [
+            (tcp_pkt(vlan=100), True),
+            (tcp_pkt(vlan=100, ttl=1, id=7), True),
+            (tcp_pkt(vlan=200), False),
+            (tcp_pkt(vlan=100, dst="10.0.0.3"), False),
+            (tcp_pkt(), False),
+        ])
+        self.assert_matches(exp_pkt, TCP_MATCH_FIELDS, [
+            (tcp_pkt(vlan=200), True),
+            (tcp_pkt(vlan=100, src="10.0.0.3"), False),
+        ])
+        # Frames with other headers don't match anymore: IP starts after the VLAN tag
+        self.assert_only_legacy_matches(exp_pkt, TCP_MATCH_FIELDS, tcp_pkt())
+        self.assert_only_legacy_matches(tcp_pkt(), TCP_MATCH_FIELDS, tcp_pkt(vlan=100))
+
+    def test_ipv4_with_options(self):
+        options = [packet.IPOption_RR(routers=["1.1.1.1"])]
+        exp_pkt = tcp_pkt(ip_options=options)
+        self.assert_matches(exp_pkt, TCP_MATCH_FIELDS, [
+            (tcp_pkt(ip_options=options), True),
+            (tcp_pkt(ip_options=[packet.IPOption_RR(routers=["2.2.2.2"])]), True),
+            (tcp_pkt(ip_options=options, dst="10.0.0.3"), False),
+        ])
+        # TCP moves with the length of the IP header
+        self.assert_only_legacy_matches(exp_pkt, TCP_MATCH_FIELDS, tcp_pkt())
+        self.assert_only_legacy_matches(tcp_pkt(), TCP_MATCH_FIELDS, tcp_pkt(ip_options=options))
+        self.assert_matches(exp_pkt, [("IP", "src"), ("IP", "dst")], [(tcp_pkt(), True)])
+
+    def test_layer_missing_from_frame(self):
+        exp_pkt = tcp_pkt()
+        udp_frame = packet.Ether(**ETH) / packet.IP(src="10.0.0.1", dst="10.0.0.2") / packet.UDP(dport=80)
+        self.assert_matches(exp_pkt, TCP_MATCH_FIELDS, [
+            (udp_frame, False),
+            (packet.Ether(**ETH) / packet.ARP(), False),
+            (bytes(tcp_pkt())[:36], False),
+        ])
+        # Only the headers up to the matched fields are matched
+        self.assert_matches(exp_pkt, [("Ethernet", "src")], [(packet.Ether(**ETH) / packet.ARP(), True)])
+
+    def test_layer_missing_from_expected_packet(self):
+        self.assert_matches(tcp_pkt(), [("UDP", "dport")], [(tcp_pkt(), False)])
+        self.assert_matches(tcp_pkt(), [("802.1Q", "vlan")], [(tcp_pkt(vlan=100), False)])
+
+    def test_ipv6(self):
+        exp_pkt = ipv6_pkt()
+        match_fields = [("IPv6", "src"), ("IPv6", "dst"), ("UDP", "dport")]
+        self.assert_matches(exp_pkt, match_fields, [
+            (ipv6_pkt(), True),
+            (ipv6_pkt(packet.UDP(sport=5678, dport=4789)), True),
+            (ipv6_pkt(packet.UDP(dport=4790)), False),
+            (ipv6_pkt(packet.TCP(dport=4789)), False),
+            (packet.Ether(**ETH) / packet.IPv6(src="fc00::1", dst="fc00::3") / packet.UDP(dport=4789), False),
+        ])
+        self.assert_matches(exp_pkt, [("IPv6", "src"), ("IPv6", "dst")], [(ipv6_pkt(packet.TCP()), True)])
+
+    def test_no_match_fields(self):
+        self.assert_matches(tcp_pkt(), [], [(tcp_pkt(vlan=100), True), (ipv6_pkt(), True)])
+
+    def test_auto_computed_fields(self):
+        # None in the expected packet, the dissected "None" never matched the received value
+        exp_pkt = tcp_pkt()
+        self.assertTrue(compiled_match(exp_pkt, bytes(tcp_pkt()), [("IP", "len"), ("IP", "chksum")]))
+        self.assertFalse(legacy_match(exp_pkt, bytes(tcp_pkt()), [("IP", "len"), ("IP", "chksum")]))
+        self.assertFalse(compiled_match(exp_pkt, bytes(tcp_pkt(ttl=1)), [("IP", "chksum")]))
+
+    def test_flags(self):
+        # Flags are dissected as "None", so they always matched
+        self.assert_only_legacy_matches(tcp_pkt(flags=0), [("IP", "flags")], tcp_pkt(flags="DF"))
+        self.assert_matches(tcp_pkt(flags="DF"), [("IP", "flags")], [(tcp_pkt(flags="DF"), True)])
+
+
+class FakeDataplane(object):
+
+    def __init__(self, frames):
+        # Lists of (frame, timestamp) like the queues of the PTF dataplane
+        self.packet_queues = {(0, port): [(bytes(frame), 0) for frame in port_frames]
+                              for port, port_frames in frames.items()}
+
+
+class FakePtfAdapter(object):
+
+    def __init__(self, frames):
+        self.dataplane = FakeDataplane(frames)
+
+
+class TestFilterPktBuffer(unittest.TestCase):
+
+    def test_matched_packets_counted_by_port(self):
+        exp_pkt = tcp_pkt(vlan=100)
+        ptfadapter = FakePtfAdapter({
+            1: [tcp_pkt(vlan=100), tcp_pkt(), tcp_pkt(vlan=100)],
+            2: [tcp_pkt(vlan=100, dst="10.0.0.3")],
+            3: [tcp_pkt(vlan=100)],
+        })
+        pkt_filter = FilterPktBuffer(ptfadapter, exp_pkt, [1, 2, 3], match_fields=TCP_MATCH_FIELDS, timeout=1,
+                                     settle_time=0, poll_interval=0.01)
+        self.assertTrue(pkt_filter.filter_pkt_in_buffer())
+        self.assertEqual(pkt_filter.matched_index, {1: 2, 2: 0, 3: 1})
+        self.assertEqual(bytes(pkt_filter.received_pkt), bytes(exp_pkt))
+
+    def test_difference_of_matched_packet(self):
+        exp_pkt = tcp_pkt()
+        ptfadapter = FakePtfAdapter({1: [tcp_pkt(ttl=1)]})
+        pkt_filter = FilterPktBuffer(ptfadapter, exp_pkt, 1, match_fields=TCP_MATCH_FIELDS, timeout=1,
+                                     settle_time=0, poll_interval=0.01)
+        self.assertIn("IP ttl=1", pkt_filter.filter_pkt_in_buffer())
+
+    def test_ignored_fields(self):
+        exp_pkt = tcp_pkt()
+        ptfadapter = FakePtfAdapter({1: [tcp_pkt(ttl=1)]})
+        pkt_filter = FilterPktBuffer(ptfadapter, exp_pkt, 1, match_fields=TCP_MATCH_FIELDS,
+                                     ignore_fields=[("IP", "ttl"), ("IP", "chksum")], timeout=1, settle_time=0,
+                                     poll_interval=0.01)
+        self.assertTrue(pkt_filter.filter_pkt_in_buffer())
+
+    def test_no_matched_packet(self):
+        ptfadapter = FakePtfAdapter({1: [tcp_pkt(dst="10.0.0.3")]})
+        pkt_filter = FilterPktBuffer(ptfadapter, tcp_pkt(), 1, match_fields=TCP_MATCH_FIELDS, timeout=0.05,
+                                     settle_time=0, poll_interval=0.01)
+        self.assertFalse(pkt_filter.filter_pkt_in_buffer())
+        self.assertEqual(pkt_filter.matched_index, {1: 0})
+        self.assertIsNone(pkt_filter.received_pkt)
+
+
+if __name__ == "__main__":
+    unittest.main()
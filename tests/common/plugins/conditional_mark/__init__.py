@@ -3,6 +3,8 @@
 This plugin supports adding any mark to specified test cases based on conditions. All the information of test cases,
 marks, and conditions can be specified in a centralized file.
 """
+import functools
+import hashlib
 import json
 import logging
 import os
@@ -12,6 +14,7 @@ import yaml
 import glob
 import pytest
 
+from tests.common.cache import FactsCache
 from tests.common.testbed import TestbedInfo
 from .issue import check_issues
 from tests.common.utilities import get_duts_from_host_pattern
@@ -30,6 +33,9 @@ MARK_CONDITIONS_CONSTANTS = {
                      't2', 't2_2lc_36p-masic', 't2_2lc_min_ports-masic',
                      'lt2-p32o64', 'lt2-o128', 'ft2-64']
 }
+# Zone of FactsCache for the parsed mark conditions files
+CONDITIONS_CACHE_ZONE = 'conditional_mark'
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 
 def pytest_addoption(parser):
@@ -66,6 +72,34 @@ def pytest_addoption(parser):
              "by default it will not use the static reason specified in the mark conditions file")
 
 
+def load_conditions_file(conditions_file):
+    """Load the content of a mark conditions file.
+
+    Parsing all the mark conditions files takes seconds, so the parsed content is cached in FactsCache and reused
+    as long as modification time and size of the file do not change.
+
+    Args:
+        conditions_file (str): Path of the mark conditions file.
+
+    Returns:
+        dict: Parsed content of the mark conditions file.
+    """
+    stat = os.stat(conditions_file)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cache = FactsCache()
+    key = hashlib.md5(os.path.abspath(conditions_file).encode('utf-8')).hexdigest()
+    cached = cache.read(CONDITIONS_CACHE_ZONE, key)
+    if isinstance(cached, dict) and cached.get('signature') == signature:
+        logger.debug('Loaded test mark conditions file {} from cache'.format(conditions_file))
+        return cached['conditions']
+
+    with open(conditions_file) as f:
+        conditions = yaml.load(f, Loader=YAML_LOADER)
+    cache.write(CONDITIONS_CACHE_ZONE, key, {'path': conditions_file, 'signature': signature,
+                                             'conditions': conditions})
+    return conditions
+
+
 def load_conditions(session):
     """Load the content from mark conditions file
 
@@ -96,11 +130,10 @@ def load_conditions(session):
     try:
         logger.debug('Trying to load test mark conditions files: {}'.format(conditions_files))
         for conditions_file in conditions_files:
-            with open(conditions_file) as f:
-                logger.debug('Loaded test mark conditions file: {}'.format(conditions_file))
-                conditions = yaml.safe_load(f)
-                for key, value in list(conditions.items()):
-                    conditions_list.append({key: value})
+            conditions = load_conditions_file(conditions_file)
+            logger.debug('Loaded test mark conditions file: {}'.format(conditions_file))
+            for key, value in list(conditions.items()):
+                conditions_list.append({key: value})
     except Exception as e:
         logger.error('Failed to load {}, exception: {}'.format(conditions_files, repr(e)), exc_info=True)
         pytest.fail('Loading conditions file "{}" failed. Possibly invalid yaml file.'.format(conditions_files))
@@ -423,6 +456,125 @@ def load_basic_facts(dut_name, session):
     return results
 
 
+class ConditionMatcher(object):
+    """Index of the mark conditions for finding the entries matching a test case name.
+
+    Entries are matched as prefixes of the test case name by walking a character trie, entries with 'regex: True'
+    are precompiled. Matches are returned in the order of the conditions list, so the result is the same as checking
+    every entry in turn.
+    """
+
+    def __init__(self, conditions):
+        self.conditions = conditions
+        self._trie = {}
+        self._regexes = []
+        self._use_longest = []
+
+        for index, condition in enumerate(conditions):
+            # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
+            condition_entry = list(condition.keys())[0]
+            condition_items = condition[condition_entry]
+            use_longest = False
+            if "regex" in condition_items.keys():
+                assert isinstance(condition_items["regex"], bool), \
+                    "The value of 'regex' in the mark conditions yaml should be bool type."
+                if condition_items["regex"] is True:
+                    self._regexes.append((index, re.compile(condition_entry)))
+            else:
+                if "use_longest" in condition_items.keys():
+                    assert isinstance(condition_items["use_longest"], bool), \
+                        "The value of 'use_longest' in the mark conditions yaml should be bool type."
+                    use_longest = condition_items["use_longest"]
+                node = self._trie
+                for char in condition_entry:
+                    node = node.setdefault(char, {})
+                node.setdefault(None, []).append(index)
+            self._use_longest.append(use_longest)
+
+    def match(self, nodeid):
+        """Find the conditions matching the test case name.
+
+        An entry with 'use_longest: True' drops all the matches of the entries before it.
+
+        Args:
+            nodeid (str): Full test case name
+
+        Returns:
+            list: Matching conditions in the order of the conditions list.
+        """
+        node = self._trie
+        indexes = list(node.get(None, []))
+        for char in nodeid:
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                indexes.extend(node[None])
+        indexes.extend(index for index, regex in self._regexes if regex.search(nodeid))
+
+        all_matches = []
+        for index in sorted(indexes):
+            if self._use_longest[index]:
+                all_matches = []
+            all_matches.append(self.conditions[index])
+        return all_matches
+
+
+class ConditionEvaluator(object):
+    """Evaluate condition strings against a snapshot of basic facts.
+
+    Basic facts don't change during collection, so the result of each condition string is memoized.
+    """
+
+    def __init__(self, basic_facts, session):
+        self.basic_facts = basic_facts
+        self.session = session
+        self._globals = {k: v for k, v in basic_facts.items()}
+        for var in ["asic_type"]:
+            if var not in self._globals:
+                self._globals[var] = None
+        self._results = {}
+
+    def evaluate(self, condition):
+        result = self._results.get(condition)
+        if result is None:
+            condition_str = update_issue_status(condition, self.session)
+            try:
+                result = bool(eval(_compile_condition(condition_str), self._globals))
+            except Exception:
+                raise RuntimeError('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
+                    condition,
+                    condition_str))
+            self._results[condition] = result
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_condition(condition_str):
+    return compile(condition_str, '<condition>', 'eval')
+
+
+_condition_matcher = None
+_condition_evaluator = None
+
+
+def get_condition_matcher(conditions):
+    """Get the matcher of the conditions list, the matcher is only rebuilt when a different list is passed in."""
+    global _condition_matcher
+    if _condition_matcher is None or _condition_matcher.conditions is not conditions:
+        _condition_matcher = ConditionMatcher(conditions)
+    return _condition_matcher
+
+
+def get_condition_evaluator(basic_facts, session):
+    """Get the evaluator of the basic facts, the evaluator is only rebuilt when different facts are passed in."""
+    global _condition_evaluator
+    if _condition_evaluator is None or _condition_evaluator.basic_facts is not basic_facts or \
+            _condition_evaluator.session is not session:
+        _condition_evaluator = ConditionEvaluator(basic_facts, session)
+    return _condition_evaluator
+
+
 def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts):
     """Find all matches of the given test case name in the conditions list.
 
@@ -433,35 +585,11 @@ def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, ba
     Returns:
         list: All match test case name or None if not found
     """
-    all_matches = []
     max_length = -1
     conditional_marks = {}
     matches = []
 
-    for condition in conditions:
-        # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
-        condition_entry = list(condition.keys())[0]
-        condition_items = condition[condition_entry]
-        if "regex" in condition_items.keys():
-            assert isinstance(condition_items["regex"], bool), \
-                "The value of 'regex' in the mark conditions yaml should be bool type."
-            if condition_items["regex"] is True:
-                match = re.search(condition_entry, nodeid)
-            else:
-                match = None
-
-        elif "use_longest" in condition_items.keys():
-            assert isinstance(condition_items["use_longest"], bool), \
-                "The value of 'use_longest' in the mark conditions yaml should be bool type."
-            if nodeid.startswith(condition_entry) and condition_items["use_longest"] is True:
-                all_matches = []
-
-            match = nodeid.startswith(condition_entry)
-        else:
-            match = nodeid.startswith(condition_entry)
-
-        if match:
-            all_matches.append(condition)
+    all_matches = get_condition_matcher(conditions).match(nodeid)
 
     for match in all_matches:
         case_starting_substring = list(match.keys())[0]
@@ -561,25 +689,10 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
     if condition is None or condition.strip() == '':
         return True    # Empty condition item will be evaluated as True. Equivalent to be ignored.
 
-    condition_str = update_issue_status(condition, session)
-    try:
-        safe_facts = {k: v for k, v in basic_facts.items()}
-        safe_globals = {}
-        safe_globals.update(safe_facts)
-
-        for var in ["asic_type"]:
-            if var not in safe_globals:
-                safe_globals[var] = None
-
-        condition_result = bool(eval(condition_str, safe_globals))
-
-        if condition_result and dynamic_update_skip_reason:
-            mark_details['reason'].append(condition)
-        return condition_result
-    except Exception:
-        raise RuntimeError('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
-            condition,
-            condition_str))
+    condition_result = get_condition_evaluator(basic_facts, session).evaluate(condition)
+    if condition_result and dynamic_update_skip_reason:
+        mark_details['reason'].append(condition)
+    return condition_result
 
 
 def evaluate_conditions(dynamic_update_skip_reason, mark_details, conditions, basic_facts,
@@ -669,7 +782,7 @@ def pytest_collection_modifyitems(session, config, items):
         all_matches = find_all_matches(item.nodeid, conditions, session, dynamic_update_skip_reason, basic_facts)
 
         if all_matches:
-            logger.debug('Found match "{}" for test case "{}"'.format(all_matches, item.nodeid))
+            logger.debug('Found match "%s" for test case "%s"', all_matches, item.nodeid)
 
             for match in all_matches:
                 # match is a dict which has only one item, so we use match.values()[0] to get its value.
@@ -709,5 +822,5 @@ def pytest_collection_modifyitems(session, config, items):
                         else:
                             mark = getattr(pytest.mark, mark_name)(reason=reason)
 
-                        logger.debug('Adding mark {} to {}'.format(mark, item.nodeid))
+                        logger.debug('Adding mark %s to %s', mark, item.nodeid)
                         item.add_marker(mark)
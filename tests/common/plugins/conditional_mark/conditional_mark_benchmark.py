@@ -0,0 +1,254 @@
+"""Benchmark of the conditional_mark plugin at collection time.
+
+Build the test case names of the full tests tree and compare the time spent by the conditional_mark plugin in
+loading the mark conditions files and in finding the marks of every test case, between the legacy implementation
+(yaml.safe_load of every file, every entry checked with startswith/re.search and every condition string evaluated
+by eval for every test case) and the indexed matcher with memoized conditions. The marks found by both are compared.
+
+Test case names are extracted statically (test functions and methods of test classes, without parametrization),
+so the benchmark does not need the dependencies of the test modules.
+
+Usage:
+    python tests/common/plugins/conditional_mark/conditional_mark_benchmark.py --rounds 3
+"""
+import argparse
+import ast
+import glob
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../..")
+sys.path.insert(0, os.path.join(TESTS_DIR, ".."))
+
+from tests.common.cache import facts_cache     # noqa: E402
+import tests.common.plugins.conditional_mark as conditional_mark     # noqa: E402
+
+CONDITIONS_FILES = os.path.join(TESTS_DIR, conditional_mark.DEFAULT_CONDITIONS_FILE)
+
+# Basic facts of a virtual switch testbed, facts referenced by the conditions but not listed here are None.
+BASIC_FACTS = {
+    "asic_type": "vs",
+    "asic_gen": "unknown",
+    "topo_type": "t0",
+    "topo_name": "t0",
+    "testbed": "vms-kvm-t0",
+    "platform": "x86_64-kvm_x86_64-r0",
+    "hwsku": "Force10-S6000",
+    "release": "master",
+    "build_version": "master.0-dirty-20261017.000000",
+    "is_multi_asic": False,
+    "num_asic": 1,
+    "is_supervisor": False,
+    "is_smartswitch": False,
+    "macsec_en": False,
+    "switch_type": "",
+    "type": "",
+}
+
+
+class FakeCache(object):
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+
+class FakeSession(object):
+    class config(object):
+        cache = FakeCache()
+
+        class option(object):
+            mark_conditions_files = []
+
+
+def collect_nodeids(tests_dir):
+    """Test case names of the tests tree, relative to the tests folder like the pytest nodeids."""
+    nodeids = []
+    for path in sorted(glob.glob(os.path.join(tests_dir, "**", "test_*.py"), recursive=True)):
+        relpath = os.path.relpath(path, tests_dir)
+        try:
+            with open(path) as f:
+                tree = ast.parse(f.read())
+        except (SyntaxError, UnicodeDecodeError):
+            continue
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+                nodeids.append("{}::{}".format(relpath, node.name))
+            elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+                for method in node.body:
+                    if isinstance(method, (ast.FunctionDef, ast.AsyncFunctionDef)) and \
+                            method.name.startswith("test"):
+                        nodeids.append("{}::{}::{}".format(relpath, node.name, method.name))
+    return nodeids
+
+
+def condition_strings(conditions):
+    for condition in conditions:
+        for mark_details in list(condition.values())[0].values():
+            if not isinstance(mark_details, dict):
+                continue
+            mark_conditions = mark_details.get("conditions")
+            for condition_str in mark_conditions if isinstance(mark_conditions, list) else [mark_conditions]:
+                if condition_str:
+                    yield condition_str
+
+
+def basic_facts(conditions):
+    facts = dict(BASIC_FACTS, constants=conditional_mark.MARK_CONDITIONS_CONSTANTS)
+    for condition_str in condition_strings(conditions):
+        try:
+            tree = ast.parse(re.sub("https?://[^ )]+", "True", condition_str).strip(), mode="eval")
+        except SyntaxError:
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and node.id not in facts and node.id not in dir(__builtins__):
+                facts[node.id] = None
+    return facts
+
+
+def legacy_load_conditions(conditions_files):
+    conditions_list = []
+    for conditions_file in conditions_files:
+        with open(conditions_file) as f:
+            for key, value in list(yaml.safe_load(f).items()):
+                conditions_list.append({key: value})
+    return conditions_list
+
+
+def legacy_evaluate_condition(condition, basic_facts, session):
+    if condition is None or condition.strip() == '':
+        return True
+    condition_str = conditional_mark.update_issue_status(condition, session)
+    try:
+        safe_globals = {k: v for k, v in basic_facts.items()}
+        for var in ["asic_type"]:
+            if var not in safe_globals:
+                safe_globals[var] = None
+        return bool(eval(condition_str, safe_globals))
+    except Exception:
+        raise RuntimeError('Failed to evaluate condition {}'.format(condition))
+
+
+def legacy_evaluate_conditions(conditions, basic_facts, conditions_logical_operator, session):
+    if isinstance(conditions, list):
+        results = [legacy_evaluate_condition(c, basic_facts, session) for c in conditions]
+        return any(results) if conditions_logical_operator == 'OR' else all(results)
+    return legacy_evaluate_condition(conditions, basic_facts, session)
+
+
+def legacy_find_all_matches(nodeid, conditions, session, basic_facts):
+    """find_all_matches before the indexed matcher, dynamic_update_skip_reason omitted."""
+    all_matches = []
+    max_length = -1
+    conditional_marks = {}
+    matches = []
+    for condition in conditions:
+        condition_entry = list(condition.keys())[0]
+        condition_items = condition[condition_entry]
+        if "regex" in condition_items.keys():
+            match = re.search(condition_entry, nodeid) if condition_items["regex"] is True else None
+        elif "use_longest" in condition_items.keys():
+            if nodeid.startswith(condition_entry) and condition_items["use_longest"] is True:
+                all_matches = []
+            match = nodeid.startswith(condition_entry)
+        else:
+            match = nodeid.startswith(condition_entry)
+        if match:
+            all_matches.append(condition)
+
+    for match in all_matches:
+        case_starting_substring = list(match.keys())[0]
+        length = len(case_starting_substring)
+        for mark in match[case_starting_substring].keys():
+            if mark in ["regex", "use_longest"]:
+                continue
+            mark_details = match[case_starting_substring][mark]
+            if legacy_evaluate_conditions(mark_details.get('conditions'), basic_facts,
+                                          mark_details.get('conditions_logical_operator', 'AND').upper(), session):
+                if mark not in conditional_marks or length >= max_length:
+                    conditional_marks[mark] = {case_starting_substring: {mark: mark_details}}
+                    max_length = length
+
+    for condition in list(conditional_marks.values()):
+        if condition not in matches:
+            matches.append(condition)
+    return matches
+
+
+def find_marks(find, nodeids):
+    marks = {}
+    errors = 0
+    for nodeid in nodeids:
+        try:
+            marks[nodeid] = find(nodeid)
+        except RuntimeError:
+            errors += 1
+    return marks, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark conditional_mark plugin at collection time")
+    parser.add_argument("--rounds", type=int, default=3, help="Number of measurements, the best one is reported")
+    args = parser.parse_args()
+
+    nodeids = collect_nodeids(TESTS_DIR)
+    conditions_files = sorted(glob.glob(CONDITIONS_FILES))
+    session = FakeSession()
+    session.config.option.mark_conditions_files = conditions_files
+    conditions = legacy_load_conditions(conditions_files)
+    # Consider all the issues as active, the issue status is never queried in the benchmark
+    session.config.cache.set('ISSUE_STATUS', dict(
+        (url, True) for condition_str in condition_strings(conditions)
+        for url in re.findall('https?://[^ )]+', condition_str)))
+    facts = basic_facts(conditions)
+    print("{} test cases, {} conditions entries in {} files".format(
+        len(nodeids), len(conditions), len(conditions_files)))
+
+    cache_location = tempfile.mkdtemp(prefix="conditional_mark_benchmark_")
+    # Keep the benchmark away from the cache of the test runs
+    facts_cache.Singleton._instances.pop(facts_cache.FactsCache, None)
+    cache = facts_cache.FactsCache(cache_location)
+    try:
+        measurements = [
+            ("load legacy", lambda: legacy_load_conditions(conditions_files)),
+            ("load cold", lambda: (cache.cleanup(), conditional_mark.load_conditions(session))),
+            # Only the on-disk cache is warm, like in a new pytest session
+            ("load warm", lambda: (cache._cache.clear(), conditional_mark.load_conditions(session))),
+            ("match legacy", lambda: find_marks(lambda nodeid: legacy_find_all_matches(
+                nodeid, conditions, session, facts), nodeids)),
+            ("match indexed", lambda: find_marks(lambda nodeid: conditional_mark.find_all_matches(
+                nodeid, conditions, session, False, facts), nodeids)),
+        ]
+        results = {}
+        print("{:>14} {:>10}".format("phase", "time(s)"))
+        for name, func in measurements:
+            best = None
+            for _ in range(args.rounds):
+                # Start every round of the indexed matcher from scratch
+                conditional_mark._condition_matcher = conditional_mark._condition_evaluator = None
+                start = time.time()
+                results[name] = func()
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print("{:>14} {:>10.3f}".format(name, best))
+    finally:
+        shutil.rmtree(cache_location, ignore_errors=True)
+
+    assert results["match legacy"] == results["match indexed"], "Marks found by legacy and indexed matcher differ"
+    marked = sum(1 for marks in results["match indexed"][0].values() if marks)
+    print("{} test cases marked, {} failed to evaluate conditions, same results".format(
+        marked, results["match indexed"][1]))
+
+
+if __name__ == "__main__":
+    main()
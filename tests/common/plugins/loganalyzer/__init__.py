@@ -1,7 +1,9 @@
 import logging
+import time
+
 import pytest
 
-from .loganalyzer import LogAnalyzer, DisableLogrotateCronContext
+from .loganalyzer import LogAnalyzer, DisableLogrotateCronContext, loganalyzer_overhead
 from tests.common.errors import RunAnsibleModuleFail
 from tests.common.helpers.parallel import parallel_run, reset_ansible_local_tmp
 from .bug_handler_helper import get_bughandler_instance
@@ -23,6 +25,14 @@ def pytest_addoption(parser):
     parser.addoption("--force_load_err_list", action="store_true", default=False,
                      help="Load the user defined err msgs which is not included in the common ignore file,"
                           "even when disable_loganalyzer is true")
+    parser.addoption("--loganalyzer_agent", action="store_true", default=False,
+                     help="place markers, extract and analyze logs on the DUT by a loganalyzer agent deployed once "
+                          "per session, one round trip per DUT before and after each test")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    for line in loganalyzer_overhead.report():
+        logging.info(line)
 
 
 @reset_ansible_local_tmp
@@ -79,6 +89,7 @@ def loganalyzer(duthosts, request, log_rotate_modular_chassis):
         return
 
     # Analyze all the duts
+    setup_start = time.time()
     fail_test = not (request.config.getoption("--ignore_la_failure"))
     store_la_logs = request.config.getoption("--store_la_logs")
     analyzers = {}
@@ -94,6 +105,7 @@ def loganalyzer(duthosts, request, log_rotate_modular_chassis):
         analyzer.load_common_config()
         analyzers[duthost.hostname] = analyzer
     markers = parallel_run(analyzer_add_marker, [analyzers], {}, duthosts, timeout=120)
+    loganalyzer_overhead.record(request.node.nodeid, "setup", time.time() - setup_start)
 
     yield analyzers
 
@@ -102,13 +114,21 @@ def loganalyzer(duthosts, request, log_rotate_modular_chassis):
             "rep_setup" in request.node.__dict__ and request.node.rep_setup.skipped:
         return
     logging.info("Starting to analyse on all DUTs")
-    la_results = parallel_run(
-        analyze_logs,
-        [analyzers, markers],
-        {'fail_test': fail_test, 'store_la_logs': store_la_logs},
-        duthosts,
-        timeout=240
-    )
+    teardown_start = time.time()
+    try:
+        la_results = parallel_run(
+            analyze_logs,
+            [analyzers, markers],
+            {'fail_test': fail_test, 'store_la_logs': store_la_logs},
+            duthosts,
+            timeout=240
+        )
+    finally:
+        teardown_time = time.time() - teardown_start
+        loganalyzer_overhead.record(request.node.nodeid, "teardown", teardown_time)
+        stat = loganalyzer_overhead.stats[request.node.nodeid]
+        request.node.user_properties.append(("loganalyzer_overhead", round(stat["setup"] + stat["teardown"], 3)))
+        logging.info("Loganalyzer overhead: setup {:.2f}s, teardown {:.2f}s".format(stat["setup"], teardown_time))
     consolidated_bughandler = get_bughandler_instance({"type": "consolidated"})
     consolidated_bughandler.bug_handler_wrapper(analyzers, duthosts, la_results)
 
@@ -1,7 +1,10 @@
+import collections
+import hashlib
 import json
 import logging
 import os
 import re
+import threading
 import time
 import pprint
 import shutil
@@ -17,6 +20,17 @@ COMMON_MATCH = join(split(__file__)[0], "loganalyzer_common_match.txt")
 COMMON_IGNORE = join(split(__file__)[0], "loganalyzer_common_ignore.txt")
 COMMON_EXPECT = join(split(__file__)[0], "loganalyzer_common_expect.txt")
 SYSLOG_TMP_FOLDER = "/tmp/syslog"
+ANSIBLE_LOGANALYZER_AGENT = join(split(os.path.realpath(ANSIBLE_LOGANALYZER_MODULE))[0], "loganalyzer_agent.py")
+# Exit code of the agent command when the agent is not deployed on the DUT, e.g. after a reboot cleared /tmp
+AGENT_NOT_DEPLOYED_RC = 100
+
+
+def _agent_content_hash():
+    md5 = hashlib.md5()
+    for path in (ANSIBLE_LOGANALYZER_MODULE, ANSIBLE_LOGANALYZER_AGENT):
+        with open(path, "rb") as f:
+            md5.update(f.read())
+    return md5.hexdigest()[:12]
 
 
 class DisableLogrotateCronContext:
@@ -73,6 +87,108 @@ class LogAnalyzerError(Exception):
         return pprint.pformat("Log Analyzer Error- Matches found, please check errors in log")
 
 
+class LogAnalyzerAgentError(Exception):
+    """Raised when a request sent to the loganalyzer agent on the DUT failed."""
+    pass
+
+
+class LogAnalyzerAgent:
+    """
+    Client of the loganalyzer agent running on the DUT.
+
+    The agent (loganalyzer_agent.py next to the legacy loganalyzer.py) is copied to the DUT into a directory keyed by
+    the content hash of the agent and of loganalyzer.py, so it is deployed once per session and redeployed only when
+    missing on the DUT or when the sources changed. A batch of requests costs one ansible 'shell' call.
+    """
+    _content_hash = None
+
+    def __init__(self, ansible_host, dut_run_dir="/tmp"):
+        self.ansible_host = ansible_host
+        if LogAnalyzerAgent._content_hash is None:
+            LogAnalyzerAgent._content_hash = _agent_content_hash()
+        self.agent_dir = os.path.join(dut_run_dir, "loganalyzer_agent_{}".format(LogAnalyzerAgent._content_hash))
+        self.agent_path = os.path.join(self.agent_dir, "loganalyzer_agent.py")
+
+    def deploy(self):
+        """
+        Copy the agent and the legacy loganalyzer module it imports to the DUT.
+        """
+        logging.debug("Deploying loganalyzer agent to {}:{}".format(self.ansible_host.hostname, self.agent_dir))
+        self.ansible_host.file(path=self.agent_dir, state="directory")
+        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.agent_dir, "loganalyzer.py"))
+        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_AGENT, dest=self.agent_path)
+
+    def _execute(self, payload):
+        cmd = "test -f {agent} || exit {rc}; python {agent}".format(agent=self.agent_path, rc=AGENT_NOT_DEPLOYED_RC)
+        return self.ansible_host.shell(cmd, stdin=payload, module_ignore_errors=True)
+
+    def run(self, requests):
+        """
+        Execute a batch of requests on the DUT.
+
+        @param requests: List of agent requests, see loganalyzer_agent.py for the format.
+        @return: List of the results of the requests.
+        @raise LogAnalyzerAgentError: When any of the requests failed.
+        """
+        payload = json.dumps(requests)
+        res = self._execute(payload)
+        if res["rc"] == AGENT_NOT_DEPLOYED_RC:
+            self.deploy()
+            res = self._execute(payload)
+        try:
+            responses = json.loads(res["stdout"])
+        except ValueError:
+            raise LogAnalyzerAgentError("Unexpected output of loganalyzer agent on {}, rc {}:\n{}\n{}".format(
+                self.ansible_host.hostname, res["rc"], res["stdout"], res["stderr"]))
+        for response in responses:
+            logging.debug("Loganalyzer agent {} '{}' {:.3f}s{}".format(
+                self.ansible_host.hostname, response["action"], response["elapsed"],
+                " (skipped)" if response["skipped"] else ""))
+        failures = [response for response in responses if response["failed"]]
+        if failures:
+            raise LogAnalyzerAgentError("Loganalyzer agent request '{}' failed on {}:\n{}".format(
+                failures[0]["action"], self.ansible_host.hostname, failures[0]["msg"]))
+        return [response["result"] for response in responses]
+
+
+class LogAnalyzerOverhead(object):
+    """
+    Wall time spent by the loganalyzer fixture before and after every test.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = collections.OrderedDict()
+
+    def record(self, nodeid, phase, elapsed):
+        with self._lock:
+            self.stats.setdefault(nodeid, {"setup": 0.0, "teardown": 0.0})[phase] += elapsed
+
+    def report(self, top=10):
+        """
+        Return lines of report: overall overhead and the tests with the most expensive loganalyzer overhead.
+        """
+        with self._lock:
+            stats = list(self.stats.items())
+        if not stats:
+            return []
+        totals = [stat["setup"] + stat["teardown"] for _, stat in stats]
+        lines = ["loganalyzer overhead: {} tests, total {:.1f}s, mean {:.2f}s, max {:.2f}s".format(
+            len(stats), sum(totals), sum(totals) / len(totals), max(totals))]
+        lines.append("{:>10} {:>12} {}".format("setup(s)", "teardown(s)", "test"))
+        for nodeid, stat in sorted(stats, key=lambda item: item[1]["setup"] + item[1]["teardown"],
+                                   reverse=True)[:top]:
+            lines.append("{:>10.2f} {:>12.2f} {}".format(stat["setup"], stat["teardown"], nodeid))
+        return lines
+
+
+loganalyzer_overhead = LogAnalyzerOverhead()
+
+
 class LogAnalyzer:
     def __init__(self, ansible_host, marker_prefix, request=None, dut_run_dir="/tmp", start_marker=None,
                  additional_files={},
@@ -97,10 +213,13 @@ class LogAnalyzer:
         self.additional_files = list(additional_files.keys())
         self.additional_start_str = list(additional_files.values())
         self.request = request
+        self.agent = None
         if self.request is not None and getattr(self.request, "config", None) is not None:
             # override the fail and store_la_logs if they are set in the request config options
             self.fail = not (self.request.config.getoption("--ignore_la_failure"))
             self.store_la_logs = self.request.config.getoption("--store_la_logs")
+            if self.request.config.getoption("--loganalyzer_agent", default=False):
+                self.agent = LogAnalyzerAgent(ansible_host, dut_run_dir=self.dut_run_dir)
 
         self._la_logs_dir = "/tmp/loganalyzer/{}".format(self.ansible_host.hostname)
         self.bughandler = bughandler
@@ -111,6 +230,11 @@ class LogAnalyzer:
 
         @return: True for successful execution False otherwise
         """
+        if self.agent:
+            logging.debug("Adding end marker '{}'".format(marker))
+            self.agent.run([self._agent_marker_request("end", marker)])
+            return
+
         self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
 
         cmd = "python {run_dir}/loganalyzer.py --action add_end_marker --run_id {marker}"\
@@ -279,7 +403,9 @@ class LogAnalyzer:
         """
         logging.debug("Loganalyzer init")
 
-        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
+        if not self.agent:
+            self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE,
+                                   dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
 
         log_files = []
         for idx, path in enumerate(self.additional_files):
@@ -292,11 +418,17 @@ class LogAnalyzer:
         """
         Adds the start ignore marker to the log files
         """
+        add_start_ignore_mark = ".".join((self.marker_prefix, time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())))
+        if self.agent:
+            logging.debug("Adding start ignore marker '{}'".format(add_start_ignore_mark))
+            self.agent.run([self._agent_marker_request("start_ignore", add_start_ignore_mark, log_files)])
+            self._markers.append(add_start_ignore_mark)
+            return
+
         # We copy 'loganalyzer.py' to /tmp dir during loganalyzer initialization,
         # but the file could be auto removed by rebooting device,
         # always copy script to make sure the marker can be added successfully.
         self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
-        add_start_ignore_mark = ".".join((self.marker_prefix, time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())))
         cmd = "python {run_dir}/loganalyzer.py --action add_start_ignore_mark --run_id {add_start_ignore_mark}"\
             .format(run_dir=self.dut_run_dir, add_start_ignore_mark=add_start_ignore_mark)
         if log_files:
@@ -310,11 +442,16 @@ class LogAnalyzer:
         """
         Adds the end ignore marker to the log files
         """
+        marker = self._markers.pop()
+        if self.agent:
+            logging.debug("Adding end ignore marker '{}'".format(marker))
+            self.agent.run([self._agent_marker_request("end_ignore", marker, log_files)])
+            return
+
         # We copy 'loganalyzer.py' to /tmp dir during loganalyzer initialization,
         # but the file could be auto removed by rebooting device,
         # always copy script to make sure the marker can be added successfully.
         self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
-        marker = self._markers.pop()
         cmd = "python {run_dir}/loganalyzer.py --action add_end_ignore_mark --run_id {marker}"\
             .format(run_dir=self.dut_run_dir, marker=marker)
         if log_files:
@@ -328,6 +465,11 @@ class LogAnalyzer:
         Adds the marker to the log files
         """
         start_marker = ".".join((self.marker_prefix, time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())))
+        if self.agent:
+            logging.debug("Adding start marker '{}'".format(start_marker))
+            self.agent.run([self._agent_marker_request("start", start_marker, log_files)])
+            return start_marker
+
         cmd = "python {run_dir}/loganalyzer.py --action init --run_id {start_marker}"\
             .format(run_dir=self.dut_run_dir, start_marker=start_marker)
         if log_files:
@@ -359,8 +501,6 @@ class LogAnalyzer:
                             "expect_messages": {},
                             "unused_expected_regexp": []
                             }
-        timestamp = time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())
-        tmp_folder = ".".join((SYSLOG_TMP_FOLDER, self.ansible_host.hostname, timestamp))
         marker = marker.replace(' ', '_')
         self.ansible_loganalyzer.run_id = marker
 
@@ -369,6 +509,59 @@ class LogAnalyzer:
         else:
             start_string = self.start_marker
 
+        if self.agent:
+            analyzer_parse_result = self._analyze_on_dut(marker, start_string, maximum_log_length)
+        else:
+            analyzer_parse_result = self._fetch_and_analyze(marker, start_string, maximum_log_length)
+
+        expected_lines_total = []
+        unused_regex_messages = []
+
+        for key, value in list(analyzer_parse_result.items()):
+            matching_lines, expecting_lines = value
+            analyzer_summary["total"]["match"] += len(matching_lines)
+            analyzer_summary["total"]["expected_match"] += len(expecting_lines)
+            analyzer_summary["match_files"][key] = {"match": len(matching_lines),
+                                                    "expected_match": len(expecting_lines)}
+            analyzer_summary["match_messages"][key] = matching_lines
+            analyzer_summary["expect_messages"][key] = expecting_lines
+            expected_lines_total.extend(expecting_lines)
+
+        # Find unused regex matches
+        for regex in self.expect_regex:
+            for line in expected_lines_total:
+                if re.search(regex, line):
+                    break
+            else:
+                unused_regex_messages.append(regex)
+        analyzer_summary["total"]["expected_missing_match"] = len(unused_regex_messages)
+        analyzer_summary["unused_expected_regexp"] = unused_regex_messages
+        logging.debug("Analyzer summary: {}".format(pprint.pformat(analyzer_summary)))
+        try:
+            shutil.rmtree(self._la_logs_dir)
+        except FileNotFoundError:
+            pass
+        if analyzer_summary["total"]["match"] != 0 and store_la_logs:
+            self.save_matching_errors(analyzer_summary["match_messages"].values())
+        if fail:
+            self._verify_log(analyzer_summary)
+        hostname = self.ansible_host.hostname
+        if isinstance(self.bughandler, BugHandler):
+            self.bughandler.bug_handler_wrapper(analyzers={hostname: self},
+                                                la_results={hostname: analyzer_summary},
+                                                duthosts=[self.ansible_host])
+        else:
+            logging.warning("Skip bug handler execution because it is not a valid BugHandler")
+        return analyzer_summary
+
+    def _fetch_and_analyze(self, marker, start_string, maximum_log_length):
+        """
+        @summary: Extract the logs on the DUT, download them and analyze them locally.
+
+        @return: Map <file_name, [match_lines, expect_lines]>
+        """
+        timestamp = time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())
+        tmp_folder = ".".join((SYSLOG_TMP_FOLDER, self.ansible_host.hostname, timestamp))
         with DisableLogrotateCronContext(self.ansible_host):
             # Add end marker into DUT syslog
             self._add_end_marker(marker)
@@ -414,45 +607,40 @@ class LogAnalyzer:
                 logging.debug("{} file content:\n\n{}".format(folder, fo.read()))
             os.remove(folder)
 
-        expected_lines_total = []
-        unused_regex_messages = []
+        return analyzer_parse_result
 
-        for key, value in list(analyzer_parse_result.items()):
-            matching_lines, expecting_lines = value
-            analyzer_summary["total"]["match"] += len(matching_lines)
-            analyzer_summary["total"]["expected_match"] += len(expecting_lines)
-            analyzer_summary["match_files"][key] = {"match": len(matching_lines),
-                                                    "expected_match": len(expecting_lines)}
-            analyzer_summary["match_messages"][key] = matching_lines
-            analyzer_summary["expect_messages"][key] = expecting_lines
-            expected_lines_total.extend(expecting_lines)
+    def _agent_marker_request(self, kind, marker, log_files=None):
+        return {"action": "add_marker", "kind": kind, "run_id": marker, "logs": log_files or []}
 
-        # Find unused regex matches
-        for regex in self.expect_regex:
-            for line in expected_lines_total:
-                if re.search(regex, line):
-                    break
+    def _analyze_on_dut(self, marker, start_string, maximum_log_length):
+        """
+        @summary: Place the end marker, extract and analyze the logs on the DUT by one request batch to the
+                  loganalyzer agent. Only the matching and expected lines are transferred back.
+
+        @return: Map <file_name, [match_lines, expect_lines]>
+        """
+        requests = [{"action": "disable_logrotate"},
+                    self._agent_marker_request("end", marker),
+                    {"action": "extract", "directory": "/var/log", "file_prefix": "syslog",
+                     "start_string": start_string, "target_filename": self.extracted_syslog}]
+        file_list = [self.extracted_syslog]
+        for idx, path in enumerate(self.additional_files):
+            file_dir, file_name = split(path)
+            extracted_file_name = os.path.join(self.dut_run_dir, file_name)
+            if self.additional_start_str and self.additional_start_str[idx] != '':
+                start_str = self.additional_start_str[idx]
             else:
-                unused_regex_messages.append(regex)
-        analyzer_summary["total"]["expected_missing_match"] = len(unused_regex_messages)
-        analyzer_summary["unused_expected_regexp"] = unused_regex_messages
-        logging.debug("Analyzer summary: {}".format(pprint.pformat(analyzer_summary)))
-        try:
-            shutil.rmtree(self._la_logs_dir)
-        except FileNotFoundError:
-            pass
-        if analyzer_summary["total"]["match"] != 0 and store_la_logs:
-            self.save_matching_errors(analyzer_summary["match_messages"].values())
-        if fail:
-            self._verify_log(analyzer_summary)
-        hostname = self.ansible_host.hostname
-        if isinstance(self.bughandler, BugHandler):
-            self.bughandler.bug_handler_wrapper(analyzers={hostname: self},
-                                                la_results={hostname: analyzer_summary},
-                                                duthosts=[self.ansible_host])
-        else:
-            logging.warning("Skip bug handler execution because it is not a valid BugHandler")
-        return analyzer_summary
+                start_str = start_string
+            requests.append({"action": "extract", "directory": file_dir, "file_prefix": file_name,
+                             "start_string": start_str, "target_filename": extracted_file_name})
+            file_list.append(extracted_file_name)
+        requests.append({"action": "restore_logrotate", "always": True})
+        requests.append({"action": "analyze", "run_id": marker, "start_marker": self.start_marker,
+                         "files": file_list, "match_regex": self.match_regex, "ignore_regex": self.ignore_regex,
+                         "expect_regex": self.expect_regex, "maximum_log_length": maximum_log_length})
+
+        logging.debug("Analyze files {} on {}".format(file_list, self.ansible_host.hostname))
+        return self.agent.run(requests)[-1]
 
     def save_extracted_log(self, dest):
         """
@@ -0,0 +1,118 @@
+"""Benchmark of AnsibleLogAnalyzer.analyze_file on synthetic syslog.
+
+Generate a synthetic syslog between start/end markers and compare wall time and peak RSS of the streaming
+analyze_file against the legacy approach, which loaded the whole file with readlines() and ran findall() of the
+match/ignore regex on every line. Every analyzer runs in its own child process, so peak RSS is measured separately.
+
+Usage:
+    python tests/common/plugins/loganalyzer/loganalyzer_benchmark.py --size_mb 1024
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import Pipe, Process
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from system_msg_handler import AnsibleLogAnalyzer     # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+RUN_ID = "loganalyzer_benchmark"
+
+SAMPLE_LINES = [
+    "Oct 17 10:00:00.000001 sonic INFO swss#orchagent: :- doTask: Processed port Ethernet{}",
+    "Oct 17 10:00:00.000002 sonic NOTICE syncd#syncd: :- threadFunction: time span 10 ms for 'get:PORT'",
+    "Oct 17 10:00:00.000003 sonic INFO kernel: [ 1234.5678] Ethernet{}: link up",
+    "Oct 17 10:00:00.000004 sonic ERR ntpd[{}]: routing socket reports: No buffer space available",
+    "Oct 17 10:00:00.000005 sonic INFO bgp#bgpd[{}]: %ADJCHANGE: neighbor 10.0.0.1 Up",
+]
+MATCHING_LINE = "Oct 17 10:00:00.000006 sonic ERR swss#orchagent: :- unexpected failure {}"
+
+
+def generate_log(path, size_mb):
+    random.seed(0)
+    target = size_mb * 1024 * 1024
+    with open(path, "w") as log_file:
+        log_file.write("Oct 17 09:59:59.000000 sonic INFO start-LogAnalyzer-{}\n".format(RUN_ID))
+        written = 0
+        while written < target:
+            chunk = []
+            for index in range(10000):
+                template = MATCHING_LINE if index == 0 else random.choice(SAMPLE_LINES)
+                chunk.append(template.format(index))
+            data = "\n".join(chunk) + "\n"
+            log_file.write(data)
+            written += len(data)
+        log_file.write("Oct 17 10:59:59.000000 sonic INFO end-LogAnalyzer-{}\n".format(RUN_ID))
+
+
+def load_regex(analyzer):
+    match_regex = analyzer.create_msg_regex([os.path.join(BASE_DIR, "loganalyzer_common_match.txt")])[0]
+    ignore_regex = analyzer.create_msg_regex([os.path.join(BASE_DIR, "loganalyzer_common_ignore.txt")])[0]
+    return match_regex, ignore_regex
+
+
+def legacy_analyze(analyzer, path):
+    """Per line work of analyze_file before streaming, error handling of markers omitted."""
+    match_regex, ignore_regex = load_regex(analyzer)
+    start_marker = analyzer.create_start_marker()
+    end_marker = analyzer.create_end_marker()
+    matching_lines = []
+    with open(path, "r") as log_file:
+        for rev_line in reversed(log_file.readlines()):
+            if end_marker in rev_line or analyzer.end_ignore_marker_prefix in rev_line or \
+                    analyzer.start_ignore_marker_prefix in rev_line:
+                continue
+            if rev_line.find(start_marker) != -1 and 'extract_log' not in rev_line:
+                break
+            if match_regex.findall(rev_line) and not ignore_regex.findall(rev_line):
+                matching_lines.append(rev_line)
+    return matching_lines
+
+
+def streaming_analyze(analyzer, path):
+    match_regex, ignore_regex = load_regex(analyzer)
+    return analyzer.analyze_file(path, match_regex, ignore_regex, None)[0]
+
+
+def _child(func, path, conn):
+    start = time.time()
+    matches = func(AnsibleLogAnalyzer(RUN_ID, False), path)
+    elapsed = time.time() - start
+    conn.send((len(matches), elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    conn.close()
+
+
+def run(func, path):
+    parent_conn, child_conn = Pipe(duplex=False)
+    child = Process(target=_child, args=(func, path, child_conn))
+    child.start()
+    result = parent_conn.recv()
+    child.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loganalyzer analyze_file")
+    parser.add_argument("--size_mb", type=int, default=1024, help="Size of the synthetic syslog in MB")
+    parser.add_argument("--log_file", default=None, help="Path of the synthetic syslog, generated if not existing")
+    args = parser.parse_args()
+
+    log_file = args.log_file or os.path.join(tempfile.gettempdir(), "loganalyzer_benchmark_{}mb.log".format(
+        args.size_mb))
+    if not os.path.exists(log_file):
+        print("Generating {} MB synthetic syslog {}".format(args.size_mb, log_file))
+        generate_log(log_file, args.size_mb)
+
+    print("{:>10} {:>10} {:>10} {:>14}".format("analyzer", "matches", "time(s)", "peak RSS(MB)"))
+    for name, func in [("legacy", legacy_analyze), ("streaming", streaming_analyze)]:
+        matches, elapsed, max_rss = run(func, log_file)
+        print("{:>10} {:>10} {:>10.2f} {:>14.1f}".format(name, matches, elapsed, max_rss / 1024.0))
+
+
+if __name__ == "__main__":
+    main()
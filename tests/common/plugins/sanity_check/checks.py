@@ -45,56 +45,40 @@ CHECK_ITEMS = [
 __all__ = CHECK_ITEMS
 
 
-def _find_down_phy_ports(dut, phy_interfaces):
-    down_phy_ports = []
-    include_inband_intfs = True if dut.sonichost.get_facts().get(
-        'switch_type', None) == 'voq' else False
-    intf_facts = dut.show_interface(command='status',
-                                    include_internal_intfs=(
-                                        '201811' not in dut.os_version),
-                                    include_inband_intfs=include_inband_intfs)[
-                                        'ansible_facts']['int_status']
-    for intf in phy_interfaces:
-        try:
-            if intf_facts[intf]['oper_state'] == 'down':
-                down_phy_ports.append(intf)
-        except KeyError:
-            down_phy_ports.append(intf)
-    return down_phy_ports
-
-
-def _find_down_ip_ports(dut, ip_interfaces, use_ipv6=False):
-    down_ip_ports = []
-    if use_ipv6:
-        ip_intf_facts = dut.show_ipv6_interface()['ansible_facts']['ipv6_interfaces']
-    else:
-        ip_intf_facts = dut.show_ip_interface()['ansible_facts']['ip_interfaces']
-
-    for intf in ip_interfaces:
-        try:
-            if ip_intf_facts[intf]['oper_state'] == 'down':
-                down_ip_ports.append(intf)
-        except KeyError:
-            down_ip_ports.append(intf)
-    return down_ip_ports
-
-
-def _find_down_ports(dut, phy_interfaces, ip_interfaces, use_ipv6=False):
+def _find_down_ports(dut, asic_interfaces, use_ipv6=False):
     """Finds the ports which are operationally down
 
+    The status of the L3 and physical interfaces of all the ASICs is got by a single batch of show commands.
+
     Args:
-        dut (object): The sonichost/sonicasic object
-        phy_interfaces (list): List of all phyiscal operation in 'admin_up'
-        ip_interfaces (list): List of the L3 interfaces
+        dut (object): The MultiAsicSonicHost object
+        asic_interfaces (list): List of (sonicasic object, list of all phyiscal interfaces in 'admin_up', list of the
+            L3 interfaces) of the ASICs
         use_ipv6 (bool): Whether to use IPv6 interface check instead of IPv4
 
     Returns:
         [list]: list of the down ports
     """
-    down_ports = []
-    down_ports = _find_down_ip_ports(dut, ip_interfaces, use_ipv6) + \
-        _find_down_phy_ports(dut, phy_interfaces)
+    include_inband_intfs = True if dut.sonichost.get_facts().get(
+        'switch_type', None) == 'voq' else False
+    include_internal_intfs = '201811' not in dut.os_version
+    show_cmds = []
+    for asic, _, _ in asic_interfaces:
+        ns_option = " -n {}".format(asic.namespace) if asic.namespace is not None else ""
+        show_cmds.append("show {} interfaces{}".format("ipv6" if use_ipv6 else "ip",
+                                                       ns_option + " -d all" if ns_option else ""))
+        display_option = " -d all" if (include_internal_intfs and ns_option) or include_inband_intfs else ""
+        show_cmds.append("show interface status{}{}".format(ns_option, display_option))
+    outputs = dut.show_and_parse_batch(show_cmds)
 
+    down_ports = []
+    for index, (_, phy_interfaces, ip_interfaces) in enumerate(asic_interfaces):
+        # Lines of the additional addresses of an L3 interface have no interface name
+        ip_intf_oper_state = dict((row["interface"], row.get("admin/oper", "").split("/")[-1])
+                                  for row in outputs[2 * index] if row.get("interface"))
+        intf_oper_state = dict((row["interface"], row.get("oper")) for row in outputs[2 * index + 1])
+        down_ports += [intf for intf in ip_interfaces if ip_intf_oper_state.get(intf, "down") == "down"]
+        down_ports += [intf for intf in phy_interfaces if intf_oper_state.get(intf, "down") == "down"]
     return down_ports
 
 
@@ -131,6 +115,7 @@ def check_interfaces(duthosts, tbinfo):
             else False
         )
 
+        asic_interfaces = []
         for asic in dut.asics:
             ip_interfaces = []
             cfg_facts = asic.config_facts(host=dut.hostname,
@@ -152,28 +137,29 @@ def check_interfaces(duthosts, tbinfo):
 
             logger.info(json.dumps(phy_interfaces, indent=4))
             logger.info(json.dumps(ip_interfaces, indent=4))
-            if use_ipv6:
-                logger.info("Using IPv6 interface checking for topology: %s" % tbinfo["topo"]["name"])
+            asic_interfaces.append((asic, phy_interfaces, ip_interfaces))
+
+        if use_ipv6:
+            logger.info("Using IPv6 interface checking for topology: %s" % tbinfo["topo"]["name"])
 
-            if timeout == 0:  # Check interfaces status, do not retry.
-                down_ports += _find_down_ports(asic, phy_interfaces, ip_interfaces, use_ipv6)
+        # The interfaces of all the ASICs are checked together, in one round trip to the DUT
+        if timeout == 0:  # Check interfaces status, do not retry.
+            down_ports = _find_down_ports(dut, asic_interfaces, use_ipv6)
+        else:  # Retry checking interface status
+            start = time.time()
+            elapsed = 0
+            while elapsed < timeout:
+                down_ports = _find_down_ports(dut, asic_interfaces, use_ipv6)
                 check_result["failed"] = True if len(down_ports) > 0 else False
                 check_result["down_ports"] = down_ports
-            else:  # Retry checking interface status
-                start = time.time()
-                elapsed = 0
-                while elapsed < timeout:
-                    down_ports = _find_down_ports(asic, phy_interfaces, ip_interfaces, use_ipv6)
-                    check_result["failed"] = True if len(down_ports) > 0 else False
-                    check_result["down_ports"] = down_ports
-
-                    if check_result["failed"]:
-                        wait(interval,
-                             msg="Found down ports, wait %d seconds to retry. Remaining time: %d, down_ports=%s" %
-                                 (interval, int(timeout - elapsed), str(check_result["down_ports"])))
-                        elapsed = time.time() - start
-                    else:
-                        break
+
+                if check_result["failed"]:
+                    wait(interval,
+                         msg="Found down ports, wait %d seconds to retry. Remaining time: %d, down_ports=%s" %
+                             (interval, int(timeout - elapsed), str(check_result["down_ports"])))
+                    elapsed = time.time() - start
+                else:
+                    break
 
         logger.info("Done checking interfaces status on %s" % dut.hostname)
         check_result["failed"] = True if len(down_ports) > 0 else False
@@ -4,10 +4,13 @@ Testbed file related utilities.
 
 import argparse
 import csv
+import hashlib
 import ipaddr as ipaddress
 import json
 import os
+import pickle
 import re
+import tempfile
 import yaml
 import logging
 
@@ -16,6 +19,98 @@ from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
+# libyaml loader if PyYAML is built with it, much faster than the pure python one
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Pickles of the loaded testbed and topology files
+YAML_CACHE_LOCATION = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../_cache/testbed_yaml")
+
+
+def load_yaml_file(filename):
+    """
+    Load a yaml file, from a pickle of it if the file is not modified since it was cached.
+
+    The cached pickle is keyed by the modification time and size of the file, so that pytest and every xdist worker
+    don't parse the testbed and topology files again.
+    """
+    file_stat = os.stat(filename)
+    key = (os.path.realpath(filename), file_stat.st_mtime_ns, file_stat.st_size)
+    cache_file = os.path.join(YAML_CACHE_LOCATION, hashlib.sha1(key[0].encode()).hexdigest() + ".pickle")
+    try:
+        with open(cache_file, "rb") as f:
+            cached_key, data = pickle.load(f)
+        if cached_key == key:
+            return data
+    except (IOError, OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        pass
+
+    with open(filename) as f:
+        data = yaml.load(f, Loader=SafeLoader)
+    try:
+        if not os.path.isdir(YAML_CACHE_LOCATION):
+            os.makedirs(YAML_CACHE_LOCATION)
+        # replace the pickle atomically, it may be read by other processes
+        fd, tmp_file = tempfile.mkstemp(dir=YAML_CACHE_LOCATION)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((key, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError) as e:
+        logger.debug("Failed to cache %s: %s", filename, repr(e))
+    return data
+
+
+class TestbedTopo(OrderedDict):
+    """
+    Testbeds of a testbed file by name.
+
+    A testbed is stored as read from the testbed file, and its topology is parsed when the testbed is first read
+    from the mapping: getting one testbed only parses this testbed, getting all of them (items(), values()) parses
+    them all.
+    """
+
+    def __init__(self, parse_testbed=None):
+        super(TestbedTopo, self).__init__()
+        self._parse_testbed = parse_testbed
+
+    def _parsed(self, tb):
+        # the topology of a testbed not parsed yet is still its name
+        if isinstance(tb["topo"], str):
+            self._parse_testbed(tb)
+        return tb
+
+    def _parse_all(self):
+        for tb in OrderedDict.values(self):
+            self._parsed(tb)
+
+    def __getitem__(self, tb_name):
+        return self._parsed(super(TestbedTopo, self).__getitem__(tb_name))
+
+    def get(self, tb_name, default=None):
+        if tb_name in self:
+            return self[tb_name]
+        return default
+
+    def items(self):
+        self._parse_all()
+        return super(TestbedTopo, self).items()
+
+    def values(self):
+        self._parse_all()
+        return super(TestbedTopo, self).values()
+
+    def pop(self, tb_name, *default):
+        if tb_name in self:
+            self._parsed(OrderedDict.__getitem__(self, tb_name))
+        return super(TestbedTopo, self).pop(tb_name, *default)
+
+    def copy(self):
+        self._parse_all()
+        return OrderedDict(self)
+
+    def __reduce__(self):
+        # pickle the testbeds as they are, without parsing them
+        return self.__class__, (self._parse_testbed,), None, None, iter(OrderedDict.items(self))
+
 
 class TestbedInfo(object):
     """Parse the testbed file used to describe whole testbed info."""
@@ -54,6 +149,8 @@ class TestbedInfo(object):
         self.testbed_topo = OrderedDict()
         # use to convert from netmask to cidr
         self._address_cache = {}
+        # topologies loaded by topology file, shared by the testbeds of the same topology
+        self._topologies = {}
         if self.testbed_filename.endswith(".yaml"):
             self._read_testbed_topo_from_yaml()
         if self.testbed_filename.endswith(".csv"):
@@ -61,7 +158,6 @@ class TestbedInfo(object):
             # create yaml testbed file
             self.dump_testbeds_to_yaml()
         self.parse_topo()
-        self._normalize_topo_names()
 
     def _cidr_to_ip_mask(self, network):
         addr = ipaddress.IPNetwork(network)
@@ -106,17 +202,16 @@ class TestbedInfo(object):
 
     def _read_testbed_topo_from_yaml(self):
         """Read yaml testbed info file."""
-        with open(self.testbed_filename) as f:
-            tb_info = yaml.safe_load(f)
+        tb_info = load_yaml_file(self.testbed_filename)
 
-            if tb_info is None or len(tb_info) == 0:
-                raise ValueError("Testbed file {} is empty".format(self.testbed_filename))
+        if tb_info is None or len(tb_info) == 0:
+            raise ValueError("Testbed file {} is empty".format(self.testbed_filename))
 
-            tb_type = "regular" if "conf-name" in tb_info[0] else "nut"
-            if tb_type == "nut":
-                self._read_nut_testbed_topo_from_yaml(tb_info)
-            else:
-                self._read_regular_testbed_topo_from_yaml(tb_info)
+        tb_type = "regular" if "conf-name" in tb_info[0] else "nut"
+        if tb_type == "nut":
+            self._read_nut_testbed_topo_from_yaml(tb_info)
+        else:
+            self._read_regular_testbed_topo_from_yaml(tb_info)
 
     def _read_regular_testbed_topo_from_yaml(self, tb_info):
         for tb in tb_info:
@@ -377,32 +472,46 @@ class TestbedInfo(object):
         return map
 
     def parse_topo(self):
-        for tb_name, tb in list(self.testbed_topo.items()):
-            topo = tb.pop("topo")
-            tb["topo"] = defaultdict()
-            tb["topo"]["name"] = topo
-            tb["topo"]["type"] = self.get_testbed_type(topo)
+        """Parse the topologies of the testbeds when they are read from testbed_topo."""
+        testbed_topo = TestbedTopo(self._parse_testbed_topo)
+        testbed_topo.update(OrderedDict.items(self.testbed_topo))
+        self.testbed_topo = testbed_topo
 
+    def _load_topology(self, topo):
+        """
+        Load the topology file of topology topo and the PTF maps derived from it, once for all the testbeds of the
+        topology.
+        """
+        if topo not in self._topologies:
+            topology = {}
             if topo.startswith("nut-"):
                 topo_dir = os.path.join(os.path.dirname(__file__), self.NUT_TOPOLOGY_FILEPATH)
                 topo_file = os.path.join(topo_dir, "{}.yml".format(topo))
-                with open(topo_file, 'r') as fh:
-                    tb['topo']['properties'] = yaml.safe_load(fh)
+                topology['properties'] = load_yaml_file(topo_file)
             else:
                 topo_dir = os.path.join(os.path.dirname(__file__), self.TOPOLOGY_FILEPATH)
                 topo_file = os.path.join(topo_dir, "topo_{}.yml".format(topo))
-                with open(topo_file, 'r') as fh:
-                    tb['topo']['properties'] = yaml.safe_load(fh)
-                tb['topo']['ptf_map'] = self.calculate_ptf_index_map(tb)
-                tb['topo']['ptf_map_disabled'] = self.calculate_ptf_index_map_disabled(tb)
-                tb['topo']['ptf_dut_intf_map'] = self.calculate_ptf_dut_intf_map(tb)
-
-    def _normalize_topo_names(self):
-        """Normalize topology names by removing the '-vpp' suffix if present."""
-        for tb_name, tb in list(self.testbed_topo.items()):
-            topo_name = tb["topo"]["name"]
-            if topo_name.endswith("-vpp"):
-                tb["topo"]["name"] = topo_name[:-4]  # Remove the last 4 characters ("-vpp")
+                topology['properties'] = load_yaml_file(topo_file)
+                tb = {'topo': topology}
+                topology['ptf_map'] = self.calculate_ptf_index_map(tb)
+                topology['ptf_map_disabled'] = self.calculate_ptf_index_map_disabled(tb)
+                topology['ptf_dut_intf_map'] = self.calculate_ptf_dut_intf_map(tb)
+            self._topologies[topo] = topology
+        return self._topologies[topo]
+
+    def _parse_testbed_topo(self, tb):
+        topo = tb.pop("topo")
+        tb["topo"] = defaultdict()
+        tb["topo"]["name"] = topo
+        tb["topo"]["type"] = self.get_testbed_type(topo)
+        tb["topo"].update(self._load_topology(topo))
+        self._normalize_topo_name(tb)
+
+    def _normalize_topo_name(self, tb):
+        """Normalize topology name by removing the '-vpp' suffix if present."""
+        topo_name = tb["topo"]["name"]
+        if topo_name.endswith("-vpp"):
+            tb["topo"]["name"] = topo_name[:-4]  # Remove the last 4 characters ("-vpp")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from tests.common import db_comparison
+from tests.common.db_comparison import DBType, SnapshotDiff, _JsonObjectReader
+
+# Snapshot a of a STATE DB, with volatile fields, PROCESS_STATS entries and keys of all the JSON value types
+SNAPSHOT_A = {
+    "PORT_TABLE|Ethernet0": {"expireat": 1760000000.123, "ttl": -0.001, "type": "hash",
+                             "value": {"state": "ok", "speed": "100000", "update_time": "1"}},
+    "PORT_TABLE|Ethernet4": {"expireat": 1760000000.456, "ttl": -0.001, "type": "hash",
+                             "value": {"state": "ok", "speed": "100000", "update_time": "1"}},
+    "NEIGH_STATE_TABLE|10.0.0.57": {"expireat": 1760000001.5, "ttl": -0.001, "type": "hash",
+                                    "value": {"state": "Established", "peerType": "e-BGP"}},
+    "STORAGE_INFO|sda": {"expireat": 1760000002.5, "ttl": -0.001, "type": "hash",
+                         "value": {"latest_fsio_writes": "12", "total_fsio_writes": "15", "device": "sda"}},
+    "PROCESS_STATS|1": {"expireat": 1760000003.5, "ttl": -0.001, "type": "hash",
+                        "value": {"CMD": "/usr/bin/bgpd", "CPU": "1.0", "MEM": "0.5", "PPID": "0"}},
+    "PROCESS_STATS|2": {"expireat": 1760000003.5, "ttl": -0.001, "type": "hash",
+                        "value": {"CMD": "/usr/bin/zebra", "CPU": "1.0", "MEM": "0.5", "PPID": "0"}},
+    "LIST|key": {"expireat": 1760000004.5, "ttl": 120, "type": "list", "value": ["a", "b", 1, 2.5e-3, None, True]},
+    "ONLY_A|\u00e9\"\\key": {"expireat": 1760000005.5, "ttl": -0.001, "type": "hash", "value": {"field": "a\nb"}},
+}
+
+# Snapshot b: Ethernet4 changed, NEIGH_STATE_TABLE and LIST only changed in volatile fields, ONLY_A removed, ONLY_B
+# added, bgpd restarted with another PID and zebra replaced by staticd
+SNAPSHOT_B = {
+    "PORT_TABLE|Ethernet0": {"expireat": 1760000100.123, "ttl": -0.001, "type": "hash",
+                             "value": {"state": "ok", "speed": "100000", "update_time": "2"}},
+    "PORT_TABLE|Ethernet4": {"expireat": 1760000100.456, "ttl": -0.001, "type": "hash",
+                             "value": {"state": "down", "speed": "40000", "update_time": "2"}},
+    "NEIGH_STATE_TABLE|10.0.0.57": {"expireat": 1760000101.5, "ttl": 60, "type": "hash",
+                                    "value": {"state": "Established", "peerType": "e-BGP"}},
+    "STORAGE_INFO|sda": {"expireat": 1760000102.5, "ttl": -0.001, "type": "hash",
+                         "value": {"latest_fsio_writes": "20", "total_fsio_writes": "35", "device": "sda"}},
+    "PROCESS_STATS|3": {"expireat": 1760000103.5, "ttl": -0.001, "type": "hash",
+                        "value": {"CMD": "/usr/bin/bgpd", "CPU": "2.0", "MEM": "0.6", "PPID": "0"}},
+    "PROCESS_STATS|4": {"expireat": 1760000103.5, "ttl": -0.001, "type": "hash",
+                        "value": {"CMD": "/usr/bin/staticd", "CPU": "1.0", "MEM": "0.5", "PPID": "0"}},
+    "LIST|key": {"expireat": 1760000104.5, "ttl": 120, "type": "list", "value": ["a", "b", 1, 2.5e-3, None, True]},
+    "ONLY_B|key": {"expireat": 1760000105.5, "ttl": -0.001, "type": "hash", "value": {"field": "\u2603"}},
+}
+
+
+def read_members(text, chunk_size):
+    return list(_JsonObjectReader(io.StringIO(text), chunk_size=chunk_size).members())
+
+
+class TestJsonObjectReader(unittest.TestCase):
+    """Test cases of the incremental reader of the members of a JSON object, with tokens cut by the chunks."""
+
+    def assert_members(self, text):
+        expected = list(json.loads(text).items())
+        # Every offset of the text ends a chunk for one of the chunk sizes
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                members = read_members(text, chunk_size)
+                self.assertEqual([(key, value) for key, value, _, _ in members], expected)
+                for key, value, start, end in members:
+                    self.assertEqual(json.loads(text[start:end]), value)
+
+    def test_strings(self):
+        self.assert_members('{"a": "Ethernet0", "b": "with \\"quotes\\" and \\\\", "c": "\\u00e9\\n\\t", "d": ""}')
+
+    def test_escaped_keys(self):
+        self.assert_members('{"PORT|\\"0\\"": 1, "\\u00e9\\\\": {"\\"": "x"}, "key\\nline": [], "\\\\": null}')
+
+    def test_numbers(self):
+        self.assert_members('{"a": 1234567, "b": -1.5e+10, "c": 0.125, "d":7,"e": 1E-3, "f": [1, 22, 333]}')
+
+    def test_literals_and_nested_values(self):
+        self.assert_members('{"a": true, "b": false, "c": null, "d": {"e": [{"f": {}}, []]}, "g": 1}')
+
+    def test_whitespace(self):
+        self.assert_members(' \n{ \n\t"a" :\r\n 1 ,\n  "b"\n:\n"c"  \n}\n ')
+
+    def test_empty_object(self):
+        for text in ('{}', ' { } ', '{\n}\n'):
+            for chunk_size in range(1, len(text) + 1):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    self.assertEqual(read_members(text, chunk_size), [])
+
+    def test_malformed(self):
+        for text in ('', '[1, 2]', '{"a": 1', '{"a" 1}', '{"a": 1,}', '{"a": tru}', '{"a": "b}'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    read_members(text, 4)
+
+
+class TestSnapshotDiffFromFiles(unittest.TestCase):
+    """Test cases of SnapshotDiff.from_files, which must give the diff and metrics of SnapshotDiff on loaded dumps."""
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_dir)
+
+    def write_snapshot(self, name, snapshot, indent):
+        path = os.path.join(self.snapshot_dir, name)
+        with open(path, "w") as f:
+            json.dump(snapshot, f, indent=indent)
+        return path
+
+    def assert_same_diff(self, db_type, snapshot_a, snapshot_b):
+        for indent in (None, 4):
+            file_a = self.write_snapshot("a.json", snapshot_a, indent)
+            file_b = self.write_snapshot("b.json", snapshot_b, indent)
+            expected = SnapshotDiff(db_type, json.loads(json.dumps(snapshot_a)), json.loads(json.dumps(snapshot_b)),
+                                    label_a="before", label_b="after")
+            # Both the streamed diff and the in-memory diff of small files
+            for min_file_size in (0, db_comparison.STREAMED_DIFF_MIN_FILE_SIZE):
+                with self.subTest(db_type=db_type, indent=indent, min_file_size=min_file_size), \
+                        patch.object(db_comparison, "STREAMED_DIFF_MIN_FILE_SIZE", min_file_size):
+                    snapshot_diff = SnapshotDiff.from_files(db_type, file_a, file_b, label_a="before", label_b="after")
+                    self.assertEqual(snapshot_diff.diff, expected.diff)
+                    self.assertEqual(snapshot_diff.metrics, expected.metrics)
+
+    def test_state_db(self):
+        self.assert_same_diff(DBType.STATE, SNAPSHOT_A, SNAPSHOT_B)
+
+    def test_appl_db(self):
+        self.assert_same_diff(DBType.APPL, SNAPSHOT_A, SNAPSHOT_B)
+
+    def test_same_snapshots(self):
+        self.assert_same_diff(DBType.STATE, SNAPSHOT_A, SNAPSHOT_A)
+
+    def test_empty_snapshot(self):
+        self.assert_same_diff(DBType.STATE, {}, SNAPSHOT_B)
+        self.assert_same_diff(DBType.STATE, SNAPSHOT_A, {})
+
+    def test_streamed_diff_loads_differing_keys_only(self):
+        file_a = self.write_snapshot("a.json", SNAPSHOT_A, 4)
+        file_b = self.write_snapshot("b.json", SNAPSHOT_B, 4)
+        with patch.object(db_comparison, "STREAMED_DIFF_MIN_FILE_SIZE", 0), \
+                patch.object(SnapshotDiff, "__init__", return_value=None) as init:
+            SnapshotDiff.from_files(DBType.STATE, file_a, file_b)
+        _, snapshot_a, snapshot_b = init.call_args.args
+        # The keys with the same values but the volatile fields aren't loaded, PROCESS_STATS entries always are
+        self.assertEqual(set(snapshot_a), {"PORT_TABLE|Ethernet4", "PROCESS_STATS|1", "PROCESS_STATS|2",
+                                           "ONLY_A|\u00e9\"\\key"})
+        self.assertEqual(set(snapshot_b), {"PORT_TABLE|Ethernet4", "PROCESS_STATS|3", "PROCESS_STATS|4",
+                                           "ONLY_B|key"})
+        self.assertEqual(init.call_args.kwargs["snapshot_totals"],
+                         (db_comparison._snapshot_totals(DBType.STATE, SNAPSHOT_A),
+                          db_comparison._snapshot_totals(DBType.STATE, SNAPSHOT_B)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,7 +30,8 @@ from tests.common.devices.k8s import K8sMasterHost
 from tests.common.devices.k8s import K8sMasterCluster
 from tests.common.devices.duthosts import DutHosts
 from tests.common.devices.vmhost import VMHost
-from tests.common.devices.base import NeighborDevice
+from tests.common.devices.base import NeighborDevice, module_call_stats
+from tests.common.devices.ssh_transport import set_ssh_transport_enabled, close_ssh_transports
 from tests.common.devices.cisco import CiscoHost
 from tests.common.fixtures.duthost_utils import backup_and_restore_config_db_session, \
     stop_route_checker_on_duthost, start_route_checker_on_duthost                           # noqa: F401
@@ -49,6 +50,9 @@ from tests.common.helpers.constants import (
 from tests.common.helpers.custom_msg_utils import add_custom_msg
 from tests.common.helpers.dut_ports import encode_dut_port_name
 from tests.common.helpers.dut_utils import encode_dut_and_container_name
+from tests.common.helpers.parallel import (
+    BroadcastExecutor, BROADCAST_MAX_WORKERS, get_broadcast_executor, set_broadcast_executor
+)
 from tests.common.helpers.parallel_utils import ParallelCoordinator, ParallelStatus, ParallelRunContext
 from tests.common.helpers.pfcwd_helper import TrafficPorts, select_test_ports, set_pfc_timers
 from tests.common.system_utils import docker
@@ -315,8 +319,25 @@ def pytest_addoption(parser):
     parser.addoption("--skip_yang", action="store_true", default=False,
                      help="Skip YANG validation")
 
+    #################################
+    #   parallel_run options        #
+    #################################
+    parser.addoption("--broadcast_workers", action="store", default=BROADCAST_MAX_WORKERS, type=int,
+                     help="Forked processes running the calls to all the ASICs of a DUT or to all the DUTs "
+                          "concurrently, e.g. 16. Default 0 runs them one after another")
+
+    #################################
+    #   ssh transport options       #
+    #################################
+    parser.addoption("--ssh_transport", action="store_true", default=False,
+                     help="Run the shell and command modules of the DUTs over a persistent SSH connection "
+                          "instead of ansible")
+
 
 def pytest_configure(config):
+    set_broadcast_executor(BroadcastExecutor(max_workers=config.getoption("broadcast_workers")))
+    set_ssh_transport_enabled(config.getoption("ssh_transport"))
+
     if config.getoption("enable_macsec"):
         topo = config.getoption("topology")
         if topo is not None and "t2" in topo:
@@ -492,6 +513,13 @@ def pytest_sessionstart(session):
 
 
 def pytest_sessionfinish(session, exitstatus):
+    close_ssh_transports()
+
+    if module_call_stats.stats:
+        logger.info("Ansible module call statistics:\n{}".format("\n".join(module_call_stats.report())))
+    if get_broadcast_executor().stats.stats:
+        logger.info("Broadcast call statistics:\n{}".format("\n".join(get_broadcast_executor().stats.report())))
+
     if session.config.cache.get("duthosts_fixture_failed", None):
         session.config.cache.set("duthosts_fixture_failed", None)
         session.exitstatus = DUTHOSTS_FIXTURE_FAILED_RC